@@ -0,0 +1,173 @@
+/**
+ * @file frame_parser.hpp
+ * @brief 管道协议的解析，pipe_rokae_force.cpp等C++接收端共用，Python端见src/pipe_receiver.py
+ */
+#pragma once
+
+#include <array>
+#include <cstddef>
+#include <cstdint>
+#include <cstring>
+#include <deque>
+#include <string>
+#include <vector>
+
+/**
+ * @brief 管道协议解析（协议定义见src/pipe_receiver.py）
+ * @brief 消息头：magic "SFP2"(4) 顺序号(4) 长度(4) 长度取反(4) CRC32(4)，均为小端，后面跟数据内容
+ * @brief 多消息帧的magic为"SFP3"，数据内容为若干条 长度(4) + 消息内容，顺序号为第一条消息的顺序号
+ * @brief 校验失败时跳过一个字节重新寻找magic，不需要重新打开管道；顺序号不连续时统计丢失的消息数
+ */
+class FrameParser {
+public:
+    static constexpr size_t HEADER_SIZE = 20;
+    static constexpr uint32_t MAX_PAYLOAD = 16 * 1024 * 1024;
+
+    uint64_t gaps = 0;
+    uint64_t lostMessages = 0;
+    uint64_t crcErrors = 0;
+    uint64_t headerErrors = 0;
+    uint64_t discardedBytes = 0;
+
+    void feed(const char* data, size_t size) {
+        buffer_.insert(buffer_.end(), data, data + size);
+    }
+
+    // 取出下一条校验通过的消息，没有完整消息时返回false
+    bool next(std::string& payload) {
+        if (!pending_.empty()) {
+            payload = std::move(pending_.front());
+            pending_.pop_front();
+            return true;
+        }
+        while (buffer_.size() - start_ >= HEADER_SIZE) {
+            const char* p = buffer_.data() + start_;
+            bool multi = std::memcmp(p, "SFP3", 4) == 0;
+            if (!multi && std::memcmp(p, "SFP2", 4) != 0) {
+                skip();
+                continue;
+            }
+            uint32_t seq, length, lengthCheck, crc;
+            std::memcpy(&seq, p + 4, 4);
+            std::memcpy(&length, p + 8, 4);
+            std::memcpy(&lengthCheck, p + 12, 4);
+            std::memcpy(&crc, p + 16, 4);
+            if ((length ^ lengthCheck) != 0xFFFFFFFFu || length > MAX_PAYLOAD) {
+                ++headerErrors;
+                skip();
+                continue;
+            }
+            if (buffer_.size() - start_ < HEADER_SIZE + length) {
+                break;  // 数据还没有到齐
+            }
+            if (crc32(p + HEADER_SIZE, length) != crc) {
+                ++crcErrors;
+                skip();
+                continue;
+            }
+            uint32_t count = 1;
+            if (multi) {
+                if (!splitMulti(p + HEADER_SIZE, length)) {
+                    ++headerErrors;
+                    skip();
+                    continue;
+                }
+                count = static_cast<uint32_t>(pending_.size());
+            }
+            if (hasExpected_ && seq != expectedSeq_) {
+                uint32_t gap = seq - expectedSeq_;
+                if (gap < 0x80000000u) {
+                    ++gaps;
+                    lostMessages += gap;
+                }
+            }
+            expectedSeq_ = seq + count;
+            hasExpected_ = true;
+            if (multi) {
+                payload = std::move(pending_.front());
+                pending_.pop_front();
+            } else {
+                payload.assign(p + HEADER_SIZE, length);
+            }
+            start_ += HEADER_SIZE + length;
+            compact();
+            return true;
+        }
+        compact();
+        return false;
+    }
+
+    // 写端断开时调用，丢弃不完整的数据
+    void reset() {
+        discardedBytes += buffer_.size() - start_;
+        pending_.clear();
+        buffer_.clear();
+        start_ = 0;
+        hasExpected_ = false;
+    }
+
+private:
+    std::vector<char> buffer_;
+    std::deque<std::string> pending_;   // 多消息帧中还没有取出的消息
+    size_t start_ = 0;
+    uint32_t expectedSeq_ = 0;
+    bool hasExpected_ = false;
+
+    // 拆分多消息帧的数据内容，长度字段与数据内容对不上时返回false
+    bool splitMulti(const char* data, uint32_t length) {
+        std::deque<std::string> messages;
+        uint32_t position = 0;
+        while (position < length) {
+            uint32_t size;
+            if (length - position < 4) {
+                return false;
+            }
+            std::memcpy(&size, data + position, 4);
+            position += 4;
+            if (size > length - position) {
+                return false;
+            }
+            messages.emplace_back(data + position, size);
+            position += size;
+        }
+        if (messages.empty()) {
+            return false;
+        }
+        pending_ = std::move(messages);
+        return true;
+    }
+
+    void skip() {
+        ++start_;
+        ++discardedBytes;
+    }
+
+    void compact() {
+        if (start_ == buffer_.size()) {
+            buffer_.clear();
+            start_ = 0;
+        } else if (start_ > 65536) {
+            buffer_.erase(buffer_.begin(), buffer_.begin() + static_cast<std::ptrdiff_t>(start_));
+            start_ = 0;
+        }
+    }
+
+    static uint32_t crc32(const char* data, size_t size) {
+        static const std::array<uint32_t, 256> table = [] {
+            std::array<uint32_t, 256> t{};
+            for (uint32_t i = 0; i < 256; ++i) {
+                uint32_t c = i;
+                for (int k = 0; k < 8; ++k) {
+                    c = (c & 1u) ? 0xEDB88320u ^ (c >> 1) : c >> 1;
+                }
+                t[i] = c;
+            }
+            return t;
+        }();
+        uint32_t crc = 0xFFFFFFFFu;
+        for (size_t i = 0; i < size; ++i) {
+            crc = table[(crc ^ static_cast<uint8_t>(data[i])) & 0xFFu] ^ (crc >> 8);
+        }
+        return crc ^ 0xFFFFFFFFu;
+    }
+};
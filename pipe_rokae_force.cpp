@@ -9,6 +9,10 @@
 #include <vector>
 #include <iostream>
 #include <sstream>
+#include <cstdint>
+#include <filesystem>
+
+#include "frame_parser.hpp"
 
 class PipeReceiver : public rclcpp::Node {
 public:
@@ -51,6 +55,7 @@ private:
     std::string pipePath_;
     int fd_;
     rclcpp::TimerBase::SharedPtr timer_;
+    FrameParser parser_;
 
     void timer_callback() {
         if (fd_ == -1) {
@@ -62,31 +67,40 @@ private:
             }
         }
 
-        // 读取数据长度
-        uint32_t dataSize;
-        ssize_t bytesRead = read(fd_, &dataSize, sizeof(dataSize));
-        if (bytesRead == 0) {
-            // 没有写入者
-            close_pipe();
-            return;
-        }
-        if (bytesRead != sizeof(dataSize)) {
-            if (errno != EAGAIN && errno != EWOULDBLOCK) {
-                RCLCPP_ERROR(this->get_logger(), "读取数据长度错误: %s", strerror(errno));
+        // 把管道中已有的数据全部读入解析器，一次read()可能只拿到半条消息
+        char chunk[4096];
+        bool writerClosed = false;
+        while (true) {
+            ssize_t bytesRead = read(fd_, chunk, sizeof(chunk));
+            if (bytesRead > 0) {
+                parser_.feed(chunk, static_cast<size_t>(bytesRead));
+                continue;
+            }
+            if (bytesRead == 0) {
+                writerClosed = true;    // 没有写入者
+            } else if (errno != EAGAIN && errno != EWOULDBLOCK) {
+                RCLCPP_ERROR(this->get_logger(), "读取管道错误: %s", strerror(errno));
             }
-            return;
+            break;
         }
 
-        // 读取实际数据
-        std::vector<char> buffer(dataSize);
-        bytesRead = read(fd_, buffer.data(), dataSize);
-        if (bytesRead != static_cast<ssize_t>(dataSize)) {
-            RCLCPP_ERROR(this->get_logger(), "读取数据内容错误: %s", strerror(errno));
-            return;
+        // 处理本次收到的所有完整消息
+        std::string data;
+        uint64_t lostBefore = parser_.lostMessages;
+        while (parser_.next(data)) {
+            RCLCPP_INFO(this->get_logger(), "接收到数据长度: %zu, 内容: %s", data.size(), data.c_str());
+        }
+        if (parser_.lostMessages != lostBefore) {
+            RCLCPP_WARN(this->get_logger(), "丢失消息: %lu (累计 %lu), CRC错误累计: %lu",
+                        static_cast<unsigned long>(parser_.lostMessages - lostBefore),
+                        static_cast<unsigned long>(parser_.lostMessages),
+                        static_cast<unsigned long>(parser_.crcErrors));
         }
 
-        std::string data(buffer.begin(), buffer.end());
-        RCLCPP_INFO(this->get_logger(), "接收到数据长度: %u, 内容: %s", dataSize, data.c_str());
+        if (writerClosed) {
+            parser_.reset();
+            close_pipe();
+        }
     }
 };
 
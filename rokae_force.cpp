@@ -25,60 +25,123 @@
 #include <cstring>
 #include <stdexcept>
 #include <vector>
+#include <sys/mman.h>
+#include <atomic>
+#include <chrono>
+#include <cstdint>
+#include <array>
+#include <limits>
 
 /**
- * @brief 接收管道数据
- * @brief 
- * @brief 
+ * @brief 读取最新值信箱（写端见src/force_mailbox.py）
+ * @brief 每个通道只有最新的一个力值，读取不会阻塞，也不会读到排队的旧数据
+ * @brief 数据年龄基于steady_clock，与Python端的perf_counter_ns同为CLOCK_MONOTONIC
  */
-class PipeReceiver {
+struct ForceSample {
+    double value;
+    double age;     // 数据年龄，单位s
+    bool stale;     // 数据年龄是否超过过期阈值
+    uint32_t seq;   // 顺序号，seq不变说明数据没有更新
+};
+
+class ForceMailbox {
 public:
-    PipeReceiver(const std::string& pipePath) : pipePath_(pipePath), fd_(-1) {}
+    ForceMailbox(const std::string& path) : path_(path), fd_(-1), base_(nullptr), size_(0), channels_(0), staleAfterNs_(0) {}
 
     void open() {
-        fd_ = ::open(pipePath_.c_str(), O_RDONLY | O_NONBLOCK);
+        fd_ = ::open(path_.c_str(), O_RDONLY);
         if (fd_ == -1) {
-            throw std::runtime_error("Failed to open FIFO: " + std::string(strerror(errno)));
+            throw std::runtime_error("Failed to open mailbox: " + std::string(strerror(errno)));
+        }
+        struct stat st;
+        if (fstat(fd_, &st) == -1 || static_cast<size_t>(st.st_size) < HEADER_SIZE) {
+            close();
+            throw std::runtime_error("Invalid mailbox file: " + path_);
         }
-        RCLCPP_INFO(rclcpp::get_logger("PipeReceiver"), "Pipe opened: %s", pipePath_.c_str());
+        size_ = static_cast<size_t>(st.st_size);
+        void* mapped = mmap(nullptr, size_, PROT_READ, MAP_SHARED, fd_, 0);
+        if (mapped == MAP_FAILED) {
+            close();
+            throw std::runtime_error("Failed to map mailbox: " + std::string(strerror(errno)));
+        }
+        base_ = static_cast<const char*>(mapped);
+        uint32_t slotSize;
+        std::memcpy(&channels_, base_ + 8, sizeof(channels_));
+        std::memcpy(&slotSize, base_ + 12, sizeof(slotSize));
+        std::memcpy(&staleAfterNs_, base_ + 16, sizeof(staleAfterNs_));
+        if (std::memcmp(base_, "SFMBOX01", 8) != 0 || slotSize != SLOT_SIZE ||
+            size_ < HEADER_SIZE + channels_ * SLOT_SIZE) {
+            close();
+            throw std::runtime_error("Invalid mailbox file: " + path_);
+        }
+        RCLCPP_INFO(rclcpp::get_logger("ForceMailbox"), "Mailbox opened: %s", path_.c_str());
     }
 
-    std::string receiveData() {
-        if (fd_ == -1) {
-            throw std::runtime_error("Pipe not opened");
-        }
+    uint32_t channels() const {
+        return channels_;
+    }
 
-        uint32_t dataSize;
-        if (read(fd_, &dataSize, sizeof(dataSize)) != sizeof(dataSize)) {
-            if (errno == EAGAIN || errno == EWOULDBLOCK) {
-                return ""; // 没有新数据
-            }
-            throw std::runtime_error("Failed to read data size: " + std::string(strerror(errno)));
+    // 读取一个通道的最新值，通道还没有数据时返回false
+    bool read(uint32_t channel, ForceSample& sample) const {
+        if (base_ == nullptr || channel >= channels_) {
+            return false;
         }
-
-        std::vector<char> buffer(dataSize);
-        if (read(fd_, buffer.data(), dataSize) != dataSize) {
-            throw std::runtime_error("Failed to read data: " + std::string(strerror(errno)));
+        const char* slot = base_ + HEADER_SIZE + channel * SLOT_SIZE;
+        const auto* seqPtr = reinterpret_cast<const std::atomic<uint32_t>*>(slot);
+        for (int attempt = 0; attempt < 100; ++attempt) {
+            uint32_t seqBefore = seqPtr->load(std::memory_order_acquire);
+            if (seqBefore & 1u) {
+                continue;   // 写端正在写入
+            }
+            uint32_t flags;
+            int64_t sampleNs;
+            double value;
+            std::memcpy(&flags, slot + 4, sizeof(flags));
+            std::memcpy(&sampleNs, slot + 8, sizeof(sampleNs));
+            std::memcpy(&value, slot + 16, sizeof(value));
+            std::atomic_thread_fence(std::memory_order_acquire);
+            if (seqPtr->load(std::memory_order_relaxed) != seqBefore) {
+                continue;
+            }
+            if (!(flags & 1u)) {
+                return false;
+            }
+            int64_t nowNs = std::chrono::duration_cast<std::chrono::nanoseconds>(
+                std::chrono::steady_clock::now().time_since_epoch()).count();
+            sample.value = value;
+            sample.age = static_cast<double>(nowNs - sampleNs) / 1e9;
+            sample.stale = nowNs - sampleNs > staleAfterNs_;
+            sample.seq = seqBefore;
+            return true;
         }
-
-        return std::string(buffer.begin(), buffer.end());
+        return false;
     }
 
     void close() {
+        if (base_ != nullptr) {
+            munmap(const_cast<char*>(base_), size_);
+            base_ = nullptr;
+        }
         if (fd_ != -1) {
             ::close(fd_);
             fd_ = -1;
-            RCLCPP_INFO(rclcpp::get_logger("PipeReceiver"), "Pipe closed");
         }
     }
 
-    ~PipeReceiver() {
+    ~ForceMailbox() {
         close();
     }
 
 private:
-    std::string pipePath_;
+    static constexpr size_t HEADER_SIZE = 64;
+    static constexpr size_t SLOT_SIZE = 32;
+
+    std::string path_;
     int fd_;
+    const char* base_;
+    size_t size_;
+    uint32_t channels_;
+    int64_t staleAfterNs_;
 };
 
 /**
@@ -190,8 +253,11 @@ public:
         RCLCPP_INFO(this->get_logger(), "Start to cartesian impedance control");
         this->declare_parameter("cartesian_point", "0.45 0.0 0.5 3.14154 0.0 3.14154");
         this->declare_parameter("velocity", "0.1");
+        // 力传感器信箱路径（写端见src/force_mailbox.py），为空时不读取
+        this->declare_parameter("force_mailbox", "");
         keyborad = this->create_subscription<std_msgs::msg::String>("/keystroke", 10, std::bind(&Rokae_Force::keyborad_callback, this, std::placeholders::_1));
         command_publisher_ = this->create_publisher<std_msgs::msg::Float32MultiArray>("cartesian_pos", 10);
+        open_force_mailbox();
 
         try
         {
@@ -250,6 +316,58 @@ private:
 
     std::string velocity_command;
 
+    std::unique_ptr<ForceMailbox> force_mailbox_;
+    rclcpp::Publisher<std_msgs::msg::Float32MultiArray>::SharedPtr sensor_force_publisher_;
+
+    void open_force_mailbox()
+    {
+        std::string path = this->get_parameter("force_mailbox").as_string();
+        if (path.empty())
+        {
+            return;
+        }
+        try
+        {
+            auto mailbox = std::make_unique<ForceMailbox>(path);
+            mailbox->open();
+            force_mailbox_ = std::move(mailbox);
+            sensor_force_publisher_ = this->create_publisher<std_msgs::msg::Float32MultiArray>("sensor_force", 10);
+        }
+        catch (const std::exception &e)
+        {
+            RCLCPP_WARN(this->get_logger(), "打开力传感器信箱失败，不发布sensor_force: %s", e.what());
+        }
+    }
+
+    // 读取信箱中每个通道的最新力值并发布，没有数据或已过期的通道为NaN
+    void publish_sensor_force()
+    {
+        if (!force_mailbox_)
+        {
+            return;
+        }
+        std_msgs::msg::Float32MultiArray message;
+        bool stale = false;
+        for (uint32_t channel = 0; channel < force_mailbox_->channels(); ++channel)
+        {
+            ForceSample sample;
+            if (force_mailbox_->read(channel, sample) && !sample.stale)
+            {
+                message.data.push_back(static_cast<float>(sample.value));
+            }
+            else
+            {
+                message.data.push_back(std::numeric_limits<float>::quiet_NaN());
+                stale = true;
+            }
+        }
+        if (stale)
+        {
+            RCLCPP_WARN_THROTTLE(this->get_logger(), *this->get_clock(), 1000, "力传感器数据缺失或已过期");
+        }
+        sensor_force_publisher_->publish(message);
+    }
+
     void publish_force_data()
     {
         try
@@ -266,6 +384,7 @@ private:
             // message.data = cart_force_vector;
             message.data = cartesian_vector;
             command_publisher_->publish(message);
+            publish_sensor_force();
         }
         catch (const std::exception &e)
         {
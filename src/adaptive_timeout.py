@@ -0,0 +1,120 @@
+"""
+模块功能描述：
+根据最近的往返时间（RTT）分布自适应地设置应答超时
+*********************************
+版本：1.0
+最近一次修改日期：2026-10-18
+
+修改日志：
+2026-10-18，建立初版
+
+说明：
+固定的50ms超时意味着丢失一个应答就要停顿50ms，在几百Hz的采集率下相当于丢掉十几个采样。
+AdaptiveTimeout记录最近window次成功请求的RTT，超时取 quantile分位数 * factor，并限制在[floor, ceiling]之内。
+发生超时后超时时间临时加倍（不超过ceiling），防止从机确实变慢时连续超时，
+之后随着新的RTT样本进入窗口逐渐恢复。样本数少于min_samples时使用初始值。
+"""
+import logging
+from typing import Dict, Any
+
+import numpy as np
+
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveTimeout:
+    """
+    基于RTT分布的自适应超时
+    """
+    def __init__(self,
+                 initial: float = 0.05,
+                 floor: float = 0.002,
+                 ceiling: float = 0.05,
+                 factor: float = 2.0,
+                 quantile: float = 99.0,
+                 window: int = 256,
+                 min_samples: int = 32,
+                 update_every: int = 16):
+        """
+        初始化
+
+        :param initial: 样本不足时使用的超时（秒）
+        :param floor: 超时下限（秒），至少要大于请求和应答在线路上的传输时间
+        :param ceiling: 超时上限（秒）
+        :param factor: 安全系数
+        :param quantile: 使用的RTT分位（0~100）
+        :param window: 保留的最近RTT样本数
+        :param min_samples: 开始自适应所需的样本数
+        :param update_every: 每多少个新样本重新计算一次分位数
+        """
+        if not 0 < floor <= ceiling:
+            raise ValueError(f"超时范围不正确: floor={floor}, ceiling={ceiling}")
+        self.floor = floor
+        self.ceiling = ceiling
+        self.factor = factor
+        self.quantile = quantile
+        self.min_samples = min(min_samples, window)
+        self.update_every = update_every
+        self.initial = initial
+        self.timeout = min(max(initial, floor), ceiling)
+
+        self._rtts = np.zeros(window, dtype=np.float64)    # 环形缓冲区
+        self._index = 0
+        self._filled = 0
+        self._since_update = 0
+        self._backoff = 1.0
+
+        # 统计信息
+        self.total_samples = 0
+        self.timeouts = 0
+        self.time_lost = 0.0            # 等待超时所花的总时间（秒）
+
+    def record(self, rtt: float) -> None:
+        """
+        记录一次成功请求的往返时间
+
+        :param rtt: 往返时间（秒）
+        """
+        self._rtts[self._index] = rtt
+        self._index = (self._index + 1) % len(self._rtts)
+        self._filled = min(self._filled + 1, len(self._rtts))
+        self.total_samples += 1
+        self._since_update += 1
+        if self._since_update >= self.update_every and self._filled >= self.min_samples:
+            self._backoff = max(1.0, self._backoff / 2)
+            self._update()
+
+    def record_timeout(self, waited: float) -> None:
+        """
+        记录一次超时
+
+        :param waited: 本次等待的时间（秒）
+        """
+        self.timeouts += 1
+        self.time_lost += waited
+        self._backoff = min(self._backoff * 2, self.ceiling / self.floor)
+        self._update()
+
+    def _update(self) -> None:
+        """重新计算超时时间"""
+        self._since_update = 0
+        if self._filled < self.min_samples:
+            base = self.initial
+        else:
+            base = float(np.percentile(self._rtts[:self._filled], self.quantile)) * self.factor
+        self.timeout = min(max(base * self._backoff, self.floor), self.ceiling)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """获取当前超时、RTT分位数和超时损失的时间"""
+        rtts = self._rtts[:self._filled]
+        return {
+            "timeout_ms": self.timeout * 1000,
+            "rtt_p50_ms": float(np.percentile(rtts, 50)) * 1000 if self._filled else None,
+            "rtt_p99_ms": float(np.percentile(rtts, 99)) * 1000 if self._filled else None,
+            "samples": self.total_samples,
+            "timeouts": self.timeouts,
+            "time_lost_s": self.time_lost,
+        }
@@ -0,0 +1,434 @@
+"""
+模块功能描述：
+记录文件的归档压缩：按传感器的分辨率转换为定点数，差分、zigzag编码后按块用zlib或lzma压缩，每块可以单独解码
+*********************************
+版本：1.2
+最近一次修改日期：2026-10-19
+
+修改日志：
+2026-10-19，建立初版
+2026-10-19，添加iter_range，与RecordingReader.iter_range相同
+2026-10-19，iter_range按chunk_records切分解码出的块
+
+说明：
+src/recording.py的记录文件每个采样占24字节，其中数值为float64。力传感器的信号变化缓慢，
+ASCII协议的报文本身只有两位小数（例如'+12.34'），float64的大部分位都是浪费。
+块的编码（全部用NumPy向量化完成）：
+    - 数值：乘以10**decimals取整为定点数，做一阶差分；时间戳：采样间隔接近固定，做二阶差分
+    - 差分结果zigzag编码为无符号数（小的负数也变成小的正数），按块内的最大值选用1/2/4/8字节宽度
+    - 标志按同样的方式保存；非有限值（NaN、inf）的位置用位图记录，原值单独保存
+    - 各部分拼接后整体用zlib或lzma压缩
+解码时定点数除以10**decimals，对原本就是decimals位小数的数值（例如float('12.34')）结果完全一致；
+分辨率更高的数值会被量化到10**-decimals，archive_recording会统计并提示最大的量化误差。
+归档文件格式（小端）：
+    文件头（32字节）：magic 'SFARC001'(8s) 版本(I) 元数据长度(I) 创建时的系统时间ns(q) 创建时的perf_counter_ns(q)，
+                      之后是UTF-8 JSON元数据（通道、decimals、原记录文件的元数据）
+    之后是若干块，每块为块头（BLOCK_HEADER_SIZE字节）加压缩后的数据
+    文件末尾为块索引（BLOCK_INDEX_DTYPE数组）和结尾（索引偏移(q) 块数(I) magic 'SFARCEND'(8s)）
+ArchiveReader读取块索引后按时间范围只解码用到的块，随机访问不需要从头解压。
+"""
+import os
+import json
+import lzma
+import zlib
+import mmap
+import struct
+import logging
+from typing import Optional, List, Dict, Any, Sequence, Iterator, Tuple, Union
+
+import numpy as np
+
+from src.recording import RecordingReader, RECORD_DTYPE
+
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+ARCHIVE_MAGIC = b'SFARC001'
+ARCHIVE_END_MAGIC = b'SFARCEND'
+ARCHIVE_VERSION = 1
+BLOCK_MAGIC = b'SFAB'
+CODECS = {'none': 0, 'zlib': 1, 'lzma': 2}
+DEFAULT_DECIMALS = 2
+DEFAULT_BLOCK_RECORDS = 65536
+
+_ARCHIVE_HEADER = struct.Struct('<8sIIqq')
+# magic 通道号 编解码器 小数位数 记录数 第一个时间戳 最后时间戳 压缩前长度 压缩后长度
+# 时间戳宽度 数值宽度 标志宽度 非有限值个数
+_BLOCK_HEADER = struct.Struct('<4sHBbIqqIIBBBxI')
+BLOCK_HEADER_SIZE = _BLOCK_HEADER.size
+_ARCHIVE_END = struct.Struct('<qI8s')
+
+BLOCK_INDEX_DTYPE = np.dtype([('offset', '<i8'), ('t_first', '<i8'), ('t_last', '<i8'), ('count', '<u4'),
+                              ('channel', '<u2'), ('codec', '<u1'), ('decimals', '<i1')])
+
+
+def _zigzag(values: np.ndarray) -> np.ndarray:
+    """有符号数 -> 无符号数：0, -1, 1, -2, 2 ... -> 0, 1, 2, 3, 4 ..."""
+    return ((values << 1) ^ (values >> 63)).view(np.uint64)
+
+
+def _unzigzag(values: np.ndarray) -> np.ndarray:
+    return ((values >> np.uint64(1)) ^ (np.uint64(0) - (values & np.uint64(1)))).view(np.int64)
+
+
+def _narrow(values: np.ndarray) -> Tuple[int, bytes]:
+    """按最大值选用最小的字节宽度，返回(宽度, 字节)"""
+    largest = int(values.max()) if len(values) else 0
+    for width in (1, 2, 4, 8):
+        if largest < 1 << (8 * width):
+            return width, values.astype(f'<u{width}').tobytes()
+
+
+def _widen(buffer: bytes, offset: int, width: int, count: int) -> Tuple[np.ndarray, int]:
+    """_narrow的逆过程，返回(uint64数组, 下一部分的偏移)"""
+    values = np.frombuffer(buffer, dtype=f'<u{width}', count=count, offset=offset).astype(np.uint64)
+    return values, offset + width * count
+
+
+def _compress(payload: bytes, codec: str, level: Optional[int]) -> bytes:
+    if codec == 'zlib':
+        return zlib.compress(payload, 6 if level is None else level)
+    if codec == 'lzma':
+        return lzma.compress(payload, preset=6 if level is None else level)
+    return payload
+
+
+def _decompress(data: Union[bytes, memoryview], codec: int) -> bytes:
+    if codec == CODECS['zlib']:
+        return zlib.decompress(data)
+    if codec == CODECS['lzma']:
+        return lzma.decompress(data)
+    return bytes(data)
+
+
+def encode_block(records: np.ndarray, channel: int = 0, decimals: int = DEFAULT_DECIMALS,
+                 codec: str = 'zlib', level: Optional[int] = None) -> bytes:
+    """
+    编码一块记录，结果可以单独解码
+
+    :param records: RECORD_DTYPE数组，时间戳递增
+    :param channel: 通道号，写入块头
+    :param decimals: 定点数的小数位数（传感器的分辨率为10**-decimals）
+    :param codec: 'zlib'、'lzma'或'none'
+    :param level: 压缩级别，为None时使用默认值
+    :return: 块头加压缩后的数据
+    """
+    if codec not in CODECS:
+        raise ValueError(f"不支持的编解码器: {codec}，可选 {list(CODECS)}")
+    count = len(records)
+    if count == 0:
+        raise ValueError("不能编码空的块")
+    timestamps = records['timestamp'].astype(np.int64)
+    values = records['value'].astype(np.float64)
+
+    # 非有限值用位图记录位置，原值单独保存，定点数处记为0
+    special = ~np.isfinite(values)
+    scaled = np.rint(np.where(special, 0.0, values) * 10.0 ** decimals)
+    if np.abs(scaled).max() >= 2.0 ** 62:
+        raise ValueError(f"数值超出{decimals}位小数定点数的范围")
+    fixed = scaled.astype(np.int64)
+
+    # 时间戳二阶差分，数值一阶差分（第一个差分相对于0，块内自包含）
+    timestamp_deltas = np.diff(np.diff(timestamps, prepend=timestamps[0]), prepend=0)
+    value_deltas = np.diff(fixed, prepend=0)
+    timestamp_width, timestamp_bytes = _narrow(_zigzag(timestamp_deltas))
+    value_width, value_bytes = _narrow(_zigzag(value_deltas))
+    flag_width, flag_bytes = _narrow(records['flags'].astype(np.uint64))
+    n_special = int(special.sum())
+    special_bytes = (np.packbits(special).tobytes() + values[special].astype('<f8').tobytes()) if n_special else b''
+
+    payload = timestamp_bytes + value_bytes + flag_bytes + special_bytes
+    data = _compress(payload, codec, level)
+    header = _BLOCK_HEADER.pack(BLOCK_MAGIC, channel, CODECS[codec], decimals, count, int(timestamps[0]),
+                                int(timestamps[-1]), len(payload), len(data), timestamp_width, value_width,
+                                flag_width, n_special)
+    return header + data
+
+
+def decode_block(buffer: Union[bytes, memoryview, mmap.mmap], offset: int = 0) -> np.ndarray:
+    """
+    解码一块记录
+
+    :param buffer: 包含该块的缓冲区
+    :param offset: 块头在缓冲区中的位置
+    :return: RECORD_DTYPE数组
+    """
+    (magic, _, codec, decimals, count, t_first, _, payload_length, data_length, timestamp_width,
+     value_width, flag_width, n_special) = _BLOCK_HEADER.unpack_from(buffer, offset)
+    if magic != BLOCK_MAGIC:
+        raise ValueError(f"偏移 {offset} 处不是有效的归档块")
+    start = offset + BLOCK_HEADER_SIZE
+    payload = _decompress(memoryview(buffer)[start:start + data_length], codec)
+    if len(payload) != payload_length:
+        raise ValueError(f"偏移 {offset} 处的归档块长度不符")
+
+    position = 0
+    timestamp_deltas, position = _widen(payload, position, timestamp_width, count)
+    value_deltas, position = _widen(payload, position, value_width, count)
+    flags, position = _widen(payload, position, flag_width, count)
+
+    records = np.zeros(count, dtype=RECORD_DTYPE)
+    records['timestamp'] = t_first + np.cumsum(np.cumsum(_unzigzag(timestamp_deltas)))
+    records['value'] = np.cumsum(_unzigzag(value_deltas)) / 10.0 ** decimals   # 除法结果与float('12.34')一致
+    records['flags'] = flags
+    if n_special:
+        mask_length = (count + 7) // 8
+        special = np.unpackbits(np.frombuffer(payload, dtype=np.uint8, count=mask_length, offset=position),
+                                count=count).astype(bool)
+        records['value'][special] = np.frombuffer(payload, dtype='<f8', count=n_special,
+                                                  offset=position + mask_length)
+    return records
+
+
+class ArchiveWriter:
+    """
+    写入归档文件：按通道攒够block_records条记录后编码为一块
+    """
+    def __init__(self,
+                 path: str,
+                 channels: Sequence[Dict[str, Any]],
+                 decimals: Union[int, Sequence[int]] = DEFAULT_DECIMALS,
+                 codec: str = 'zlib',
+                 level: Optional[int] = None,
+                 block_records: int = DEFAULT_BLOCK_RECORDS,
+                 metadata: Optional[Dict[str, Any]] = None,
+                 wall_ns: int = 0,
+                 perf_ns: int = 0):
+        """
+        初始化
+
+        :param path: 归档文件路径
+        :param channels: 通道描述（与记录文件元数据中的channels相同）
+        :param decimals: 各通道的小数位数，给出一个整数时所有通道相同；通道描述中有decimals时以通道描述为准
+        :param codec: 'zlib'、'lzma'或'none'
+        :param level: 压缩级别，为None时使用默认值
+        :param block_records: 每块的记录数，越大压缩率越高，随机访问时多解码的数据也越多
+        :param metadata: 附加的元数据
+        :param wall_ns: 原记录创建时的系统时间ns
+        :param perf_ns: 原记录创建时的perf_counter_ns
+        """
+        if codec not in CODECS:
+            raise ValueError(f"不支持的编解码器: {codec}，可选 {list(CODECS)}")
+        if isinstance(decimals, int):
+            decimals = [decimals] * len(channels)
+        self.channels = [dict(channel, decimals=int(channel.get('decimals', default)))
+                         for channel, default in zip(channels, decimals)]
+        self.codec = codec
+        self.level = level
+        self.block_records = block_records
+        self.path = path
+        self._pending: List[List[np.ndarray]] = [[] for _ in self.channels]
+        self._pending_counts = [0] * len(self.channels)
+        self._index: List[Tuple[int, int, int, int, int, int, int]] = []
+        self.raw_bytes = 0
+        self.max_quantization_error = 0.0
+
+        header_metadata = dict(metadata or {}, channels=self.channels, codec=codec, block_records=block_records)
+        metadata_bytes = json.dumps(header_metadata, ensure_ascii=False).encode('utf-8')
+        self._file = open(path, 'wb')
+        self._file.write(_ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, len(metadata_bytes), wall_ns, perf_ns))
+        self._file.write(metadata_bytes)
+
+    def __enter__(self) -> 'ArchiveWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def append(self, channel: int, records: np.ndarray) -> None:
+        """
+        追加一个通道的记录
+
+        :param channel: 通道号
+        :param records: RECORD_DTYPE数组，时间戳递增
+        """
+        while len(records):
+            take = min(len(records), self.block_records - self._pending_counts[channel])
+            self._pending[channel].append(records[:take])
+            self._pending_counts[channel] += take
+            records = records[take:]
+            if self._pending_counts[channel] == self.block_records:
+                self._write_block(channel)
+
+    def _write_block(self, channel: int) -> None:
+        pending = self._pending[channel]
+        if not pending:
+            return
+        records = pending[0] if len(pending) == 1 else np.concatenate(pending)
+        self._pending[channel] = []
+        self._pending_counts[channel] = 0
+        decimals = self.channels[channel]['decimals']
+        finite = records['value'][np.isfinite(records['value'])]
+        if len(finite):
+            quantized = np.rint(finite * 10.0 ** decimals) / 10.0 ** decimals
+            self.max_quantization_error = max(self.max_quantization_error, float(np.abs(quantized - finite).max()))
+
+        offset = self._file.tell()
+        self._file.write(encode_block(records, channel, decimals, self.codec, self.level))
+        self._index.append((offset, int(records['timestamp'][0]), int(records['timestamp'][-1]), len(records),
+                            channel, CODECS[self.codec], decimals))
+        self.raw_bytes += records.nbytes
+
+    def close(self) -> None:
+        """写入剩余的记录和块索引，关闭文件"""
+        if self._file is None:
+            return
+        for channel in range(len(self.channels)):
+            self._write_block(channel)
+        index_offset = self._file.tell()
+        self._file.write(np.array(self._index, dtype=BLOCK_INDEX_DTYPE).tobytes())
+        self._file.write(_ARCHIVE_END.pack(index_offset, len(self._index), ARCHIVE_END_MAGIC))
+        self._file.close()
+        self._file = None
+
+
+class ArchiveReader:
+    """
+    读取归档文件，按块索引只解码需要的块
+    """
+    def __init__(self, path: str):
+        """
+        初始化，映射整个文件并读取块索引
+
+        :param path: 归档文件路径
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, metadata_length, wall_ns, perf_ns = _ARCHIVE_HEADER.unpack_from(self._mm, 0)
+        if magic != ARCHIVE_MAGIC:
+            raise ValueError("不是有效的归档文件")
+        if version > ARCHIVE_VERSION:
+            raise ValueError(f"不支持的归档文件版本: {version}")
+        index_offset, block_count, end_magic = _ARCHIVE_END.unpack_from(self._mm, len(self._mm) - _ARCHIVE_END.size)
+        if end_magic != ARCHIVE_END_MAGIC:
+            raise ValueError("归档文件不完整（缺少块索引）")
+        self.wall_ns = wall_ns
+        self.perf_ns = perf_ns
+        start = _ARCHIVE_HEADER.size
+        self.metadata: Dict[str, Any] = json.loads(bytes(self._mm[start:start + metadata_length]).decode('utf-8'))
+        self.channels: List[Dict[str, Any]] = self.metadata['channels']
+        self.channel_names: List[str] = [channel['name'] for channel in self.channels]
+        self.blocks = np.frombuffer(self._mm, dtype=BLOCK_INDEX_DTYPE, count=block_count, offset=index_offset).copy()
+        self._by_channel = [self.blocks[self.blocks['channel'] == channel] for channel in range(len(self.channels))]
+
+    def channel_index(self, channel: Union[int, str]) -> int:
+        """通道名称 -> 通道号"""
+        return self.channel_names.index(channel) if isinstance(channel, str) else channel
+
+    def to_wall_ns(self, timestamps: Union[int, np.ndarray]) -> Union[int, np.ndarray]:
+        """perf_counter_ns时间戳 -> 系统时间ns"""
+        return timestamps - self.perf_ns + self.wall_ns
+
+    def count(self, channel: Union[int, str]) -> int:
+        """通道的记录数"""
+        return int(self._by_channel[self.channel_index(channel)]['count'].sum())
+
+    def iter_blocks(self, channel: Union[int, str], t0: Optional[int] = None,
+                    t1: Optional[int] = None) -> Iterator[np.ndarray]:
+        """
+        逐块解码一个通道，只解码与时间范围有重叠的块
+
+        :param channel: 通道号或通道名称
+        :param t0: 起始时间戳（含），为None时从头开始
+        :param t1: 结束时间戳（含），为None时到结尾
+        """
+        blocks = self._by_channel[self.channel_index(channel)]
+        first = 0 if t0 is None else int(np.searchsorted(blocks['t_last'], t0, side='left'))
+        last = len(blocks) if t1 is None else int(np.searchsorted(blocks['t_first'], t1, side='right'))
+        for offset in blocks['offset'][first:last]:
+            yield decode_block(self._mm, int(offset))
+
+    def iter_range(self, channel: Union[int, str], t0: Optional[int] = None, t1: Optional[int] = None,
+                   chunk_records: Optional[int] = None) -> Iterator[np.ndarray]:
+        """
+        按时间范围逐块读取一个通道，每次解码一块并去掉范围之外的记录
+
+        :param channel: 通道号或通道名称
+        :param t0: 起始时间戳（含），为None时从头开始
+        :param t1: 结束时间戳（含），为None时到结尾
+        :param chunk_records: 每次返回的最大记录数，解码出的块比它大时切分为多段视图，为None时按块返回
+        """
+        for records in self.iter_blocks(channel, t0, t1):
+            start = 0 if t0 is None else int(np.searchsorted(records['timestamp'], t0, side='left'))
+            stop = len(records) if t1 is None else int(np.searchsorted(records['timestamp'], t1, side='right'))
+            step = stop - start if chunk_records is None else chunk_records
+            for first in range(start, stop, max(step, 1)):
+                yield records[first:min(first + step, stop)]
+
+    def read(self, channel: Union[int, str]) -> np.ndarray:
+        """解码一个通道的全部记录"""
+        return self.read_range(channels=[channel])[self.channel_names[self.channel_index(channel)]]
+
+    def read_range(self, t0: Optional[int] = None, t1: Optional[int] = None,
+                   channels: Optional[Sequence[Union[int, str]]] = None) -> Dict[str, np.ndarray]:
+        """
+        按时间范围读取，与RecordingReader.read_range相同
+
+        :param t0: 起始时间戳（含），为None时从头开始
+        :param t1: 结束时间戳（含），为None时到结尾
+        :param channels: 通道号或通道名称，为None时为全部通道
+        :return: 通道名称 -> RECORD_DTYPE数组
+        """
+        if channels is None:
+            channels = range(len(self.channels))
+        results = {}
+        for channel in channels:
+            parts = list(self.iter_blocks(channel, t0, t1))
+            records = np.concatenate(parts) if parts else np.empty(0, dtype=RECORD_DTYPE)
+            if len(records):
+                start = 0 if t0 is None else int(np.searchsorted(records['timestamp'], t0, side='left'))
+                stop = len(records) if t1 is None else int(np.searchsorted(records['timestamp'], t1, side='right'))
+                records = records[start:stop]
+            results[self.channel_names[self.channel_index(channel)]] = records
+        return results
+
+    def close(self) -> None:
+        """关闭文件映射"""
+        self._mm.close()
+
+    def __enter__(self) -> 'ArchiveReader':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+def archive_recording(source: str, destination: str, decimals: Union[int, Sequence[int]] = DEFAULT_DECIMALS,
+                      codec: str = 'zlib', level: Optional[int] = None,
+                      block_records: int = DEFAULT_BLOCK_RECORDS) -> Dict[str, Any]:
+    """
+    把记录文件的原始采样压缩为归档文件（降采样金字塔不保存，需要时可以重新生成）
+
+    :param source: 记录文件路径
+    :param destination: 归档文件路径
+    :param decimals: 各通道的小数位数，记录文件的通道描述中有decimals时以通道描述为准
+    :param codec: 'zlib'、'lzma'或'none'
+    :param level: 压缩级别
+    :param block_records: 每块的记录数
+    :return: 记录数、原始字节数、归档文件大小、压缩比和最大量化误差
+    """
+    with RecordingReader(source) as reader:
+        metadata = {key: value for key, value in reader.metadata.items() if key not in ('channels', 'pyramid')}
+        writer = ArchiveWriter(destination, reader.channels, decimals, codec, level, block_records,
+                               metadata=dict(metadata, source=os.path.basename(source)),
+                               wall_ns=reader.wall_ns, perf_ns=reader.perf_ns)
+        with writer:
+            for channel in range(len(reader.channels)):
+                for view in reader.iter_views(channel):
+                    writer.append(channel, view)
+        records = sum(reader.count(channel) for channel in range(len(reader.channels)))
+
+    size = os.path.getsize(destination)
+    if writer.max_quantization_error > 0:
+        logger.warning(f"{source}: 数值的分辨率高于归档的小数位数，最大量化误差 {writer.max_quantization_error:g}")
+    return {
+        "records": records,
+        "raw_bytes": writer.raw_bytes,
+        "archive_bytes": size,
+        "ratio": writer.raw_bytes / size if size else 0.0,
+        "max_quantization_error": writer.max_quantization_error,
+    }
@@ -0,0 +1,337 @@
+"""
+模块功能描述：
+后台写入线程：采集循环只把数据放入有界队列，由独立线程批量写盘，采集循环从不等待磁盘
+*********************************
+版本：1.2
+最近一次修改日期：2026-10-19
+
+修改日志：
+2026-10-19，建立初版
+2026-10-19，写入失败的批次单独计数，不计入written；stop等待超时时不关闭写入目标
+2026-10-19，合并的一批数据在submit之间切分到不同文件，文件不超过rotate_bytes；只有文件头的文件不轮换
+
+说明：
+在采集循环里直接写文件，一次缓慢的写入或fsync就会让串口读取停顿，read_sensor_data的缓冲区随之积压。
+BackgroundWriter：
+    - submit只做一次不等待的入队，队列满时丢弃该批数据并计数，不阻塞调用方
+    - 写入线程每隔write_interval秒一次取出队列中积压的全部数据（不超过batch_bytes），合并为一次大的顺序写入，
+      写入次数少，也很少与采集线程争抢GIL
+    - 统计写入延迟（数据入队到写完的时间）、队列深度、丢弃数、写入失败数和最长的单次写入时间
+    - stop等待写入线程超时时不关闭写入目标（线程可能还在写），可以再次调用stop继续等待
+子类实现_open_target、_write_batch、_sync、_close_target即可换成其它存储。
+BackgroundFileWriter把bytes写入文件：
+    - 按大小（rotate_bytes）或时间（rotate_seconds）轮换文件，文件名为 <名称>.0000<扩展名>、<名称>.0001<扩展名>...，
+      每个文件开头写入header（例如录制文件头），轮换只发生在两次submit的数据之间，记录不会被拆到两个文件中。
+      合并写入的一批数据按submit的边界切分，文件（含header）不超过rotate_bytes，
+      只有单次submit的数据本身就超过上限时，该文件才会超出；只有header的文件不会被轮换
+    - fsync_interval给出时，写入线程每隔这么久调用一次fsync
+"""
+import os
+import time
+import queue
+import logging
+import threading
+from typing import Optional, Any, List, Tuple, Callable, Dict
+
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class BackgroundWriter:
+    """
+    在独立线程中写入数据的基类
+    """
+    def __init__(self,
+                 queue_size: int = 4096,
+                 batch_bytes: int = 1024 * 1024,
+                 fsync_interval: Optional[float] = None,
+                 write_interval: float = 0.05,
+                 name: str = 'writer'):
+        """
+        初始化
+
+        :param queue_size: 队列中最多积压的数据批数，超过时新数据被丢弃
+        :param batch_bytes: 一次写入最多合并的字节数（按submit时给出的大小计算）
+        :param fsync_interval: 每隔多少秒同步一次到磁盘，为None时不主动同步
+        :param write_interval: 两次写入之间的最短间隔（秒），越长每次写入越大，写入延迟也越大
+        :param name: 名称，用于线程名和日志
+        """
+        self.queue_size = queue_size
+        self.batch_bytes = batch_bytes
+        self.fsync_interval = fsync_interval
+        self.write_interval = write_interval
+        self.name = name
+        self._queue: 'queue.Queue[Tuple[int, Any, int]]' = queue.Queue(maxsize=queue_size)
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_sync = time.monotonic()
+
+        # 统计信息
+        self.submitted = 0
+        self.dropped = 0
+        self.dropped_bytes = 0
+        self.written = 0
+        self.written_bytes = 0
+        self.batches = 0
+        self.syncs = 0
+        self.errors = 0
+        self.failed = 0
+        self.failed_bytes = 0
+        self.last_error: Optional[BaseException] = None
+        self.last_lag_ns = 0
+        self.max_lag_ns = 0
+        self.max_write_ns = 0
+
+    def start(self) -> 'BackgroundWriter':
+        """打开写入目标并启动写入线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._open_target()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"BackgroundWriter-{self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def submit(self, item: Any, size: int = 0) -> bool:
+        """
+        提交一批数据，不等待
+
+        :param item: 数据，由子类的_write_batch解释
+        :param size: 数据大小（字节），用于合并写入和统计
+        :return: 是否入队成功，队列满时为False（数据被丢弃）
+        """
+        try:
+            self._queue.put_nowait((time.perf_counter_ns(), item, size))
+        except queue.Full:
+            self.dropped += 1
+            self.dropped_bytes += size
+            return False
+        self.submitted += 1
+        return True
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        写完队列中剩余的数据，停止写入线程并关闭写入目标。
+        超时后线程仍在写入时不关闭写入目标，返回后可以再次调用stop
+
+        :param timeout: 等待线程结束的时间（秒），为None时一直等待
+        """
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning(f"{self.name}: 等待写入线程超时，队列中还有 {self.queue_depth} 批，暂不关闭写入目标")
+            return
+        self._thread = None
+        self._sync()
+        self._close_target()
+        logger.info(f"{self.name}: 写入线程已停止，写入 {self.written} 批 {self.written_bytes} 字节，"
+                    f"丢弃 {self.dropped} 批，写入失败 {self.failed} 批，最大写入延迟 {self.max_lag_ns / 1e6:.2f} ms")
+
+    def __enter__(self) -> 'BackgroundWriter':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                first = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                if self._stop_event.is_set():
+                    return
+                continue
+
+            # 取出积压的数据合并为一次写入
+            batch = [first]
+            size = first[2]
+            while size < self.batch_bytes:
+                try:
+                    entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(entry)
+                size += entry[2]
+
+            start_ns = time.perf_counter_ns()
+            try:
+                self._write_batch([item for _, item, _ in batch])
+            except Exception as e:
+                self.errors += 1
+                self.failed += len(batch)
+                self.failed_bytes += size
+                self.last_error = e
+                logger.error(f"{self.name}: 写入失败: {e}")
+            else:
+                self.written += len(batch)
+                self.written_bytes += size
+            end_ns = time.perf_counter_ns()
+            self.batches += 1
+            self.max_write_ns = max(self.max_write_ns, end_ns - start_ns)
+            self.last_lag_ns = end_ns - batch[0][0]
+            self.max_lag_ns = max(self.max_lag_ns, self.last_lag_ns)
+
+            if self.fsync_interval is not None and time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+            if self.write_interval and size < self.batch_bytes:
+                self._stop_event.wait(self.write_interval)      # 停止时立即醒来，写完剩余数据
+
+    def _sync(self) -> None:
+        """同步到磁盘"""
+        self._last_sync = time.monotonic()
+        self.syncs += 1
+
+    def _open_target(self) -> None:
+        """打开写入目标，在start中调用"""
+
+    def _write_batch(self, items: List[Any]) -> None:
+        """写入一批数据，在写入线程中调用"""
+        raise NotImplementedError
+
+    def _close_target(self) -> None:
+        """关闭写入目标，在stop中调用"""
+
+    @property
+    def queue_depth(self) -> int:
+        """队列中等待写入的数据批数"""
+        return self._queue.qsize()
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """获取写入量、丢弃数、队列深度和写入延迟"""
+        return {
+            "submitted": self.submitted,
+            "written": self.written,
+            "written_bytes": self.written_bytes,
+            "dropped": self.dropped,
+            "dropped_bytes": self.dropped_bytes,
+            "queue_depth": self.queue_depth,
+            "batches": self.batches,
+            "syncs": self.syncs,
+            "errors": self.errors,
+            "failed": self.failed,
+            "failed_bytes": self.failed_bytes,
+            "last_lag_ms": self.last_lag_ns / 1e6,
+            "max_lag_ms": self.max_lag_ns / 1e6,
+            "max_write_ms": self.max_write_ns / 1e6,
+        }
+
+
+class BackgroundFileWriter(BackgroundWriter):
+    """
+    在独立线程中把bytes写入文件，可以按大小或时间轮换文件
+    """
+    def __init__(self,
+                 path: str,
+                 header: Optional[Callable[[], bytes]] = None,
+                 rotate_bytes: Optional[int] = None,
+                 rotate_seconds: Optional[float] = None,
+                 queue_size: int = 4096,
+                 batch_bytes: int = 1024 * 1024,
+                 fsync_interval: Optional[float] = None,
+                 write_interval: float = 0.05,
+                 name: str = 'file'):
+        """
+        初始化
+
+        :param path: 文件路径，轮换时在扩展名前加上四位序号
+        :param header: 返回文件头的函数，每个新文件开头写入一次
+        :param rotate_bytes: 单个文件的大小上限（字节），为None时不按大小轮换
+        :param rotate_seconds: 单个文件的时长上限（秒），为None时不按时间轮换
+        :param queue_size: 队列中最多积压的数据批数
+        :param batch_bytes: 一次写入最多合并的字节数
+        :param fsync_interval: 每隔多少秒fsync一次，为None时不主动同步
+        :param write_interval: 两次写入之间的最短间隔（秒）
+        :param name: 名称，用于线程名和日志
+        """
+        super().__init__(queue_size, batch_bytes, fsync_interval, write_interval, name)
+        self.path = path
+        self.header = header
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.paths: List[str] = []
+        self._fd: Optional[int] = None
+        self._file_bytes = 0
+        self._header_bytes = 0      # 当前文件中文件头的字节数，_file_bytes不超过它时文件里还没有数据
+        self._file_opened = 0.0
+
+    @property
+    def rotating(self) -> bool:
+        return self.rotate_bytes is not None or self.rotate_seconds is not None
+
+    def part_path(self, index: int) -> str:
+        """第index个文件的路径"""
+        if not self.rotating:
+            return self.path
+        root, ext = os.path.splitext(self.path)
+        return f"{root}.{index:04d}{ext}"
+
+    def submit(self, data: bytes, size: Optional[int] = None) -> bool:
+        """
+        提交要写入的字节，不等待
+
+        :param data: 字节
+        :return: 是否入队成功，队列满时为False
+        """
+        return super().submit(data, len(data) if size is None else size)
+
+    def _open_file(self) -> None:
+        path = self.part_path(len(self.paths))
+        self._fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o644)
+        self.paths.append(path)
+        self._file_bytes = 0
+        self._file_opened = time.monotonic()
+        if self.header is not None:
+            self._write_all(self.header())
+        self._header_bytes = self._file_bytes
+
+    def _write_all(self, data: bytes) -> None:
+        view = memoryview(data)
+        while view:
+            written = os.write(self._fd, view)
+            view = view[written:]
+        self._file_bytes += len(data)
+
+    def _open_target(self) -> None:
+        self._open_file()
+
+    def _rotate(self) -> None:
+        self._sync()
+        os.close(self._fd)
+        self._open_file()
+
+    def _write_batch(self, items: List[bytes]) -> None:
+        if self.rotate_seconds is not None and self._file_bytes > self._header_bytes and \
+                time.monotonic() - self._file_opened >= self.rotate_seconds:
+            self._rotate()
+        if self.rotate_bytes is None:
+            self._write_all(b''.join(items))
+            return
+        # 按submit的边界切分，连续写入同一个文件的部分仍合并为一次写入
+        start = 0
+        size = self._file_bytes
+        for index, item in enumerate(items):
+            if size + len(item) > self.rotate_bytes and size > self._header_bytes:
+                if index > start:
+                    self._write_all(b''.join(items[start:index]))
+                self._rotate()
+                start = index
+                size = self._file_bytes
+            size += len(item)
+        self._write_all(b''.join(items[start:]))
+
+    def _sync(self) -> None:
+        super()._sync()
+        if self._fd is not None:
+            os.fsync(self._fd)
+
+    def _close_target(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return dict(super().get_statistics(), files=list(self.paths))
@@ -0,0 +1,390 @@
+"""
+模块功能描述：
+多个记录文件的离线批量分析：用进程池并行处理，每个文件得到统计量、滤波后的信号、事件和采集率/抖动报告，最后合并
+*********************************
+版本：1.2
+最近一次修改日期：2026-10-19
+
+修改日志：
+2026-10-19，建立初版
+2026-10-19，标准差统一为样本标准差（除以n-1），与src/streaming_stats.py一致；CPU时间之和与总耗时之比改称并行度，不再当作加速比
+2026-10-19，采集率在单个文件和合并结果中使用同一个定义（全部记录的间隔数/时长），每个文件记录records和duration
+
+说明：
+试验后的分析原来是一个脚本处理一个文件，几十次试验要一个个手动运行。run_batch把文件分配给ProcessPoolExecutor：
+    - 传给子进程的只有文件路径和分析参数，子进程自己用RecordingReader（mmap）打开文件，
+      数据不经过pickle在进程之间复制，返回的也只是统计结果
+    - 每个文件、每个通道计算（analyze_recording）：
+        统计量：有效/无效采样数、最小值、最大值、平均值、标准差、P50、P99
+        （标准差都是样本标准差，除以n-1，与src/streaming_stats.py的StreamingStats、SlidingWindowStats相同）
+        采集率和抖动：采集率为全部记录（包括无效采样）的间隔数除以首尾时间差，
+        采样间隔的平均值、标准差、P99、最大值，以及超过中位间隔gap_factor倍的间断次数
+        滤波：按cutoff_hz做滑动平均低通，给出output_dir时把滤波后的信号写入 <文件名>.filtered.sfrec
+        事件：滤波后的信号偏离基线超过阈值的连续区间。基线取每baseline_seconds秒一段的中位数再线性插值，
+              不会被几百毫秒的冲击拉偏；阈值默认为原始信号噪声（减去滤波结果）稳健标准差的event_sigma倍，
+              间隔不到一个滤波窗口的区间合并为一个事件，给出事件数和前max_events个事件的起止时间、持续时间和峰值
+    - merge_results按通道合并：采样数相加，平均值和标准差按分组公式合并，最小/最大值取极值，
+      采集率为各文件的间隔数之和除以时长之和（与单个文件的定义相同），
+      P99和抖动取各文件中的最大值（分位数无法精确合并）
+    - 报告中给出各文件分析占用的CPU时间之和与总耗时之比（并行度），表示平均有几个进程在同时计算，
+      核数越多越接近进程数。它不是加速比：进程池的启动、调度和争用使每个文件的CPU时间本身变长，
+      加速比要与workers=1的总耗时对比（见test/test_of_recording/bench_batch_analysis.py）
+也可以直接运行：python -m src.batch_analysis <记录文件或目录> ... [--workers N] [--output 目录]
+"""
+import os
+import sys
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Optional, List, Dict, Any, Sequence, Union
+
+import numpy as np
+
+from src.recording import RecordingReader, RecordingWriter, FLAG_INVALID
+
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+RECORDING_EXTENSION = '.sfrec'
+
+
+def moving_average(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    居中的滑动平均（两端窗口截短），用累加和计算，耗时与窗口长度无关
+
+    :param values: 数值
+    :param window: 窗口长度（采样数）
+    :return: 与values等长的滤波结果
+    """
+    if window <= 1 or len(values) == 0:
+        return values.astype(np.float64, copy=True)
+    sums = np.concatenate(([0.0], np.cumsum(values, dtype=np.float64)))
+    index = np.arange(len(values))
+    lower = np.maximum(index - window // 2, 0)
+    upper = np.minimum(index + (window - window // 2), len(values))
+    return (sums[upper] - sums[lower]) / (upper - lower)
+
+
+def block_median_baseline(values: np.ndarray, block: int) -> np.ndarray:
+    """
+    变化缓慢的基线：每block个采样取一次中位数，在各段中心之间线性插值
+
+    :param values: 数值
+    :param block: 每段的采样数
+    :return: 与values等长的基线
+    """
+    if len(values) <= block:
+        return np.full(len(values), np.median(values) if len(values) else 0.0)
+    full = len(values) // block * block
+    medians = np.median(values[:full].reshape(-1, block), axis=1)
+    centers = np.arange(len(medians)) * block + (block - 1) / 2
+    if full < len(values):
+        medians = np.append(medians, np.median(values[full:]))
+        centers = np.append(centers, (full + len(values) - 1) / 2)
+    return np.interp(np.arange(len(values)), centers, medians)
+
+
+def robust_std(values: np.ndarray) -> float:
+    """稳健标准差：1.4826倍的中位数绝对偏差，不受少数离群值影响"""
+    if len(values) == 0:
+        return 0.0
+    return 1.4826 * float(np.median(np.abs(values - np.median(values))))
+
+
+def detect_events(timestamps: np.ndarray, filtered: np.ndarray, baseline: np.ndarray, threshold: float,
+                  min_gap: int = 1, max_events: int = 20) -> Dict[str, Any]:
+    """
+    找出滤波后的信号偏离基线超过阈值的连续区间
+
+    :param timestamps: 时间戳（perf_counter_ns）
+    :param filtered: 滤波后的数值
+    :param baseline: 基线（变化缓慢的部分）
+    :param threshold: 偏离基线的阈值
+    :param min_gap: 间隔少于这么多个采样的两个区间合并为一个事件
+    :param max_events: 最多列出的事件数
+    :return: 事件数、阈值和前max_events个事件
+    """
+    deviation = filtered - baseline
+    active = np.abs(deviation) > threshold
+    edges = np.diff(active.astype(np.int8), prepend=0, append=0)
+    starts = np.flatnonzero(edges == 1)
+    stops = np.flatnonzero(edges == -1)        # 不含
+    if len(starts) > 1:
+        keep = starts[1:] - stops[:-1] >= min_gap   # 在阈值附近抖动产生的短间隔不算新事件
+        starts = np.concatenate((starts[:1], starts[1:][keep]))
+        stops = np.concatenate((stops[:-1][keep], stops[-1:]))
+    events = []
+    for start, stop in zip(starts[:max_events], stops[:max_events]):
+        peak = start + int(np.argmax(np.abs(deviation[start:stop])))
+        events.append({
+            "start_ns": int(timestamps[start]),
+            "end_ns": int(timestamps[stop - 1]),
+            "duration_ms": (int(timestamps[stop - 1]) - int(timestamps[start])) / 1e6,
+            "peak": float(filtered[peak]),
+            "peak_ns": int(timestamps[peak]),
+        })
+    return {"count": len(starts), "threshold": threshold, "events": events}
+
+
+def _channel_report(timestamps: np.ndarray, values: np.ndarray, flags: np.ndarray,
+                    cutoff_hz: Optional[float], baseline_seconds: float, event_threshold: Optional[float],
+                    event_sigma: float, gap_factor: float, max_events: int) -> Dict[str, Any]:
+    """分析一个通道，返回统计、采集率/抖动和事件；滤波结果放在'_filtered'中由调用方取走"""
+    valid = np.isfinite(values) & ((flags & FLAG_INVALID) == 0)
+    t = timestamps[valid]
+    v = values[valid]
+    records = len(timestamps)
+    duration = (int(timestamps[-1]) - int(timestamps[0])) / 1e9 if records else 0.0
+    # 采集率按全部记录的间隔数计算，merge_results用records和duration按同一个定义合并
+    report: Dict[str, Any] = {"count": int(len(v)), "invalid": int(len(values) - len(v)), "records": records,
+                              "duration": duration,
+                              "sampling_rate": (records - 1) / duration if duration > 0 else 0.0}
+    if len(v) == 0:
+        return report
+
+    mean = float(v.mean())
+    p50, p99 = np.percentile(v, [50, 99])
+    report.update(min=float(v.min()), max=float(v.max()), mean=mean, m2=float(((v - mean) ** 2).sum()),
+                  std=float(v.std(ddof=1)) if len(v) > 1 else 0.0, p50=float(p50), p99=float(p99))
+
+    intervals = np.diff(timestamps).astype(np.float64) / 1e6
+    if len(intervals):
+        median = float(np.median(intervals))
+        report["interval"] = {
+            "mean_ms": float(intervals.mean()),
+            "std_ms": float(intervals.std(ddof=1)) if len(intervals) > 1 else 0.0,
+            "p50_ms": median,
+            "p99_ms": float(np.percentile(intervals, 99)),
+            "max_ms": float(intervals.max()),
+            "gaps": int((intervals > gap_factor * median).sum()) if median > 0 else 0,
+        }
+
+    rate = report["sampling_rate"]
+    window = max(1, int(round(rate / cutoff_hz))) if cutoff_hz and rate > 0 else 1
+    filtered = moving_average(v, window)
+    baseline = block_median_baseline(filtered, max(window, int(round(rate * baseline_seconds))))
+    report["filter_window"] = window
+    if event_threshold is None:
+        noise = v - filtered if window > 1 else v - baseline
+        event_threshold = event_sigma * robust_std(noise)
+    report["events"] = detect_events(t, filtered, baseline, event_threshold, window, max_events)
+    report["_filtered"] = (t, filtered)
+    return report
+
+
+def analyze_recording(path: str,
+                      channels: Optional[Sequence[Union[int, str]]] = None,
+                      cutoff_hz: Optional[float] = 10.0,
+                      baseline_seconds: float = 2.0,
+                      event_threshold: Optional[float] = None,
+                      event_sigma: float = 5.0,
+                      gap_factor: float = 3.0,
+                      max_events: int = 20,
+                      output_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    分析一个记录文件，在子进程中运行
+
+    :param path: 记录文件路径
+    :param channels: 要分析的通道号或名称，为None时为全部通道
+    :param cutoff_hz: 低通滤波的截止频率（Hz），滑动平均窗口为采集率/cutoff_hz个采样，为None时不滤波
+    :param baseline_seconds: 事件检测的基线每多少秒取一次中位数
+    :param event_threshold: 事件阈值（偏离基线的绝对值），为None时按event_sigma自动确定
+    :param event_sigma: 自动阈值为噪声稳健标准差的多少倍
+    :param gap_factor: 采样间隔超过中位间隔的多少倍算作间断
+    :param max_events: 每个通道最多列出的事件数
+    :param output_dir: 给出时把滤波后的信号写入该目录
+    :return: {"path", "elapsed": 耗时, "cpu": 占用的CPU时间, "channels": {通道名称: 报告}}
+    """
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    reports: Dict[str, Dict[str, Any]] = {}
+    filtered: Dict[int, tuple] = {}
+    with RecordingReader(path) as reader:
+        selected = range(len(reader.channel_names)) if channels is None else \
+            [reader.channel_index(channel) for channel in channels]
+        for channel in selected:
+            records = reader.read(channel)
+            report = _channel_report(records['timestamp'], records['value'], records['flags'], cutoff_hz,
+                                     baseline_seconds, event_threshold, event_sigma, gap_factor, max_events)
+            del records
+            if '_filtered' in report:
+                filtered[channel] = report.pop('_filtered')
+            reports[reader.channel_names[channel]] = report
+        channel_info = reader.channels
+        metadata = reader.metadata
+
+    if output_dir is not None and filtered:
+        name = os.path.splitext(os.path.basename(path))[0]
+        output = os.path.join(output_dir, f"{name}.filtered{RECORDING_EXTENSION}")
+        with RecordingWriter(output, [channel_info[channel] for channel in filtered],
+                             metadata={'source': os.path.basename(path), 'cutoff_hz': cutoff_hz,
+                                       'source_metadata': {key: value for key, value in metadata.items()
+                                                           if key not in ('channels', 'pyramid')}}) as writer:
+            for index, (t, values) in enumerate(filtered.values()):
+                writer.append_many(index, t, values)
+        reports = {name: dict(report, filtered_path=output) for name, report in reports.items()}
+
+    return {"path": path, "elapsed": time.perf_counter() - start, "cpu": time.process_time() - cpu_start,
+            "channels": reports}
+
+
+def merge_results(results: Sequence[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    按通道名称合并各文件的分析结果
+
+    :param results: analyze_recording的返回值（出错的文件已去掉）
+    :return: 通道名称 -> 合并后的报告
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    for result in results:
+        for name, report in result["channels"].items():
+            total = merged.setdefault(name, {"files": 0, "count": 0, "invalid": 0, "mean": 0.0, "m2": 0.0,
+                                             "min": float('inf'), "max": float('-inf'), "p99_max": None,
+                                             "records": 0, "intervals": 0, "duration": 0.0, "events": 0, "gaps": 0,
+                                             "interval_p99_max_ms": None, "interval_max_ms": None})
+            total["files"] += 1
+            total["invalid"] += report["invalid"]
+            total["records"] += report["records"]
+            total["intervals"] += max(report["records"] - 1, 0)
+            total["duration"] += report["duration"]
+            count = report["count"]
+            if not count:
+                continue
+            # 分组合并平均值和平方和（Chan等人的并行算法）
+            combined = total["count"] + count
+            delta = report["mean"] - total["mean"]
+            total["mean"] += delta * count / combined
+            total["m2"] += report["m2"] + delta * delta * total["count"] * count / combined
+            total["count"] = combined
+            total["min"] = min(total["min"], report["min"])
+            total["max"] = max(total["max"], report["max"])
+            total["p99_max"] = report["p99"] if total["p99_max"] is None else max(total["p99_max"], report["p99"])
+            total["events"] += report["events"]["count"]
+            interval = report.get("interval")
+            if interval:
+                total["gaps"] += interval["gaps"]
+                for key, source in (("interval_p99_max_ms", "p99_ms"), ("interval_max_ms", "max_ms")):
+                    total[key] = interval[source] if total[key] is None else max(total[key], interval[source])
+    for total in merged.values():
+        total["std"] = (total["m2"] / (total["count"] - 1)) ** 0.5 if total["count"] > 1 else 0.0
+        total["sampling_rate"] = total["intervals"] / total["duration"] if total["duration"] > 0 else 0.0
+    return merged
+
+
+def find_recordings(paths: Sequence[str]) -> List[str]:
+    """展开目录（目录中的*.sfrec，不包括滤波输出），保持给出的顺序"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(os.path.join(path, name) for name in os.listdir(path)
+                                if name.endswith(RECORDING_EXTENSION)
+                                and not name.endswith(f".filtered{RECORDING_EXTENSION}")))
+        else:
+            files.append(path)
+    return files
+
+
+def run_batch(paths: Sequence[str], workers: Optional[int] = None, **options) -> Dict[str, Any]:
+    """
+    用进程池并行分析多个记录文件并合并结果
+
+    :param paths: 记录文件或目录
+    :param workers: 进程数，为None时为CPU核数；为1时在当前进程中依次分析（便于调试和对比）
+    :param options: 传给analyze_recording的参数
+    :return: {"files": [各文件结果], "errors": {路径: 错误}, "merged": {通道: 合并报告},
+              "wall_s": 总耗时, "cpu_s": 各文件分析的CPU时间之和, "parallelism": 并行度（cpu_s / wall_s），
+              "workers": 进程数}。加速比需要另外与workers=1的wall_s对比
+    """
+    files = find_recordings(paths)
+    workers = workers or os.cpu_count() or 1
+    if options.get('output_dir'):
+        os.makedirs(options['output_dir'], exist_ok=True)
+    results: Dict[str, Dict[str, Any]] = {}
+    errors: Dict[str, str] = {}
+    start = time.perf_counter()
+    if workers == 1:
+        for path in files:
+            try:
+                results[path] = analyze_recording(path, **options)
+            except Exception as e:
+                errors[path] = f"{type(e).__name__}: {e}"
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, max(1, len(files)))) as executor:
+            futures = {executor.submit(analyze_recording, path, **options): path for path in files}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    results[path] = future.result()
+                except Exception as e:
+                    errors[path] = f"{type(e).__name__}: {e}"
+    wall = time.perf_counter() - start
+    for path, error in errors.items():
+        logger.error(f"分析 {path} 失败: {error}")
+
+    ordered = [results[path] for path in files if path in results]
+    cpu = sum(result["cpu"] for result in ordered)
+    return {
+        "files": ordered,
+        "errors": errors,
+        "merged": merge_results(ordered),
+        "wall_s": wall,
+        "cpu_s": cpu,
+        "parallelism": cpu / wall if wall > 0 else 0.0,
+        "workers": workers,
+    }
+
+
+def print_report(report: Dict[str, Any], show_events: bool = False) -> None:
+    """打印run_batch的结果"""
+    for result in report["files"]:
+        print(f"\n{result['path']} （{result['elapsed']:.2f} 秒）")
+        for name, channel in result["channels"].items():
+            if not channel["count"]:
+                print(f"  {name}: 没有有效采样（无效 {channel['invalid']}）")
+                continue
+            interval = channel.get("interval", {})
+            print(f"  {name}: {channel['count']} 个采样（无效 {channel['invalid']}），{channel['duration']:.1f} 秒，"
+                  f"{channel['sampling_rate']:.1f} Hz")
+            print(f"    平均 {channel['mean']:.4f}  标准差 {channel['std']:.4f}  最小 {channel['min']:.4f}  "
+                  f"最大 {channel['max']:.4f}  P50 {channel['p50']:.4f}  P99 {channel['p99']:.4f}")
+            if interval:
+                print(f"    采样间隔: 平均 {interval['mean_ms']:.3f} ms  标准差 {interval['std_ms']:.3f} ms  "
+                      f"P99 {interval['p99_ms']:.3f} ms  最大 {interval['max_ms']:.3f} ms  间断 {interval['gaps']} 次")
+            events = channel["events"]
+            print(f"    事件: {events['count']} 个（阈值 {events['threshold']:.4f}，滤波窗口 {channel['filter_window']}）")
+            if show_events:
+                for event in events["events"]:
+                    print(f"      {event['start_ns'] / 1e9:.3f} s 起 {event['duration_ms']:.1f} ms，"
+                          f"峰值 {event['peak']:.4f}")
+
+    print("\n合并结果:")
+    for name, total in report["merged"].items():
+        print(f"  {name}: {total['files']} 个文件，{total['count']} 个采样（无效 {total['invalid']}），"
+              f"{total['duration']:.1f} 秒，{total['sampling_rate']:.1f} Hz，"
+              f"平均 {total['mean']:.4f}  标准差 {total['std']:.4f}  最小 {total['min']:.4f}  最大 {total['max']:.4f}，"
+              f"事件 {total['events']} 个，间断 {total['gaps']} 次，最大采样间隔 {total['interval_max_ms']} ms")
+    for path, error in report["errors"].items():
+        print(f"  失败: {path}: {error}")
+    print(f"\n{len(report['files'])} 个文件，{report['workers']} 个进程，总耗时 {report['wall_s']:.2f} 秒，"
+          f"CPU时间之和 {report['cpu_s']:.2f} 秒，并行度 {report['parallelism']:.2f}")
+
+
+if __name__ == "__main__":
+    arguments = sys.argv[1:]
+    workers = None
+    output_dir = None
+    if '--workers' in arguments:
+        position = arguments.index('--workers')
+        workers = int(arguments[position + 1])
+        del arguments[position:position + 2]
+    if '--output' in arguments:
+        position = arguments.index('--output')
+        output_dir = arguments[position + 1]
+        del arguments[position:position + 2]
+    if not arguments:
+        print("用法: python -m src.batch_analysis <记录文件或目录> ... [--workers N] [--output 目录]")
+        sys.exit(1)
+    print_report(run_batch(arguments, workers=workers, output_dir=output_dir), show_events=True)
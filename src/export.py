@@ -0,0 +1,355 @@
+"""
+模块功能描述：
+把记录文件（.sfrec）或归档文件（.sfarc）分块导出为CSV，或在安装了pyarrow时导出为Parquet/Arrow，内存占用与文件大小无关
+*********************************
+版本：1.1
+最近一次修改日期：2026-10-19
+
+修改日志：
+2026-10-19，建立初版
+2026-10-19，合并格式的其它通道改用随主通道推进的游标，不再每块调用一次read_range重复解码归档块
+
+说明：
+先把记录读成Python列表再写CSV，几千万个采样就会耗尽内存，逐行格式化也很慢。export_recording：
+    - 通过iter_range按时间范围逐块读取（记录文件为mmap视图，归档文件每次解码一块），每块写完即释放
+    - CSV的格式化完全向量化：整数和定点小数用查表把每4位数字一次转换为字符，
+      各列拼成一个字节矩阵后用掩码去掉前导空位，一次写出整块；没有小数位数的通道用float的最短表示
+    - 长格式（默认）：每行一个采样，列为 channel, timestamp_ns, [wall_ns], value, flags，按通道依次输出
+    - 合并格式（fuse=True）：以第一个通道的时间戳为准，每行为 timestamp_ns, [wall_ns], X, Y, Z，
+      其它通道取不晚于该时间戳、相差不超过tolerance_ns的最近一个采样，没有时为空；无效采样输出为空
+    - 目标文件扩展名为.parquet、.arrow或.feather时需要pyarrow，逐块写入同一个文件
+    - 返回并打印行数、耗时和每秒行数
+也可以直接运行：
+python -m src.export <记录或归档文件> <输出文件> [--channels X,Y,Z] [--start 秒] [--end 秒] [--fuse]
+                     [--tolerance-ms 毫秒] [--decimals 位数] [--wall-time] [--chunk 行数]
+--start/--end为相对于文件中第一个采样的秒数。
+"""
+import os
+import time
+import logging
+import argparse
+from typing import Optional, List, Dict, Any, Sequence, Union, Tuple, Iterator
+
+import numpy as np
+
+from src.recording import RecordingReader, RECORD_DTYPE, FLAG_INVALID, KIND_RAW
+from src.archive import ArchiveReader
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+ARROW_EXTENSIONS = ('.parquet', '.arrow', '.feather')
+DEFAULT_CHUNK_ROWS = 1 << 16          # 格式化时每行约占400字节的临时内存
+
+# 0000 ~ 9999 的四位数字字符
+_DIGITS4 = np.array([list(f"{i:04d}".encode()) for i in range(10000)], dtype=np.uint8)
+_POWERS_OF_TEN = 10 ** np.arange(1, 19, dtype=np.int64)
+_INT_WIDTH = 20     # 符号加19位数字
+
+
+Field = Tuple[np.ndarray, np.ndarray]      # (字节矩阵, 保留的位置)
+
+
+def _int_field(values: np.ndarray, decimals: int = 0, missing: Optional[np.ndarray] = None) -> Field:
+    """
+    整数（decimals > 0时为定点小数，values为乘以10**decimals后的整数）-> 右对齐的字节矩阵和掩码
+
+    :param values: int64数组
+    :param decimals: 小数位数
+    :param missing: 为True的位置输出为空
+    """
+    count = len(values)
+    magnitude = np.abs(values)
+    matrix = np.empty((count, _INT_WIDTH), dtype=np.uint8)
+    rest = magnitude.copy()
+    for group in range(_INT_WIDTH // 4):
+        stop = _INT_WIDTH - 4 * group
+        matrix[:, stop - 4:stop] = _DIGITS4[rest % 10000]
+        rest //= 10000
+    digits = np.searchsorted(_POWERS_OF_TEN, magnitude, side='right') + 1
+    if decimals:
+        digits = np.maximum(digits, decimals + 1)          # 0.05而不是.05
+    negative = values < 0
+    sign_position = _INT_WIDTH - digits - 1
+    matrix[negative, sign_position[negative]] = ord('-')
+    keep = np.arange(_INT_WIDTH) >= (sign_position + ~negative)[:, None]
+    if decimals:
+        point = _INT_WIDTH - decimals
+        matrix = np.concatenate((matrix[:, :point], np.full((count, 1), ord('.'), dtype=np.uint8),
+                                 matrix[:, point:]), axis=1)
+        keep = np.concatenate((keep[:, :point], np.ones((count, 1), dtype=bool), keep[:, point:]), axis=1)
+    if missing is not None:
+        keep &= ~missing[:, None]
+    return matrix, keep
+
+
+def _float_field(values: np.ndarray, decimals: Optional[int]) -> Field:
+    """浮点数 -> 字节矩阵和掩码；给出小数位数时按定点数格式化，否则用最短表示。NaN输出为空"""
+    missing = ~np.isfinite(values)
+    if decimals is not None:
+        fixed = np.rint(np.where(missing, 0.0, values) * 10.0 ** decimals).astype(np.int64)
+        return _int_field(fixed, decimals, missing)
+    text = np.where(missing, 0.0, values).astype('S32')
+    matrix = text.view(np.uint8).reshape(len(values), -1)
+    return matrix, (matrix != 0) & ~missing[:, None]
+
+
+def _literal(count: int, text: bytes) -> Field:
+    matrix = np.tile(np.frombuffer(text, dtype=np.uint8), (count, 1))
+    return matrix, np.ones(matrix.shape, dtype=bool)
+
+
+def format_csv(columns: Sequence[Field]) -> bytes:
+    """
+    把各列拼成CSV文本（逗号分隔，每行以换行结尾）
+
+    :param columns: _int_field、_float_field得到的各列
+    :return: 整块的字节
+    """
+    count = len(columns[0][0])
+    parts: List[Field] = []
+    for index, column in enumerate(columns):
+        if index:
+            parts.append(_literal(count, b','))
+        parts.append(column)
+    parts.append(_literal(count, b'\n'))
+    matrix = np.concatenate([matrix for matrix, _ in parts], axis=1)
+    keep = np.concatenate([keep for _, keep in parts], axis=1)
+    return matrix[keep].tobytes()
+
+
+def open_reader(path: str) -> Union[RecordingReader, ArchiveReader]:
+    """按扩展名打开记录文件或归档文件"""
+    if path.endswith('.sfarc'):
+        return ArchiveReader(path)
+    return RecordingReader(path)
+
+
+def first_timestamp(reader: Union[RecordingReader, ArchiveReader]) -> Optional[int]:
+    """文件中最早的采样时间戳"""
+    if isinstance(reader, ArchiveReader):
+        return int(reader.blocks['t_first'].min()) if len(reader.blocks) else None
+    firsts = [info.t_first for info in reader.segments if info.kind == KIND_RAW and info.count]
+    return min(firsts) if firsts else None
+
+
+class _CsvSink:
+    def __init__(self, path: str, header: Sequence[str], decimals: Sequence[Optional[int]]):
+        self.file = open(path, 'wb')
+        self.file.write((','.join(header) + '\n').encode('utf-8'))
+        self.decimals = decimals
+
+    def write(self, columns: Dict[str, np.ndarray]) -> None:
+        fields = []
+        for (name, values), decimals in zip(columns.items(), self.decimals):
+            if values.dtype.kind == 'f':
+                fields.append(_float_field(values, decimals))
+            else:
+                fields.append(_int_field(values.astype(np.int64)))
+        self.file.write(format_csv(fields))
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class _ArrowSink:
+    def __init__(self, path: str, header: Sequence[str], decimals: Sequence[Optional[int]]):
+        if pyarrow is None:
+            raise ImportError("导出Parquet/Arrow需要pyarrow：pip install pyarrow")
+        self.path = path
+        self.writer = None
+
+    def write(self, columns: Dict[str, np.ndarray]) -> None:
+        table = pyarrow.table({name: pyarrow.array(values, from_pandas=True) for name, values in columns.items()})
+        if self.writer is None:
+            if self.path.endswith('.parquet'):
+                self.writer = pyarrow.parquet.ParquetWriter(self.path, table.schema)
+            else:
+                self.writer = pyarrow.ipc.new_file(self.path, table.schema)
+        self.writer.write_table(table)
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+
+
+def _long_chunks(reader, channels: List[int], t0: Optional[int], t1: Optional[int], chunk_rows: int,
+                 wall_time: bool) -> Iterator[Tuple[Dict[str, np.ndarray], int]]:
+    """长格式：按通道依次输出 (列, 通道号)"""
+    for channel in channels:
+        for records in reader.iter_range(channel, t0, t1, chunk_rows):
+            columns = {'channel': np.full(len(records), channel, dtype=np.int64),
+                       'timestamp_ns': records['timestamp']}
+            if wall_time:
+                columns['wall_ns'] = reader.to_wall_ns(records['timestamp'])
+            columns['value'] = records['value']
+            columns['flags'] = records['flags']
+            yield columns, channel
+
+
+class _AsofCursor:
+    """
+    合并格式中一个非主通道的对齐游标：随主通道的块向后推进，底层的iter_range只遍历一次，
+    归档文件的每个块也只解码一次；只保留还可能被后续时间戳用到的有效采样
+    """
+    def __init__(self, reader, channel: int, t0: Optional[int], t1: Optional[int], tolerance_ns: int,
+                 chunk_rows: int):
+        self.tolerance_ns = tolerance_ns
+        self._chunks = reader.iter_range(channel, None if t0 is None else t0 - tolerance_ns, t1, chunk_rows)
+        self._records = np.empty(0, dtype=RECORD_DTYPE)
+        self._exhausted = False
+
+    def values(self, timestamps: np.ndarray) -> np.ndarray:
+        """
+        每个时间戳之前（含）相差不超过tolerance_ns的最近一个有效采样的数值，没有时为NaN
+
+        :param timestamps: 主通道一块的时间戳，递增，且晚于上一次调用的时间戳
+        :return: 与timestamps等长的数值数组
+        """
+        end = int(timestamps[-1])
+        # 读到晚于本块最后一个时间戳的采样为止，下一块需要的采样也就都在缓存里了
+        while not self._exhausted and (not len(self._records) or self._records['timestamp'][-1] <= end):
+            records = next(self._chunks, None)
+            if records is None:
+                self._exhausted = True
+                break
+            records = records[np.isfinite(records['value']) & ((records['flags'] & FLAG_INVALID) == 0)]
+            self._records = np.concatenate((self._records, records))
+
+        records = self._records
+        if not len(records):
+            return np.full(len(timestamps), np.nan)
+        index = np.searchsorted(records['timestamp'], timestamps, side='right') - 1
+        found = index >= 0
+        index = np.maximum(index, 0)
+        found &= timestamps - records['timestamp'][index] <= self.tolerance_ns
+        values = np.where(found, records['value'][index], np.nan)
+        # 后续时间戳都晚于end，早于end - tolerance_ns的采样不会再用到
+        self._records = records[int(np.searchsorted(records['timestamp'], end - self.tolerance_ns, side='left')):]
+        return values
+
+
+def _fused_chunks(reader, channels: List[int], t0: Optional[int], t1: Optional[int], chunk_rows: int,
+                  wall_time: bool, tolerance_ns: int) -> Iterator[Tuple[Dict[str, np.ndarray], int]]:
+    """合并格式：以第一个通道的时间戳为准，其它通道按时间对齐"""
+    master = channels[0]
+    cursors = [_AsofCursor(reader, channel, t0, t1, tolerance_ns, chunk_rows) for channel in channels[1:]]
+    for records in reader.iter_range(master, t0, t1, chunk_rows):
+        timestamps = records['timestamp']
+        columns = {'timestamp_ns': timestamps}
+        if wall_time:
+            columns['wall_ns'] = reader.to_wall_ns(timestamps)
+        invalid = (records['flags'] & FLAG_INVALID) != 0
+        columns[reader.channel_names[master]] = np.where(invalid, np.nan, records['value'])
+        for channel, cursor in zip(channels[1:], cursors):
+            columns[reader.channel_names[channel]] = cursor.values(timestamps)
+        yield columns, master
+
+
+def export_recording(source: str,
+                     destination: str,
+                     channels: Optional[Sequence[Union[int, str]]] = None,
+                     t0: Optional[int] = None,
+                     t1: Optional[int] = None,
+                     fuse: bool = False,
+                     tolerance_ns: int = 10_000_000,
+                     decimals: Optional[int] = None,
+                     wall_time: bool = False,
+                     chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Dict[str, Any]:
+    """
+    分块导出记录文件或归档文件
+
+    :param source: 记录文件（.sfrec）或归档文件（.sfarc）
+    :param destination: 输出文件，扩展名为.parquet、.arrow、.feather时用pyarrow写入，其它为CSV
+    :param channels: 通道号或通道名称，为None时为全部通道；合并格式以第一个通道为准
+    :param t0: 起始时间戳（perf_counter_ns，含），为None时从头开始
+    :param t1: 结束时间戳（含），为None时到结尾
+    :param fuse: 是否把各通道合并到同一行
+    :param tolerance_ns: 合并格式中其它通道的采样最多比该行早多少纳秒
+    :param decimals: CSV中数值的小数位数，为None时使用通道描述中的decimals，都没有时用最短表示
+    :param wall_time: 是否增加系统时间列wall_ns
+    :param chunk_rows: 每块的最大行数，决定内存占用
+    :return: 行数、输出字节数、耗时和每秒行数
+    """
+    start = time.perf_counter()
+    reader = open_reader(source)
+    try:
+        selected = list(range(len(reader.channel_names))) if channels is None else \
+            [reader.channel_index(channel) for channel in channels]
+        channel_decimals = [reader.channels[channel].get('decimals') if decimals is None else decimals
+                            for channel in selected]
+        if fuse:
+            header = ['timestamp_ns'] + (['wall_ns'] if wall_time else []) + \
+                     [reader.channel_names[channel] for channel in selected]
+            column_decimals = [None] * (len(header) - len(selected)) + channel_decimals
+            chunks = _fused_chunks(reader, selected, t0, t1, chunk_rows, wall_time, tolerance_ns)
+        else:
+            header = ['channel', 'timestamp_ns'] + (['wall_ns'] if wall_time else []) + ['value', 'flags']
+            column_decimals = [None] * len(header)
+            chunks = _long_chunks(reader, selected, t0, t1, chunk_rows, wall_time)
+
+        arrow = os.path.splitext(destination)[1].lower() in ARROW_EXTENSIONS
+        sink = (_ArrowSink if arrow else _CsvSink)(destination, header, column_decimals)
+        rows = 0
+        try:
+            for columns, channel in chunks:
+                if not fuse:
+                    # 长格式的数值列按所属通道的小数位数格式化
+                    sink.decimals = column_decimals[:-2] + [channel_decimals[selected.index(channel)], None]
+                sink.write(columns)
+                rows += len(columns['timestamp_ns'])
+        finally:
+            sink.close()
+    finally:
+        reader.close()
+
+    elapsed = time.perf_counter() - start
+    result = {
+        "rows": rows,
+        "bytes": os.path.getsize(destination),
+        "seconds": elapsed,
+        "rows_per_s": rows / elapsed if elapsed > 0 else 0.0,
+    }
+    logger.info(f"导出 {source} -> {destination}: {rows} 行, {result['bytes'] / 1e6:.1f} MB, "
+                f"{elapsed:.2f} 秒, {result['rows_per_s']:.0f} 行/秒")
+    return result
+
+
+def main(arguments: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="把记录文件或归档文件导出为CSV/Parquet/Arrow")
+    parser.add_argument('source', help="记录文件（.sfrec）或归档文件（.sfarc）")
+    parser.add_argument('destination', help="输出文件，扩展名为.parquet/.arrow/.feather时需要pyarrow，其它为CSV")
+    parser.add_argument('--channels', help="逗号分隔的通道名称，默认全部通道")
+    parser.add_argument('--start', type=float, help="起始时间，相对于第一个采样的秒数")
+    parser.add_argument('--end', type=float, help="结束时间，相对于第一个采样的秒数")
+    parser.add_argument('--fuse', action='store_true', help="各通道合并到同一行（例如X/Y/Z）")
+    parser.add_argument('--tolerance-ms', type=float, default=10.0, help="合并时其它通道的采样最多早多少毫秒")
+    parser.add_argument('--decimals', type=int, help="数值的小数位数，默认使用通道描述中的decimals")
+    parser.add_argument('--wall-time', action='store_true', help="增加系统时间列wall_ns")
+    parser.add_argument('--chunk', type=int, default=DEFAULT_CHUNK_ROWS, help="每块的最大行数")
+    options = parser.parse_args(arguments)
+
+    t0 = t1 = None
+    if options.start is not None or options.end is not None:
+        reader = open_reader(options.source)
+        origin = first_timestamp(reader) or 0
+        reader.close()
+        t0 = None if options.start is None else origin + int(options.start * 1e9)
+        t1 = None if options.end is None else origin + int(options.end * 1e9)
+    channels = options.channels.split(',') if options.channels else None
+    return export_recording(options.source, options.destination, channels, t0, t1, options.fuse,
+                            int(options.tolerance_ms * 1e6), options.decimals, options.wall_time, options.chunk)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+模块功能描述：
+最新值信箱：每个通道只保留最新的一个力值，原地覆盖、从不排队
+*********************************
+版本：1.0
+最近一次修改日期：2026-10-18
+
+修改日志：
+2026-10-18，建立初版
+
+说明：
+控制回路（rokae_force.cpp的阻抗控制）只需要最新的力值，不需要排队的历史数据。
+信箱是一块共享内存文件（默认在/dev/shm下），写端用顺序锁（seqlock）原地覆盖每个通道的槽位，
+读端随时读取，得到数值、数据年龄以及是否过期。数据年龄只取决于写端最后一次更新的时间，与读端快慢无关。
+
+内存布局（小端）：
+    头部 HEADER_SIZE 字节：magic(8s) 通道数(I) 槽位大小(I) 过期阈值ns(q)
+    每个通道一个槽位 SLOT_SIZE 字节：
+        seq(I)        顺序号，奇数表示正在写入
+        flags(I)      FLAG_VALID 表示槽位中已有数据
+        sample_ns(q)  数据采集时间（time.perf_counter_ns，即CLOCK_MONOTONIC）
+        value(d)      力值
+        publish_ns(q) 写入信箱的时间
+"""
+import os
+import mmap
+import time
+import struct
+import logging
+from typing import Optional, NamedTuple
+
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+MAILBOX_MAGIC = b'SFMBOX01'
+HEADER_SIZE = 64
+SLOT_SIZE = 32
+FLAG_VALID = 0x1
+
+_HEADER = struct.Struct('<8sIIq')
+_SEQ = struct.Struct('<I')
+_SLOT_BODY = struct.Struct('<Iqdq')     # flags, sample_ns, value, publish_ns（紧跟在seq之后）
+_SLOT = struct.Struct('<IIqdq')
+
+
+class MailboxSample(NamedTuple):
+    """信箱中读出的一个数据"""
+    value: float
+    age: float          # 数据年龄（秒）
+    stale: bool         # 数据年龄是否超过过期阈值
+    seq: int            # 顺序号，两次读取的seq相同说明数据没有更新
+
+
+class ForceMailboxWriter:
+    """
+    信箱写端
+    """
+    def __init__(self,
+                 mailbox_path: str = '/dev/shm/sensor_force_mailbox',
+                 channels: int = 1,
+                 stale_after: float = 0.05):
+        """
+        初始化
+
+        :param mailbox_path: 信箱文件路径
+        :param channels: 通道数
+        :param stale_after: 过期阈值（秒），写入头部供读端使用
+        """
+        self.mailbox_path = mailbox_path
+        self.channels = channels
+        self.stale_after = stale_after
+        self._fd: Optional[int] = None
+        self._mm: Optional[mmap.mmap] = None
+        self._seqs = [0] * channels
+
+    def open(self) -> None:
+        """创建（或覆盖）信箱文件并映射到内存"""
+        size = HEADER_SIZE + self.channels * SLOT_SIZE
+        self._fd = os.open(self.mailbox_path, os.O_RDWR | os.O_CREAT, 0o666)
+        os.ftruncate(self._fd, size)
+        self._mm = mmap.mmap(self._fd, size)
+        self._mm[:size] = bytes(size)
+        _HEADER.pack_into(self._mm, 0, MAILBOX_MAGIC, self.channels, SLOT_SIZE, int(self.stale_after * 1e9))
+        logger.info(f"信箱已打开: {self.mailbox_path}，通道数 {self.channels}")
+
+    def publish(self, channel: int, value: float, sample_ns: Optional[int] = None) -> None:
+        """
+        覆盖写入一个通道的最新值
+
+        :param channel: 通道序号
+        :param value: 力值
+        :param sample_ns: 数据采集时间（perf_counter_ns），为None时使用当前时间
+        """
+        if self._mm is None:
+            raise RuntimeError("信箱未打开")
+        offset = HEADER_SIZE + channel * SLOT_SIZE
+        publish_ns = time.perf_counter_ns()
+        seq = self._seqs[channel]
+        _SEQ.pack_into(self._mm, offset, (seq + 1) & 0xFFFFFFFF)       # 奇数：正在写入
+        _SLOT_BODY.pack_into(self._mm, offset + _SEQ.size, FLAG_VALID,
+                             publish_ns if sample_ns is None else sample_ns, value, publish_ns)
+        seq = (seq + 2) & 0xFFFFFFFF
+        _SEQ.pack_into(self._mm, offset, seq)                           # 偶数：写入完成
+        self._seqs[channel] = seq
+
+    def close(self) -> None:
+        """关闭信箱，保留文件，读端仍可以读到最后的数值（会被判定为过期）"""
+        if self._mm is not None:
+            self._mm.close()
+            os.close(self._fd)
+            self._mm = None
+            self._fd = None
+            logger.info("信箱已关闭")
+
+
+class ForceMailboxReader:
+    """
+    信箱读端（Python参考实现，C++端见rokae_force.cpp中的ForceMailbox）
+    """
+    def __init__(self,
+                 mailbox_path: str = '/dev/shm/sensor_force_mailbox',
+                 stale_after: Optional[float] = None,
+                 max_retries: int = 100):
+        """
+        初始化
+
+        :param mailbox_path: 信箱文件路径
+        :param stale_after: 过期阈值（秒），为None时使用写端写入头部的值
+        :param max_retries: 读到正在写入的槽位时的最大重试次数
+        """
+        self.mailbox_path = mailbox_path
+        self.stale_after = stale_after
+        self.max_retries = max_retries
+        self.channels = 0
+        self._mm: Optional[mmap.mmap] = None
+        self._stale_after_ns = 0
+
+    def open(self) -> None:
+        """以只读方式映射信箱文件"""
+        with open(self.mailbox_path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.channels, slot_size, stale_after_ns = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAILBOX_MAGIC or slot_size != SLOT_SIZE:
+            self.close()
+            raise ValueError(f"不是有效的信箱文件: {self.mailbox_path}")
+        self._stale_after_ns = stale_after_ns if self.stale_after is None else int(self.stale_after * 1e9)
+
+    def read(self, channel: int = 0) -> Optional[MailboxSample]:
+        """
+        读取一个通道的最新值（非阻塞）
+
+        :param channel: 通道序号
+        :return: 最新值，通道还没有数据或一直读不到一致的数据时为None
+        """
+        if self._mm is None:
+            raise RuntimeError("信箱未打开")
+        if not 0 <= channel < self.channels:
+            raise IndexError(f"通道序号超出范围: {channel}")
+        offset = HEADER_SIZE + channel * SLOT_SIZE
+        for _ in range(self.max_retries):
+            seq, flags, sample_ns, value, _ = _SLOT.unpack_from(self._mm, offset)
+            if seq & 1 or _SEQ.unpack_from(self._mm, offset)[0] != seq:
+                continue                    # 写端正在写入，重新读取
+            if not flags & FLAG_VALID:
+                return None
+            age_ns = time.perf_counter_ns() - sample_ns
+            return MailboxSample(value, age_ns / 1e9, age_ns > self._stale_after_ns, seq)
+        return None
+
+    def close(self) -> None:
+        """解除映射"""
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
@@ -0,0 +1,287 @@
+"""
+模块功能描述：
+端到端延迟追踪：从串口字节到达，到管道另一端收到数据
+*********************************
+版本：1.1
+最近一次修改日期：2026-10-19
+
+修改日志：
+2026-10-18，建立初版
+2026-10-18，参考消费端改用src/pipe_receiver.py中的PipeReceiver
+2026-10-19，LatencyHistogram改为对数-线性分桶并在桶内插值，负值单独计数，不再按0处理
+
+说明：
+发送端在四个节点打时间戳（time.perf_counter_ns）：
+    chunk_read   -> 读到包含该批第一帧的串口数据块
+    frame_decode -> 该批第一帧解码完成
+    batch_yield  -> 一批报文凑齐并抛出
+    pipe_write   -> 写入管道之前
+时间戳以文本尾巴的形式附在消息末尾：'<报文> #T <chunk_read> <frame_decode> <batch_yield> <pipe_write>'。
+Linux下perf_counter_ns基于CLOCK_MONOTONIC，不同进程之间可以直接相减。
+"""
+import sys
+import time
+import logging
+from typing import Optional, List, Dict, Tuple
+
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+TRACE_STAGES = ('chunk_read', 'frame_decode', 'batch_yield', 'pipe_write')
+TRACE_MARKER = ' #T '
+
+
+def encode_trace(stamps: Dict[str, int]) -> str:
+    """
+    把时间戳编码为附加在消息末尾的文本
+
+    :param stamps: 各节点的时间戳（ns），必须包含TRACE_STAGES中的全部节点
+    :return: 以TRACE_MARKER开头的文本
+    """
+    return TRACE_MARKER + ' '.join(str(stamps[stage]) for stage in TRACE_STAGES)
+
+
+def split_trace(data: str) -> Tuple[str, Optional[Dict[str, int]]]:
+    """
+    把消息拆分为报文内容和时间戳
+
+    :param data: 接收到的消息
+    :return: (报文内容, 时间戳字典)。消息中没有时间戳时，第二项为None
+    """
+    body, marker, tail = data.rpartition(TRACE_MARKER)
+    if not marker:
+        return data, None
+    values = tail.split()
+    if len(values) != len(TRACE_STAGES):
+        return data, None
+    try:
+        return body, dict(zip(TRACE_STAGES, map(int, values)))
+    except ValueError:
+        return data, None
+
+
+class LatencyHistogram:
+    """
+    对数-线性分桶的延迟直方图（与HdrHistogram相同的思路），内存占用固定
+
+    每个2的幂区间 [2^k, 2^(k+1)) 再等分为SUB_BUCKETS个子桶，小于SUB_BUCKETS的值每个值一个桶，
+    相对误差不超过1/SUB_BUCKETS。分位数在桶内线性插值。
+    负值（例如receive_excess这类“实测减理论”的残差）按绝对值记入单独的一组桶，
+    均值、最小值和分位数都保留符号，negative给出负值的个数。
+    """
+    SUB_BITS = 3
+    SUB_BUCKETS = 1 << SUB_BITS                     # 每个2的幂区间的子桶数
+    BUCKET_COUNT = SUB_BUCKETS * (64 - SUB_BITS)    # 覆盖到2^63 ns
+
+    def __init__(self):
+        self.buckets: List[int] = [0] * self.BUCKET_COUNT             # 非负值，按值分桶
+        self.negative_buckets: List[int] = [0] * self.BUCKET_COUNT    # 负值，按绝对值分桶
+        self.count: int = 0
+        self.negative: int = 0
+        self.total_ns: int = 0
+        self.min_ns: Optional[int] = None
+        self.max_ns: Optional[int] = None
+
+    @classmethod
+    def bucket_index(cls, magnitude_ns: int) -> int:
+        """
+        非负值所在的桶号
+
+        :param magnitude_ns: 非负的延迟（ns）
+        :return: 桶号
+        """
+        if magnitude_ns < cls.SUB_BUCKETS:
+            return magnitude_ns
+        shift = magnitude_ns.bit_length() - cls.SUB_BITS - 1
+        return min(cls.SUB_BUCKETS * (shift + 1) + (magnitude_ns >> shift) - cls.SUB_BUCKETS, cls.BUCKET_COUNT - 1)
+
+    @classmethod
+    def bucket_bounds(cls, index: int) -> Tuple[int, int]:
+        """
+        桶的取值范围
+
+        :param index: 桶号
+        :return: (下边界, 上边界)，左闭右开
+        """
+        if index < cls.SUB_BUCKETS:
+            return index, index + 1
+        shift = index // cls.SUB_BUCKETS - 1
+        mantissa = index % cls.SUB_BUCKETS + cls.SUB_BUCKETS
+        return mantissa << shift, (mantissa + 1) << shift
+
+    def add(self, value_ns: int) -> None:
+        """
+        添加一个延迟样本
+
+        :param value_ns: 延迟（ns），可以为负数
+        """
+        if value_ns < 0:
+            self.negative += 1
+            self.negative_buckets[self.bucket_index(-value_ns)] += 1
+        else:
+            self.buckets[self.bucket_index(value_ns)] += 1
+        self.count += 1
+        self.total_ns += value_ns
+        if self.min_ns is None or value_ns < self.min_ns:
+            self.min_ns = value_ns
+        if self.max_ns is None or value_ns > self.max_ns:
+            self.max_ns = value_ns
+
+    def percentile(self, q: float) -> Optional[int]:
+        """
+        估算分位数：找到所在的桶，在桶内按样本均匀分布线性插值
+
+        :param q: 分位（0~100）
+        :return: 分位数（ns），没有样本时为None
+        """
+        if not self.count:
+            return None
+        target = self.count * q / 100
+        accumulated = 0
+        # 负值从绝对值最大的桶开始，即从小到大
+        for index in range(self.BUCKET_COUNT - 1, -1, -1):
+            bucket = self.negative_buckets[index]
+            if bucket and accumulated + bucket >= target:
+                lower, upper = self.bucket_bounds(index)
+                value = -(upper - (target - accumulated) / bucket * (upper - lower))
+                return int(min(max(value, self.min_ns), self.max_ns))
+            accumulated += bucket
+        for index, bucket in enumerate(self.buckets):
+            if bucket and accumulated + bucket >= target:
+                lower, upper = self.bucket_bounds(index)
+                value = lower + (target - accumulated) / bucket * (upper - lower)
+                return int(min(max(value, self.min_ns), self.max_ns))
+            accumulated += bucket
+        return self.max_ns
+
+    def get_results(self) -> Dict[str, float]:
+        """
+        获取统计结果，单位为毫秒
+
+        :return: 包含样本数、负值个数、平均值、最小值、最大值、分位数的字典
+        """
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "negative": self.negative,
+            "mean_ms": self.total_ns / self.count / 1e6,
+            "min_ms": self.min_ns / 1e6,
+            "p50_ms": self.percentile(50) / 1e6,
+            "p99_ms": self.percentile(99) / 1e6,
+            "max_ms": self.max_ns / 1e6,
+        }
+
+    def format_buckets(self) -> List[str]:
+        """
+        把非空的桶按2的幂区间合并后格式化为可打印的文本行，负值合为一行
+
+        :return: 文本行列表
+        """
+        lines = []
+        if self.negative:
+            lines.append(f"  < {0:11.3f} ms : {self.negative}")
+        octaves: Dict[int, int] = {}
+        for index, bucket in enumerate(self.buckets):
+            if bucket:
+                upper = self.bucket_bounds(index)[1] - 1
+                octaves[upper.bit_length()] = octaves.get(upper.bit_length(), 0) + bucket
+        for bits, bucket in sorted(octaves.items()):
+            upper_ms = (1 << bits) / 1e6
+            lines.append(f"  <= {upper_ms:10.3f} ms : {bucket}")
+        return lines
+
+
+class StageLatencyAnalyzer:
+    """
+    按阶段统计延迟的参考消费端分析器
+    """
+    STAGE_PAIRS = (
+        ('chunk_read', 'frame_decode'),
+        ('frame_decode', 'batch_yield'),
+        ('batch_yield', 'pipe_write'),
+        ('pipe_write', 'receive'),
+        ('chunk_read', 'receive'),
+    )
+
+    def __init__(self):
+        self.histograms: Dict[str, LatencyHistogram] = {
+            f"{start}->{end}": LatencyHistogram() for start, end in self.STAGE_PAIRS
+        }
+        self.untraced_messages: int = 0
+
+    def add(self, stamps: Optional[Dict[str, int]], receive_ns: int) -> None:
+        """
+        添加一条消息的时间戳
+
+        :param stamps: split_trace得到的时间戳字典
+        :param receive_ns: 消费端收到消息的时间戳（ns）
+        """
+        if stamps is None:
+            self.untraced_messages += 1
+            return
+        stamps = dict(stamps, receive=receive_ns)
+        for start, end in self.STAGE_PAIRS:
+            self.histograms[f"{start}->{end}"].add(stamps[end] - stamps[start])
+
+    def print_results(self, show_buckets: bool = False) -> None:
+        """
+        打印各阶段的延迟统计
+
+        :param show_buckets: 是否打印直方图的每个桶
+        """
+        for name, histogram in self.histograms.items():
+            results = histogram.get_results()
+            if not results["count"]:
+                continue
+            logger.info(f"{name}: 样本 {results['count']}, 平均 {results['mean_ms']:.3f} ms, "
+                        f"p50 {results['p50_ms']:.3f} ms, p99 {results['p99_ms']:.3f} ms, "
+                        f"最大 {results['max_ms']:.3f} ms")
+            if show_buckets:
+                for line in histogram.format_buckets():
+                    logger.info(line)
+        if self.untraced_messages:
+            logger.info(f"没有时间戳的消息: {self.untraced_messages}")
+
+
+def run_trace_consumer(pipe_path: str = '/tmp/sensor_data_pipe',
+                       report_interval: float = 5.0,
+                       run_duration: Optional[float] = None) -> StageLatencyAnalyzer:
+    """
+    参考消费端：从管道读取带时间戳的消息，统计各阶段延迟
+
+    :param pipe_path: 管道路径
+    :param report_interval: 打印统计结果的间隔（秒）
+    :param run_duration: 运行持续时间（秒），如果为None则一直运行
+    :return: 延迟分析器
+    """
+    from src.pipe_receiver import PipeReceiver      # pipe_receiver依赖本模块，在这里导入避免循环引用
+
+    receiver = PipeReceiver(pipe_path)
+    receiver.open()
+
+    analyzer = StageLatencyAnalyzer()
+    start_time = last_report = time.time()
+    try:
+        while run_duration is None or time.time() - start_time < run_duration:
+            messages = receiver.receive(timeout=0.1)
+            receive_ns = time.perf_counter_ns()         # 同一次唤醒取出的消息共用一个接收时间戳
+            for payload in messages:
+                _, stamps = split_trace(payload.decode('utf-8'))
+                analyzer.add(stamps, receive_ns)
+
+            if time.time() - last_report > report_interval:
+                analyzer.print_results()
+                last_report = time.time()
+    except KeyboardInterrupt:
+        logger.info("程序被用户中断")
+    finally:
+        receiver.close()
+        analyzer.print_results(show_buckets=True)
+    return analyzer
+
+
+if __name__ == "__main__":
+    run_trace_consumer(pipe_path=sys.argv[1] if len(sys.argv) > 1 else '/tmp/sensor_data_pipe')
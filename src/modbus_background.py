@@ -0,0 +1,192 @@
+"""
+模块功能描述：
+后台采集线程：持续轮询一个仪表，把带时间戳的数值写入环形缓冲区，读取方从不等待总线
+*********************************
+版本：1.1
+最近一次修改日期：2026-10-19
+
+修改日志：
+2026-10-18，建立初版
+2026-10-19，可选地把每个采样送入StreamingStats
+
+说明：
+OptimizedSensorReader.read_float在调用方的线程里读总线，10ms内重复调用返回缓存值，
+调用方要么被RS-485的读写阻塞，要么拿到不知道多旧的数据。
+BackgroundPoller在独立线程中连续调用读取函数（例如RtuPoller.read_float），数值和perf_counter_ns时间戳
+写入固定大小的NumPy环形缓冲区：
+    latest()    立即返回最新的(数值, 距今秒数)
+    since(t_ns) 立即返回时间戳不早于t_ns的(时间戳数组, 数值数组)副本
+只有采集线程写缓冲区，先写数据、再增加计数，读取方按计数取数据，不需要加锁；
+读取方复制的数据如果在复制过程中被覆盖，会被丢弃。
+"""
+import time
+import logging
+import threading
+from typing import Optional, Callable, Tuple, Dict, Any
+
+import numpy as np
+
+from src.rate_control import FixedRatePoller
+from src.streaming_stats import StreamingStats
+
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class BackgroundPoller:
+    """
+    在后台线程中连续采集一个数值
+    """
+    def __init__(self,
+                 read: Callable[[], float],
+                 capacity: int = 65536,
+                 rate: Optional[float] = None,
+                 name: str = 'sensor',
+                 exceptions: tuple = (IOError, ValueError),
+                 stats: Optional[StreamingStats] = None):
+        """
+        初始化
+
+        :param read: 完成一次采样并返回数值的函数，例如RtuPoller.read_float
+        :param capacity: 环形缓冲区保留的采样数
+        :param rate: 采集率（Hz），为None时尽可能快；给出时用FixedRatePoller按绝对时间定速
+        :param name: 名称，用于线程名和日志
+        :param exceptions: 记为失败并继续采集的异常类型
+        :param stats: 流式统计，给出时每个采样都会送入，其它线程可以随时查询
+        """
+        self.read = read
+        self.capacity = capacity
+        self.rate = rate
+        self.name = name
+        self.exceptions = exceptions
+        self.stats = stats
+        self._pacer = FixedRatePoller(read, rate) if rate else None
+
+        self._timestamps = np.zeros(capacity, dtype=np.int64)
+        self._values = np.zeros(capacity, dtype=np.float64)
+        self._count = 0                     # 写入过的采样总数
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # 统计信息
+        self.errors = 0
+        self.last_error: Optional[BaseException] = None
+        self.start_ns: Optional[int] = None
+
+    def start(self) -> 'BackgroundPoller':
+        """启动采集线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"BackgroundPoller-{self.name}", daemon=True)
+        self.start_ns = time.perf_counter_ns()
+        self._thread.start()
+        logger.info(f"{self.name}: 后台采集已启动")
+        return self
+
+    def stop(self, timeout: float = 1.0) -> None:
+        """
+        停止采集线程
+
+        :param timeout: 等待线程结束的时间（秒），正在进行的一次请求会先完成
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+            logger.info(f"{self.name}: 后台采集已停止，共 {self._count} 个采样，{self.errors} 次错误")
+
+    def __enter__(self) -> 'BackgroundPoller':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
+
+    def _run(self) -> None:
+        read = self._pacer.poll if self._pacer else self.read
+        timestamps, values, capacity, stats = self._timestamps, self._values, self.capacity, self.stats
+        while not self._stop_event.is_set():
+            try:
+                value = read()
+            except self.exceptions as e:
+                self.errors += 1
+                self.last_error = e
+                continue
+            index = self._count % capacity
+            timestamp_ns = time.perf_counter_ns()
+            timestamps[index] = timestamp_ns
+            values[index] = value
+            self._count += 1
+            if stats is not None:
+                stats.add(value, timestamp_ns)
+
+    @property
+    def count(self) -> int:
+        """写入过的采样总数"""
+        return self._count
+
+    def latest(self) -> Optional[Tuple[float, float]]:
+        """
+        最新的采样
+
+        :return: (数值, 距今秒数)，还没有采样时为None
+        """
+        count = self._count
+        if not count:
+            return None
+        index = (count - 1) % self.capacity
+        value, timestamp = float(self._values[index]), int(self._timestamps[index])
+        if self._count - count >= self.capacity - 1:
+            return self.latest()            # 读取过程中该位置被覆盖，极少发生
+        return value, (time.perf_counter_ns() - timestamp) / 1e9
+
+    def since(self, t_ns: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        时间戳不早于t_ns的所有采样（仍在缓冲区中的部分）
+
+        :param t_ns: 起始时间（perf_counter_ns）
+        :return: (时间戳数组, 数值数组)，按时间顺序
+        """
+        count = self._count
+        first = max(0, count - self.capacity)
+        split = count % self.capacity
+        if count <= self.capacity:
+            segments = [slice(0, count)]
+        else:
+            segments = [slice(split, self.capacity), slice(0, split)]   # 旧的在前
+
+        # 在按时间排序的两段中二分查找起点
+        start_logical = count
+        offset = first
+        for segment in segments:
+            part = self._timestamps[segment]
+            position = int(np.searchsorted(part, t_ns, side='left'))
+            if position < len(part):
+                start_logical = offset + position
+                break
+            offset += len(part)
+
+        logical = np.arange(start_logical, count)
+        physical = logical % self.capacity
+        timestamps = self._timestamps[physical]
+        values = self._values[physical]
+
+        # 复制过程中被采集线程覆盖的旧数据丢弃
+        overwritten = self._count - self.capacity + 1 - start_logical
+        if overwritten > 0:
+            timestamps, values = timestamps[overwritten:], values[overwritten:]
+        return timestamps, values
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """获取采样数、错误次数、实际采集率和最新采样的时间"""
+        duration = (time.perf_counter_ns() - self.start_ns) / 1e9 if self.start_ns else 0
+        latest = self.latest()
+        return {
+            "samples": self._count,
+            "errors": self.errors,
+            "achieved_rate": self._count / duration if duration > 0 else 0.0,
+            "latest_age_ms": latest[1] * 1000 if latest else None,
+            "last_error": repr(self.last_error) if self.last_error else None,
+        }
@@ -0,0 +1,195 @@
+"""
+模块功能描述：
+Modbus块读取：把相邻的多个数值合并为尽量少的FC03/FC04请求，并用NumPy批量解析
+*********************************
+版本：1.0
+最近一次修改日期：2026-10-18
+
+修改日志：
+2026-10-18，建立初版
+
+说明：
+每次请求的总线开销（请求报文、从机响应时间、应答头和CRC）是固定的，一次读多个寄存器可以把这部分开销分摊到每个数值上。
+合并规则由设备决定：
+    max_registers  单次请求允许的最大寄存器数（协议上限125）
+    max_gap        两个数值之间允许一起读取的空闲寄存器数。很多仪表读到未定义的寄存器会返回异常，
+                   默认为0，即只合并首尾相接的数值
+不同功能码（保持寄存器/输入寄存器）的数值分别合并。
+"""
+import logging
+from typing import List, Dict, Sequence, NamedTuple, Any
+
+import numpy as np
+
+from src.modbus_rtu import RtuPoller
+
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 各数据类型占用的寄存器数
+REGISTER_COUNTS = {'uint16': 1, 'int16': 1, 'uint32': 2, 'int32': 2, 'float32': 2}
+
+
+class RegisterValue(NamedTuple):
+    """需要读取的一个数值"""
+    name: str
+    address: int                    # 起始寄存器地址
+    data_type: str = 'float32'      # 见REGISTER_COUNTS
+    functioncode: int = 3
+
+    @property
+    def register_count(self) -> int:
+        return REGISTER_COUNTS[self.data_type]
+
+
+class BlockRead:
+    """
+    一次块读取请求，以及其应答的批量解析
+    """
+    def __init__(self, functioncode: int, start: int, count: int, values: List[RegisterValue],
+                 word_order: str = 'big'):
+        """
+        初始化，预先计算每个数值在应答中的位置
+
+        :param functioncode: 功能码
+        :param start: 起始寄存器地址
+        :param count: 寄存器数量
+        :param values: 本次请求覆盖的数值
+        :param word_order: 32位数值的寄存器顺序，'big'为高位寄存器在前，'little'为低位寄存器在前
+        """
+        if word_order not in ('big', 'little'):
+            raise ValueError(f"不支持的寄存器顺序: {word_order!r}")
+        self.functioncode = functioncode
+        self.start = start
+        self.count = count
+        self.values = values
+        self.word_order = word_order
+
+        # 按数据类型分组，记录每组数值在应答中的寄存器下标和在self.values中的位置
+        self._groups = {}
+        for position, value in enumerate(values):
+            indices, positions = self._groups.setdefault(value.data_type, ([], []))
+            indices.append(value.address - start)
+            positions.append(position)
+        self._groups = {data_type: (np.array(indices), np.array(positions))
+                        for data_type, (indices, positions) in self._groups.items()}
+
+    def __repr__(self):
+        return (f"BlockRead(functioncode={self.functioncode}, start=0x{self.start:04X}, count={self.count}, "
+                f"values={[value.name for value in self.values]})")
+
+    def decode(self, data: bytes) -> np.ndarray:
+        """
+        批量解析应答中的寄存器数据
+
+        :param data: 应答中的寄存器数据（2*count字节，大端）
+        :return: 与self.values顺序一致的float64数组
+        """
+        words = np.frombuffer(data, dtype='>u2').astype(np.uint32)
+        result = np.empty(len(self.values), dtype=np.float64)
+        for data_type, (indices, positions) in self._groups.items():
+            if REGISTER_COUNTS[data_type] == 1:
+                raw = words[indices].astype(np.uint16)
+                result[positions] = raw.view(np.int16) if data_type == 'int16' else raw
+                continue
+            high, low = words[indices], words[indices + 1]
+            if self.word_order == 'little':
+                high, low = low, high
+            combined = (high << 16) | low
+            if data_type == 'float32':
+                result[positions] = combined.view(np.float32)
+            elif data_type == 'int32':
+                result[positions] = combined.view(np.int32)
+            else:
+                result[positions] = combined
+        return result
+
+
+def plan_block_reads(values: Sequence[RegisterValue],
+                     max_registers: int = 125,
+                     max_gap: int = 0,
+                     word_order: str = 'big') -> List[BlockRead]:
+    """
+    把需要读取的数值合并为尽量少的块读取请求。
+    按地址排序后贪心地向后扩展当前块，直到超出max_registers或遇到超过max_gap的空隙，
+    对于"用定长窗口覆盖有序区间"的问题，这样得到的请求数最少
+
+    :param values: 需要读取的数值
+    :param max_registers: 单次请求允许的最大寄存器数
+    :param max_gap: 允许一起读取的空闲寄存器数
+    :param word_order: 32位数值的寄存器顺序
+    :return: 块读取请求列表
+    """
+    if not 1 <= max_registers <= 125:
+        raise ValueError(f"max_registers超出范围: {max_registers}")
+    blocks = []
+    for functioncode in sorted({value.functioncode for value in values}):
+        group = sorted((value for value in values if value.functioncode == functioncode),
+                       key=lambda value: value.address)
+        start = end = None
+        members: List[RegisterValue] = []
+        for value in group:
+            value_end = value.address + value.register_count
+            if value.register_count > max_registers:
+                raise ValueError(f"{value.name} 占用的寄存器数超过 max_registers")
+            if members and value.address - end <= max_gap and max(end, value_end) - start <= max_registers:
+                members.append(value)
+                end = max(end, value_end)
+                continue
+            if members:
+                blocks.append(BlockRead(functioncode, start, end - start, members, word_order))
+            start, end, members = value.address, value_end, [value]
+        if members:
+            blocks.append(BlockRead(functioncode, start, end - start, members, word_order))
+    return blocks
+
+
+class BlockPoller:
+    """
+    按块读取计划轮询一个从机上的多个数值
+    """
+    def __init__(self,
+                 ser: Any,
+                 slave_address: int,
+                 values: Sequence[RegisterValue],
+                 max_registers: int = 125,
+                 max_gap: int = 0,
+                 word_order: str = 'big'):
+        """
+        初始化，为每个块生成一个RtuPoller
+
+        :param ser: 已经打开的串口
+        :param slave_address: 从机地址
+        :param values: 需要读取的数值
+        :param max_registers: 单次请求允许的最大寄存器数
+        :param max_gap: 允许一起读取的空闲寄存器数
+        :param word_order: 32位数值的寄存器顺序
+        """
+        self.values = list(values)
+        self.names = [value.name for value in self.values]
+        if len(set(self.names)) != len(self.names):
+            raise ValueError("数值名称不能重复")
+        self.blocks = plan_block_reads(self.values, max_registers, max_gap, word_order)
+        self.pollers = [RtuPoller(ser, slave_address, block.start, block.count, block.functioncode)
+                        for block in self.blocks]
+        # 每个块的解析结果在最终数组中的位置
+        position_of = {name: position for position, name in enumerate(self.names)}
+        self._positions = [np.array([position_of[value.name] for value in block.values]) for block in self.blocks]
+        logger.info(f"{len(self.values)} 个数值合并为 {len(self.blocks)} 次请求")
+
+    def poll(self) -> np.ndarray:
+        """
+        依次完成所有块读取
+
+        :return: 与初始化时values顺序一致的float64数组
+        """
+        result = np.empty(len(self.values), dtype=np.float64)
+        for block, poller, positions in zip(self.blocks, self.pollers, self._positions):
+            result[positions] = block.decode(poller.transact())
+        return result
+
+    def poll_dict(self) -> Dict[str, float]:
+        """依次完成所有块读取，按名称返回数值"""
+        return dict(zip(self.names, self.poll().tolist()))
@@ -0,0 +1,191 @@
+"""
+模块功能描述：
+RS-485总线调度：一条总线、一个串口，轮询多个从机
+*********************************
+版本：1.1
+最近一次修改日期：2026-10-18
+
+修改日志：
+2026-10-18，建立初版
+2026-10-18，等待改用src/rate_control.py中的wait_until
+
+说明：
+Modbus RTU规定两帧之间至少要有3.5个字符时间的静默间隔，波特率高于19200时固定为1.75ms。
+RtuBusScheduler独占一个串口，按优先级和每个从机的目标采集率选择下一次轮询的对象，
+每次发送请求前保证距离上一帧结束已经过了静默间隔，并统计每个从机实际达到的采集率。
+目标采集率为None的从机尽可能快地轮询，它们之间按轮转的方式共享总线剩余的时间。
+"""
+import time
+import logging
+from typing import Optional, Callable, Dict, List, Any
+
+import serial
+
+from src.modbus_rtu import ModbusRtuError
+from src.rate_control import wait_until
+
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def bits_per_character(ser: Any) -> int:
+    """
+    根据串口设置计算一个字符的位数：起始位 + 数据位 + 校验位 + 停止位
+
+    :param ser: 串口
+    :return: 位数
+    """
+    parity_bits = 0 if ser.parity == serial.PARITY_NONE else 1
+    return int(1 + ser.bytesize + parity_bits + ser.stopbits + 0.5)
+
+
+def silent_interval(baudrate: int, bits_per_char: int = 11) -> float:
+    """
+    计算Modbus RTU帧间的最小静默间隔
+
+    :param baudrate: 波特率
+    :param bits_per_char: 一个字符的位数
+    :return: 静默间隔（秒）
+    """
+    if baudrate > 19200:
+        return 0.00175
+    return 3.5 * bits_per_char / baudrate
+
+
+class BusSlave:
+    """
+    总线上的一个轮询对象
+    """
+    def __init__(self, name: str, read: Callable[[], Any], rate: Optional[float], priority: int,
+                 on_value: Optional[Callable[[str, Any, int], None]]):
+        self.name = name
+        self.read = read
+        self.rate = rate
+        self.period_ns = int(1e9 / rate) if rate else 0
+        self.priority = priority
+        self.on_value = on_value
+        self.next_due_ns = 0
+
+        # 统计信息
+        self.successes = 0
+        self.errors = 0
+        self.skipped_periods = 0
+        self.last_value: Any = None
+        self.last_read_ns = 0
+
+
+class RtuBusScheduler:
+    """
+    单串口多从机的轮询调度器
+    """
+    def __init__(self, ser: Any, baudrate: Optional[int] = None, spin_threshold: float = 0.0002):
+        """
+        初始化
+
+        :param ser: 已经打开的串口，所有从机的轮询器都必须使用这个串口
+        :param baudrate: 波特率，为None时从串口读取
+        :param spin_threshold: 等待时间小于该值（秒）时忙等，而不是sleep，提高帧间隔的精度
+        """
+        self.ser = ser
+        self.baudrate = baudrate or ser.baudrate
+        self.silent_interval_ns = int(silent_interval(self.baudrate, bits_per_character(ser)) * 1e9)
+        self.spin_threshold_ns = int(spin_threshold * 1e9)
+        self.slaves: List[BusSlave] = []
+        self._bus_idle_since_ns = 0         # 上一帧结束的时间
+        self._start_ns: Optional[int] = None
+
+    def add(self, name: str, read: Callable[[], Any], rate: Optional[float] = None, priority: int = 0,
+            on_value: Optional[Callable[[str, Any, int], None]] = None) -> BusSlave:
+        """
+        添加一个轮询对象
+
+        :param name: 名称
+        :param read: 完成一次请求-应答并返回数值的函数，例如RtuPoller(ser, ...).read_float
+        :param rate: 目标采集率（Hz），None为尽可能快
+        :param priority: 优先级，数值大的先轮询
+        :param on_value: 读取成功后的回调，参数为(名称, 数值, 时间戳perf_counter_ns)
+        :return: 轮询对象
+        """
+        slave = BusSlave(name, read, rate, priority, on_value)
+        self.slaves.append(slave)
+        return slave
+
+    def _select(self, now_ns: int) -> BusSlave:
+        """
+        选择下一个轮询对象：已经到期的对象中优先级最高、到期最早的；都没到期时选最早到期的
+
+        :param now_ns: 当前时间
+        :return: 轮询对象
+        """
+        due = [slave for slave in self.slaves if slave.next_due_ns <= now_ns]
+        if due:
+            return min(due, key=lambda slave: (-slave.priority, slave.next_due_ns))
+        return min(self.slaves, key=lambda slave: (slave.next_due_ns, -slave.priority))
+
+    def step(self) -> BusSlave:
+        """
+        完成一次轮询
+
+        :return: 本次轮询的对象
+        """
+        if not self.slaves:
+            raise RuntimeError("没有添加轮询对象")
+        now_ns = time.perf_counter_ns()
+        if self._start_ns is None:
+            self._start_ns = now_ns
+        slave = self._select(now_ns)
+        wait_until(max(slave.next_due_ns, self._bus_idle_since_ns + self.silent_interval_ns),
+                   'hybrid', self.spin_threshold_ns)
+
+        try:
+            value = slave.read()
+        except ModbusRtuError as e:
+            slave.errors += 1
+            logger.debug(f"{slave.name} 读取错误: {e}")
+        else:
+            slave.successes += 1
+            slave.last_value = value
+            slave.last_read_ns = time.perf_counter_ns()
+            if slave.on_value:
+                slave.on_value(slave.name, value, slave.last_read_ns)
+        finally:
+            self._bus_idle_since_ns = time.perf_counter_ns()
+
+        # 安排下一次轮询。定速的对象按绝对时间推进，落后超过一个周期时跳过错过的周期
+        if slave.period_ns:
+            slave.next_due_ns = max(slave.next_due_ns, self._start_ns) + slave.period_ns
+            if slave.next_due_ns < self._bus_idle_since_ns - slave.period_ns:
+                missed = (self._bus_idle_since_ns - slave.next_due_ns) // slave.period_ns
+                slave.skipped_periods += missed
+                slave.next_due_ns += missed * slave.period_ns
+        else:
+            slave.next_due_ns = self._bus_idle_since_ns
+        return slave
+
+    def run(self, duration: Optional[float] = None, stop: Optional[Callable[[], bool]] = None) -> None:
+        """
+        连续轮询
+
+        :param duration: 运行持续时间（秒），如果为None则一直运行
+        :param stop: 返回True时停止轮询的函数，例如threading.Event().is_set
+        """
+        end_ns = None if duration is None else time.perf_counter_ns() + int(duration * 1e9)
+        while (end_ns is None or time.perf_counter_ns() < end_ns) and not (stop and stop()):
+            self.step()
+
+    def get_statistics(self) -> Dict[str, Dict[str, Any]]:
+        """获取每个从机的目标采集率、实际采集率和错误次数"""
+        duration = (time.perf_counter_ns() - self._start_ns) / 1e9 if self._start_ns else 0
+        return {
+            slave.name: {
+                "target_rate": slave.rate,
+                "achieved_rate": slave.successes / duration if duration > 0 else 0.0,
+                "successes": slave.successes,
+                "errors": slave.errors,
+                "skipped_periods": slave.skipped_periods,
+                "last_value": slave.last_value,
+            }
+            for slave in self.slaves
+        }
@@ -0,0 +1,154 @@
+"""
+模块功能描述：
+Modbus RTU的CRC16校验（多项式0xA001，初值0xFFFF，低字节在前）
+*********************************
+版本：1.1
+最近一次修改日期：2026-10-18
+
+修改日志：
+2026-10-18，建立初版，查表法与test/test_of_modbus/CRC.py一致
+2026-10-18，增加一次处理两个字节的查找表、固定报文的CRC缓存和NumPy批量校验
+
+说明：
+CRC16_PAIR_TABLE以"当前CRC异或下两个字节（小端16位字）"为下标，一次查表完成两个字节，
+Python循环次数减半。构造只依赖256项的单字节表：对x = crc ^ word，
+    CRC16_PAIR_TABLE[x] = (T[x & 0xFF] >> 8) ^ T[((x >> 8) ^ T[x & 0xFF]) & 0xFF]
+报文较短时建立16位字数组的开销超过节省的循环，crc16按长度自动选择单字节或双字节方式。
+check_crc_batch对(N, L)的定长报文数组逐列（每次两列）做向量化查表，N个报文同时计算，
+适合校验录制下来的大量应答报文。
+"""
+import sys
+import array
+import struct
+from functools import lru_cache
+from typing import List, Union
+
+import numpy as np
+
+
+def _build_table(poly: int = 0xA001) -> List[int]:
+    """
+    生成256项的CRC16查找表
+
+    :param poly: 反射多项式
+    :return: 查找表
+    """
+    table = []
+    for index in range(256):
+        crc = index
+        for _ in range(8):
+            crc = (crc >> 1) ^ poly if crc & 0x0001 else crc >> 1
+        table.append(crc)
+    return table
+
+
+def _build_pair_table(table: List[int]) -> List[int]:
+    """
+    由单字节查找表生成65536项的双字节查找表
+
+    :param table: 单字节查找表
+    :return: 双字节查找表
+    """
+    return [(table[x & 0xFF] >> 8) ^ table[((x >> 8) ^ table[x & 0xFF]) & 0xFF] for x in range(65536)]
+
+
+CRC16_TABLE = tuple(_build_table())
+CRC16_PAIR_TABLE = tuple(_build_pair_table(CRC16_TABLE))
+_CRC = struct.Struct('<H')
+_PAIR_THRESHOLD = 16        # 不少于该长度的数据使用双字节查表
+_NATIVE_LITTLE_ENDIAN = sys.byteorder == 'little'
+_TABLE_ARRAY = np.array(CRC16_TABLE, dtype=np.uint16)
+_PAIR_TABLE_ARRAY = np.array(CRC16_PAIR_TABLE, dtype=np.uint16)
+
+
+def crc16(data: Union[bytes, bytearray, memoryview], register: int = 0xFFFF) -> int:
+    """
+    计算CRC16
+
+    :param data: 待校验的数据
+    :param register: 初始值。传入前一段数据的CRC可以接着计算，例如先算好固定应答头的CRC
+    :return: CRC16数值
+    """
+    table = CRC16_TABLE
+    if len(data) < _PAIR_THRESHOLD:
+        for byte in data:
+            register = (register >> 8) ^ table[(register ^ byte) & 0xFF]
+        return register
+
+    even = len(data) & ~1
+    words = array.array('H', bytes(data[:even]))
+    if not _NATIVE_LITTLE_ENDIAN:
+        words.byteswap()
+    pair_table = CRC16_PAIR_TABLE
+    for word in words:
+        register = pair_table[register ^ word]
+    if even != len(data):
+        register = (register >> 8) ^ table[(register ^ data[-1]) & 0xFF]
+    return register
+
+
+@lru_cache(maxsize=1024)
+def crc16_cached(data: bytes) -> int:
+    """
+    带缓存的CRC16，用于反复出现的固定报文（例如轮询请求）。data必须是bytes
+
+    :param data: 待校验的数据
+    :return: CRC16数值
+    """
+    return crc16(data)
+
+
+def append_crc(frame: bytes) -> bytes:
+    """
+    在报文末尾加上CRC16（低字节在前）
+
+    :param frame: 不含CRC的报文
+    :return: 完整报文
+    """
+    return frame + _CRC.pack(crc16(frame))
+
+
+def check_crc(frame: bytes) -> bool:
+    """
+    检查完整报文末尾的CRC16
+
+    :param frame: 含CRC的完整报文
+    :return: 校验是否通过
+    """
+    return len(frame) >= 3 and crc16(frame[:-2]) == _CRC.unpack_from(frame, len(frame) - 2)[0]
+
+
+def crc16_batch(frames: np.ndarray) -> np.ndarray:
+    """
+    批量计算定长数据的CRC16
+
+    :param frames: 形状为(N, L)的uint8数组，每行一段数据
+    :return: 长度为N的uint16数组
+    """
+    frames = np.asarray(frames, dtype=np.uint8)
+    if frames.ndim != 2:
+        raise ValueError(f"frames必须是二维数组，实际为{frames.ndim}维")
+    length = frames.shape[1]
+    register = np.full(frames.shape[0], 0xFFFF, dtype=np.uint16)
+    words = frames[:, :length & ~1].astype(np.uint16)
+    for column in range(0, length & ~1, 2):
+        register = _PAIR_TABLE_ARRAY[register ^ (words[:, column] | (words[:, column + 1] << 8))]
+    if length & 1:
+        register = (register >> 8) ^ _TABLE_ARRAY[(register ^ frames[:, -1]) & 0xFF]
+    return register
+
+
+def check_crc_batch(frames: Union[np.ndarray, bytes], frame_length: int = 0) -> np.ndarray:
+    """
+    批量检查定长报文末尾的CRC16
+
+    :param frames: 形状为(N, L)的uint8数组，或者N个首尾相接的报文组成的bytes
+    :param frame_length: frames为bytes时每个报文的长度
+    :return: 长度为N的bool数组，校验通过为True
+    """
+    if not isinstance(frames, np.ndarray):
+        if frame_length < 3:
+            raise ValueError("frames为bytes时必须给出frame_length（至少为3）")
+        frames = np.frombuffer(frames, dtype=np.uint8).reshape(-1, frame_length)
+    received = frames[:, -2].astype(np.uint16) | (frames[:, -1].astype(np.uint16) << 8)
+    return crc16_batch(frames[:, :-2]) == received
@@ -0,0 +1,228 @@
+"""
+模块功能描述：
+Modbus RTU快速轮询，绕过minimalmodbus的通用处理流程
+*********************************
+版本：1.3
+最近一次修改日期：2026-10-19
+
+修改日志：
+2026-10-18，建立初版
+2026-10-18，应答头固定，预先算好应答头的CRC，每次只对数据部分继续计算
+2026-10-18，支持自适应超时（src/adaptive_timeout.py）和不等待的立即重试，统计超时损失的时间
+2026-10-19，先读5字节判断是否为异常应答，异常应答不再等满整个超时
+
+说明：
+minimalmodbus.Instrument.read_registers每次调用都要重新生成请求报文、计算CRC，
+再经过通用的应答检查和解析流程。对于固定不变的读寄存器请求，这些工作可以只做一次：
+RtuPoller在初始化时生成带CRC的FC03/FC04请求报文、预期的应答头和预编译的struct.Struct，
+之后每次轮询只做"写请求、按预期长度读应答、校验、解析"。
+读应答分两次：先读5字节（正好是异常应答的长度），不是异常应答时再读剩下的部分，
+这样从机返回异常码时可以立即报告，不必等读超时。
+"""
+import time
+import struct
+import logging
+from typing import Optional, Tuple, Any
+
+import serial
+
+from src.modbus_crc import crc16, append_crc
+from src.adaptive_timeout import AdaptiveTimeout
+
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+EXCEPTION_RESPONSE_LENGTH = 5   # 异常应答：从机地址、功能码|0x80、异常码、CRC
+_REQUEST = struct.Struct('>BBHH')
+_CRC = struct.Struct('<H')
+
+
+class ModbusRtuError(IOError):
+    """Modbus RTU通讯错误"""
+
+
+class RtuTimeoutError(ModbusRtuError):
+    """在超时时间内没有收到完整的应答"""
+
+
+class RtuResponseError(ModbusRtuError):
+    """应答的CRC、从机地址、功能码或长度不正确"""
+
+
+class RtuExceptionResponse(ModbusRtuError):
+    """从机返回了异常应答"""
+    def __init__(self, exception_code: int):
+        super().__init__(f"从机返回异常码: {exception_code}")
+        self.exception_code = exception_code
+
+
+def build_read_request(slave_address: int, functioncode: int, register_address: int,
+                       number_of_registers: int) -> bytes:
+    """
+    生成读寄存器请求报文（含CRC）
+
+    :param slave_address: 从机地址（1-247）
+    :param functioncode: 功能码，3读保持寄存器，4读输入寄存器
+    :param register_address: 起始寄存器地址
+    :param number_of_registers: 寄存器数量（1-125）
+    :return: 完整的请求报文
+    """
+    if functioncode not in (3, 4):
+        raise ValueError(f"不支持的功能码: {functioncode}")
+    if not 1 <= number_of_registers <= 125:
+        raise ValueError(f"寄存器数量超出范围: {number_of_registers}")
+    return append_crc(_REQUEST.pack(slave_address, functioncode, register_address, number_of_registers))
+
+
+def open_rtu_port(port: str, baudrate: int = 115200, timeout: float = 0.05) -> serial.Serial:
+    """
+    按8N1打开Modbus RTU串口
+
+    :param port: 串口名称
+    :param baudrate: 波特率
+    :param timeout: 读超时时间（秒）
+    :return: 已经打开的串口
+    """
+    return serial.Serial(
+        port=port,
+        baudrate=baudrate,
+        bytesize=8,
+        parity=serial.PARITY_NONE,
+        stopbits=1,
+        timeout=timeout
+    )
+
+
+class RtuPoller:
+    """
+    固定请求的Modbus RTU轮询器
+    """
+    def __init__(self,
+                 ser: Any,
+                 slave_address: int,
+                 register_address: int,
+                 number_of_registers: int = 2,
+                 functioncode: int = 3,
+                 clear_buffers_before_each_transaction: bool = False,
+                 adaptive_timeout: Optional[AdaptiveTimeout] = None,
+                 retries: int = 0):
+        """
+        初始化，预先生成请求报文和解析用的struct
+
+        :param ser: 已经打开的串口（或具有write/read/reset_input_buffer接口的对象），可以被多个轮询器共用
+        :param slave_address: 从机地址
+        :param register_address: 起始寄存器地址
+        :param number_of_registers: 寄存器数量，读一个浮点数为2
+        :param functioncode: 功能码，3或4
+        :param clear_buffers_before_each_transaction: 是否在每次请求前清空接收缓冲区
+        :param adaptive_timeout: 自适应超时，每次请求前把串口的timeout设为其当前值。为None时使用串口本身的timeout
+        :param retries: 超时或应答错误时立即重试的次数（不等待）。从机的异常应答不重试
+        """
+        self.ser = ser
+        self.slave_address = slave_address
+        self.register_address = register_address
+        self.number_of_registers = number_of_registers
+        self.functioncode = functioncode
+        self.clear_buffers_before_each_transaction = clear_buffers_before_each_transaction
+        self.adaptive_timeout = adaptive_timeout
+        self.retries = retries
+
+        self.request = build_read_request(slave_address, functioncode, register_address, number_of_registers)
+        self.response_length = 5 + 2 * number_of_registers     # 地址、功能码、字节数、数据、CRC
+        self._response_header = bytes((slave_address, functioncode, 2 * number_of_registers))
+        self._response_header_crc = crc16(self._response_header)
+        self._registers_struct = struct.Struct(f'>{number_of_registers}H')
+        self._floats_struct = struct.Struct(f'>{number_of_registers // 2}f')
+
+        # 统计信息
+        self.total_transactions = 0
+        self.successful_transactions = 0
+        self.timeouts = 0
+        self.response_errors = 0
+        self.retried_transactions = 0
+        self.timeout_time_lost = 0.0        # 等待超时所花的总时间（秒）
+
+    def transact(self) -> bytes:
+        """
+        完成一次请求-应答，失败时按retries立即重试
+
+        :return: 应答中的寄存器数据（2*number_of_registers字节，大端）
+        """
+        for _ in range(self.retries):
+            try:
+                return self._transact_once()
+            except (RtuTimeoutError, RtuResponseError):
+                self.retried_transactions += 1
+        return self._transact_once()
+
+    def _transact_once(self) -> bytes:
+        """完成一次请求-应答，不重试"""
+        ser = self.ser
+        adaptive_timeout = self.adaptive_timeout
+        self.total_transactions += 1
+        if adaptive_timeout is not None and ser.timeout != adaptive_timeout.timeout:
+            ser.timeout = adaptive_timeout.timeout
+        if self.clear_buffers_before_each_transaction:
+            ser.reset_input_buffer()
+        start_time = time.perf_counter()
+        ser.write(self.request)
+        # 先读异常应答的长度，从机返回异常码时不用等满超时去读不存在的字节
+        response = ser.read(EXCEPTION_RESPONSE_LENGTH)
+        if (len(response) == EXCEPTION_RESPONSE_LENGTH and response[1] == self.functioncode | 0x80
+                and crc16(response[:3]) == _CRC.unpack_from(response, 3)[0]):
+            self.response_errors += 1
+            raise RtuExceptionResponse(response[2])
+        if len(response) == EXCEPTION_RESPONSE_LENGTH:
+            response += ser.read(self.response_length - EXCEPTION_RESPONSE_LENGTH)
+        rtt = time.perf_counter() - start_time
+
+        if len(response) != self.response_length:
+            self.timeouts += 1
+            self.timeout_time_lost += rtt
+            if adaptive_timeout is not None:
+                adaptive_timeout.record_timeout(rtt)
+            ser.reset_input_buffer()            # 丢弃可能晚到的半截应答，避免影响下一次请求
+            raise RtuTimeoutError(f"应答不完整: 期望 {self.response_length} 字节，收到 {len(response)} 字节")
+        if response[:3] != self._response_header:
+            self.response_errors += 1
+            ser.reset_input_buffer()
+            raise RtuResponseError(f"应答头不正确: {response[:3].hex(' ')}")
+        if crc16(response[3:-2], self._response_header_crc) != _CRC.unpack_from(response, self.response_length - 2)[0]:
+            self.response_errors += 1
+            ser.reset_input_buffer()
+            raise RtuResponseError("应答CRC校验失败")
+        self.successful_transactions += 1
+        if adaptive_timeout is not None:
+            adaptive_timeout.record(rtt)
+        return response[3:-2]
+
+    def read_registers(self) -> Tuple[int, ...]:
+        """读取寄存器，返回无符号16位整数"""
+        return self._registers_struct.unpack(self.transact())
+
+    def read_floats(self) -> Tuple[float, ...]:
+        """读取寄存器并按大端32位浮点数解析（高位寄存器在前）"""
+        return self._floats_struct.unpack(self.transact())
+
+    def read_float(self, precision_bit: Optional[int] = None) -> float:
+        """
+        读取一个浮点数
+
+        :param precision_bit: 保留的小数位数，为None时不做舍入
+        :return: 浮点数
+        """
+        value = self._floats_struct.unpack_from(self.transact())[0]
+        return value if precision_bit is None else round(value, precision_bit)
+
+    def get_statistics(self) -> dict:
+        """获取通讯统计信息"""
+        return {
+            "total_transactions": self.total_transactions,
+            "successful_transactions": self.successful_transactions,
+            "timeouts": self.timeouts,
+            "response_errors": self.response_errors,
+            "retried_transactions": self.retried_transactions,
+            "timeout_time_lost_s": self.timeout_time_lost,
+        }
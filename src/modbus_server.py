@@ -0,0 +1,278 @@
+"""
+模块功能描述：
+Modbus从机的寄存器与请求处理，以及用于测试的asyncio Modbus TCP / RTU over TCP服务器
+*********************************
+版本：1.0
+最近一次修改日期：2026-10-18
+
+修改日志：
+2026-10-18，建立初版
+
+说明：
+RegisterBank保存一个从机的保持寄存器（FC03/06/16）和输入寄存器（FC04），
+handle_pdu按Modbus协议处理一个请求PDU（功能码+数据，不含地址和校验）并返回应答PDU，
+与传输方式无关，TCP服务器和串口模拟器都可以使用。
+ModbusTcpServer在后台线程中运行asyncio事件循环：
+    framing='tcp'  标准Modbus TCP（MBAP头），每个请求单独处理，可以同时有多个未完成的请求
+    framing='rtu'  RTU over TCP，模拟透传的串口服务器，报文带CRC，按顺序逐个应答
+response_delay模拟从机的处理时间。
+"""
+import array
+import struct
+import asyncio
+import logging
+import threading
+from typing import Dict, Optional, Sequence, Tuple
+
+from src.modbus_crc import append_crc, check_crc
+
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 异常码
+ILLEGAL_FUNCTION = 0x01
+ILLEGAL_DATA_ADDRESS = 0x02
+ILLEGAL_DATA_VALUE = 0x03
+GATEWAY_TARGET_FAILED = 0x0B
+
+_MBAP = struct.Struct('>HHHB')      # 事务号、协议号、长度、单元号
+_ADDRESS_COUNT = struct.Struct('>HH')
+_FLOAT = struct.Struct('>f')
+
+
+class ModbusServerError(Exception):
+    """请求需要以异常应答返回"""
+    def __init__(self, exception_code: int):
+        super().__init__(f"异常码: {exception_code}")
+        self.exception_code = exception_code
+
+
+class RegisterBank:
+    """
+    一个从机的寄存器
+    """
+    def __init__(self, size: int = 65536):
+        """
+        初始化，所有寄存器为0
+
+        :param size: 每种寄存器的数量
+        """
+        self.size = size
+        self.holding = array.array('H', bytes(2 * size))
+        self.input = array.array('H', bytes(2 * size))
+
+    def _table(self, functioncode: int) -> array.array:
+        return self.input if functioncode == 4 else self.holding
+
+    def _check_range(self, address: int, count: int) -> None:
+        if address < 0 or address + count > self.size:
+            raise ModbusServerError(ILLEGAL_DATA_ADDRESS)
+
+    def read(self, functioncode: int, address: int, count: int) -> bytes:
+        """
+        读取寄存器
+
+        :param functioncode: 3为保持寄存器，4为输入寄存器
+        :param address: 起始地址
+        :param count: 数量
+        :return: 大端的寄存器数据
+        """
+        self._check_range(address, count)
+        return struct.pack(f'>{count}H', *self._table(functioncode)[address:address + count])
+
+    def write(self, address: int, values: Sequence[int], functioncode: int = 3) -> None:
+        """
+        写入寄存器
+
+        :param address: 起始地址
+        :param values: 16位无符号数值
+        :param functioncode: 写入的寄存器种类，3为保持寄存器，4为输入寄存器
+        """
+        self._check_range(address, len(values))
+        self._table(functioncode)[address:address + len(values)] = array.array('H', values)
+
+    def set_float(self, address: int, value: float, functioncode: int = 3) -> None:
+        """
+        以大端32位浮点数（高位寄存器在前）写入两个寄存器
+
+        :param address: 起始地址
+        :param value: 浮点数
+        :param functioncode: 写入的寄存器种类
+        """
+        self.write(address, struct.unpack('>HH', _FLOAT.pack(value)), functioncode)
+
+    def get_float(self, address: int, functioncode: int = 3) -> float:
+        """读取两个寄存器组成的浮点数"""
+        return _FLOAT.unpack(self.read(functioncode, address, 2))[0]
+
+
+def exception_pdu(functioncode: int, exception_code: int) -> bytes:
+    """生成异常应答PDU"""
+    return bytes((functioncode | 0x80, exception_code))
+
+
+def handle_pdu(bank: RegisterBank, pdu: bytes) -> bytes:
+    """
+    处理一个请求PDU，支持FC03、FC04、FC06、FC16
+
+    :param bank: 从机的寄存器
+    :param pdu: 请求PDU（功能码+数据）
+    :return: 应答PDU
+    """
+    if not pdu:
+        raise ValueError("空的请求PDU")
+    functioncode = pdu[0]
+    try:
+        if functioncode in (3, 4):
+            if len(pdu) != 5:
+                raise ModbusServerError(ILLEGAL_DATA_VALUE)
+            address, count = _ADDRESS_COUNT.unpack_from(pdu, 1)
+            if not 1 <= count <= 125:
+                raise ModbusServerError(ILLEGAL_DATA_VALUE)
+            return bytes((functioncode, 2 * count)) + bank.read(functioncode, address, count)
+        if functioncode == 6:
+            if len(pdu) != 5:
+                raise ModbusServerError(ILLEGAL_DATA_VALUE)
+            address, value = _ADDRESS_COUNT.unpack_from(pdu, 1)
+            bank.write(address, (value,))
+            return pdu
+        if functioncode == 16:
+            if len(pdu) < 6:
+                raise ModbusServerError(ILLEGAL_DATA_VALUE)
+            address, count = _ADDRESS_COUNT.unpack_from(pdu, 1)
+            if not 1 <= count <= 123 or pdu[5] != 2 * count or len(pdu) != 6 + 2 * count:
+                raise ModbusServerError(ILLEGAL_DATA_VALUE)
+            bank.write(address, struct.unpack_from(f'>{count}H', pdu, 6))
+            return pdu[:5]
+        raise ModbusServerError(ILLEGAL_FUNCTION)
+    except ModbusServerError as e:
+        return exception_pdu(functioncode, e.exception_code)
+
+
+def rtu_request_length(header: bytes) -> int:
+    """
+    根据RTU请求的前7个字节确定整个请求的长度
+
+    :param header: 请求的前7个字节（地址、功能码、地址、数量、FC16的字节数）
+    :return: 请求总长度（含CRC）
+    """
+    if header[1] in (15, 16):
+        return 9 + header[6]
+    return 8
+
+
+class ModbusTcpServer:
+    """
+    在后台线程中运行的Modbus TCP / RTU over TCP测试服务器
+    """
+    def __init__(self,
+                 banks: Dict[int, RegisterBank],
+                 host: str = '127.0.0.1',
+                 port: int = 0,
+                 framing: str = 'tcp',
+                 response_delay: float = 0.0):
+        """
+        初始化
+
+        :param banks: 单元号（从机地址）到寄存器的映射
+        :param host: 监听地址
+        :param port: 监听端口，0为自动分配
+        :param framing: 'tcp'为Modbus TCP，'rtu'为RTU over TCP
+        :param response_delay: 每个请求的处理时间（秒）
+        """
+        if framing not in ('tcp', 'rtu'):
+            raise ValueError(f"不支持的报文格式: {framing!r}")
+        self.banks = banks
+        self.host = host
+        self.port = port
+        self.framing = framing
+        self.response_delay = response_delay
+        self.total_requests = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    async def _respond_tcp(self, writer: asyncio.StreamWriter, transaction_id: int, unit: int, pdu: bytes) -> None:
+        """处理一个Modbus TCP请求。每个请求是一个独立的任务，多个请求的处理时间可以重叠"""
+        if self.response_delay:
+            await asyncio.sleep(self.response_delay)
+        bank = self.banks.get(unit)
+        response = handle_pdu(bank, pdu) if bank is not None else exception_pdu(pdu[0], GATEWAY_TARGET_FAILED)
+        if not writer.is_closing():
+            writer.write(_MBAP.pack(transaction_id, 0, len(response) + 1, unit) + response)
+
+    async def _handle_tcp(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        tasks = set()
+        try:
+            while True:
+                header = await reader.readexactly(_MBAP.size)
+                transaction_id, protocol_id, length, unit = _MBAP.unpack(header)
+                pdu = await reader.readexactly(length - 1)
+                if protocol_id != 0 or not pdu:
+                    break
+                self.total_requests += 1
+                task = asyncio.ensure_future(self._respond_tcp(writer, transaction_id, unit, pdu))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            for task in list(tasks):
+                task.cancel()
+            writer.close()
+
+    async def _handle_rtu(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                header = await reader.readexactly(7)
+                frame = header + await reader.readexactly(rtu_request_length(header) - 7)
+                self.total_requests += 1
+                bank = self.banks.get(frame[0])
+                if not check_crc(frame) or bank is None:
+                    continue            # 和总线上的从机一样，不应答
+                if self.response_delay:
+                    await asyncio.sleep(self.response_delay)
+                writer.write(append_crc(frame[:1] + handle_pdu(bank, frame[1:-2])))
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    def start(self) -> Tuple[str, int]:
+        """
+        在后台线程中启动服务器
+
+        :return: 实际监听的(地址, 端口)
+        """
+        started = threading.Event()
+        handler = self._handle_tcp if self.framing == 'tcp' else self._handle_rtu
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._server = self._loop.run_until_complete(asyncio.start_server(handler, self.host, self.port))
+            self.port = self._server.sockets[0].getsockname()[1]
+            started.set()
+            self._loop.run_forever()
+            self._server.close()
+            pending = asyncio.all_tasks(self._loop)
+            for task in pending:
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            self._loop.run_until_complete(self._server.wait_closed())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        started.wait()
+        logger.info(f"Modbus测试服务器已启动: {self.host}:{self.port} ({self.framing})")
+        return self.host, self.port
+
+    def stop(self) -> None:
+        """停止服务器"""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = None
@@ -0,0 +1,246 @@
+"""
+模块功能描述：
+挂在伪终端（PTY）上的Modbus RTU从机模拟器，用于在同一台Linux机器上复现和对比各种轮询方式
+*********************************
+版本：1.0
+最近一次修改日期：2026-10-18
+
+修改日志：
+2026-10-18，建立初版
+
+说明：
+Modbus Slave软件不能让寄存器数值随时间变化，faster_sample_rate系列实验无法自动复现。
+RtuSlaveSimulator打开一对伪终端，从机一侧由后台线程应答，返回的端口名（如/dev/pts/3）可以像真实串口一样
+交给minimalmodbus、RtuPoller等使用：
+    - 一个模拟器可以挂多个从机地址，寄存器处理与src/modbus_server.py的TCP测试服务器相同（FC03/04/06/16）
+    - add_signal把一个随时间变化的函数绑定到两个寄存器（大端浮点数），每次读请求前按当前时间更新，
+      默认每个从机在0x0206有一个正弦信号
+    - turnaround        从机收到请求后到开始应答的时间
+    - drop_rate         不应答的概率
+    - corrupt_rate      应答CRC错误的概率
+    - baudrate          给出时按该波特率加上请求和应答在线路上的传输时间，PTY本身没有波特率限制
+运行方式（项目根目录下）：
+python -m src.modbus_simulator [从机地址列表=1] [应答延迟ms=0] [丢包率=0] [CRC错误率=0] [波特率=不模拟]
+"""
+import os
+import sys
+import tty
+import math
+import time
+import random
+import select
+import logging
+import threading
+from typing import Optional, Sequence, Callable, Dict, List, Tuple, Any
+
+from src.modbus_crc import append_crc, check_crc
+from src.modbus_server import RegisterBank, handle_pdu, rtu_request_length
+from src.rate_control import wait_until
+
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIGNAL_REGISTER = 0x0206
+_SUPPORTED_FUNCTIONCODES = (3, 4, 6, 16)
+
+
+def sine_signal(amplitude: float = 10.0, frequency: float = 1.0, offset: float = 0.0) -> Callable[[float], float]:
+    """
+    正弦信号
+
+    :param amplitude: 幅值
+    :param frequency: 频率（Hz）
+    :param offset: 偏置
+    :return: 以秒为参数的函数
+    """
+    return lambda t: offset + amplitude * math.sin(2 * math.pi * frequency * t)
+
+
+class RtuSlaveSimulator:
+    """
+    伪终端上的多从机Modbus RTU模拟器
+    """
+    def __init__(self,
+                 slave_addresses: Sequence[int] = (1,),
+                 turnaround: float = 0.0,
+                 drop_rate: float = 0.0,
+                 corrupt_rate: float = 0.0,
+                 baudrate: Optional[int] = None,
+                 bits_per_char: int = 10,
+                 default_signals: bool = True,
+                 seed: Optional[int] = None):
+        """
+        初始化
+
+        :param slave_addresses: 从机地址
+        :param turnaround: 应答延迟（秒）
+        :param drop_rate: 不应答的概率（0~1）
+        :param corrupt_rate: 应答CRC错误的概率（0~1）
+        :param baudrate: 模拟的波特率，为None时不模拟线路传输时间
+        :param bits_per_char: 每个字符的位数，8N1为10
+        :param default_signals: 是否给每个从机在DEFAULT_SIGNAL_REGISTER加一个正弦信号（偏置为从机地址）
+        :param seed: 随机数种子，便于复现丢包和CRC错误
+        """
+        self.banks: Dict[int, RegisterBank] = {address: RegisterBank() for address in slave_addresses}
+        self.turnaround = turnaround
+        self.drop_rate = drop_rate
+        self.corrupt_rate = corrupt_rate
+        self.baudrate = baudrate
+        self.bits_per_char = bits_per_char
+        self._random = random.Random(seed)
+        self._signals: Dict[int, List[Tuple[int, int, Callable[[float], float]]]] = {
+            address: [] for address in slave_addresses}
+        if default_signals:
+            for address in slave_addresses:
+                self.add_signal(address, DEFAULT_SIGNAL_REGISTER, sine_signal(offset=float(address)))
+
+        self.port: Optional[str] = None
+        self._master_fd: Optional[int] = None
+        self._slave_fd: Optional[int] = None
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_time = time.perf_counter()
+
+        # 统计信息
+        self.requests = 0
+        self.replies = 0
+        self.dropped = 0
+        self.corrupted = 0
+        self.ignored = 0            # CRC错误或地址不属于本模拟器的请求
+
+    def add_signal(self, slave_address: int, register_address: int, signal: Callable[[float], float],
+                   functioncode: int = 3) -> None:
+        """
+        把随时间变化的信号绑定到两个寄存器
+
+        :param slave_address: 从机地址
+        :param register_address: 起始寄存器地址
+        :param signal: 以模拟器启动后的秒数为参数、返回浮点数的函数
+        :param functioncode: 3为保持寄存器，4为输入寄存器
+        """
+        self._signals[slave_address].append((register_address, functioncode, signal))
+
+    def wire_time(self, length: int) -> float:
+        """length个字节在线路上的传输时间（秒），不模拟波特率时为0"""
+        return length * self.bits_per_char / self.baudrate if self.baudrate else 0.0
+
+    def start(self) -> str:
+        """
+        打开伪终端并启动应答线程
+
+        :return: 主站使用的端口名
+        """
+        self._master_fd, self._slave_fd = os.openpty()
+        tty.setraw(self._master_fd)
+        tty.setraw(self._slave_fd)
+        self.port = os.ttyname(self._slave_fd)
+        self._stop_event.clear()
+        self._start_time = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="RtuSlaveSimulator", daemon=True)
+        self._thread.start()
+        logger.info(f"Modbus RTU模拟器已启动: {self.port}, 从机地址 {sorted(self.banks)}")
+        return self.port
+
+    def stop(self) -> None:
+        """停止应答线程并关闭伪终端"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for fd in (self._master_fd, self._slave_fd):
+            if fd is not None:
+                os.close(fd)
+        self._master_fd = self._slave_fd = None
+
+    def __enter__(self) -> 'RtuSlaveSimulator':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
+
+    def _run(self) -> None:
+        buffer = bytearray()
+        while not self._stop_event.is_set():
+            readable, _, _ = select.select([self._master_fd], [], [], 0.05)
+            if not readable:
+                continue
+            try:
+                buffer += os.read(self._master_fd, 4096)
+            except OSError:
+                return
+            received_ns = time.perf_counter_ns()
+            while len(buffer) >= 8:
+                length = rtu_request_length(buffer)
+                if len(buffer) < length:
+                    break
+                frame = bytes(buffer[:length])
+                if buffer[1] not in _SUPPORTED_FUNCTIONCODES and not check_crc(frame):
+                    del buffer[0]           # 无法确定报文长度，逐字节重新同步
+                    self.ignored += 1
+                    continue
+                del buffer[:length]
+                self._respond(frame, received_ns)
+
+    def _respond(self, frame: bytes, received_ns: int) -> None:
+        """处理一个请求报文"""
+        self.requests += 1
+        slave_address = frame[0]
+        bank = self.banks.get(slave_address)
+        if bank is None or not check_crc(frame):
+            self.ignored += 1
+            return
+        if self.drop_rate and self._random.random() < self.drop_rate:
+            self.dropped += 1
+            return
+
+        if frame[1] in (3, 4):
+            now = time.perf_counter() - self._start_time
+            for register_address, functioncode, signal in self._signals[slave_address]:
+                bank.set_float(register_address, signal(now), functioncode)
+        response = append_crc(frame[:1] + handle_pdu(bank, frame[1:-2]))
+        if self.corrupt_rate and self._random.random() < self.corrupt_rate:
+            response = response[:-1] + bytes((response[-1] ^ 0xFF,))
+            self.corrupted += 1
+
+        delay = self.wire_time(len(frame)) + self.turnaround + self.wire_time(len(response))
+        if delay:
+            wait_until(received_ns + int(delay * 1e9), 'hybrid', 200_000)
+        os.write(self._master_fd, response)
+        self.replies += 1
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """获取请求、应答、丢弃和CRC错误的次数"""
+        return {
+            "requests": self.requests,
+            "replies": self.replies,
+            "dropped": self.dropped,
+            "corrupted": self.corrupted,
+            "ignored": self.ignored,
+        }
+
+
+def main():
+    slave_addresses = [int(address) for address in sys.argv[1].split(',')] if len(sys.argv) > 1 else [1]
+    turnaround = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.0
+    drop_rate = float(sys.argv[3]) if len(sys.argv) > 3 else 0.0
+    corrupt_rate = float(sys.argv[4]) if len(sys.argv) > 4 else 0.0
+    baudrate = int(sys.argv[5]) if len(sys.argv) > 5 else None
+
+    simulator = RtuSlaveSimulator(slave_addresses, turnaround, drop_rate, corrupt_rate, baudrate)
+    port = simulator.start()
+    print(f"模拟器端口: {port}，按 Ctrl+C 停止...")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulator.stop()
+        print(f"模拟器统计: {simulator.get_statistics()}")
+
+
+if __name__ == "__main__":
+    main()
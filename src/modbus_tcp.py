@@ -0,0 +1,452 @@
+"""
+模块功能描述：
+Modbus TCP传输：连接池、按事务号流水线发送多个请求，以及供RtuPoller使用的RTU over TCP"串口"
+*********************************
+版本：1.0
+最近一次修改日期：2026-10-18
+
+修改日志：
+2026-10-18，建立初版
+
+说明：
+串口上的Modbus只能一问一答，采集率受限于 请求+应答的传输时间+从机处理时间。
+Modbus TCP的MBAP头带有事务号，同一个连接上可以连续发出多个请求，再按事务号匹配应答，
+网络往返和从机处理时间被多个请求分摊，吞吐量不再受一问一答的限制（需要网关/从机支持多个未完成的请求）。
+    TcpConnectionPool     同一个网关的持久连接池，连接出错时丢弃，下次使用时重新建立
+    ModbusTcpClient       execute一问一答；pipeline保持window个未完成的请求
+    TcpPoller             与RtuPoller接口一致的固定请求轮询器
+    RtuOverTcpSerial      透传模式的串口服务器：把TCP连接包装成具有write/read/reset_input_buffer的"串口"，
+                          可以直接交给RtuPoller、BlockPoller和RtuBusScheduler使用
+"""
+import time
+import queue
+import socket
+import struct
+import select
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Optional, Sequence, List, Tuple, Iterator, Dict
+
+from src.modbus_rtu import ModbusRtuError, RtuExceptionResponse
+
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+_MBAP = struct.Struct('>HHHB')      # 事务号、协议号、长度、单元号
+_READ_PDU = struct.Struct('>BHH')
+
+
+class ModbusTcpError(ModbusRtuError):
+    """Modbus TCP通讯错误"""
+
+
+class TcpTimeoutError(ModbusTcpError):
+    """在超时时间内没有收到完整的应答"""
+
+
+class TcpResponseError(ModbusTcpError):
+    """应答的事务号、协议号、单元号或长度不正确"""
+
+
+def build_read_pdu(functioncode: int, register_address: int, number_of_registers: int) -> bytes:
+    """
+    生成读寄存器请求PDU
+
+    :param functioncode: 功能码，3或4
+    :param register_address: 起始寄存器地址
+    :param number_of_registers: 寄存器数量（1-125）
+    :return: 请求PDU
+    """
+    if functioncode not in (3, 4):
+        raise ValueError(f"不支持的功能码: {functioncode}")
+    if not 1 <= number_of_registers <= 125:
+        raise ValueError(f"寄存器数量超出范围: {number_of_registers}")
+    return _READ_PDU.pack(functioncode, register_address, number_of_registers)
+
+
+def open_tcp_connection(host: str, port: int, timeout: float) -> socket.socket:
+    """
+    建立TCP连接并关闭Nagle算法，小报文立即发出
+
+    :param host: 地址
+    :param port: 端口
+    :param timeout: 连接和接收超时（秒）
+    :return: 已连接的socket
+    """
+    sock = socket.create_connection((host, port), timeout=timeout)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    """接收指定长度的数据"""
+    data = bytearray()
+    try:
+        while len(data) < size:
+            chunk = sock.recv(size - len(data))
+            if not chunk:
+                raise ModbusTcpError("连接已被对方关闭")
+            data += chunk
+    except socket.timeout:
+        raise TcpTimeoutError(f"应答不完整: 期望 {size} 字节，收到 {len(data)} 字节") from None
+    return bytes(data)
+
+
+class TcpConnectionPool:
+    """
+    同一个网关的持久连接池（线程安全）
+    """
+    def __init__(self, host: str, port: int = 502, max_connections: int = 4, timeout: float = 1.0):
+        """
+        初始化，连接在第一次使用时建立
+
+        :param host: 网关地址
+        :param port: 网关端口
+        :param max_connections: 最大连接数，很多网关只允许少量的并发连接
+        :param timeout: 连接和接收超时（秒）
+        """
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[socket.socket]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self.connections_opened = 0
+
+    def acquire(self) -> socket.socket:
+        """取出一个连接，没有空闲连接时新建，达到最大连接数时等待"""
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            sock = open_tcp_connection(self.host, self.port, self.timeout)
+        except OSError as e:
+            self._slots.release()
+            raise ModbusTcpError(f"无法连接 {self.host}:{self.port}: {e}") from e
+        self.connections_opened += 1
+        return sock
+
+    def release(self, sock: socket.socket, broken: bool = False) -> None:
+        """
+        归还连接
+
+        :param sock: 连接
+        :param broken: 连接是否出错（超时、应答错位等），出错的连接直接关闭
+        """
+        if broken:
+            sock.close()
+        else:
+            self._idle.put(sock)
+        self._slots.release()
+
+    @contextmanager
+    def connection(self) -> Iterator[socket.socket]:
+        """以with语句使用一个连接，出现异常时丢弃该连接"""
+        sock = self.acquire()
+        try:
+            yield sock
+        except BaseException:
+            self.release(sock, broken=True)
+            raise
+        self.release(sock)
+
+    def close(self) -> None:
+        """关闭所有空闲连接"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class ModbusTcpClient:
+    """
+    Modbus TCP客户端
+    """
+    def __init__(self,
+                 host: str,
+                 port: int = 502,
+                 unit: int = 1,
+                 timeout: float = 1.0,
+                 pool: Optional[TcpConnectionPool] = None,
+                 max_connections: int = 4):
+        """
+        初始化
+
+        :param host: 网关地址
+        :param port: 网关端口
+        :param unit: 默认单元号（网关后面的从机地址）
+        :param timeout: 连接和接收超时（秒）
+        :param pool: 共用的连接池，为None时新建
+        :param max_connections: 新建连接池时的最大连接数
+        """
+        self.unit = unit
+        self.pool = pool or TcpConnectionPool(host, port, max_connections, timeout)
+        self._transaction_id = 0
+        self._lock = threading.Lock()
+
+    def _next_transaction_id(self) -> int:
+        with self._lock:
+            self._transaction_id = (self._transaction_id + 1) & 0xFFFF
+            return self._transaction_id
+
+    @staticmethod
+    def _read_response(sock: socket.socket) -> Tuple[int, int, bytes]:
+        """接收一个应答，返回(事务号, 单元号, 应答PDU)"""
+        transaction_id, protocol_id, length, unit = _MBAP.unpack(_recv_exactly(sock, _MBAP.size))
+        if protocol_id != 0 or not 2 <= length <= 254:
+            raise TcpResponseError(f"应答头不正确: 协议号 {protocol_id}, 长度 {length}")
+        return transaction_id, unit, _recv_exactly(sock, length - 1)
+
+    @staticmethod
+    def _check_pdu(request: bytes, response: bytes) -> bytes:
+        """检查应答PDU的功能码，异常应答转换为RtuExceptionResponse"""
+        if response[0] == request[0] | 0x80 and len(response) == 2:
+            raise RtuExceptionResponse(response[1])
+        if response[0] != request[0]:
+            raise TcpResponseError(f"应答功能码不正确: {response[0]}")
+        return response
+
+    def execute(self, pdu: bytes, unit: Optional[int] = None) -> bytes:
+        """
+        一问一答地执行一个请求
+
+        :param pdu: 请求PDU
+        :param unit: 单元号，为None时使用默认值
+        :return: 应答PDU
+        """
+        unit = self.unit if unit is None else unit
+        transaction_id = self._next_transaction_id()
+        with self.pool.connection() as sock:
+            sock.sendall(_MBAP.pack(transaction_id, 0, len(pdu) + 1, unit) + pdu)
+            response_id, response_unit, response = self._read_response(sock)
+            if response_id != transaction_id or response_unit != unit:
+                raise TcpResponseError(f"应答事务号不匹配: 期望 {transaction_id}, 收到 {response_id}")
+        return self._check_pdu(pdu, response)
+
+    def pipeline(self, pdus: Sequence[bytes], window: int = 8, unit: Optional[int] = None) -> List[bytes]:
+        """
+        在一个连接上保持最多window个未完成的请求，按事务号匹配应答（应答可以乱序到达）
+
+        :param pdus: 请求PDU列表
+        :param window: 最多未完成的请求数
+        :param unit: 单元号，为None时使用默认值
+        :return: 与pdus顺序一致的应答PDU列表
+        """
+        unit = self.unit if unit is None else unit
+        responses: List[Optional[bytes]] = [None] * len(pdus)
+        outstanding: Dict[int, int] = {}        # 事务号 -> 请求下标
+        error: Optional[ModbusRtuError] = None
+        next_index = 0
+        with self.pool.connection() as sock:
+            while next_index < len(pdus) or outstanding:
+                # 补满窗口，多个请求合并为一次发送
+                burst = []
+                while next_index < len(pdus) and len(outstanding) < window:
+                    transaction_id = self._next_transaction_id()
+                    pdu = pdus[next_index]
+                    burst.append(_MBAP.pack(transaction_id, 0, len(pdu) + 1, unit) + pdu)
+                    outstanding[transaction_id] = next_index
+                    next_index += 1
+                if burst:
+                    sock.sendall(b''.join(burst))
+
+                response_id, _, response = self._read_response(sock)
+                index = outstanding.pop(response_id, None)
+                if index is None:
+                    raise TcpResponseError(f"收到未知事务号的应答: {response_id}")
+                try:
+                    responses[index] = self._check_pdu(pdus[index], response)
+                except RtuExceptionResponse as e:
+                    error = error or e      # 收完其余应答再抛出，保持连接上的应答不错位
+        if error is not None:
+            raise error
+        return responses
+
+    def read_registers(self, register_address: int, number_of_registers: int, functioncode: int = 3,
+                       unit: Optional[int] = None) -> bytes:
+        """
+        读寄存器
+
+        :return: 寄存器数据（大端）
+        """
+        response = self.execute(build_read_pdu(functioncode, register_address, number_of_registers), unit)
+        if len(response) != 2 + 2 * number_of_registers or response[1] != 2 * number_of_registers:
+            raise TcpResponseError(f"应答长度不正确: {len(response)}")
+        return response[2:]
+
+    def close(self) -> None:
+        """关闭连接池中的空闲连接"""
+        self.pool.close()
+
+
+class TcpPoller:
+    """
+    Modbus TCP上的固定请求轮询器，接口与RtuPoller一致
+    """
+    def __init__(self,
+                 client: ModbusTcpClient,
+                 register_address: int,
+                 number_of_registers: int = 2,
+                 functioncode: int = 3,
+                 unit: Optional[int] = None):
+        """
+        初始化，预先生成请求PDU和解析用的struct
+
+        :param client: Modbus TCP客户端
+        :param register_address: 起始寄存器地址
+        :param number_of_registers: 寄存器数量
+        :param functioncode: 功能码，3或4
+        :param unit: 单元号，为None时使用客户端的默认值
+        """
+        self.client = client
+        self.unit = client.unit if unit is None else unit
+        self.number_of_registers = number_of_registers
+        self.request = build_read_pdu(functioncode, register_address, number_of_registers)
+        self._response_header = bytes((functioncode, 2 * number_of_registers))
+        self._registers_struct = struct.Struct(f'>{number_of_registers}H')
+        self._floats_struct = struct.Struct(f'>{number_of_registers // 2}f')
+
+        # 统计信息
+        self.total_transactions = 0
+        self.successful_transactions = 0
+        self.errors = 0
+
+    def _data(self, response: bytes) -> bytes:
+        if response[:2] != self._response_header or len(response) != 2 + 2 * self.number_of_registers:
+            self.errors += 1
+            raise TcpResponseError(f"应答不正确: {response[:2].hex(' ')}")
+        self.successful_transactions += 1
+        return response[2:]
+
+    def transact(self) -> bytes:
+        """
+        完成一次请求-应答
+
+        :return: 应答中的寄存器数据
+        """
+        self.total_transactions += 1
+        try:
+            response = self.client.execute(self.request, self.unit)
+        except ModbusRtuError:
+            self.errors += 1
+            raise
+        return self._data(response)
+
+    def transact_many(self, count: int, window: int = 8) -> List[bytes]:
+        """
+        流水线方式连续完成count次请求
+
+        :param count: 请求次数
+        :param window: 最多未完成的请求数
+        :return: 每次应答中的寄存器数据
+        """
+        self.total_transactions += count
+        try:
+            responses = self.client.pipeline([self.request] * count, window, self.unit)
+        except ModbusRtuError:
+            self.errors += 1
+            raise
+        return [self._data(response) for response in responses]
+
+    def read_registers(self) -> Tuple[int, ...]:
+        """读取寄存器，返回无符号16位整数"""
+        return self._registers_struct.unpack(self.transact())
+
+    def read_floats(self) -> Tuple[float, ...]:
+        """读取寄存器并按大端32位浮点数解析（高位寄存器在前）"""
+        return self._floats_struct.unpack(self.transact())
+
+    def read_float(self, precision_bit: Optional[int] = None) -> float:
+        """
+        读取一个浮点数
+
+        :param precision_bit: 保留的小数位数，为None时不做舍入
+        :return: 浮点数
+        """
+        value = self._floats_struct.unpack_from(self.transact())[0]
+        return value if precision_bit is None else round(value, precision_bit)
+
+    def get_statistics(self) -> dict:
+        """获取通讯统计信息"""
+        return {
+            "total_transactions": self.total_transactions,
+            "successful_transactions": self.successful_transactions,
+            "errors": self.errors,
+        }
+
+
+class RtuOverTcpSerial:
+    """
+    透传模式的串口服务器：TCP连接上收发的是带CRC的RTU报文。
+    实现了RtuPoller用到的串口接口（write、read、reset_input_buffer、in_waiting、is_open、close），
+    以及RtuBusScheduler用到的串口参数属性（串口服务器另一侧的串口设置）
+    """
+    def __init__(self, host: str, port: int, timeout: float = 0.05, baudrate: int = 115200,
+                 bytesize: int = 8, parity: str = 'N', stopbits: int = 1):
+        """
+        初始化并建立连接
+
+        :param host: 串口服务器地址
+        :param port: 串口服务器端口
+        :param timeout: 读超时时间（秒），与serial.Serial的timeout含义相同
+        :param baudrate: 串口服务器上的串口波特率
+        :param bytesize: 数据位
+        :param parity: 校验位
+        :param stopbits: 停止位
+        """
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.baudrate = baudrate
+        self.bytesize = bytesize
+        self.parity = parity
+        self.stopbits = stopbits
+        self._sock: Optional[socket.socket] = open_tcp_connection(host, port, timeout)
+
+    @property
+    def is_open(self) -> bool:
+        return self._sock is not None
+
+    @property
+    def in_waiting(self) -> int:
+        readable, _, _ = select.select([self._sock], [], [], 0)
+        if not readable:
+            return 0
+        return len(self._sock.recv(65536, socket.MSG_PEEK))
+
+    def write(self, data: bytes) -> int:
+        self._sock.sendall(data)
+        return len(data)
+
+    def read(self, size: int = 1) -> bytes:
+        """读取size个字节，超时后返回已经收到的部分"""
+        data = bytearray()
+        deadline = time.perf_counter() + self.timeout
+        while len(data) < size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            self._sock.settimeout(remaining)
+            try:
+                chunk = self._sock.recv(size - len(data))
+            except socket.timeout:
+                break
+            if not chunk:
+                break
+            data += chunk
+        return bytes(data)
+
+    def reset_input_buffer(self) -> None:
+        """丢弃已经收到但还没有读取的数据"""
+        while self.in_waiting:
+            self._sock.recv(65536)
+
+    def close(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
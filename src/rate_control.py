@@ -0,0 +1,156 @@
+"""
+模块功能描述：
+定速轮询：按绝对时间的截止点调用读取函数，保证采样周期均匀
+*********************************
+版本：1.0
+最近一次修改日期：2026-10-18
+
+修改日志：
+2026-10-18，建立初版
+
+说明：
+faster_sample_rate.py中"读完后sleep剩余的间隔"的做法，每次的sleep误差和读取耗时都会累积到下一个周期，
+采集率会越跑越慢。这里第n次采样的截止点固定为 start + n * period（perf_counter_ns），单次的延迟不会影响之后的采样。
+某次读取超时等原因导致落后一个周期以上时，直接跳到下一个还没过去的截止点，并记录跳过的周期数，
+不会为了追赶进度而连续快速采样。
+等待方式：
+    sleep   只用time.sleep，CPU占用最低，精度取决于系统调度（Linux上通常为几十到上百微秒）
+    spin    忙等，精度最高，占满一个CPU核
+    hybrid  先sleep到截止点前spin_threshold，再忙等剩余的时间，兼顾精度与CPU占用
+"""
+import time
+import logging
+from typing import Optional, Callable, Any, Dict
+
+from src.latency_trace import LatencyHistogram
+
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+WAIT_MODES = ('sleep', 'spin', 'hybrid')
+
+
+def wait_until(deadline_ns: int, mode: str = 'hybrid', spin_threshold_ns: int = 1_000_000) -> None:
+    """
+    等待到指定的perf_counter_ns时间
+
+    :param deadline_ns: 截止时间
+    :param mode: 等待方式，见WAIT_MODES
+    :param spin_threshold_ns: hybrid方式下最后忙等的时间（ns）
+    """
+    if mode == 'spin':
+        spin_threshold_ns = None
+    elif mode == 'sleep':
+        spin_threshold_ns = 0
+    while True:
+        remaining_ns = deadline_ns - time.perf_counter_ns()
+        if remaining_ns <= 0:
+            return
+        if spin_threshold_ns is not None and remaining_ns > spin_threshold_ns:
+            time.sleep((remaining_ns - spin_threshold_ns) / 1e9)
+
+
+class FixedRatePoller:
+    """
+    按固定采集率调用读取函数
+    """
+    def __init__(self,
+                 read: Callable[[], Any],
+                 rate: float,
+                 mode: str = 'hybrid',
+                 spin_threshold: float = 0.001):
+        """
+        初始化
+
+        :param read: 完成一次采样并返回数值的函数，例如RtuPoller.read_float
+        :param rate: 采集率（Hz）
+        :param mode: 等待方式，见WAIT_MODES
+        :param spin_threshold: hybrid方式下最后忙等的时间（秒）
+        """
+        if rate <= 0:
+            raise ValueError(f"采集率必须大于0: {rate}")
+        if mode not in WAIT_MODES:
+            raise ValueError(f"不支持的等待方式: {mode!r}")
+        self.read = read
+        self.rate = rate
+        self.period_ns = int(round(1e9 / rate))
+        self.mode = mode
+        self.spin_threshold_ns = int(spin_threshold * 1e9)
+
+        self.next_deadline_ns: Optional[int] = None
+        self.start_ns: Optional[int] = None
+
+        # 统计信息
+        self.jitter = LatencyHistogram()    # 每次采样实际开始时间相对截止点的延迟
+        self.total_samples = 0
+        self.failed_samples = 0
+        self.skipped_periods = 0
+
+    def reset(self) -> None:
+        """从下一次调用开始重新计时"""
+        self.next_deadline_ns = None
+
+    def poll(self) -> Any:
+        """
+        等到下一个截止点，完成一次采样
+
+        :return: 读取函数的返回值
+        """
+        if self.next_deadline_ns is None:
+            self.next_deadline_ns = time.perf_counter_ns()
+            if self.start_ns is None:
+                self.start_ns = self.next_deadline_ns
+        deadline_ns = self.next_deadline_ns
+        wait_until(deadline_ns, self.mode, self.spin_threshold_ns)
+
+        lateness_ns = time.perf_counter_ns() - deadline_ns
+        if lateness_ns >= self.period_ns:
+            # 落后一个周期以上：跳过已经错过的截止点
+            missed = lateness_ns // self.period_ns
+            self.skipped_periods += missed
+            deadline_ns += missed * self.period_ns
+            lateness_ns -= missed * self.period_ns
+        self.jitter.add(lateness_ns)
+        self.next_deadline_ns = deadline_ns + self.period_ns
+
+        self.total_samples += 1
+        try:
+            return self.read()
+        except Exception:
+            self.failed_samples += 1
+            raise
+
+    def run(self,
+            duration: Optional[float] = None,
+            on_value: Optional[Callable[[Any], None]] = None,
+            exceptions: tuple = (IOError, ValueError)) -> None:
+        """
+        连续定速采样
+
+        :param duration: 运行持续时间（秒），如果为None则一直运行
+        :param on_value: 每次采样成功后的回调
+        :param exceptions: 记为失败并继续运行的异常类型
+        """
+        end_ns = None if duration is None else time.perf_counter_ns() + int(duration * 1e9)
+        while end_ns is None or time.perf_counter_ns() < end_ns:
+            try:
+                value = self.poll()
+            except exceptions as e:
+                logger.debug(f"采样失败: {e}")
+                continue
+            if on_value:
+                on_value(value)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """获取目标与实际采集率、跳过的周期数和调度抖动"""
+        duration = (time.perf_counter_ns() - self.start_ns) / 1e9 if self.start_ns else 0
+        return {
+            "target_rate": self.rate,
+            "achieved_rate": self.total_samples / duration if duration > 0 else 0.0,
+            "total_samples": self.total_samples,
+            "failed_samples": self.failed_samples,
+            "skipped_periods": self.skipped_periods,
+            "jitter": self.jitter.get_results(),
+        }
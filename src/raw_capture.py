@@ -0,0 +1,258 @@
+"""
+模块功能描述：
+串口原始字节流的录制与按时间回放
+*********************************
+版本：1.1
+最近一次修改日期：2026-10-19
+
+修改日志：
+2026-10-18，建立初版
+2026-10-19，录制改由src/background_writer.py的后台线程写盘，支持文件轮换和定时fsync
+
+说明：
+录制文件格式（小端）：
+    文件头：magic 'SFRAW001'(8s) 波特率(I) 录制开始的系统时间ns(q)
+    之后每个数据块一条记录：读取时间perf_counter_ns(q) 长度(I) + 原始字节
+ReplaySerial实现了AsciiSendModel.read_sensor_data用到的串口接口（is_open、in_waiting、read、close），
+可以通过AsciiSendModel(ser=...)直接替换真实串口。例如三个维度同时回放：
+    ThreeDimensionalForceModel({'X': {'ser': ReplaySerial('x.raw')}, ...})
+RawCaptureWriter.write只把记录放入后台写入线程的队列，读串口的循环不会被写盘阻塞；队列满时丢弃并计数。
+按大小或时间轮换时，录制文件为 x.0000.raw、x.0001.raw...，每个文件都带文件头，
+iter_capture和ReplaySerial传入 x.raw 即可按顺序读取全部分段。
+"""
+import os
+import glob
+import time
+import struct
+import logging
+from typing import Optional, Iterator, Tuple, BinaryIO, List
+
+from src.background_writer import BackgroundFileWriter
+
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+CAPTURE_MAGIC = b'SFRAW001'
+_FILE_HEADER = struct.Struct('<8sIq')
+_RECORD = struct.Struct('<qI')
+
+
+class RawCaptureWriter:
+    """
+    原始字节流录制
+    """
+    def __init__(self,
+                 capture_path: str,
+                 baudrate: int = 0,
+                 buffer_size: int = 1024 * 1024,
+                 rotate_bytes: Optional[int] = None,
+                 rotate_seconds: Optional[float] = None,
+                 fsync_interval: Optional[float] = None,
+                 queue_size: int = 65536):
+        """
+        初始化
+
+        :param capture_path: 录制文件路径
+        :param baudrate: 串口波特率，只作为记录写入文件头
+        :param buffer_size: 后台线程一次写入最多合并的字节数
+        :param rotate_bytes: 单个录制文件的大小上限（字节），为None时不按大小轮换
+        :param rotate_seconds: 单个录制文件的时长上限（秒），为None时不按时间轮换
+        :param fsync_interval: 每隔多少秒fsync一次，为None时不主动同步
+        :param queue_size: 等待写盘的数据块数上限，超过时丢弃
+        """
+        self.capture_path = capture_path
+        self.baudrate = baudrate
+        self.buffer_size = buffer_size
+        self.total_chunks = 0
+        self.total_bytes = 0
+        self._writer = BackgroundFileWriter(capture_path, header=self._header, rotate_bytes=rotate_bytes,
+                                            rotate_seconds=rotate_seconds, queue_size=queue_size,
+                                            batch_bytes=buffer_size, fsync_interval=fsync_interval,
+                                            name=os.path.basename(capture_path))
+        self._opened = False
+
+    def _header(self) -> bytes:
+        return _FILE_HEADER.pack(CAPTURE_MAGIC, self.baudrate, time.time_ns())
+
+    def open(self) -> None:
+        """创建录制文件，启动后台写入线程"""
+        self._writer.start()
+        self._opened = True
+        logger.info(f"开始录制串口数据: {self.capture_path}")
+
+    def write(self, chunk: bytes, t_ns: Optional[int] = None) -> None:
+        """
+        记录一个数据块
+
+        :param chunk: 从串口读到的原始字节
+        :param t_ns: 读取时间（perf_counter_ns），为None时使用当前时间
+        """
+        if not self._opened:
+            raise RuntimeError("录制文件未打开")
+        record = _RECORD.pack(time.perf_counter_ns() if t_ns is None else t_ns, len(chunk)) + chunk
+        if self._writer.submit(record):
+            self.total_chunks += 1
+            self.total_bytes += len(chunk)
+
+    @property
+    def dropped_chunks(self) -> int:
+        """写盘跟不上、被丢弃的数据块数"""
+        return self._writer.dropped
+
+    def get_statistics(self) -> dict:
+        """获取录制量、丢弃数和后台写入延迟"""
+        return dict(self._writer.get_statistics(), total_chunks=self.total_chunks, total_bytes=self.total_bytes)
+
+    def close(self) -> None:
+        """写完剩余数据后关闭录制文件"""
+        if self._opened:
+            self._writer.stop()
+            self._opened = False
+            logger.info(f"录制结束: {self.total_chunks} 个数据块, {self.total_bytes} 字节, "
+                        f"丢弃 {self.dropped_chunks} 个数据块")
+
+
+class CapturingSerial:
+    """
+    包装真实串口，读到的每个数据块都写入录制文件，其余属性直接转发给被包装的串口
+    """
+    def __init__(self, ser, writer: RawCaptureWriter):
+        """
+        初始化
+
+        :param ser: 已经打开的串口对象
+        :param writer: 已经打开的录制文件
+        """
+        self.ser = ser
+        self.writer = writer
+
+    def read(self, size: int = 1) -> bytes:
+        chunk = self.ser.read(size)
+        if chunk:
+            self.writer.write(chunk)
+        return chunk
+
+    def close(self) -> None:
+        self.ser.close()
+        self.writer.close()
+
+    def __getattr__(self, name):
+        return getattr(self.ser, name)
+
+
+def read_capture_header(f: BinaryIO) -> Tuple[int, int]:
+    """
+    读取并检查录制文件头
+
+    :param f: 以二进制模式打开的录制文件
+    :return: (波特率, 录制开始的系统时间ns)
+    """
+    header = f.read(_FILE_HEADER.size)
+    if len(header) != _FILE_HEADER.size:
+        raise ValueError("录制文件不完整")
+    magic, baudrate, wall_time_ns = _FILE_HEADER.unpack(header)
+    if magic != CAPTURE_MAGIC:
+        raise ValueError("不是有效的串口录制文件")
+    return baudrate, wall_time_ns
+
+
+def capture_parts(capture_path: str) -> List[str]:
+    """
+    录制文件的全部分段。文件本身存在时只有它自己，否则为轮换生成的 <名称>.NNNN<扩展名>，按序号排序
+
+    :param capture_path: 录制时给出的文件路径
+    :return: 文件路径列表
+    """
+    if os.path.exists(capture_path):
+        return [capture_path]
+    root, ext = os.path.splitext(capture_path)
+    parts = sorted(glob.glob(f"{glob.escape(root)}.[0-9][0-9][0-9][0-9]{ext}"))
+    if not parts:
+        raise FileNotFoundError(capture_path)
+    return parts
+
+
+def iter_capture(capture_path: str) -> Iterator[Tuple[int, bytes]]:
+    """
+    逐个读取录制文件（包括轮换生成的全部分段）中的数据块。程序崩溃时最后一条记录可能不完整，会被忽略
+
+    :param capture_path: 录制文件路径
+    :return: (读取时间ns, 原始字节)的迭代器
+    """
+    for path in capture_parts(capture_path):
+        with open(path, 'rb') as f:
+            read_capture_header(f)
+            while True:
+                record = f.read(_RECORD.size)
+                if len(record) != _RECORD.size:
+                    break
+                t_ns, length = _RECORD.unpack(record)
+                chunk = f.read(length)
+                if len(chunk) != length:
+                    break
+                yield t_ns, chunk
+
+
+class ReplaySerial:
+    """
+    按录制时的节奏回放原始字节流的"串口"
+    """
+    def __init__(self, capture_path: str, speed: Optional[float] = 1.0, max_pending: int = 4096):
+        """
+        初始化
+
+        :param capture_path: 录制文件路径
+        :param speed: 回放倍速。1为原速，N为N倍速，None或0为尽可能快
+        :param max_pending: 尽可能快模式下，一次最多放出的字节数，避免一次把整个文件读进内存
+        """
+        self.capture_path = capture_path
+        self.speed = speed or None
+        self.max_pending = max_pending
+        with open(capture_parts(capture_path)[0], 'rb') as f:
+            self.baudrate, _ = read_capture_header(f)
+        self._chunks = iter_capture(capture_path)
+        self._next_chunk: Optional[Tuple[int, bytes]] = next(self._chunks, None)
+        self._pending = bytearray()         # 已经"到达"但还没有被读取的字节
+        self._first_t_ns: Optional[int] = None
+        self._start_ns = 0
+        self._closed = False
+
+    def _release(self) -> None:
+        """把到达时间已过的数据块放入待读取区"""
+        if self._next_chunk is None:
+            return
+        if self._first_t_ns is None:        # 第一次访问时开始计时
+            self._first_t_ns = self._next_chunk[0]
+            self._start_ns = time.perf_counter_ns()
+        if self.speed is None:
+            while self._next_chunk is not None and len(self._pending) < self.max_pending:
+                self._pending.extend(self._next_chunk[1])
+                self._next_chunk = next(self._chunks, None)
+            return
+        elapsed_ns = (time.perf_counter_ns() - self._start_ns) * self.speed
+        while self._next_chunk is not None and self._next_chunk[0] - self._first_t_ns <= elapsed_ns:
+            self._pending.extend(self._next_chunk[1])
+            self._next_chunk = next(self._chunks, None)
+
+    @property
+    def is_open(self) -> bool:
+        """回放结束（所有数据都被读走）后变为False"""
+        return not self._closed and (self._next_chunk is not None or bool(self._pending))
+
+    @property
+    def in_waiting(self) -> int:
+        self._release()
+        return len(self._pending)
+
+    def read(self, size: int = 1) -> bytes:
+        self._release()
+        data = bytes(self._pending[:size])
+        del self._pending[:size]
+        return data
+
+    def close(self) -> None:
+        self._closed = True
+        self._chunks.close()
+        self._pending.clear()
@@ -0,0 +1,867 @@
+"""
+模块功能描述：
+分段、只追加的二进制采集记录文件：通过预分配的mmap段写入，读取时得到零拷贝的NumPy视图
+*********************************
+版本：1.4
+最近一次修改日期：2026-10-19
+
+修改日志：
+2026-10-18，建立初版
+2026-10-19，写入时同时生成min/max/mean降采样金字塔，添加envelope查询
+2026-10-19，文件内保存段索引（版本2），添加read_range按时间范围读取
+2026-10-19，添加iter_range，按时间范围分块读取，内存占用与范围长度无关
+2026-10-19，由后台线程提前为后续的段分配磁盘空间，换段时采集循环只需映射
+
+说明：
+all_values、values_buffer、TestInfo.all_data把每个采样作为Python对象保存在内存里，
+1kHz × 3通道运行一整夜会耗尽内存，程序崩溃时数据全部丢失。记录文件格式（小端）：
+    文件头（4096字节）：magic 'SFREC001'(8s) 版本(I) 文件头大小(I) 段大小(I)
+                        创建时的系统时间ns(q) 创建时的perf_counter_ns(q) 元数据长度(I)，
+                        偏移64处开始为UTF-8 JSON元数据：{"channels": [{"name": "X", ...}, ...], ...}
+                        偏移2048处为索引段位置表：最多256个<q，0表示未使用（版本2）
+    之后是若干个等长的段（段大小为页大小的整数倍），每段属于一个通道：
+        段头（64字节）：magic 'SFSG'(4s) 通道号(H) 类型(H) 记录大小(H) 保留(H) 该通道内的段序号(I)
+                        容量(I) 第一条记录的时间戳(q) 最后一条记录的时间戳(q) 记录数(I)
+        段头之后是定长记录，类型为KIND_RAW时记录为RECORD_DTYPE：时间戳<i8 数值<f8 标志<u4 保留<u4
+时间戳为perf_counter_ns，与文件头中的时间对照可以换算为系统时间（to_wall_ns）。
+每条记录先写入数据，再更新段头中的记录数和最后时间戳，程序崩溃时已经计入记录数的数据都是完整的。
+降采样金字塔：写入原始采样的同时，按PYRAMID_FACTORS（默认10、100、1000个原始采样合并为一个桶）生成各层的
+min/max/mean，作为类型为1、2、3的段（记录为PYRAMID_DTYPE）保存在同一个文件中，第k层的第i个桶对应
+原始记录[i*factor, (i+1)*factor)。envelope按需要的像素数选择最粗而桶数仍不少于像素数的一层，
+耗时与输出的点数成正比，与时间范围内的原始采样数无关。无效采样（NaN）不计入桶的统计，全部无效的桶为NaN。
+关闭文件时未满的桶也会写入；程序崩溃时金字塔最多落后于原始数据最后一个桶，envelope用原始数据补齐。
+段索引：每分配一个数据段，就在索引段（类型KIND_INDEX）中追加一条INDEX_DTYPE记录（段的文件偏移、通道、类型），
+段写满或关闭文件时再填入该段的第一个、最后一个时间戳和记录数。读取时只需映射文件头中列出的索引段，
+不用逐个读取段头；read_range先在该通道各段的最后时间戳中二分查找，再在段内按时间戳二分查找，
+查找的耗时与文件大小成对数关系，返回的数组只涉及一个段时为零拷贝视图。
+版本1的文件没有索引，打开时逐个扫描段头。
+预分配：ftruncate和posix_fallocate可能要等文件系统分配磁盘块，由后台线程提前为后面reserve_segments个段完成，
+段写满时采集循环只做一次mmap（不涉及磁盘读写）；预留跟不上写入速度时才在换段时等待。
+文件末尾因此可能有尚未使用的预留空间，关闭时截掉；程序崩溃时留下的预留空间不在索引中，读取时忽略。
+"""
+import os
+import json
+import math
+import mmap
+import bisect
+import time
+import struct
+import logging
+import threading
+from typing import Optional, List, Dict, Any, Sequence, Iterator, Tuple, Union
+
+import numpy as np
+
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+RECORDING_MAGIC = b'SFREC001'
+RECORDING_VERSION = 2
+HEADER_SIZE = 4096
+METADATA_OFFSET = 64
+SEGMENT_MAGIC = b'SFSG'
+SEGMENT_HEADER_SIZE = 64
+INDEX_TABLE_OFFSET = 2048
+INDEX_TABLE_SIZE = 256
+KIND_RAW = 0
+KIND_INDEX = 0xFFFF
+FLAG_INVALID = 1            # 采样无效（例如报文无法解析），数值为NaN
+
+RECORD_DTYPE = np.dtype([('timestamp', '<i8'), ('value', '<f8'), ('flags', '<u4'), ('reserved', '<u4')])
+
+_FILE_HEADER = struct.Struct('<8sIIIqqI')
+_SEGMENT_HEADER = struct.Struct('<4sHHHHIIqqI')
+_SEGMENT_TAIL = struct.Struct('<qI')         # 最后时间戳、记录数，每次追加后一起更新
+_SEGMENT_TAIL_OFFSET = 28
+_SEGMENT_FIRST_OFFSET = 20
+_TIMESTAMP = struct.Struct('<q')
+_RECORD = struct.Struct('<qdII')
+
+INDEX_DTYPE = np.dtype([('offset', '<i8'), ('t_first', '<i8'), ('t_last', '<i8'), ('count', '<u4'),
+                        ('channel', '<u2'), ('kind', '<u2')])   # count为0表示该段还在写入中，以段头为准
+_INDEX_ENTRY = struct.Struct('<qqqIHH')
+_INDEX_FINAL = struct.Struct('<qqI')            # 段写满后填入：第一个时间戳、最后时间戳、记录数
+_INDEX_POINTER = struct.Struct('<q')
+
+PYRAMID_FACTORS = (10, 100, 1000)
+PYRAMID_DTYPE = np.dtype([('timestamp', '<i8'), ('min', '<f8'), ('max', '<f8'), ('mean', '<f8'),
+                          ('count', '<u4'), ('reserved', '<u4')])     # timestamp为桶内第一个采样的时间戳
+_PYRAMID_RECORD = struct.Struct('<qdddII')
+
+
+class SegmentInfo:
+    """记录文件中的一个段"""
+    __slots__ = ('offset', 'channel', 'kind', 'record_size', 'sequence', 'capacity', 't_first', 't_last', 'count')
+
+    def __init__(self, offset: int, channel: int, kind: int, record_size: int, sequence: int, capacity: int,
+                 t_first: int, t_last: int, count: int):
+        self.offset = offset
+        self.channel = channel
+        self.kind = kind
+        self.record_size = record_size
+        self.sequence = sequence
+        self.capacity = capacity
+        self.t_first = t_first
+        self.t_last = t_last
+        self.count = count
+
+    @property
+    def data_offset(self) -> int:
+        return self.offset + SEGMENT_HEADER_SIZE
+
+    def __repr__(self):
+        return (f"SegmentInfo(channel={self.channel}, kind={self.kind}, sequence={self.sequence}, "
+                f"count={self.count}/{self.capacity}, t=[{self.t_first}, {self.t_last}])")
+
+
+def _normalize_channels(channels: Sequence[Union[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """把通道名称或通道描述统一为带name的字典"""
+    normalized = [{'name': channel} if isinstance(channel, str) else dict(channel) for channel in channels]
+    names = [channel['name'] for channel in normalized]
+    if len(set(names)) != len(names):
+        raise ValueError("通道名称不能重复")
+    return normalized
+
+
+class _OpenSegment:
+    """写入中的段"""
+    __slots__ = ('info', 'mm', 'base', 'records', 'index_entry')
+
+    def __init__(self, info: SegmentInfo, mm: mmap.mmap, base: int, dtype: np.dtype):
+        self.info = info
+        self.mm = mm
+        self.base = base            # 段头在mm中的位置（mmap的起点需要按分配粒度对齐）
+        self.records = np.frombuffer(mm, dtype=dtype, count=info.capacity, offset=base + SEGMENT_HEADER_SIZE)
+        self.index_entry: Optional[Tuple['_OpenSegment', int]] = None   # (索引段, 条目在索引段mm中的位置)
+
+
+class _PyramidLevel:
+    """金字塔的一层：把下一层（或原始数据）的step个桶合并为一个桶，合并后写入文件并交给更粗的一层"""
+
+    def __init__(self, writer: 'RecordingWriter', channel: int, kind: int, step: int,
+                 coarser: Optional['_PyramidLevel']):
+        self.writer = writer
+        self.channel = channel
+        self.kind = kind
+        self.step = step
+        self.coarser = coarser
+        self._reset()
+
+    def _reset(self) -> None:
+        self.n = 0                  # 当前桶已经合并的下层桶数
+        self.t = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.sum = 0.0
+        self.count = 0              # 有效采样数
+
+    def add(self, t: int, minimum: float, maximum: float, total: float, count: int) -> None:
+        """合并一个下层的桶（原始采样是只有一个采样的桶）"""
+        if not self.n:
+            self.t = t
+        if minimum < self.min:
+            self.min = minimum
+        if maximum > self.max:
+            self.max = maximum
+        self.sum += total
+        self.count += count
+        self.n += 1
+        if self.n == self.step:
+            self._emit()
+
+    def add_many(self, t: np.ndarray, minimum: np.ndarray, maximum: np.ndarray, total: np.ndarray,
+                 count: np.ndarray) -> None:
+        """合并一批下层的桶：先补满当前的桶，中间对齐的部分按step分组批量合并，剩余部分逐个合并"""
+        n = len(t)
+        i = 0
+        while self.n and i < n:
+            self.add(int(t[i]), float(minimum[i]), float(maximum[i]), float(total[i]), int(count[i]))
+            i += 1
+        end = i + (n - i) // self.step * self.step
+        if end > i:
+            shape = (-1, self.step)
+            merged = (t[i:end:self.step], minimum[i:end].reshape(shape).min(axis=1),
+                      maximum[i:end].reshape(shape).max(axis=1), total[i:end].reshape(shape).sum(axis=1),
+                      count[i:end].reshape(shape).sum(axis=1))
+            self.writer._append_pyramid_many(self.channel, self.kind, *merged)
+            if self.coarser is not None:
+                self.coarser.add_many(*merged)
+        for j in range(end, n):
+            self.add(int(t[j]), float(minimum[j]), float(maximum[j]), float(total[j]), int(count[j]))
+
+    def _emit(self) -> None:
+        self.writer._append_pyramid(self.channel, self.kind, self.t, self.min, self.max, self.sum, self.count)
+        if self.coarser is not None:
+            self.coarser.add(self.t, self.min, self.max, self.sum, self.count)
+        self._reset()
+
+    def flush(self) -> None:
+        """关闭文件时写入未满的桶"""
+        if self.n:
+            self._emit()
+        if self.coarser is not None:
+            self.coarser.flush()
+
+
+class RecordingWriter:
+    """
+    记录文件的写入
+    """
+    def __init__(self,
+                 path: str,
+                 channels: Sequence[Union[str, Dict[str, Any]]],
+                 segment_size: int = 256 * 1024,
+                 metadata: Optional[Dict[str, Any]] = None,
+                 pyramid: Sequence[int] = PYRAMID_FACTORS,
+                 reserve_segments: int = 8):
+        """
+        初始化
+
+        :param path: 记录文件路径
+        :param channels: 通道名称，或带name的通道描述字典（例如{'name': 'X', 'unit': 'kg'}）
+        :param segment_size: 段大小（字节），必须是页大小的整数倍
+        :param metadata: 其它写入文件头的元数据
+        :param pyramid: 降采样金字塔各层合并的原始采样数，后一层必须是前一层的整数倍，为空时不生成金字塔
+        :param reserve_segments: 由后台线程提前分配磁盘空间的段数，为0时在换段时同步分配
+        """
+        if any(f <= 1 for f in pyramid) or any(b % a for a, b in zip(pyramid, pyramid[1:])):
+            raise ValueError(f"金字塔各层必须大于1且是前一层的整数倍: {pyramid}")
+        if segment_size % mmap.PAGESIZE or segment_size <= SEGMENT_HEADER_SIZE + RECORD_DTYPE.itemsize:
+            raise ValueError(f"段大小必须是页大小({mmap.PAGESIZE})的整数倍: {segment_size}")
+        self.path = path
+        self.channels = _normalize_channels(channels)
+        self.channel_names = [channel['name'] for channel in self.channels]
+        self.segment_size = segment_size
+        self.metadata = dict(metadata or {})
+        self.pyramid = tuple(pyramid)
+        self.reserve_segments = reserve_segments
+        self.wall_ns = 0
+        self.perf_ns = 0
+        self.total_records = 0
+        self.total_segments = 0
+        self._fd: Optional[int] = None
+        self._file_size = 0
+        self._open_segments: Dict[Tuple[int, int], _OpenSegment] = {}
+        self._sequences: Dict[Tuple[int, int], int] = {}
+        self._pyramids: Dict[int, _PyramidLevel] = {}       # 通道 -> 最细的一层
+        self._header_mm: Optional[mmap.mmap] = None
+        self._index_segments: List[_OpenSegment] = []          # 全部索引段，写满的段还要回填，一直保持映射
+        self._reserved_size = 0                                 # 已经分配了磁盘空间的文件大小
+        self._reserve_condition = threading.Condition()
+        self._reserve_thread: Optional[threading.Thread] = None
+        self._reserve_stop = False
+        self._reserve_error: Optional[OSError] = None
+
+    def open(self) -> 'RecordingWriter':
+        """创建记录文件并写入文件头"""
+        metadata = dict(self.metadata, channels=self.channels, pyramid=list(self.pyramid))
+        metadata_bytes = json.dumps(metadata, ensure_ascii=False).encode('utf-8')
+        if METADATA_OFFSET + len(metadata_bytes) > INDEX_TABLE_OFFSET:
+            raise ValueError(f"元数据过长: {len(metadata_bytes)} 字节")
+        self.wall_ns, self.perf_ns = time.time_ns(), time.perf_counter_ns()
+        header = bytearray(HEADER_SIZE)
+        _FILE_HEADER.pack_into(header, 0, RECORDING_MAGIC, RECORDING_VERSION, HEADER_SIZE, self.segment_size,
+                               self.wall_ns, self.perf_ns, len(metadata_bytes))
+        header[METADATA_OFFSET:METADATA_OFFSET + len(metadata_bytes)] = metadata_bytes
+
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o644)
+        os.write(self._fd, bytes(header))
+        self._file_size = HEADER_SIZE
+        self._reserved_size = HEADER_SIZE
+        self._header_mm = mmap.mmap(self._fd, HEADER_SIZE, offset=0)
+        if self.reserve_segments > 0:
+            self._reserve_stop = False
+            self._reserve_error = None
+            self._reserve_thread = threading.Thread(target=self._reserve_loop, name="RecordingWriter-reserve",
+                                                    daemon=True)
+            self._reserve_thread.start()
+        for channel in range(len(self.channels)):
+            level = None
+            for kind in range(len(self.pyramid), 0, -1):
+                step = self.pyramid[kind - 1] // (self.pyramid[kind - 2] if kind > 1 else 1)
+                level = _PyramidLevel(self, channel, kind, step, level)
+            if level is not None:
+                self._pyramids[channel] = level
+        logger.info(f"开始记录: {self.path}, 通道 {self.channel_names}")
+        return self
+
+    def __enter__(self) -> 'RecordingWriter':
+        return self.open()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def channel_index(self, channel: Union[int, str]) -> int:
+        """通道名称或通道号转换为通道号"""
+        return channel if isinstance(channel, int) else self.channel_names.index(channel)
+
+    def _new_segment(self, channel: int, kind: int = KIND_RAW, dtype: np.dtype = RECORD_DTYPE) -> _OpenSegment:
+        """
+        在文件末尾预分配一个新段并映射到内存
+
+        :param channel: 通道号
+        :param kind: 段类型
+        :param dtype: 记录的数据类型
+        :return: 写入中的段
+        """
+        if self._fd is None:
+            raise RuntimeError("记录文件未打开")
+        key = (channel, kind)
+        previous = self._open_segments.pop(key, None)
+        if previous is not None:
+            self._release(previous)
+
+        segment = self._allocate(channel, kind, dtype)
+        self._open_segments[key] = segment
+        self.total_segments += 1
+
+        # 在索引中登记新段，先于段内的任何数据写入
+        index = self._index_segments[-1] if self._index_segments else None
+        if index is None or index.info.count >= index.info.capacity:
+            index = self._new_index_segment()
+        position = index.base + SEGMENT_HEADER_SIZE + index.info.count * INDEX_DTYPE.itemsize
+        _INDEX_ENTRY.pack_into(index.mm, position, segment.info.offset, 0, 0, 0, channel, kind)
+        index.info.count += 1
+        _SEGMENT_TAIL.pack_into(index.mm, index.base + _SEGMENT_TAIL_OFFSET, 0, index.info.count)
+        segment.index_entry = (index, position)
+        return segment
+
+    def _extend(self, start: int, end: int) -> None:
+        """把文件扩展到end，并为[start, end)分配磁盘空间"""
+        os.ftruncate(self._fd, end)
+        if hasattr(os, 'posix_fallocate'):
+            os.posix_fallocate(self._fd, start, end - start)    # 真正分配磁盘空间，避免写入时才发现磁盘已满
+
+    def _reserve_loop(self) -> None:
+        """后台线程：保持文件末尾之后还有reserve_segments个段的预留空间"""
+        condition = self._reserve_condition
+        while True:
+            with condition:
+                while not self._reserve_stop and \
+                        self._reserved_size >= self._file_size + self.reserve_segments * self.segment_size:
+                    condition.wait()
+                if self._reserve_stop:
+                    return
+                start = self._reserved_size
+                end = self._file_size + self.reserve_segments * self.segment_size
+            try:
+                self._extend(start, end)
+            except OSError as e:
+                logger.error(f"预分配磁盘空间失败，改为换段时同步分配: {e}")
+                with condition:
+                    self._reserve_error = e
+                    condition.notify_all()
+                return
+            with condition:
+                self._reserved_size = end
+                condition.notify_all()
+
+    def _allocate(self, channel: int, kind: int, dtype: np.dtype) -> _OpenSegment:
+        """在文件末尾取一个段（通常已由后台线程分配好磁盘空间），映射到内存并写入段头"""
+        offset = self._file_size
+        end = offset + self.segment_size
+        with self._reserve_condition:
+            self._file_size = end
+            self._reserve_condition.notify_all()
+            while self._reserve_thread is not None and self._reserve_error is None and self._reserved_size < end:
+                self._reserve_condition.wait()      # 预留跟不上写入时才等待
+            reserved = self._reserved_size >= end
+        if not reserved:
+            self._extend(offset, end)
+            self._reserved_size = end
+
+        # mmap的偏移必须是分配粒度（Linux为页大小，Windows为64KiB）的整数倍
+        map_offset = offset - offset % mmap.ALLOCATIONGRANULARITY
+        base = offset - map_offset
+        mm = mmap.mmap(self._fd, base + self.segment_size, offset=map_offset)
+
+        key = (channel, kind)
+        sequence = self._sequences.get(key, 0)
+        self._sequences[key] = sequence + 1
+        capacity = (self.segment_size - SEGMENT_HEADER_SIZE) // dtype.itemsize
+        info = SegmentInfo(offset, channel, kind, dtype.itemsize, sequence, capacity, 0, 0, 0)
+        _SEGMENT_HEADER.pack_into(mm, base, SEGMENT_MAGIC, channel, kind, dtype.itemsize, 0, sequence,
+                                  capacity, 0, 0, 0)
+        return _OpenSegment(info, mm, base, dtype)
+
+    def _new_index_segment(self) -> _OpenSegment:
+        """分配一个索引段，并把它的位置写入文件头中的索引段位置表"""
+        number = len(self._index_segments)
+        if number >= INDEX_TABLE_SIZE:
+            raise RuntimeError(f"索引段数量超过上限 {INDEX_TABLE_SIZE}，请增大段大小")
+        segment = self._allocate(KIND_INDEX, KIND_INDEX, INDEX_DTYPE)
+        _INDEX_POINTER.pack_into(self._header_mm, INDEX_TABLE_OFFSET + number * _INDEX_POINTER.size,
+                                 segment.info.offset)
+        self._index_segments.append(segment)
+        return segment
+
+    def _release(self, segment: _OpenSegment) -> None:
+        """写满或关闭时把段的时间范围和记录数填入索引，释放段的映射"""
+        if segment.index_entry is not None:
+            index, position = segment.index_entry
+            info = segment.info
+            _INDEX_FINAL.pack_into(index.mm, position + 8, info.t_first, info.t_last, info.count)
+            segment.index_entry = None
+        segment.records = None
+        segment.mm.flush()
+        segment.mm.close()
+
+    def _write_records(self, channel: int, kind: int, records: np.ndarray) -> None:
+        """
+        把一批记录写入某个通道某种类型的段，段写满时分配新段。先写数据，再更新段头
+
+        :param channel: 通道号
+        :param kind: 段类型
+        :param records: 结构化数组
+        """
+        written = 0
+        while written < len(records):
+            segment = self._open_segments.get((channel, kind))
+            if segment is None or segment.info.count >= segment.info.capacity:
+                segment = self._new_segment(channel, kind, records.dtype)
+            info = segment.info
+            n = min(info.capacity - info.count, len(records) - written)
+            segment.records[info.count:info.count + n] = records[written:written + n]
+            if info.count == 0:
+                info.t_first = int(records['timestamp'][written])
+                _TIMESTAMP.pack_into(segment.mm, segment.base + _SEGMENT_FIRST_OFFSET, info.t_first)
+            info.count += n
+            info.t_last = int(records['timestamp'][written + n - 1])
+            _SEGMENT_TAIL.pack_into(segment.mm, segment.base + _SEGMENT_TAIL_OFFSET, info.t_last, info.count)
+            written += n
+        if kind == KIND_RAW:
+            self.total_records += len(records)
+
+    def _append_pyramid(self, channel: int, kind: int, t: int, minimum: float, maximum: float, total: float,
+                        count: int) -> None:
+        """写入金字塔的一个桶"""
+        segment = self._open_segments.get((channel, kind))
+        if segment is None or segment.info.count >= segment.info.capacity:
+            segment = self._new_segment(channel, kind, PYRAMID_DTYPE)
+        info = segment.info
+        if count:
+            mean = total / count
+        else:
+            minimum = maximum = mean = math.nan
+        _PYRAMID_RECORD.pack_into(segment.mm, segment.base + SEGMENT_HEADER_SIZE + info.count * PYRAMID_DTYPE.itemsize,
+                                  t, minimum, maximum, mean, count, 0)
+        if info.count == 0:
+            info.t_first = t
+            _TIMESTAMP.pack_into(segment.mm, segment.base + _SEGMENT_FIRST_OFFSET, t)
+        info.count += 1
+        info.t_last = t
+        _SEGMENT_TAIL.pack_into(segment.mm, segment.base + _SEGMENT_TAIL_OFFSET, t, info.count)
+
+    def _append_pyramid_many(self, channel: int, kind: int, t: np.ndarray, minimum: np.ndarray,
+                             maximum: np.ndarray, total: np.ndarray, count: np.ndarray) -> None:
+        """批量写入金字塔的桶"""
+        records = np.zeros(len(t), dtype=PYRAMID_DTYPE)
+        records['timestamp'] = t
+        records['count'] = count
+        empty = count == 0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            records['mean'] = np.where(empty, np.nan, total / count)
+        records['min'] = np.where(empty, np.nan, minimum)
+        records['max'] = np.where(empty, np.nan, maximum)
+        self._write_records(channel, kind, records)
+
+    def append(self, channel: Union[int, str], timestamp_ns: int, value: float, flags: int = 0) -> None:
+        """
+        追加一条记录
+
+        :param channel: 通道号或通道名称
+        :param timestamp_ns: 时间戳（perf_counter_ns）
+        :param value: 数值
+        :param flags: 标志位，例如标记解析失败的采样
+        """
+        if not isinstance(channel, int):
+            channel = self.channel_names.index(channel)
+        segment = self._open_segments.get((channel, KIND_RAW))
+        if segment is None or segment.info.count >= segment.info.capacity:
+            segment = self._new_segment(channel)
+        info = segment.info
+        _RECORD.pack_into(segment.mm, segment.base + SEGMENT_HEADER_SIZE + info.count * RECORD_DTYPE.itemsize,
+                          timestamp_ns, value, flags, 0)
+        if info.count == 0:
+            info.t_first = timestamp_ns
+            _TIMESTAMP.pack_into(segment.mm, segment.base + _SEGMENT_FIRST_OFFSET, timestamp_ns)
+        info.count += 1
+        info.t_last = timestamp_ns
+        _SEGMENT_TAIL.pack_into(segment.mm, segment.base + _SEGMENT_TAIL_OFFSET, timestamp_ns, info.count)
+        self.total_records += 1
+
+        level = self._pyramids.get(channel)
+        if level is not None:
+            if value == value:
+                level.add(timestamp_ns, value, value, value, 1)
+            else:
+                level.add(timestamp_ns, math.inf, -math.inf, 0.0, 0)
+
+    def append_many(self, channel: Union[int, str], timestamps: Sequence[int], values: Sequence[float],
+                    flags: Optional[Sequence[int]] = None) -> None:
+        """
+        批量追加记录
+
+        :param channel: 通道号或通道名称
+        :param timestamps: 时间戳数组（perf_counter_ns）
+        :param values: 数值数组
+        :param flags: 标志位数组，为None时全部为0
+        """
+        channel = self.channel_index(channel)
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        flags = np.zeros(len(timestamps), dtype=np.uint32) if flags is None else np.asarray(flags, dtype=np.uint32)
+        if not len(timestamps) == len(values) == len(flags):
+            raise ValueError("时间戳、数值和标志位的长度不一致")
+        records = np.zeros(len(timestamps), dtype=RECORD_DTYPE)
+        records['timestamp'] = timestamps
+        records['value'] = values
+        records['flags'] = flags
+        self._write_records(channel, KIND_RAW, records)
+
+        level = self._pyramids.get(channel)
+        if level is not None:
+            valid = ~np.isnan(values)
+            level.add_many(timestamps, np.where(valid, values, np.inf), np.where(valid, values, -np.inf),
+                           np.where(valid, values, 0.0), valid.astype(np.int64))
+
+    def flush(self) -> None:
+        """把所有写入中的段同步到磁盘"""
+        for segment in self._open_segments.values():
+            segment.mm.flush()
+        for segment in self._index_segments:
+            segment.mm.flush()
+        self._header_mm.flush()
+
+    def close(self) -> None:
+        """释放所有段并关闭文件"""
+        if self._fd is None:
+            return
+        for level in self._pyramids.values():
+            level.flush()
+        self._pyramids.clear()
+        for segment in self._open_segments.values():
+            self._release(segment)
+        self._open_segments.clear()
+        for segment in self._index_segments:
+            self._release(segment)
+        self._index_segments.clear()
+        if self._reserve_thread is not None:
+            with self._reserve_condition:
+                self._reserve_stop = True
+                self._reserve_condition.notify_all()
+            self._reserve_thread.join()
+            self._reserve_thread = None
+        if self._reserved_size > self._file_size:
+            os.ftruncate(self._fd, self._file_size)     # 截掉未使用的预留空间
+        self._header_mm.flush()
+        self._header_mm.close()
+        self._header_mm = None
+        os.close(self._fd)
+        self._fd = None
+        logger.info(f"记录结束: {self.total_records} 条记录, {self.total_segments} 个段")
+
+
+def _raw_buckets(records: np.ndarray) -> np.ndarray:
+    """把原始记录转换为只有一个采样的桶"""
+    buckets = np.zeros(len(records), dtype=PYRAMID_DTYPE)
+    buckets['timestamp'] = records['timestamp']
+    for name in ('min', 'max', 'mean'):
+        buckets[name] = records['value']
+    buckets['count'] = ~np.isnan(records['value'])
+    return buckets
+
+
+def _merge_buckets(buckets: np.ndarray, pixels: int) -> np.ndarray:
+    """把相邻的桶合并，使桶数不超过pixels"""
+    group = -(-len(buckets) // pixels)
+    if group <= 1:
+        return np.array(buckets)
+    padded = -(-len(buckets) // group) * group
+    pad = padded - len(buckets)
+    shape = (-1, group)
+    counts = np.concatenate([buckets['count'], np.zeros(pad, dtype=np.uint32)]).reshape(shape)
+    valid = counts > 0
+    means = np.concatenate([buckets['mean'], np.zeros(pad)]).reshape(shape)
+    minimums = np.concatenate([buckets['min'], np.full(pad, np.nan)]).reshape(shape)
+    maximums = np.concatenate([buckets['max'], np.full(pad, np.nan)]).reshape(shape)
+
+    merged = np.zeros(padded // group, dtype=PYRAMID_DTYPE)
+    merged['timestamp'] = buckets['timestamp'][::group]
+    merged['count'] = counts.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        merged['min'] = np.where(valid, minimums, np.inf).min(axis=1)
+        merged['max'] = np.where(valid, maximums, -np.inf).max(axis=1)
+        merged['mean'] = np.where(valid, means * counts, 0.0).sum(axis=1) / merged['count']
+    empty = merged['count'] == 0
+    merged['min'][empty] = np.nan
+    merged['max'][empty] = np.nan
+    return merged
+
+
+class RecordingReader:
+    """
+    记录文件的读取，数据以零拷贝的NumPy视图返回（只读）
+    """
+    def __init__(self, path: str):
+        """
+        初始化，映射整个文件并扫描所有段
+
+        :param path: 记录文件路径
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_size, segment_size, wall_ns, perf_ns, metadata_length = \
+            _FILE_HEADER.unpack_from(self._mm, 0)
+        if magic != RECORDING_MAGIC:
+            raise ValueError("不是有效的记录文件")
+        if version > RECORDING_VERSION:
+            raise ValueError(f"不支持的记录文件版本: {version}")
+        self.version = version
+        self.header_size = header_size
+        self.segment_size = segment_size
+        self.wall_ns = wall_ns
+        self.perf_ns = perf_ns
+        self.metadata: Dict[str, Any] = json.loads(
+            bytes(self._mm[METADATA_OFFSET:METADATA_OFFSET + metadata_length]).decode('utf-8'))
+        self.channels: List[Dict[str, Any]] = self.metadata['channels']
+        self.channel_names: List[str] = [channel['name'] for channel in self.channels]
+        self.pyramid: Tuple[int, ...] = tuple(self.metadata.get('pyramid', ()))
+        self.segments: List[SegmentInfo] = []
+        self._by_key: Dict[Tuple[int, int], List[SegmentInfo]] = {}
+        self._starts: Dict[Tuple[int, int], List[int]] = {}
+        self._t_lasts: Dict[Tuple[int, int], np.ndarray] = {}
+        self._scan()
+
+    def _read_segment_header(self, offset: int) -> Optional[SegmentInfo]:
+        """读取一个段头，不是有效的段时返回None"""
+        fields = _SEGMENT_HEADER.unpack_from(self._mm, offset)
+        if fields[0] != SEGMENT_MAGIC:
+            return None
+        _, channel, kind, record_size, _, sequence, capacity, t_first, t_last, count = fields
+        return SegmentInfo(offset, channel, kind, record_size, sequence, capacity, t_first, t_last,
+                           min(count, capacity))
+
+    def _scan(self) -> None:
+        """
+        找出所有数据段。版本2的文件从索引段中读取，写入中的段（索引中记录数为0）再读一次段头；
+        版本1的文件逐个扫描段头。预分配后还没来得及写段头（程序崩溃）的段会被跳过
+        """
+        if self.version >= 2:
+            pointers = np.frombuffer(self._mm, dtype='<i8', count=INDEX_TABLE_SIZE, offset=INDEX_TABLE_OFFSET)
+            entries = []
+            for pointer in pointers[pointers > 0]:
+                index = self._read_segment_header(int(pointer))
+                if index is not None:
+                    entries.append(np.frombuffer(self._mm, dtype=INDEX_DTYPE, count=index.count,
+                                                 offset=index.data_offset))
+            entries = np.concatenate(entries) if entries else np.empty(0, dtype=INDEX_DTYPE)
+            sequences: Dict[Tuple[int, int], int] = {}
+            for offset, t_first, t_last, count, channel, kind in entries.tolist():
+                if offset + self.segment_size > len(self._mm):
+                    continue
+                if count:
+                    record_size = (RECORD_DTYPE if kind == KIND_RAW else PYRAMID_DTYPE).itemsize
+                    sequence = sequences.get((channel, kind), 0)
+                    info = SegmentInfo(offset, channel, kind, record_size, sequence,
+                                       (self.segment_size - SEGMENT_HEADER_SIZE) // record_size,
+                                       t_first, t_last, count)
+                else:
+                    info = self._read_segment_header(offset)
+                    if info is None:
+                        continue
+                sequences[(channel, kind)] = info.sequence + 1
+                self.segments.append(info)
+        else:
+            offset = self.header_size
+            while offset + self.segment_size <= len(self._mm):
+                info = self._read_segment_header(offset)
+                if info is not None and info.kind != KIND_INDEX:
+                    self.segments.append(info)
+                offset += self.segment_size
+        self.segments.sort(key=lambda info: (info.channel, info.kind, info.sequence))
+        for info in self.segments:
+            if info.count:
+                self._by_key.setdefault((info.channel, info.kind), []).append(info)
+        for key, segments in self._by_key.items():
+            self._starts[key] = [0]
+            for info in segments[:-1]:
+                self._starts[key].append(self._starts[key][-1] + info.count)     # 每段在该通道内的起始记录号
+            self._t_lasts[key] = np.array([info.t_last for info in segments], dtype=np.int64)
+
+    def channel_index(self, channel: Union[int, str]) -> int:
+        """通道名称或通道号转换为通道号"""
+        return channel if isinstance(channel, int) else self.channel_names.index(channel)
+
+    def to_wall_ns(self, timestamps: Union[int, np.ndarray]) -> Union[int, np.ndarray]:
+        """把记录中的perf_counter_ns时间戳换算为系统时间（ns）"""
+        return timestamps - self.perf_ns + self.wall_ns
+
+    def channel_segments(self, channel: Union[int, str], kind: int = KIND_RAW) -> List[SegmentInfo]:
+        """某个通道某种类型的所有段，按写入顺序"""
+        return self._by_key.get((self.channel_index(channel), kind), [])
+
+    def segment_view(self, info: SegmentInfo, dtype: Optional[np.dtype] = None) -> np.ndarray:
+        """
+        一个段中的记录（零拷贝）
+
+        :param info: 段
+        :param dtype: 记录的数据类型，为None时按段类型选择RECORD_DTYPE或PYRAMID_DTYPE
+        :return: 只读的结构化数组视图
+        """
+        if dtype is None:
+            dtype = RECORD_DTYPE if info.kind == KIND_RAW else PYRAMID_DTYPE
+        if dtype.itemsize != info.record_size:
+            raise ValueError(f"记录大小不匹配: {dtype.itemsize} != {info.record_size}")
+        return np.frombuffer(self._mm, dtype=dtype, count=info.count, offset=info.data_offset)
+
+    def iter_views(self, channel: Union[int, str], kind: int = KIND_RAW,
+                   dtype: Optional[np.dtype] = None) -> Iterator[np.ndarray]:
+        """逐段返回某个通道的记录视图（零拷贝）"""
+        for info in self.channel_segments(channel, kind):
+            yield self.segment_view(info, dtype)
+
+    def read(self, channel: Union[int, str], kind: int = KIND_RAW, dtype: Optional[np.dtype] = None) -> np.ndarray:
+        """
+        某个通道的全部记录。只有一个段时为零拷贝视图，多个段时拼接为新数组
+
+        :param channel: 通道号或通道名称
+        :param kind: 段类型，KIND_RAW为原始数据，1、2、3...为金字塔的各层
+        :return: 结构化数组
+        """
+        views = list(self.iter_views(channel, kind, dtype))
+        if not views:
+            return np.empty(0, dtype=dtype or (RECORD_DTYPE if kind == KIND_RAW else PYRAMID_DTYPE))
+        return views[0] if len(views) == 1 else np.concatenate(views)
+
+    def count(self, channel: Union[int, str], kind: int = KIND_RAW) -> int:
+        """某个通道的记录数"""
+        return sum(info.count for info in self.channel_segments(channel, kind))
+
+    def _slice(self, channel: int, kind: int, start: int, stop: int) -> np.ndarray:
+        """
+        按通道内的记录号取出[start, stop)的记录，只涉及一个段时为零拷贝视图
+
+        :param channel: 通道号
+        :param kind: 段类型
+        :return: 结构化数组
+        """
+        key = (channel, kind)
+        segments, starts = self._by_key.get(key, []), self._starts.get(key, [])
+        parts = []
+        index = max(0, bisect.bisect_right(starts, start) - 1)
+        while index < len(segments) and starts[index] < stop:
+            first = starts[index]
+            view = self.segment_view(segments[index])
+            parts.append(view[max(0, start - first):max(0, stop - first)])
+            index += 1
+        if not parts:
+            return np.empty(0, dtype=RECORD_DTYPE if kind == KIND_RAW else PYRAMID_DTYPE)
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def _raw_index(self, channel: int, timestamp_ns: int, side: str = 'left') -> int:
+        """
+        时间戳在原始数据中的位置：先按段头中的最后时间戳二分查找段，再在段内二分查找
+
+        :param channel: 通道号
+        :param timestamp_ns: 时间戳（perf_counter_ns）
+        :param side: 'left'为第一个不早于该时间戳的记录号，'right'为第一个晚于该时间戳的记录号
+        :return: 通道内的记录号
+        """
+        segments = self._by_key.get((channel, KIND_RAW), [])
+        if not segments:
+            return 0
+        starts = self._starts[(channel, KIND_RAW)]
+        index = int(np.searchsorted(self._t_lasts[(channel, KIND_RAW)], timestamp_ns, side=side))
+        if index == len(segments):
+            return starts[-1] + segments[-1].count
+        timestamps = self.segment_view(segments[index])['timestamp']
+        return starts[index] + int(np.searchsorted(timestamps, timestamp_ns, side=side))
+
+    def read_range(self, t0: Optional[int] = None, t1: Optional[int] = None,
+                   channels: Optional[Sequence[Union[int, str]]] = None) -> Dict[str, np.ndarray]:
+        """
+        按时间范围读取原始记录。查找的耗时与文件大小成对数关系；
+        某个通道的结果只涉及一个段时为内存映射上的零拷贝视图，否则拼接为新数组
+
+        :param t0: 起始时间戳（perf_counter_ns，含），为None时从头开始
+        :param t1: 结束时间戳（含），为None时到结尾
+        :param channels: 通道号或通道名称，为None时为全部通道
+        :return: 通道名称 -> RECORD_DTYPE结构化数组
+        """
+        if channels is None:
+            channels = range(len(self.channel_names))
+        results = {}
+        for channel in channels:
+            channel = self.channel_index(channel)
+            start = 0 if t0 is None else self._raw_index(channel, t0, 'left')
+            stop = self.count(channel) if t1 is None else self._raw_index(channel, t1, 'right')
+            results[self.channel_names[channel]] = self._slice(channel, KIND_RAW, start, max(start, stop))
+        return results
+
+    def iter_range(self, channel: Union[int, str], t0: Optional[int] = None, t1: Optional[int] = None,
+                   chunk_records: int = 1 << 20) -> Iterator[np.ndarray]:
+        """
+        按时间范围分块读取一个通道的原始记录，每块不超过chunk_records条，不跨段时为零拷贝视图
+
+        :param channel: 通道号或通道名称
+        :param t0: 起始时间戳（含），为None时从头开始
+        :param t1: 结束时间戳（含），为None时到结尾
+        :param chunk_records: 每块的最大记录数
+        """
+        channel = self.channel_index(channel)
+        start = 0 if t0 is None else self._raw_index(channel, t0, 'left')
+        stop = self.count(channel) if t1 is None else self._raw_index(channel, t1, 'right')
+        for first in range(start, stop, chunk_records):
+            yield self._slice(channel, KIND_RAW, first, min(first + chunk_records, stop))
+
+    def envelope(self, channel: Union[int, str], t0: Optional[int] = None, t1: Optional[int] = None,
+                 pixels: int = 1000) -> np.ndarray:
+        """
+        时间范围内数据的包络，不超过pixels个点，每个点为一段时间内的最小值、最大值和均值。
+        选用最粗而桶数仍不少于pixels的金字塔层，耗时与输出的点数成正比。
+        两端的桶可能包含少量范围之外的采样
+
+        :param channel: 通道号或通道名称
+        :param t0: 起始时间戳（perf_counter_ns），为None时从头开始
+        :param t1: 结束时间戳（含），为None时到结尾
+        :param pixels: 最多输出的点数，一般取绘图区域的宽度（像素）
+        :return: PYRAMID_DTYPE结构化数组，timestamp为每个点第一个采样的时间戳，count为有效采样数
+        """
+        channel = self.channel_index(channel)
+        total = self.count(channel)
+        start = 0 if t0 is None else self._raw_index(channel, t0, 'left')
+        stop = total if t1 is None else self._raw_index(channel, t1, 'right')
+        if stop <= start:
+            return np.empty(0, dtype=PYRAMID_DTYPE)
+
+        factor, kind = 1, KIND_RAW
+        for level, level_factor in enumerate(self.pyramid, 1):
+            if (stop - start) // level_factor >= pixels and self.count(channel, level):
+                factor, kind = level_factor, level
+        if kind == KIND_RAW:
+            buckets = _raw_buckets(self._slice(channel, KIND_RAW, start, stop))
+        else:
+            buckets = self._slice(channel, kind, start // factor, -(-stop // factor))
+            covered = self.count(channel, kind) * factor
+            if stop > covered:
+                # 程序崩溃时金字塔会落后于原始数据，缺少的部分用原始数据补齐
+                tail = _raw_buckets(self._slice(channel, KIND_RAW, max(start, covered), stop))
+                buckets = np.concatenate([buckets, tail])
+        return _merge_buckets(buckets, pixels)
+
+    def close(self) -> None:
+        """关闭文件映射。仍有视图在使用时无法关闭，映射会在视图释放后由垃圾回收关闭"""
+        try:
+            self._mm.close()
+        except BufferError:
+            logger.debug("仍有视图引用记录文件，暂不关闭映射")
+
+    def __enter__(self) -> 'RecordingReader':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
@@ -2,17 +2,29 @@
 模块功能描述：
 单通道ascii模式数据采集、解码、分析
 *********************************
-版本：1.0
-最近一次修改日期：2024-10-29
+版本：1.1
+最近一次修改日期：2026-10-19
 
 修改日志：
 2024-10-29，优化程序，添加单独的测试模块
+2026-10-18，添加parse_report，把报文转换为数值
+2026-10-18，支持传入串口对象，以及录制原始字节流
+2026-10-18，run_ascii_send_model可以把解析后的数值写入记录文件（src/recording.py）
+2026-10-19，TestInfo改用src/streaming_stats.py中的StreamingStats，不再保存全部报文
+2026-10-19，run_ascii_send_model可以把解析后的数值写入SQLite数据库（src/sqlite_sink.py）
+2026-10-19，read_sensor_data可以给每个报文单独打时间戳，run_ascii_send_model按报文时间戳写入记录文件、数据库和统计
 """
+import math
 import logging
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Sequence
 import serial
 import time
 
+from src.raw_capture import RawCaptureWriter, CapturingSerial
+from src.recording import RecordingWriter, FLAG_INVALID
+from src.sqlite_sink import SQLiteSink
+from src.streaming_stats import StreamingStats
+
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -33,6 +45,8 @@ class AsciiSendModel():
                  minimum_packet_interval: Optional[float] = None,
                  byte_num_of_one_message: int = 7,
                  buffer_size: Optional[int] = None,
+                 ser: Optional[Any] = None,
+                 capture_path: Optional[str] = None,
                  **kwargs: Any):
         """
         参数初始化
@@ -46,6 +60,8 @@ class AsciiSendModel():
         :param minimum_packet_interval: 最小包间隔。ascii模式只能保证实际包间隔时间大于仪表的设定值
         :param byte_num_of_one_message: 一个报文的字节数
         :param buffer_size: 串口缓冲区大小
+        :param ser: 已经打开的串口对象，或者具有相同读取接口的对象（如src/raw_capture.py中的ReplaySerial）。为None时按上面的参数打开串口
+        :param capture_path: 录制文件路径。不为None时，读到的每个原始数据块都带时间戳写入该文件
         :param kwargs: 其它参数
         """
         self.port_name = port_name
@@ -61,13 +77,19 @@ class AsciiSendModel():
         if kwargs:
             raise ValueError('猪头，压根没有这玩意！： {!r}'.format(kwargs))
 
-        # 配置并打开串口
-        self.ser = serial.Serial(
-            port=self.port_name,
-            baudrate=self.baudrate,
-            bytesize=self.bytesize,
-            timeout=self.timeout
-        )
+        # 配置并打开串口，传入ser时直接使用（例如ReplaySerial回放录制的数据）
+        if ser is None:
+            ser = serial.Serial(
+                port=self.port_name,
+                baudrate=self.baudrate,
+                bytesize=self.bytesize,
+                timeout=self.timeout
+            )
+        if capture_path:
+            capture_writer = RawCaptureWriter(capture_path, baudrate=self.baudrate)
+            capture_writer.open()
+            ser = CapturingSerial(ser, capture_writer)
+        self.ser = ser
 
     def close(self) -> None:
         """显式关闭串口"""
@@ -83,15 +105,21 @@ class AsciiSendModel():
     def read_sensor_data(self,
                          standard_message_length: int = 7,
                          report_count: int = 50,
-                         chunk_size: int = 512) -> List[str]:
+                         chunk_size: int = 512,
+                         with_timestamps: bool = False) -> List[str]:
         """
         在ascii通讯模式下读取串口数据：
         1. 首先找到第一个回车符(0D)作为数据同步点
         2. 之后的数据才开始正式接收和解码处理
 
+        报文的时间戳：每次读串口时记下读取时刻，缓冲区末尾的字节就是在这一时刻前后收到的，
+        某个报文的回车符之后还有k个字节时，按波特率往前推k个字节的传输时间，作为该报文的到达时间。
+        同一批报文因此各有各的时间戳，并且保证不递减
+
         :param standard_message_length: 标准通讯模式下，符合标准的默认报文长度（以字节为单位）
         :param report_count: 一次抛出的报文数量限制（已经转换为仪表数值，kg为单位）
         :param chunk_size: 缓冲区大小
+        :param with_timestamps: 为True时每次抛出(报文列表, 时间戳列表)，时间戳为perf_counter_ns，与报文一一对应
 
         :return: 解码后的报文列表
         """
@@ -102,13 +130,20 @@ class AsciiSendModel():
 
         buffer = bytearray()  # 创建空的字节串
         reports = []  # 创建报文空列表
-
-        while True:                     # 进入数据处理循环
+        timestamps = []  # 与reports对应的到达时间
+        # 一个字节在线路上的传输时间：起始位 + 数据位 + 校验位 + 停止位
+        bits_per_byte = 1 + self.bytesize + (0 if self.parity == 'N' else 1) + self.stopbits
+        byte_ns = int(bits_per_byte * 1e9 / self.baudrate)
+        read_ns = time.perf_counter_ns()
+        last_timestamp = 0
+
+        while self.ser.is_open:         # 进入数据处理循环，串口关闭（或回放结束）时退出
             # 读取新数据并添加到buffer
             if self.ser.in_waiting:     # 如果串口中有数据等待
                 # print('串口有数据')
                 chunk = self.ser.read(min(self.ser.in_waiting, chunk_size))  # 从等待区和设置的chunk区中，选一个较小的区，进行读取操作
                 buffer.extend(chunk)    # 添加到buffer中
+                read_ns = time.perf_counter_ns()
 
             while len(buffer) >= standard_message_length:         # 当buffer超过默认报文长度7
                 cr_index = buffer.find(b'\r')       # cr_index作为空格符的索引
@@ -117,16 +152,20 @@ class AsciiSendModel():
 
                 valid_data = buffer[:cr_index + 1]
                 buffer = buffer[cr_index + 1:]  # 更新buffer
+                # 回车符之后的字节晚于该报文到达，按传输时间往前推
+                last_timestamp = max(last_timestamp, read_ns - len(buffer) * byte_ns)
 
                 try:
                     decoded_data = valid_data.decode('ascii').strip()
                     reports.append(decoded_data)
+                    timestamps.append(last_timestamp)
                     # print('report添加完毕')
                     if len(reports) >= report_count:
                         # print('report已抛出')
                         # total_reports += len(reports)       # 采集率计算
-                        yield reports
+                        yield (reports, timestamps) if with_timestamps else reports
                         reports = []
+                        timestamps = []
                 except UnicodeDecodeError as e:
                     logging.error(f"解码错误：{e}，丢弃无效数据")
 
@@ -140,72 +179,114 @@ class AsciiSendModel():
                 time.sleep(0.005)  # 等待时间，可根据需要调整
 
 
+def parse_report(report: str) -> Optional[float]:
+    """
+    把read_sensor_data得到的报文转换为仪表数值
+
+    :param report: 解码后的报文，例如'+12.34'
+    :return: 仪表数值（kg），无法解析时为None
+    """
+    try:
+        return float(report)
+    except ValueError:
+        return None
+
+
 class TestInfo:
     """
-    专门用于测试的类
+    专门用于测试的类。统计由StreamingStats完成，不保存报文，内存占用固定，运行过程中可以随时查询
     """
-    def __init__(self):
-        self.start_time: float = time.time()
-        self.total_reports: int = 0              # 采集率初始计数设置0
-        self.all_data: List[str] = []
+    def __init__(self, name: str = 'force'):
+        self.stats = StreamingStats(name)
+
+    @property
+    def total_reports(self) -> int:
+        """收到的报文总数（包括无法解析的报文）"""
+        return self.stats.count + self.stats.invalid
 
-    def add_reports(self, reports: List[str]) -> None:
+    def add_reports(self, reports: List[str], timestamp_ns: Optional[int] = None,
+                    timestamps: Optional[Sequence[int]] = None) -> None:
         """
         添加新的报告数据
 
         :param reports: 新的报告数据列表
+        :param timestamp_ns: 这批报文的到达时间（perf_counter_ns），为None时取当前时间
+        :param timestamps: 每个报文各自的到达时间（read_sensor_data(with_timestamps=True)给出），
+                           给出时忽略timestamp_ns，到达间隔按报文计算
         """
-        self.total_reports += len(reports)
-        self.all_data.extend(reports)
+        if timestamps is None:
+            self.stats.add_many([parse_report(report) for report in reports], timestamp_ns)
+            return
+        for report, report_ns in zip(reports, timestamps):
+            self.stats.add(parse_report(report), report_ns)
 
     def get_results(self) -> Dict[str, Any]:
         """
         获取测试结果
 
-        :return: 包含测试结果的字典
+        :return: 包含测试结果的字典，见StreamingStats.get_results
+        """
+        return dict(self.stats.get_results(), total_reports=self.total_reports)
+
+    def print_results(self, show_gaps: bool = False) -> None:
         """
-        end_time = time.time()
-        duration = end_time - self.start_time
-        sampling_rate = self.total_reports / duration if duration > 0 else 0
-        return {
-            "duration": duration,
-            "sampling_rate": sampling_rate,
-            "total_reports": self.total_reports,
-            "all_data": self.all_data
-        }
-
-    def print_results(self) -> None:
-        """打印测试结果"""
-        results = self.get_results()
-        logger.info(f"平均采集率: {results['sampling_rate']:.2f} 个/秒")
-        logger.info("所有采集到的数值:")
-        for i, data in enumerate(results['all_data'], 1):
-            logger.info(f"{i}: {data}")
+        打印测试结果
+
+        :param show_gaps: 是否打印报文到达间隔直方图
+        """
+        self.stats.print_results(show_gaps)
 
 def run_ascii_send_model(run_duration: Optional[float] = None,
-                         enable_test_info: bool = True
+                         enable_test_info: bool = True,
+                         recording_path: Optional[str] = None,
+                         report_interval: Optional[float] = None,
+                         sqlite_path: Optional[str] = None
                          ) -> None:
     """
     运行ASCII发送模型
 
     :param run_duration: 运行持续时间（秒），如果为None则一直运行，操作者可以手动停止
     :param enable_test_info: 是否启用测试信息收集
+    :param recording_path: 记录文件路径，给出时把每个报文解析后的数值连同时间戳写入文件，
+                           无法解析的报文记为NaN并带FLAG_INVALID标志
+    :param report_interval: 运行过程中打印测试信息的间隔（秒），为None时只在结束时打印
+    :param sqlite_path: SQLite数据库路径，给出时把解析后的数值由后台线程批量写入数据库，无效报文同样处理
     """
     ascii_model = None
     test_info = TestInfo() if enable_test_info else None
+    recorder = None
+    sink = None
 
     try:
         ascii_model = AsciiSendModel(port_name='COM10',
                                      baudrate=115200,
                                      )
+        if recording_path:
+            recorder = RecordingWriter(recording_path, [{'name': 'force', 'unit': 'kg'}],
+                                       metadata={'port': getattr(ascii_model.ser, 'port', None)}).open()
+        if sqlite_path:
+            sink = SQLiteSink(sqlite_path, [{'name': 'force', 'unit': 'kg'}]).start()
         print('马上开始')
 
         start_time = time.time()
-        for reports in ascii_model.read_sensor_data():  # 积累了指定数量的数据后，返回一次reports。即由ascii_model.read_sensor_data()来触发循环
+        last_report_time = start_time
+        # 积累了指定数量的数据后，返回一次reports及每个报文的到达时间。即由ascii_model.read_sensor_data()来触发循环
+        for reports, timestamps in ascii_model.read_sensor_data(with_timestamps=True):
             if enable_test_info:
-                test_info.add_reports(reports)
-
-            if time.time() - start_time > run_duration:
+                test_info.add_reports(reports, timestamps=timestamps)
+                if report_interval is not None and time.time() - last_report_time >= report_interval:
+                    test_info.print_results()
+                    last_report_time = time.time()
+            if recorder is not None or sink is not None:
+                values = [parse_report(report) for report in reports]
+                flags = [0 if value is not None else FLAG_INVALID for value in values]
+                values = [math.nan if value is None else value for value in values]
+                if recorder is not None:
+                    recorder.append_many(0, timestamps, values, flags)
+                if sink is not None and values:
+                    sink.append_many(0, timestamps, values, flags)
+
+            if run_duration is not None and time.time() - start_time > run_duration:
                 break
 
     except Exception as e:
@@ -213,6 +294,10 @@ def run_ascii_send_model(run_duration: Optional[float] = None,
     finally:
         if ascii_model:
             ascii_model.close()
+        if recorder is not None:
+            recorder.close()
+        if sink is not None:
+            sink.stop()
 
         if enable_test_info and test_info:
             test_info.print_results()
@@ -0,0 +1,294 @@
+"""
+模块功能描述：
+把采样写入SQLite数据库：后台线程批量插入，带(channel, timestamp)索引和按秒汇总表，不需要数据库服务器就能用SQL查询
+*********************************
+版本：1.1
+最近一次修改日期：2026-10-19
+
+修改日志：
+2026-10-19，建立初版
+2026-10-19，每次打开数据库记为一个会话，采样和按秒汇总都带会话号，每个会话保存自己的wall_ns和perf_ns
+
+说明：
+SQLiteSink继承src/background_writer.py中的BackgroundWriter：
+    - append/append_many只把数据放入队列，采集循环不等待数据库；队列满时丢弃并计数
+    - 写入线程每隔write_interval秒把积压的数据合并为一个事务，用预编译语句executemany插入，
+      一次事务通常包含数百到数千行，multi-kHz的多通道写入也只有每秒几次提交
+    - 数据库使用WAL模式、synchronous=NORMAL：提交不等待fsync，读取（例如另一个进程里的查询）不阻塞写入；
+      fsync_interval给出时，写入线程每隔这么久做一次WAL检查点
+表结构：
+    channels(id, name, metadata)                        通道号、名称、JSON描述
+    sessions(id, wall_ns, perf_ns)                      每次打开数据库为一个会话，记录打开时的系统时间和perf_counter_ns
+    samples(session, channel, timestamp, value, flags)  原始采样，时间戳为perf_counter_ns，索引(session, channel, timestamp)
+    rollup_1s(session, channel, second, count, invalid, min, max, sum, sum_sq)
+                                                        按秒汇总（second = timestamp // 10**9），
+                                                        每个事务用NumPy按(通道, 秒)分组后upsert
+    rollup_1s_view                                      rollup_1s加上mean、variance和该秒起点的系统时间wall_ns
+                                                        （部分SQLite版本没有sqrt，标准差在查询方开方）
+perf_counter_ns的起点不固定（例如重启后从头开始），不同会话的timestamp和second不能直接比较，
+需要按会话换算：系统时间 = timestamp - sessions.perf_ns + sessions.wall_ns。
+查询示例：
+    SELECT timestamp, value FROM samples WHERE session = (SELECT max(id) FROM sessions)
+        AND channel = (SELECT id FROM channels WHERE name = 'X') AND timestamp BETWEEN ? AND ?
+    SELECT wall_ns, mean, min, max FROM rollup_1s_view WHERE channel = 1 ORDER BY wall_ns
+channels表中的id从1开始，与append时使用的通道号（在channels参数中的位置）不同；
+同一个数据库可以被多次打开追加，通道按名称对应到同一个id，会话号依次递增。
+"""
+import json
+import time
+import sqlite3
+import logging
+from typing import Optional, List, Dict, Any, Sequence, Union, Tuple
+
+import numpy as np
+
+from src.background_writer import BackgroundWriter
+from src.recording import RECORD_DTYPE, FLAG_INVALID
+
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS channels (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL, metadata TEXT);
+CREATE TABLE IF NOT EXISTS sessions (id INTEGER PRIMARY KEY, wall_ns INTEGER NOT NULL, perf_ns INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS samples (session INTEGER NOT NULL, channel INTEGER NOT NULL, timestamp INTEGER NOT NULL,
+                                    value REAL, flags INTEGER NOT NULL DEFAULT 0);
+CREATE INDEX IF NOT EXISTS samples_session_channel_timestamp ON samples (session, channel, timestamp);
+CREATE TABLE IF NOT EXISTS rollup_1s (session INTEGER NOT NULL, channel INTEGER NOT NULL, second INTEGER NOT NULL,
+                                      count INTEGER NOT NULL, invalid INTEGER NOT NULL,
+                                      min REAL, max REAL, sum REAL NOT NULL, sum_sq REAL NOT NULL,
+                                      PRIMARY KEY (session, channel, second)) WITHOUT ROWID;
+CREATE VIEW IF NOT EXISTS rollup_1s_view AS
+    SELECT r.session, r.channel, r.second, r.count, r.invalid, r.min, r.max,
+           CASE WHEN r.count > 0 THEN r.sum / r.count END AS mean,
+           CASE WHEN r.count > 0 THEN max(r.sum_sq / r.count - (r.sum / r.count) * (r.sum / r.count), 0) END
+               AS variance,
+           r.second * 1000000000 - s.perf_ns + s.wall_ns AS wall_ns
+    FROM rollup_1s AS r JOIN sessions AS s ON s.id = r.session;
+"""
+
+_INSERT_SAMPLES = "INSERT INTO samples (session, channel, timestamp, value, flags) VALUES (?, ?, ?, ?, ?)"
+_UPSERT_ROLLUP = """
+INSERT INTO rollup_1s (session, channel, second, count, invalid, min, max, sum, sum_sq)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (session, channel, second) DO UPDATE SET
+    count = count + excluded.count,
+    invalid = invalid + excluded.invalid,
+    min = CASE WHEN min IS NULL OR excluded.min < min THEN excluded.min ELSE min END,
+    max = CASE WHEN max IS NULL OR excluded.max > max THEN excluded.max ELSE max END,
+    sum = sum + excluded.sum,
+    sum_sq = sum_sq + excluded.sum_sq
+"""
+
+
+def _rollup_rows(session: int, channels: np.ndarray, timestamps: np.ndarray, values: np.ndarray,
+                 flags: np.ndarray) -> List[Tuple]:
+    """按(通道, 秒)分组计算汇总，返回本会话rollup_1s的行；无效采样只计入invalid"""
+    seconds = timestamps // 1_000_000_000
+    order = np.lexsort((seconds, channels))
+    channels, seconds, values, flags = channels[order], seconds[order], values[order], flags[order]
+    boundary = np.flatnonzero((np.diff(channels) != 0) | (np.diff(seconds) != 0)) + 1
+    starts = np.concatenate(([0], boundary))
+
+    invalid = ~np.isfinite(values) | ((flags & FLAG_INVALID) != 0)
+    valid_values = np.where(invalid, 0.0, values)
+    count = np.add.reduceat((~invalid).astype(np.int64), starts)
+    minimum = np.minimum.reduceat(np.where(invalid, np.inf, values), starts)
+    maximum = np.maximum.reduceat(np.where(invalid, -np.inf, values), starts)
+    total = np.add.reduceat(valid_values, starts)
+    total_sq = np.add.reduceat(valid_values * valid_values, starts)
+    invalid_count = np.add.reduceat(invalid.astype(np.int64), starts)
+    minimum = np.where(count > 0, minimum, np.nan)
+    maximum = np.where(count > 0, maximum, np.nan)
+
+    rows = []
+    for row in zip(channels[starts].tolist(), seconds[starts].tolist(), count.tolist(), invalid_count.tolist(),
+                   minimum.tolist(), maximum.tolist(), total.tolist(), total_sq.tolist()):
+        # 全部无效的秒：min/max写为NULL
+        rows.append((session,) + (row if row[2] else row[:4] + (None, None) + row[6:]))
+    return rows
+
+
+class SQLiteSink(BackgroundWriter):
+    """
+    在后台线程中把采样批量写入SQLite数据库
+    """
+    def __init__(self,
+                 path: str,
+                 channels: Sequence[Union[str, Dict[str, Any]]],
+                 rollup: bool = True,
+                 queue_size: int = 65536,
+                 batch_bytes: int = 4 * 1024 * 1024,
+                 fsync_interval: Optional[float] = None,
+                 write_interval: float = 0.2,
+                 name: str = 'sqlite'):
+        """
+        初始化
+
+        :param path: 数据库文件路径，已存在时追加，通道按名称对应
+        :param channels: 通道名称或通道描述（至少包含name），顺序即append时使用的通道号
+        :param rollup: 是否维护按秒汇总表
+        :param queue_size: 队列中最多积压的数据批数，超过时新数据被丢弃
+        :param batch_bytes: 一个事务最多合并的数据量（按每个采样24字节计算）
+        :param fsync_interval: 每隔多少秒做一次WAL检查点，为None时由SQLite自动检查点
+        :param write_interval: 两次事务之间的最短间隔（秒），越长每个事务越大
+        :param name: 名称，用于线程名和日志
+        """
+        super().__init__(queue_size, batch_bytes, fsync_interval, write_interval, name)
+        self.path = path
+        self.channels = [{'name': channel} if isinstance(channel, str) else dict(channel) for channel in channels]
+        self.channel_names = [channel['name'] for channel in self.channels]
+        self.rollup = rollup
+        self.rows = 0
+        self.session: Optional[int] = None
+        self._channel_ids: List[int] = []
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def channel_index(self, channel: Union[int, str]) -> int:
+        """通道名称 -> 通道号"""
+        return self.channel_names.index(channel) if isinstance(channel, str) else channel
+
+    def append(self, channel: Union[int, str], timestamp_ns: int, value: float, flags: int = 0) -> bool:
+        """
+        提交一个采样，不等待
+
+        :param channel: 通道号或通道名称
+        :param timestamp_ns: 时间戳（perf_counter_ns）
+        :param value: 数值，无效采样为NaN
+        :param flags: 标志，例如FLAG_INVALID
+        :return: 是否入队成功，队列满时为False
+        """
+        return self.submit((self.channel_index(channel), timestamp_ns, value, flags), RECORD_DTYPE.itemsize)
+
+    def append_many(self, channel: Union[int, str], timestamps: Sequence[int], values: Sequence[float],
+                    flags: Optional[Sequence[int]] = None) -> bool:
+        """
+        提交一个通道的一批采样，作为一项入队，不等待
+
+        :param channel: 通道号或通道名称
+        :param timestamps: 时间戳（perf_counter_ns）
+        :param values: 数值
+        :param flags: 标志，为None时全部为0
+        :return: 是否入队成功，队列满时为False
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        flags = np.zeros(len(timestamps), dtype=np.uint32) if flags is None else np.asarray(flags, dtype=np.uint32)
+        return self.submit((self.channel_index(channel), timestamps, values, flags),
+                           len(timestamps) * RECORD_DTYPE.itemsize)
+
+    def _open_target(self) -> None:
+        # 连接在调用start的线程中建立，之后只在写入线程（以及stop时）使用
+        self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+        tables = self._connection.execute("SELECT count(*) FROM sqlite_master WHERE name = 'samples'").fetchone()[0]
+        if tables and version != SCHEMA_VERSION:
+            self._connection.close()
+            self._connection = None
+            raise ValueError(f"数据库 {self.path} 的表结构版本为{version}，需要{SCHEMA_VERSION}，请换一个文件")
+        self._connection.executescript(_SCHEMA)
+        self._connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        with self._connection:
+            self._connection.execute("BEGIN")
+            self.session = self._connection.execute("INSERT INTO sessions (wall_ns, perf_ns) VALUES (?, ?)",
+                                                    (time.time_ns(), time.perf_counter_ns())).lastrowid
+            self._channel_ids = []
+            for channel in self.channels:
+                self._connection.execute("INSERT OR IGNORE INTO channels (name, metadata) VALUES (?, ?)",
+                                         (channel['name'], json.dumps(channel, ensure_ascii=False)))
+                self._channel_ids.append(self._connection.execute(
+                    "SELECT id FROM channels WHERE name = ?", (channel['name'],)).fetchone()[0])
+
+    def _write_batch(self, items: List[Tuple]) -> None:
+        # 单个采样和批量采样统一拼成数组，采样行和汇总都从数组生成
+        singles = [item for item in items if not isinstance(item[1], np.ndarray)]
+        parts = [item for item in items if isinstance(item[1], np.ndarray)]
+        ids = np.array(self._channel_ids, dtype=np.int64)
+        channels = [np.full(len(item[1]), ids[item[0]], dtype=np.int64) for item in parts]
+        timestamps = [item[1] for item in parts]
+        values = [item[2] for item in parts]
+        flags = [item[3] for item in parts]
+        if singles:
+            channel, timestamp, value, flag = zip(*singles)
+            channels.append(ids[np.array(channel, dtype=np.int64)])
+            timestamps.append(np.array(timestamp, dtype=np.int64))
+            values.append(np.array(value, dtype=np.float64))
+            flags.append(np.array(flag, dtype=np.uint32))
+        channels = np.concatenate(channels)
+        timestamps = np.concatenate(timestamps)
+        values = np.concatenate(values)
+        flags = np.concatenate(flags)
+        if not len(timestamps):
+            return
+
+        # NaN在SQLite中保存为NULL
+        value_list = np.where(np.isnan(values), None, values).tolist() if np.isnan(values).any() else values.tolist()
+        rows = zip([self.session] * len(timestamps), channels.tolist(), timestamps.tolist(), value_list,
+                   flags.tolist())
+        connection = self._connection
+        connection.execute("BEGIN")
+        try:
+            connection.executemany(_INSERT_SAMPLES, rows)
+            if self.rollup:
+                connection.executemany(_UPSERT_ROLLUP, _rollup_rows(self.session, channels, timestamps, values, flags))
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        self.rows += len(timestamps)
+
+    def _sync(self) -> None:
+        super()._sync()
+        if self._connection is not None:
+            self._connection.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def _close_target(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return dict(super().get_statistics(), rows=self.rows, session=self.session)
+
+
+def read_samples(path: str, channel: Union[int, str], t0: Optional[int] = None,
+                 t1: Optional[int] = None, session: Optional[int] = None) -> np.ndarray:
+    """
+    从数据库读取一个会话中一个通道的采样，通过(session, channel, timestamp)索引查找
+
+    :param path: 数据库文件路径
+    :param channel: 通道名称，或通道在channels表中的id
+    :param t0: 起始时间戳（含），为None时从头开始
+    :param t1: 结束时间戳（含），为None时到结尾
+    :param session: 会话号，为None时取最近一个会话
+    :return: RECORD_DTYPE数组，NULL数值为NaN
+    """
+    connection = sqlite3.connect(path)
+    try:
+        if isinstance(channel, str):
+            row = connection.execute("SELECT id FROM channels WHERE name = ?", (channel,)).fetchone()
+            if row is None:
+                raise ValueError(f"数据库中没有通道 {channel}")
+            channel = row[0]
+        if session is None:
+            session = connection.execute("SELECT max(id) FROM sessions").fetchone()[0]
+        rows = connection.execute(
+            "SELECT timestamp, value, flags FROM samples WHERE session = ? AND channel = ? "
+            "AND timestamp BETWEEN ? AND ? ORDER BY timestamp",
+            (session, channel, -2 ** 63 if t0 is None else t0, 2 ** 63 - 1 if t1 is None else t1)).fetchall()
+    finally:
+        connection.close()
+    records = np.zeros(len(rows), dtype=RECORD_DTYPE)
+    if rows:
+        timestamps, values, flags = zip(*rows)
+        records['timestamp'] = timestamps
+        records['value'] = np.array(values, dtype=np.float64)      # None -> NaN
+        records['flags'] = flags
+    return records
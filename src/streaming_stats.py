@@ -0,0 +1,437 @@
+"""
+模块功能描述：
+流式统计：每个通道占用固定内存，运行过程中随时可以查询
+*********************************
+版本：1.3
+最近一次修改日期：2026-10-19
+
+修改日志：
+2026-10-19，建立初版
+2026-10-19，添加SlidingWindowStats
+2026-10-19，SlidingWindowStats跳过None、NaN和无穷大，单独计数
+2026-10-19，StreamingStats同样把无穷大记为无效采样，否则均值和方差都变成inf/NaN
+
+说明：
+TestInfo保存全部报文字符串，结束时才计算一次平均采集率并逐条打印，内存和退出时间都随采样数线性增长。
+StreamingStats每个采样只更新固定数量的状态：
+    - Welford算法计算均值和方差，数值稳定
+    - 最小值、最大值
+    - P²算法估算分位数（Jain & Chlamtac 1985），每个分位数只保存5个标记点
+    - 整个运行期间的平均采集率，以及最近rate_window秒的采集率（按时间分槽计数）
+    - 相邻两次到达之间的间隔直方图（src/latency_trace.py中的LatencyHistogram），
+      add_many一次加入的一批采样只计一次间隔
+只有采集线程调用add，其它线程可以随时调用get_results，读到的是某一时刻前后的近似值，不需要加锁。
+SlidingWindowStats统计最近一段数据（按采样数或按时间限定窗口）：均值和方差由可以移出旧采样的Welford算法维护，
+最小值、最大值由单调队列维护，每个采样的更新为均摊O(1)，查询为O(1)，适合GUI高频轮询多个通道。
+"""
+import math
+import time
+import logging
+from collections import deque
+from typing import Optional, Sequence, Dict, Any, List, Deque, Tuple
+
+from src.latency_trace import LatencyHistogram
+
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class P2Quantile:
+    """
+    P²分位数估算，内存固定为5个标记点
+    """
+    def __init__(self, q: float):
+        """
+        初始化
+
+        :param q: 分位（0~100）
+        """
+        if not 0 < q < 100:
+            raise ValueError(f"分位必须在(0, 100)之内: {q}")
+        p = q / 100
+        self.q = q
+        self._initial: List[float] = []
+        self._heights: Optional[List[float]] = None
+        self._positions = [0, 1, 2, 3, 4]
+        self._desired = [0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0]
+        self._increments = [0.0, p / 2, p, (1 + p) / 2, 1.0]
+
+    def add(self, x: float) -> None:
+        """添加一个样本"""
+        heights = self._heights
+        if heights is None:
+            self._initial.append(x)
+            if len(self._initial) == 5:
+                self._heights = sorted(self._initial)
+            return
+
+        positions = self._positions
+        if x < heights[0]:
+            heights[0] = x
+            k = 0
+        elif x >= heights[4]:
+            heights[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= heights[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            positions[i] += 1
+        desired = self._desired
+        for i in range(5):
+            desired[i] += self._increments[i]
+
+        # 调整中间三个标记点的高度
+        for i in (1, 2, 3):
+            d = desired[i] - positions[i]
+            if (d >= 1 and positions[i + 1] - positions[i] > 1) or (d <= -1 and positions[i - 1] - positions[i] < -1):
+                d = 1 if d > 0 else -1
+                parabolic = heights[i] + d / (positions[i + 1] - positions[i - 1]) * (
+                    (positions[i] - positions[i - 1] + d) * (heights[i + 1] - heights[i])
+                    / (positions[i + 1] - positions[i])
+                    + (positions[i + 1] - positions[i] - d) * (heights[i] - heights[i - 1])
+                    / (positions[i] - positions[i - 1]))
+                if heights[i - 1] < parabolic < heights[i + 1]:
+                    heights[i] = parabolic
+                else:
+                    heights[i] += d * (heights[i + d] - heights[i]) / (positions[i + d] - positions[i])
+                positions[i] += d
+
+    def value(self) -> Optional[float]:
+        """当前的分位数估计，没有样本时为None"""
+        if self._heights is not None:
+            return self._heights[2]
+        if not self._initial:
+            return None
+        ordered = sorted(self._initial)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self.q / 100))]
+
+
+class RateWindow:
+    """
+    最近一段时间内的采集率：把时间窗口分为若干个槽，每个槽只保存计数
+    """
+    def __init__(self, window: float = 1.0, slots: int = 10):
+        """
+        初始化
+
+        :param window: 窗口长度（秒）
+        :param slots: 槽数，越多越平滑
+        """
+        self.slots = slots
+        self.slot_ns = max(1, int(window * 1e9) // slots)
+        self._counts = [0] * slots
+        self._slot_ids = [-1] * slots
+
+    def add(self, timestamp_ns: int, n: int = 1) -> None:
+        """在timestamp_ns时刻计入n个采样"""
+        slot_id = timestamp_ns // self.slot_ns
+        index = slot_id % self.slots
+        if self._slot_ids[index] != slot_id:
+            self._slot_ids[index] = slot_id
+            self._counts[index] = 0
+        self._counts[index] += n
+
+    def rate(self, now_ns: Optional[int] = None, start_ns: Optional[int] = None) -> float:
+        """
+        窗口内的采集率
+
+        :param now_ns: 当前时间（perf_counter_ns），为None时取当前时间
+        :param start_ns: 开始采集的时间，运行时间不足一个窗口时按实际时间计算
+        :return: 采集率（个/秒）
+        """
+        if now_ns is None:
+            now_ns = time.perf_counter_ns()
+        current = now_ns // self.slot_ns
+        total = sum(count for count, slot_id in zip(self._counts, self._slot_ids) if 0 <= current - slot_id < self.slots)
+        span_ns = (self.slots - 1) * self.slot_ns + now_ns - current * self.slot_ns
+        if start_ns is not None:
+            span_ns = min(span_ns, now_ns - start_ns)
+        return total * 1e9 / span_ns if span_ns > 0 else 0.0
+
+
+class StreamingStats:
+    """
+    单个通道的流式统计
+    """
+    def __init__(self, name: str = '', quantiles: Sequence[float] = (50, 99), rate_window: float = 1.0):
+        """
+        初始化
+
+        :param name: 通道名称，用于打印
+        :param quantiles: 要估算的分位（0~100）
+        :param rate_window: 滑动采集率的窗口长度（秒）
+        """
+        self.name = name
+        self.count = 0
+        self.invalid = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self.last: Optional[float] = None
+        self.quantiles: Dict[float, P2Quantile] = {q: P2Quantile(q) for q in quantiles}
+        self.window = RateWindow(rate_window)
+        self.gaps = LatencyHistogram()
+        self.start_ns = time.perf_counter_ns()
+        self.last_ns: Optional[int] = None
+
+    def _arrival(self, timestamp_ns: Optional[int], n: int) -> int:
+        """记录一次到达的时间间隔和采集率"""
+        if timestamp_ns is None:
+            timestamp_ns = time.perf_counter_ns()
+        if self.last_ns is not None:
+            self.gaps.add(timestamp_ns - self.last_ns)
+        self.last_ns = timestamp_ns
+        self.window.add(timestamp_ns, n)
+        return timestamp_ns
+
+    def _update(self, value: float) -> None:
+        """更新数值统计"""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        for estimator in self.quantiles.values():
+            estimator.add(value)
+        self.last = value
+
+    def add(self, value: Optional[float], timestamp_ns: Optional[int] = None) -> None:
+        """
+        添加一个采样
+
+        :param value: 数值，为None、NaN或无穷大时记为无效采样
+        :param timestamp_ns: 采样时间（perf_counter_ns），为None时取当前时间
+        """
+        self._arrival(timestamp_ns, 1)
+        if value is None or not math.isfinite(value):
+            self.invalid += 1
+        else:
+            self._update(value)
+
+    def add_many(self, values: Sequence[Optional[float]], timestamp_ns: Optional[int] = None) -> None:
+        """
+        添加同一时刻到达的一批采样，例如read_sensor_data一次返回的报文
+
+        :param values: 数值，None、NaN或无穷大记为无效采样
+        :param timestamp_ns: 到达时间（perf_counter_ns），为None时取当前时间
+        """
+        if not len(values):
+            return
+        self._arrival(timestamp_ns, len(values))
+        for value in values:
+            if value is None or not math.isfinite(value):
+                self.invalid += 1
+            else:
+                self._update(value)
+
+    @property
+    def variance(self) -> Optional[float]:
+        """样本方差，采样数少于2时为None"""
+        return self._m2 / (self.count - 1) if self.count > 1 else None
+
+    @property
+    def std(self) -> Optional[float]:
+        """样本标准差"""
+        variance = self.variance
+        return math.sqrt(variance) if variance is not None else None
+
+    def get_results(self) -> Dict[str, Any]:
+        """
+        获取当前的统计结果，运行过程中可以随时调用
+
+        :return: 包含采样数、均值、标准差、最值、分位数、采集率和到达间隔的字典
+        """
+        now_ns = time.perf_counter_ns()
+        duration = (now_ns - self.start_ns) / 1e9
+        total = self.count + self.invalid
+        results = {
+            "count": self.count,
+            "invalid": self.invalid,
+            "duration": duration,
+            "sampling_rate": total / duration if duration > 0 else 0.0,
+            "window_rate": self.window.rate(now_ns, self.start_ns),
+            "last": self.last,
+            "mean": self.mean if self.count else None,
+            "std": self.std,
+            "min": self.min,
+            "max": self.max,
+        }
+        for q, estimator in self.quantiles.items():
+            results[f"p{q:g}"] = estimator.value()
+        results["gaps"] = self.gaps.get_results()
+        return results
+
+    def print_results(self, show_gaps: bool = False) -> None:
+        """
+        打印当前的统计结果
+
+        :param show_gaps: 是否打印到达间隔直方图的每个桶
+        """
+        results = self.get_results()
+        prefix = f"{self.name}: " if self.name else ""
+        logger.info(f"{prefix}采样 {results['count']}（无效 {results['invalid']}），运行 {results['duration']:.2f} 秒，"
+                    f"平均采集率 {results['sampling_rate']:.2f} 个/秒，"
+                    f"最近采集率 {results['window_rate']:.2f} 个/秒")
+        if self.count:
+            quantiles = ', '.join(f"p{q:g} {results[f'p{q:g}']:.4f}" for q in self.quantiles)
+            std = results['std'] if results['std'] is not None else 0.0
+            logger.info(f"{prefix}均值 {results['mean']:.4f}，标准差 {std:.4f}，"
+                        f"最小 {results['min']:.4f}，最大 {results['max']:.4f}，{quantiles}")
+        gaps = results["gaps"]
+        if gaps["count"]:
+            logger.info(f"{prefix}到达间隔: 平均 {gaps['mean_ms']:.3f} ms, p50 {gaps['p50_ms']:.3f} ms, "
+                        f"p99 {gaps['p99_ms']:.3f} ms, 最大 {gaps['max_ms']:.3f} ms")
+            if show_gaps:
+                for line in self.gaps.format_buckets():
+                    logger.info(line)
+
+
+class SlidingWindowStats:
+    """
+    最近一段数据的统计：按采样数或按时间限定窗口，每个采样的更新为均摊O(1)，查询为O(1)
+    """
+    def __init__(self, size: Optional[int] = 1000, duration: Optional[float] = None):
+        """
+        初始化，size和duration至少给出一个，都给出时两个条件同时生效
+
+        :param size: 窗口内最多保留的采样数
+        :param duration: 窗口的时间长度（秒）
+        """
+        if size is None and duration is None:
+            raise ValueError("size和duration至少要给出一个")
+        self.size = size
+        self.duration_ns = int(duration * 1e9) if duration is not None else None
+        self.values: Deque[float] = deque()
+        self.timestamps: Deque[int] = deque()
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._next_seq = 0                          # 下一个采样的序号
+        self._first_seq = 0                         # 窗口内第一个采样的序号
+        self._min_candidates: Deque[Tuple[int, float]] = deque()    # 序号递增、数值递增
+        self._max_candidates: Deque[Tuple[int, float]] = deque()    # 序号递增、数值递减
+        self.invalid = 0                            # 跳过的无效采样数（累计）
+
+    def add(self, value: Optional[float], timestamp_ns: Optional[int] = None) -> None:
+        """
+        添加一个采样，并移出超出窗口的旧采样
+
+        :param value: 数值，为None、NaN或无穷大时只计入invalid，不进入窗口
+        :param timestamp_ns: 采样时间（perf_counter_ns），为None时取当前时间
+        """
+        if value is None or not math.isfinite(value):
+            self.invalid += 1
+            return
+        if timestamp_ns is None:
+            timestamp_ns = time.perf_counter_ns()
+        self.values.append(value)
+        self.timestamps.append(timestamp_ns)
+        count = len(self.values)
+        delta = value - self._mean
+        self._mean += delta / count
+        self._m2 += delta * (value - self._mean)
+
+        seq = self._next_seq
+        self._next_seq += 1
+        candidates = self._min_candidates
+        while candidates and candidates[-1][1] >= value:
+            candidates.pop()
+        candidates.append((seq, value))
+        candidates = self._max_candidates
+        while candidates and candidates[-1][1] <= value:
+            candidates.pop()
+        candidates.append((seq, value))
+
+        if self.size is not None:
+            while len(self.values) > self.size:
+                self._remove_oldest()
+        if self.duration_ns is not None:
+            oldest_allowed = timestamp_ns - self.duration_ns
+            while self.timestamps[0] < oldest_allowed:
+                self._remove_oldest()
+
+    def _remove_oldest(self) -> None:
+        """移出窗口内最旧的采样"""
+        value = self.values.popleft()
+        self.timestamps.popleft()
+        count = len(self.values)
+        if count:
+            delta = value - self._mean
+            self._mean -= delta / count
+            self._m2 = max(0.0, self._m2 - delta * (value - self._mean))
+        else:
+            self._mean = self._m2 = 0.0
+        seq = self._first_seq
+        self._first_seq += 1
+        if not self._first_seq & 0xFFFFF:
+            self._recompute()
+        if self._min_candidates[0][0] == seq:
+            self._min_candidates.popleft()
+        if self._max_candidates[0][0] == seq:
+            self._max_candidates.popleft()
+
+    def _recompute(self) -> None:
+        """移出采样时的舍入误差会累积，每移出约一百万个采样按窗口内的数据重新计算一次均值和方差"""
+        self._mean = self._m2 = 0.0
+        for count, value in enumerate(self.values, 1):
+            delta = value - self._mean
+            self._mean += delta / count
+            self._m2 += delta * (value - self._mean)
+
+    @property
+    def count(self) -> int:
+        """窗口内的采样数"""
+        return len(self.values)
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self._mean if self.values else None
+
+    @property
+    def variance(self) -> Optional[float]:
+        """窗口内的样本方差，采样数少于2时为None"""
+        count = len(self.values)
+        return self._m2 / (count - 1) if count > 1 else None
+
+    @property
+    def std(self) -> Optional[float]:
+        variance = self.variance
+        return math.sqrt(variance) if variance is not None else None
+
+    @property
+    def min(self) -> Optional[float]:
+        return self._min_candidates[0][1] if self._min_candidates else None
+
+    @property
+    def max(self) -> Optional[float]:
+        return self._max_candidates[0][1] if self._max_candidates else None
+
+    @property
+    def latest(self) -> Optional[float]:
+        return self.values[-1] if self.values else None
+
+    def get_results(self) -> Dict[str, Any]:
+        """
+        获取窗口内的统计结果。按时间的窗口只在add时移出旧采样，结果对应最近一个采样时刻的窗口
+
+        :return: 包含最新值、均值、标准差、最值、采样数、累计无效采样数和窗口时间跨度的字典
+        """
+        if not self.values:
+            return {"count": 0, "invalid": self.invalid}
+        return {
+            "count": len(self.values),
+            "invalid": self.invalid,
+            "latest": self.latest,
+            "mean": self.mean,
+            "std": self.std,
+            "min": self.min,
+            "max": self.max,
+            "span": (self.timestamps[-1] - self.timestamps[0]) / 1e9,
+        }
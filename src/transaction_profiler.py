@@ -0,0 +1,197 @@
+"""
+模块功能描述：
+Modbus事务分阶段计时：串口包装层记录每次请求的写入、第一个应答字节、最后一个应答字节的时间，
+调用包装层记录解析完成的时间，按阶段统计直方图
+*********************************
+版本：1.1
+最近一次修改日期：2026-10-19
+
+修改日志：
+2026-10-18，建立初版
+2026-10-19，打印每个阶段的负值个数（turnaround_latency、receive_excess可能为负，说明线路时间估算偏大）
+
+说明：
+test_single_time.py只测量整个read_float的耗时，看不出时间花在哪里。TransactionProfiler把一次事务分为：
+    before_write        调用开始 -> 开始写请求：生成请求、minimalmodbus的帧间静默等待等Python开销
+    write_call          write系统调用本身
+    wait_first_byte     写完 -> 收到第一个应答字节 = 请求的线路时间 + 从机应答延迟 + 操作系统/USB转串口延迟
+    receive             第一个字节 -> 最后一个字节，其中 (应答长度-1) 个字节的线路时间是下限
+    after_read          收完应答 -> 调用返回：应答检查和解析的Python开销
+并由报文长度和波特率估算线路时间：
+    turnaround_latency  wait_first_byte - 请求线路时间 - 1个字节的线路时间（从机延迟与收发方向的OS/USB延迟之和）
+    receive_excess      receive - (应答长度-1)个字节的线路时间（接收方向的OS/USB缓冲延迟）
+仅靠主站一侧的时间戳无法把从机延迟和OS/USB延迟完全分开，receive_excess可以作为后者的参考。
+TimedSerial的read会先读1个字节再读剩余部分，以便记录第一个字节的时间，最坏情况下超时时间会变为原来的两倍。
+用法：
+    minimalmodbus：profiler = profile_instrument(instrument); profiler.measure(instrument.read_float, 0x0206)
+    RtuPoller：    poller.ser = TimedSerial(poller.ser); profiler = TransactionProfiler(poller.ser)
+"""
+import time
+import logging
+from typing import Any, Callable, Dict, Optional
+
+from src.latency_trace import LatencyHistogram
+
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+PROFILE_PHASES = ('before_write', 'write_call', 'wait_first_byte', 'receive', 'after_read',
+                  'turnaround_latency', 'receive_excess', 'total')
+
+
+class TimedSerial:
+    """
+    记录收发时间的串口包装层，其余属性（包括赋值）直接转发给被包装的串口
+    """
+    _OWN_ATTRIBUTES = ('ser', 'bits_per_char', 'write_start_ns', 'write_end_ns', 'first_byte_ns',
+                       'last_byte_ns', 'request_length', 'response_length')
+
+    def __init__(self, ser: Any, bits_per_char: Optional[int] = None):
+        """
+        初始化
+
+        :param ser: 已经打开的串口
+        :param bits_per_char: 每个字符的位数，为None时按串口设置计算（8N1为10）
+        """
+        if bits_per_char is None:
+            parity_bits = 0 if getattr(ser, 'parity', 'N') == 'N' else 1
+            bits_per_char = int(1 + getattr(ser, 'bytesize', 8) + parity_bits + getattr(ser, 'stopbits', 1) + 0.5)
+        self.ser = ser
+        self.bits_per_char = bits_per_char
+        self._reset_stamps()
+
+    def _reset_stamps(self) -> None:
+        self.write_start_ns = 0
+        self.write_end_ns = 0
+        self.first_byte_ns = 0
+        self.last_byte_ns = 0
+        self.request_length = 0
+        self.response_length = 0
+
+    def write(self, data: bytes) -> Optional[int]:
+        self._reset_stamps()
+        self.request_length = len(data)
+        self.write_start_ns = time.perf_counter_ns()
+        written = self.ser.write(data)
+        self.write_end_ns = time.perf_counter_ns()
+        return written
+
+    def read(self, size: int = 1) -> bytes:
+        if self.first_byte_ns or size <= 1:
+            data = self.ser.read(size)
+        else:
+            data = self.ser.read(1)
+            if data:
+                self.first_byte_ns = time.perf_counter_ns()
+                data += self.ser.read(size - 1)
+        if data:
+            now = time.perf_counter_ns()
+            if not self.first_byte_ns:
+                self.first_byte_ns = now
+            self.last_byte_ns = now
+            self.response_length += len(data)
+        return data
+
+    def wire_time_ns(self, length: int) -> int:
+        """length个字节在线路上的传输时间（ns）"""
+        return int(length * self.bits_per_char * 1e9 / self.ser.baudrate)
+
+    def __getattr__(self, name):
+        return getattr(self.ser, name)
+
+    def __setattr__(self, name, value):
+        if name in self._OWN_ATTRIBUTES:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.ser, name, value)
+
+
+class TransactionProfiler:
+    """
+    按阶段统计事务耗时
+    """
+    def __init__(self, timed_serial: TimedSerial):
+        """
+        初始化
+
+        :param timed_serial: 事务所使用的TimedSerial
+        """
+        self.timed_serial = timed_serial
+        self.histograms: Dict[str, LatencyHistogram] = {phase: LatencyHistogram() for phase in PROFILE_PHASES}
+        self.failed = 0
+        self.request_wire_ns = 0
+        self.response_wire_ns = 0
+
+    def measure(self, call: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        调用一次读取函数并记录各阶段的耗时。读取失败（抛出异常或没有收到应答）时只计数，异常照常抛出
+
+        :param call: 读取函数，例如instrument.read_float或poller.read_float
+        :return: 读取函数的返回值
+        """
+        stamps = self.timed_serial
+        start_ns = time.perf_counter_ns()
+        try:
+            result = call(*args, **kwargs)
+        except Exception:
+            self.failed += 1
+            raise
+        end_ns = time.perf_counter_ns()
+        if not stamps.last_byte_ns:
+            self.failed += 1
+            return result
+
+        self.request_wire_ns = stamps.wire_time_ns(stamps.request_length)
+        self.response_wire_ns = stamps.wire_time_ns(stamps.response_length)
+        byte_wire_ns = stamps.wire_time_ns(1)
+        wait_first_byte = stamps.first_byte_ns - stamps.write_end_ns
+        receive = stamps.last_byte_ns - stamps.first_byte_ns
+        histograms = self.histograms
+        histograms['before_write'].add(stamps.write_start_ns - start_ns)
+        histograms['write_call'].add(stamps.write_end_ns - stamps.write_start_ns)
+        histograms['wait_first_byte'].add(wait_first_byte)
+        histograms['receive'].add(receive)
+        histograms['after_read'].add(end_ns - stamps.last_byte_ns)
+        histograms['turnaround_latency'].add(wait_first_byte - self.request_wire_ns - byte_wire_ns)
+        histograms['receive_excess'].add(receive - (self.response_wire_ns - byte_wire_ns))
+        histograms['total'].add(end_ns - start_ns)
+        return result
+
+    def get_results(self) -> Dict[str, Dict[str, float]]:
+        """获取每个阶段的统计结果（毫秒）"""
+        return {phase: histogram.get_results() for phase, histogram in self.histograms.items()}
+
+    def print_results(self, show_buckets: bool = False) -> None:
+        """
+        打印每个阶段的统计结果
+
+        :param show_buckets: 是否打印每个阶段的直方图
+        """
+        total = self.histograms['total']
+        print(f"\n成功事务: {total.count}, 失败: {self.failed}")
+        print(f"估算线路时间: 请求 {self.request_wire_ns / 1e6:.3f} ms, 应答 {self.response_wire_ns / 1e6:.3f} ms")
+        print(f"{'阶段':<20}{'平均ms':>10}{'P50ms':>10}{'P99ms':>10}{'最大ms':>10}{'占比':>8}{'负值':>8}")
+        for phase, histogram in self.histograms.items():
+            results = histogram.get_results()
+            if not results["count"]:
+                continue
+            share = histogram.total_ns / total.total_ns if total.total_ns and phase in PROFILE_PHASES[:5] else None
+            print(f"{phase:<20}{results['mean_ms']:>10.3f}{results['p50_ms']:>10.3f}{results['p99_ms']:>10.3f}"
+                  f"{results['max_ms']:>10.3f}{f'{share:.1%}' if share is not None else '':>8}{results['negative']:>8}")
+            if show_buckets:
+                for line in histogram.format_buckets():
+                    print(line)
+
+
+def profile_instrument(instrument: Any) -> TransactionProfiler:
+    """
+    给minimalmodbus.Instrument的串口加上TimedSerial，返回对应的TransactionProfiler
+
+    :param instrument: minimalmodbus.Instrument
+    :return: TransactionProfiler
+    """
+    if not isinstance(instrument.serial, TimedSerial):
+        instrument.serial = TimedSerial(instrument.serial)
+    return TransactionProfiler(instrument.serial)
@@ -6,6 +6,8 @@ from PyQt6.QtCore import QTimer, pyqtSlot
 import pyqtgraph as pg
 from collections import deque
 
+from src.recording import RecordingReader
+
 # 从现有文件导入必要的类和函数
 # from test.test_of_modbus.test_modbus_03 import SensorReader, convert_address
 from test import test_multiple_port_ascii
@@ -33,6 +35,10 @@ class SensorMonitorApp(QMainWindow):
         # 创建图表
         self.create_plot()
 
+        # 记录文件回看：按可见范围和绘图宽度从降采样金字塔中取包络
+        self.reader = None
+        self.record_start_ns = 0
+
         # 初始化传感器相关变量
         self.sensor = None
         self.modbus_address = None
@@ -78,6 +84,22 @@ class SensorMonitorApp(QMainWindow):
 
         self.layout.addLayout(control_layout)
 
+        record_layout = QHBoxLayout()
+        self.record_label = QLabel("记录文件:")
+        self.record_input = QLineEdit("")
+        record_layout.addWidget(self.record_label)
+        record_layout.addWidget(self.record_input)
+
+        self.channel_select = QComboBox()
+        self.channel_select.currentIndexChanged.connect(self.update_envelope)
+        record_layout.addWidget(self.channel_select)
+
+        self.open_button = QPushButton("打开记录")
+        self.open_button.clicked.connect(self.open_recording)
+        record_layout.addWidget(self.open_button)
+
+        self.layout.addLayout(record_layout)
+
     def create_plot(self):
         self.plot_widget = pg.PlotWidget()
         self.plot_widget.setBackground('w')
@@ -87,6 +109,13 @@ class SensorMonitorApp(QMainWindow):
         self.plot_widget.showGrid(x=True, y=True)
         self.curve = self.plot_widget.plot(pen=pg.mkPen(color=(255, 0, 0), width=2))
 
+        # 记录文件的包络：最小值、最大值之间填充，均值为曲线
+        self.min_curve = self.plot_widget.plot(pen=pg.mkPen(color=(0, 0, 255, 80)))
+        self.max_curve = self.plot_widget.plot(pen=pg.mkPen(color=(0, 0, 255, 80)))
+        self.plot_widget.addItem(pg.FillBetweenItem(self.min_curve, self.max_curve, brush=pg.mkBrush(0, 0, 255, 50)))
+        self.mean_curve = self.plot_widget.plot(pen=pg.mkPen(color=(0, 0, 255), width=1))
+        self.plot_widget.getViewBox().sigXRangeChanged.connect(self.update_envelope)
+
         self.layout.addWidget(self.plot_widget)
 
     def toggle_monitoring(self):
@@ -121,6 +150,42 @@ class SensorMonitorApp(QMainWindow):
                 self.sensor.instrument.serial.close()
                 self.sensor = None
 
+    def open_recording(self):
+        """打开src/recording.py的记录文件，显示整个时间范围的包络"""
+        try:
+            reader = RecordingReader(self.record_input.text())
+        except Exception as e:
+            print(f"打开记录文件失败: {e}")
+            return
+        self.reader = reader
+        firsts = [reader.channel_segments(channel)[0].t_first
+                  for channel in range(len(reader.channel_names)) if reader.channel_segments(channel)]
+        self.record_start_ns = min(firsts) if firsts else 0
+        self.channel_select.blockSignals(True)
+        self.channel_select.clear()
+        self.channel_select.addItems(reader.channel_names)
+        self.channel_select.blockSignals(False)
+        self.plot_widget.setTitle(f"记录文件 {self.record_input.text()}", color="b", size="12pt")
+        self.update_envelope()
+        self.plot_widget.enableAutoRange()
+
+    @pyqtSlot()
+    def update_envelope(self):
+        """按当前可见的时间范围和绘图区域宽度重新查询包络，缩放时只读取需要的那一层"""
+        if self.reader is None or self.channel_select.currentIndex() < 0:
+            return
+        x_min, x_max = self.plot_widget.getViewBox().viewRange()[0]
+        t0 = self.record_start_ns + int(max(x_min, 0) * 1e9)
+        t1 = self.record_start_ns + int(max(x_max, 0) * 1e9)
+        if self.plot_widget.getViewBox().autoRangeEnabled()[0]:
+            t0, t1 = None, None
+        pixels = max(100, int(self.plot_widget.width()))
+        envelope = self.reader.envelope(self.channel_select.currentIndex(), t0, t1, pixels)
+        seconds = (envelope['timestamp'] - self.record_start_ns) / 1e9
+        self.min_curve.setData(seconds, envelope['min'], connect='finite')
+        self.max_curve.setData(seconds, envelope['max'], connect='finite')
+        self.mean_curve.setData(seconds, envelope['mean'], connect='finite')
+
     @pyqtSlot()
     def update_plot(self):
         if self.sensor and self.modbus_address is not None:
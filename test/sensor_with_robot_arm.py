@@ -7,6 +7,13 @@
 
 修改日志：
 2024-10-30，建立初版
+2026-10-18，添加可选的端到端延迟追踪时间戳
+2026-10-18，添加最新值信箱传输模式
+2026-10-18，管道默认使用带顺序号和CRC32的协议
+2026-10-18，支持录制原始字节流，以及用录制文件代替串口回放
+2026-10-19，TestInfo改用src/single_port_ascii.py中基于流式统计的版本
+2026-10-19，PipeTransmitter可以把多条消息合成一帧发送
+2026-10-19，PipeTransmitter默认把消息合成帧发送，并用后台线程保证每条消息最多等待max_delay
 """
 import os
 import logging
@@ -14,6 +21,13 @@ from typing import Optional, List, Dict, Any
 import serial
 import time
 import struct
+import threading
+
+from src.latency_trace import encode_trace
+from src.force_mailbox import ForceMailboxWriter
+from src.pipe_receiver import pack_frame, pack_multi_frame
+from src.raw_capture import RawCaptureWriter, CapturingSerial, ReplaySerial
+from src.single_port_ascii import parse_report, TestInfo
 
 
 # 配置日志
@@ -35,6 +49,8 @@ class AsciiSendModel:
                  minimum_packet_interval: Optional[float] = None,
                  byte_num_of_one_message: int = 7,
                  buffer_size: Optional[int] = None,
+                 ser: Optional[Any] = None,
+                 capture_path: Optional[str] = None,
                  **kwargs: Any):
         """
         参数初始化
@@ -48,6 +64,8 @@ class AsciiSendModel:
         :param minimum_packet_interval: 最小包间隔。ascii模式只能保证实际包间隔时间大于仪表的设定值
         :param byte_num_of_one_message: 一个报文的字节数
         :param buffer_size: 串口缓冲区大小
+        :param ser: 已经打开的串口对象，或者具有相同读取接口的对象（如src/raw_capture.py中的ReplaySerial）。为None时按上面的参数打开串口
+        :param capture_path: 录制文件路径。不为None时，读到的每个原始数据块都带时间戳写入该文件
         :param kwargs: 其它参数
         """
         self.port_name = port_name
@@ -58,20 +76,27 @@ class AsciiSendModel:
         self.timeout = timeout
         self.minimum_packet_interval = minimum_packet_interval
         self.byte_num_of_one_message = byte_num_of_one_message
+        self.last_trace: Optional[Dict[str, int]] = None     # 最近一次抛出的报文批次的追踪时间戳
 
         # 检查额外的参数
         if kwargs:
             raise ValueError('猪头，压根没有这玩意！： {!r}'.format(kwargs))
 
-        # 配置并打开串口
-        self.ser = serial.Serial(
-            port=self.port_name,
-            baudrate=self.baudrate,
-            bytesize=self.bytesize,
-            parity=self.parity,
-            stopbits=self.stopbits,
-            timeout=self.timeout
-        )
+        # 配置并打开串口，传入ser时直接使用（例如ReplaySerial回放录制的数据）
+        if ser is None:
+            ser = serial.Serial(
+                port=self.port_name,
+                baudrate=self.baudrate,
+                bytesize=self.bytesize,
+                parity=self.parity,
+                stopbits=self.stopbits,
+                timeout=self.timeout
+            )
+        if capture_path:
+            capture_writer = RawCaptureWriter(capture_path, baudrate=self.baudrate)
+            capture_writer.open()
+            ser = CapturingSerial(ser, capture_writer)
+        self.ser = ser
 
     def close(self) -> None:
         """显式关闭串口"""
@@ -87,7 +112,8 @@ class AsciiSendModel:
     def read_sensor_data(self,
                          standard_message_length: int = 7,
                          report_count: int = 50,
-                         chunk_size: int = 512) -> List[str]:
+                         chunk_size: int = 512,
+                         trace: bool = False) -> List[str]:
         """
         在ascii通讯模式下读取串口数据：
         1. 首先找到第一个回车符(0D)作为数据同步点
@@ -96,6 +122,8 @@ class AsciiSendModel:
         :param standard_message_length: 标准通讯模式下，符合标准的默认报文长度（以字节为单位）
         :param report_count: 一次抛出的报文数量限制（已经转换为仪表数值，kg为单位）
         :param chunk_size: 缓冲区大小
+        :param trace: 是否记录追踪时间戳。开启后每次抛出报文前，self.last_trace会更新为该批次的
+                      chunk_read、frame_decode、batch_yield时间戳
 
         :return: 解码后的报文列表
         """
@@ -106,12 +134,16 @@ class AsciiSendModel:
 
         buffer = bytearray()  # 创建空的字节串
         reports = []  # 创建报文空列表
+        chunk_ns = 0  # 最近一次读取数据块的时间戳
+        batch_trace = {}  # 当前批次的追踪时间戳
 
-        while True:                     # 进入数据处理循环
+        while self.ser.is_open:         # 进入数据处理循环，串口关闭（或回放结束）时退出
             # 读取新数据并添加到buffer
             if self.ser.in_waiting:     # 如果串口中有数据等待
                 # print('串口有数据')
                 chunk = self.ser.read(min(self.ser.in_waiting, chunk_size))  # 从等待区和设置的chunk区中，选一个较小的区，进行读取操作
+                if trace:
+                    chunk_ns = time.perf_counter_ns()
                 buffer.extend(chunk)    # 添加到buffer中
 
             while len(buffer) >= standard_message_length:         # 当buffer超过默认报文长度7
@@ -124,11 +156,16 @@ class AsciiSendModel:
 
                 try:
                     decoded_data = valid_data.decode('ascii').strip()   # 将采集到的数据按照ascii编码进行解码，转换为str类型，然后去除首尾的空白符
+                    if trace and not reports:                           # 批次的第一帧，记录数据块读取和解码完成的时间
+                        batch_trace = {'chunk_read': chunk_ns, 'frame_decode': time.perf_counter_ns()}
                     reports.append(decoded_data)
                     # print('report添加完毕')
                     if len(reports) >= report_count:
                         # print('report已抛出')
                         # total_reports += len(reports)       # 采集率计算
+                        if trace:
+                            batch_trace['batch_yield'] = time.perf_counter_ns()
+                            self.last_trace = batch_trace
                         yield reports
                         reports = []
                 except UnicodeDecodeError as e:
@@ -149,14 +186,34 @@ class PipeTransmitter:
     管道传输
 
     """
-    def __init__(self, pipe_path: str = '/tmp/sensor_data_pipe'):
+    def __init__(self, pipe_path: str = '/tmp/sensor_data_pipe', sequenced: bool = True, frame_messages: int = 16,
+                 max_delay: Optional[float] = 0.002):
         """
         初始化
 
         :param pipe_path: 指定的管道路径
+        :param sequenced: 是否使用带顺序号和CRC32的协议（见src/pipe_receiver.py），False为旧的"长度+数据"协议
+        :param frame_messages: 带顺序号的协议中，最多把多少条消息合成一帧发送。消息头、CRC32和write的开销
+                               由帧内的消息分摊；为1时每条消息单独成帧立即发出
+        :param max_delay: 消息最多等待多少秒就必须发出（秒）。距离上一次写入已超过max_delay时，新消息立即发出，
+                          否则先攒起来，凑够frame_messages条时发出，剩下的由后台线程每隔max_delay发出一次，
+                          所以低速时不增加延迟，高速时延迟也不超过max_delay。
+                          None为不限时，只在凑够一帧或调用flush、close时发出，适合回放等只追求吞吐量的场合
         """
         self.pipe_path = pipe_path
+        self.sequenced = sequenced
+        self.frame_messages = frame_messages
+        self.max_delay = max_delay
+        self.seq = 0                # 下一条消息的顺序号
         self.fifo = None            # fifo是文件描述符
+        self._pending: List[bytes] = []     # 等待合成一帧的消息
+        self._last_write = 0.0              # 上一次写入管道的时间（time.monotonic）
+        self._lock = threading.Lock()       # 保护_pending和管道写入
+        self._flusher: Optional[threading.Thread] = None
+        self._flusher_idle = True           # 后台线程没有在定时检查，等待_wakeup
+        self._wakeup = threading.Event()    # 有攒下的消息时唤醒空闲的后台线程
+        self._stop = threading.Event()
+        self._flush_error: Optional[OSError] = None     # 后台线程写入管道时的错误，下一次send_data时抛出
 
     def open(self):
         """
@@ -169,20 +226,100 @@ class PipeTransmitter:
             logger.info(f"创建命名管道: {self.pipe_path}")
         self.fifo = os.open(self.pipe_path, os.O_WRONLY)    # 只写模式打开指定路径管道，将信息赋值给文件描述符，用来代表管道相关信息（开关状态、路径）
         logger.info(f"管道已打开: {self.pipe_path}")          # 日志记录，管道已经打开
+        if self.sequenced and self.frame_messages > 1 and self.max_delay is not None:
+            self._stop.clear()
+            self._flusher = threading.Thread(target=self._flush_loop, name='pipe_flusher', daemon=True)
+            self._flusher.start()
 
-    def send_data(self, data: str):
+    def send_data(self, data: str, trace: Optional[Dict[str, int]] = None):
         """
         发送数据
 
         :param data: 待发送的数据
+        :param trace: 追踪时间戳。不为None时，补上pipe_write时间戳后附在数据末尾一起发送
         :return:
         """
         if not self.fifo:                       # 根据描述符，检查管道是否打开
             raise RuntimeError("管道未打开")
+        if trace is not None:
+            data += encode_trace(dict(trace, pipe_write=time.perf_counter_ns()))
         encoded_data = data.encode('utf-8')     # 将待发送字符串数据修改为UTF-8编码
-        packed_length = struct.pack('<I', len(encoded_data))  # 明确使用小端字节序
+        if self.sequenced and self.frame_messages > 1:
+            with self._lock:
+                pending = self._pending
+                pending.append(encoded_data)
+                if len(pending) >= self.frame_messages:
+                    self._flush_pending()
+                elif len(pending) == 1:
+                    self._start_batch()
+            return
+        if self.sequenced:
+            message = pack_frame(self.seq, encoded_data)    # 消息头（magic、顺序号、长度、CRC32）+数据内容
+            self.seq = (self.seq + 1) & 0xFFFFFFFF
+        else:
+            message = struct.pack('<I', len(encoded_data)) + encoded_data  # 明确使用小端字节序，"数据长度+数据内容"
+        self._write(message)
+
+    def flush(self):
+        """
+        把等待合成一帧的消息立即发出
+
+        :return:
+        """
+        with self._lock:
+            self._flush_pending()
+
+    def _start_batch(self):
+        """
+        第一条消息进入_pending时调用，调用者需持有self._lock。只在这里取时间，攒够一帧的其余消息不需要
+
+        :return:
+        """
+        if self._flush_error is not None:       # 后台线程写入失败后_pending已清空，下一条消息一定走到这里
+            self._pending = []
+            raise self._flush_error
+        if self.max_delay is None:
+            return
+        if time.monotonic() - self._last_write >= self.max_delay:
+            self._flush_pending()               # 距离上一次写入已经足够久，不必等待
+        elif self._flusher_idle and self._flusher is not None:
+            # 高速发送时后台线程一直在定时检查，不会每帧都被唤醒
+            self._flusher_idle = False
+            self._wakeup.set()
+
+    def _flush_pending(self):
+        """调用者需持有self._lock"""
+        if not self._pending:
+            return
+        message = pack_multi_frame(self.seq, self._pending)
+        self.seq = (self.seq + len(self._pending)) & 0xFFFFFFFF
+        self._pending = []
+        self._last_write = time.monotonic()
+        self._write(message)
+
+    def _flush_loop(self):
+        """
+        后台线程：有攒下的消息时每隔max_delay把它们发出，一个周期内没有攒下消息就回到空闲状态
+
+        :return:
+        """
+        while not self._stop.is_set():
+            self._wakeup.wait()
+            self._wakeup.clear()
+            while not self._stop.wait(self.max_delay):
+                with self._lock:
+                    if not self._pending:
+                        self._flusher_idle = True
+                        break
+                    try:
+                        self._flush_pending()
+                    except OSError as e:
+                        self._flush_error = e
+                        return
+
+    def _write(self, message: bytes):
         try:
-            os.write(self.fifo, packed_length + encoded_data) # 通过fifo定位管道，然后一起发送"数据长度+数据内容"。
+            os.write(self.fifo, message)        # 通过fifo定位管道，然后一起发送
         except BrokenPipeError:
             logging.error("管道连接断开")
             raise
@@ -194,27 +331,85 @@ class PipeTransmitter:
         :return:
         """
         if self.fifo:
-            os.close(self.fifo)
-            self.fifo = None        # 将描述符归位
+            try:
+                if self._flusher is not None:
+                    self._stop.set()
+                    self._wakeup.set()
+                    self._flusher.join()
+                    self._flusher = None
+                    self._flusher_idle = True
+                if self._flush_error is None:
+                    self.flush()
+            finally:
+                os.close(self.fifo)
+                self.fifo = None    # 将描述符归位
             logger.info("管道已关闭")
 
 
-def run_data_transmission(port_name: str, baudrate: int, pipe_path: str, run_duration: Optional[float] = None):
+def run_data_transmission(port_name: str, baudrate: int, pipe_path: str, run_duration: Optional[float] = None,
+                          trace: bool = False,
+                          mode: str = 'pipe',
+                          mailbox_path: str = '/dev/shm/sensor_force_mailbox',
+                          stale_after: float = 0.05,
+                          capture_path: Optional[str] = None,
+                          replay_path: Optional[str] = None,
+                          replay_speed: Optional[float] = 1.0,
+                          frame_messages: int = 16,
+                          max_delay: Optional[float] = 0.002):
+    """
+    从串口读取数据并发送给机械臂程序
+
+    :param port_name: 串口名称
+    :param baudrate: 波特率
+    :param pipe_path: 管道路径
+    :param run_duration: 运行持续时间（秒），如果为None则一直运行
+    :param trace: 是否在消息中附带延迟追踪时间戳，配合src/latency_trace.py中的消费端使用
+    :param mode: 传输模式。'pipe'：批量报文通过管道排队发送；
+                 'mailbox'：每来一帧就覆盖写入最新值信箱，只保留最新值，不排队
+    :param mailbox_path: mailbox模式下的信箱文件路径
+    :param stale_after: mailbox模式下的过期阈值（秒），超过该年龄的数据被读端判定为过期
+    :param capture_path: 录制文件路径。不为None时，把串口读到的原始字节流录制下来
+    :param replay_path: 回放文件路径。不为None时不打开串口，而是回放该录制文件，回放结束后自动退出
+    :param replay_speed: 回放倍速。1为原速，N为N倍速，None为尽可能快（可以用作吞吐量测试）
+    :param frame_messages: pipe模式下每帧最多合并的消息数，见PipeTransmitter
+    :param max_delay: pipe模式下消息最多等待多少秒就发出，见PipeTransmitter
+    """
+    if mode not in ('pipe', 'mailbox'):
+        raise ValueError(f"不支持的传输模式: {mode!r}")
+
     ascii_model = None
     pipe_transmitter = None
+    mailbox = None
 
     try:
-        ascii_model = AsciiSendModel(port_name=port_name, baudrate=baudrate)
-        pipe_transmitter = PipeTransmitter(pipe_path)
+        ser = ReplaySerial(replay_path, speed=replay_speed) if replay_path else None
+        ascii_model = AsciiSendModel(port_name=port_name, baudrate=baudrate, ser=ser, capture_path=capture_path)
+
+        if mode == 'mailbox':
+            mailbox = ForceMailboxWriter(mailbox_path, channels=1, stale_after=stale_after)
+            mailbox.open()
+            logger.info("开始数据传输（最新值信箱模式）")
+            start_time = time.time()
+            # 每帧抛出一次，数据采集时间取读到该帧所在数据块的时间
+            for reports in ascii_model.read_sensor_data(report_count=1, trace=True):
+                value = parse_report(reports[-1])
+                if value is not None:
+                    mailbox.publish(0, value, sample_ns=ascii_model.last_trace['chunk_read'])
+
+                if run_duration and time.time() - start_time > run_duration:
+                    break
+            return
+
+        pipe_transmitter = PipeTransmitter(pipe_path, frame_messages=frame_messages, max_delay=max_delay)
         pipe_transmitter.open()
 
         logger.info("开始数据传输")
         start_time = time.time()
         # buffer = []
-        for reports in ascii_model.read_sensor_data():  # 积累了指定数量的数据后，返回一次reports。即由ascii_model.read_sensor_data()来触发循环。
-                                                        # 每次输出的reports长度理论上是一样的
+        for reports in ascii_model.read_sensor_data(trace=trace):  # 积累了指定数量的数据后，返回一次reports。即由ascii_model.read_sensor_data()来触发循环。
+                                                                   # 每次输出的reports长度理论上是一样的
             data_to_send = ' '.join(reports)            # 将[str, str, ...]转换为一个连续的单一字符串，以空格为分隔符
-            pipe_transmitter.send_data(data_to_send)    # 调用send_data发送
+            pipe_transmitter.send_data(data_to_send, trace=ascii_model.last_trace if trace else None)    # 调用send_data发送
 
             # 或者逐条发送
             # for report in reports:
@@ -230,50 +425,10 @@ def run_data_transmission(port_name: str, baudrate: int, pipe_path: str, run_dur
             ascii_model.close()
         if pipe_transmitter:
             pipe_transmitter.close()
+        if mailbox:
+            mailbox.close()
 
 
-class TestInfo:
-    """
-    专门用于测试的类
-    """
-    def __init__(self):
-        self.start_time: float = time.time()
-        self.total_reports: int = 0              # 采集率初始计数设置0
-        self.all_data: List[str] = []
-
-    def add_reports(self, reports: List[str]) -> None:
-        """
-        添加新的报告数据
-
-        :param reports: 新的报告数据列表
-        """
-        self.total_reports += len(reports)
-        self.all_data.extend(reports)
-
-    def get_results(self) -> Dict[str, Any]:
-        """
-        获取测试结果
-
-        :return: 包含测试结果的字典
-        """
-        end_time = time.time()
-        duration = end_time - self.start_time
-        sampling_rate = self.total_reports / duration if duration > 0 else 0
-        return {
-            "duration": duration,
-            "sampling_rate": sampling_rate,
-            "total_reports": self.total_reports,
-            "all_data": self.all_data
-        }
-
-    def print_results(self) -> None:
-        """打印测试结果"""
-        results = self.get_results()
-        logger.info(f"平均采集率: {results['sampling_rate']:.2f} 个/秒")
-        logger.info("所有采集到的数值:")
-        for i, data in enumerate(results['all_data'], 1):
-            logger.info(f"{i}: {data}")
-
 def run_ascii_send_model(run_duration: Optional[float] = None,
                          enable_test_info: bool = True
                          ) -> None:
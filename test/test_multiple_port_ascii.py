@@ -23,6 +23,7 @@ class ThreeDimensionalForceModel:
         初始化三维力传感器模型,创建后面要用的model实例
 
         :param port_configs: 包含三个维度串口配置的字典。示例，'传感器维度'+'具体维度的配置'，具体配置又是一个字典
+                             具体配置中可以用'ser'传入src/raw_capture.py中的ReplaySerial回放录制文件，或用'capture_path'录制原始字节流
         """
         self.models = {}                                            # 用于存储每个维度的AsciiSendModel实例
         self.queues = {}                                            # 用于存储每个维度的数据队列
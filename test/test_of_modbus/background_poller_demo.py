@@ -0,0 +1,61 @@
+"""
+后台采集：src/modbus_background.py 中 BackgroundPoller 的示例
+采集线程用RtuPoller连续读取，主循环模拟GUI每100ms刷新一次：latest()取最新值和数据的"年龄"，
+since()取上次刷新以来的全部采样，主循环从不等待串口；结束时打印StreamingStats的流式统计。
+
+运行方式（项目根目录下）：
+python -m test.test_of_modbus.background_poller_demo [串口=sim] [从机地址=1] [寄存器地址=0x0206] [波特率=115200] [采集率Hz，默认尽可能快] [运行秒数=5]
+串口为sim（默认）时使用src/modbus_simulator.py中的模拟器。
+"""
+import sys
+import time
+
+from src.adaptive_timeout import AdaptiveTimeout
+from src.modbus_background import BackgroundPoller
+from src.modbus_rtu import RtuPoller, open_rtu_port
+from src.modbus_simulator import RtuSlaveSimulator
+from src.streaming_stats import StreamingStats
+
+
+def main():
+    port = sys.argv[1] if len(sys.argv) > 1 else 'sim'
+    slave_address = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    register_address = int(sys.argv[3], 0) if len(sys.argv) > 3 else 0x0206
+    baudrate = int(sys.argv[4]) if len(sys.argv) > 4 else 115200
+    rate = float(sys.argv[5]) if len(sys.argv) > 5 and float(sys.argv[5]) > 0 else None
+    duration = float(sys.argv[6]) if len(sys.argv) > 6 else 5.0
+
+    # 串口为sim时在本机启动Modbus RTU模拟器，按给定波特率模拟线路传输时间
+    simulator = None
+    if port == 'sim':
+        simulator = RtuSlaveSimulator([slave_address], baudrate=baudrate)
+        port = simulator.start()
+
+    ser = open_rtu_port(port, baudrate=baudrate)
+    poller = RtuPoller(ser, slave_address, register_address, adaptive_timeout=AdaptiveTimeout(), retries=1)
+    with BackgroundPoller(poller.read_float, rate=rate, name=port, stats=StreamingStats(port)) as background:
+        last_refresh_ns = time.perf_counter_ns()
+        received = 0
+        end_time = time.perf_counter() + duration
+        while time.perf_counter() < end_time:
+            time.sleep(0.1)
+            latest = background.latest()
+            timestamps, values = background.since(last_refresh_ns)
+            # 下次从本次拿到的最后一个采样之后开始取。不能用当前时间：since()返回之后、
+            # 取当前时间之前写入的采样会被跳过
+            if len(timestamps):
+                last_refresh_ns = int(timestamps[-1]) + 1
+            received += len(values)
+            if latest is not None:
+                print(f"最新值 {latest[0]:.4f}（{latest[1] * 1000:.2f} ms 前），本次刷新新增 {len(values)} 个采样")
+        print(f"\n刷新循环共取到 {received} 个采样")
+        print(f"后台采集统计: {background.get_statistics()}")
+        background.stats.print_results(show_gaps=True)
+    print(f"通讯统计: {poller.get_statistics()}")
+    ser.close()
+    if simulator is not None:
+        simulator.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+CRC16速度对比：test/test_of_modbus/CRC.py 中的 _calculate_crc 与 src/modbus_crc.py
+分别测试逐个报文校验（单字节查表、双字节查表、缓存）和NumPy批量校验，输出每秒校验的报文数。
+
+运行方式（项目根目录下）：
+python -m test.test_of_modbus.bench_crc [报文数=20000]
+"""
+import os
+import sys
+import time
+from typing import Callable, List
+
+from test.test_of_modbus.CRC import _calculate_crc
+from src.modbus_crc import crc16, crc16_cached, append_crc, check_crc_batch, CRC16_TABLE
+
+
+def crc16_bytewise(data: bytes) -> int:
+    """单字节查表，作为双字节查表的对照"""
+    register = 0xFFFF
+    for byte in data:
+        register = (register >> 8) ^ CRC16_TABLE[(register ^ byte) & 0xFF]
+    return register
+
+
+def frames_per_second(check: Callable[[bytes], object], frames: List[bytes]) -> float:
+    """
+    逐个报文校验的速度
+
+    :param check: 计算CRC的函数
+    :param frames: 报文列表
+    :return: 每秒校验的报文数
+    """
+    start_time = time.perf_counter()
+    for frame in frames:
+        check(frame)
+    return len(frames) / (time.perf_counter() - start_time)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    # 9字节：读一个浮点数的应答；255字节：读125个寄存器的应答；8字节的固定请求用于测试缓存
+    for frame_length in (9, 255):
+        frames = [append_crc(os.urandom(frame_length - 2)) for _ in range(count)]
+        packed = b''.join(frames)
+        print(f"\n报文长度 {frame_length} 字节，{count} 个报文:")
+        print(f"  CRC.py _calculate_crc: {frames_per_second(lambda f: _calculate_crc(f[:-2]), frames):12.0f} 帧/s")
+        print(f"  单字节查表:            {frames_per_second(lambda f: crc16_bytewise(f[:-2]), frames):12.0f} 帧/s")
+        print(f"  crc16:                 {frames_per_second(lambda f: crc16(f[:-2]), frames):12.0f} 帧/s")
+
+        start_time = time.perf_counter()
+        valid = check_crc_batch(packed, frame_length)
+        elapsed = time.perf_counter() - start_time
+        assert valid.all()
+        print(f"  check_crc_batch:       {count / elapsed:12.0f} 帧/s")
+
+    request = bytes.fromhex('01 03 02 06 00 02')
+    requests = [request] * count
+    print(f"\n固定请求 {request.hex(' ')}，{count} 次:")
+    print(f"  CRC.py _calculate_crc: {frames_per_second(_calculate_crc, requests):12.0f} 帧/s")
+    print(f"  crc16_cached:          {frames_per_second(crc16_cached, requests):12.0f} 帧/s")
+
+
+if __name__ == "__main__":
+    main()
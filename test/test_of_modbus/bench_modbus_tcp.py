@@ -0,0 +1,64 @@
+"""
+Modbus TCP吞吐量对比：一问一答 与 按事务号流水线发送
+在本机启动src/modbus_server.py中的测试服务器（response_delay模拟从机处理时间），比较：
+    RTU over TCP + RtuPoller     透传串口服务器，只能一问一答
+    Modbus TCP一问一答            TcpPoller.transact
+    Modbus TCP流水线              TcpPoller.transact_many，窗口为1/4/16/64
+也可以指定真实网关的地址和端口（网关需要支持多个未完成的请求）。
+
+运行方式（项目根目录下）：
+python -m test.test_of_modbus.bench_modbus_tcp [从机处理时间ms=1] [每项请求数=2000] [网关地址 端口 单元号 寄存器地址]
+"""
+import sys
+import time
+
+from src.modbus_rtu import RtuPoller
+from src.modbus_server import ModbusTcpServer, RegisterBank
+from src.modbus_tcp import ModbusTcpClient, TcpPoller, RtuOverTcpSerial
+
+
+def main():
+    response_delay = float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else 0.001
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    servers = []
+    if len(sys.argv) > 6:
+        host, port, unit, register_address = sys.argv[3], int(sys.argv[4]), int(sys.argv[5]), int(sys.argv[6], 0)
+    else:
+        unit, register_address = 1, 0x0206
+        bank = RegisterBank()
+        bank.set_float(register_address, 12.34)
+        servers.append(ModbusTcpServer({unit: bank}, response_delay=response_delay))
+        host, port = servers[0].start()
+        rtu_server = ModbusTcpServer({unit: bank}, framing='rtu', response_delay=response_delay)
+        servers.append(rtu_server)
+        print(f"本机测试服务器，从机处理时间 {response_delay * 1000:.2f} ms")
+
+        # 透传的串口服务器只能一问一答
+        ser = RtuOverTcpSerial(*rtu_server.start(), timeout=0.5)
+        poller = RtuPoller(ser, unit, register_address)
+        start_time = time.perf_counter()
+        for _ in range(count):
+            poller.read_float()
+        print(f"RTU over TCP 一问一答: {count / (time.perf_counter() - start_time):10.1f} 次/s")
+        ser.close()
+
+    client = ModbusTcpClient(host, port, unit)
+    poller = TcpPoller(client, register_address)
+    start_time = time.perf_counter()
+    for _ in range(count):
+        poller.read_float()
+    print(f"Modbus TCP 一问一答:  {count / (time.perf_counter() - start_time):10.1f} 次/s")
+
+    for window in (1, 4, 16, 64):
+        start_time = time.perf_counter()
+        poller.transact_many(count, window)
+        print(f"Modbus TCP 流水线 窗口 {window:2d}: {count / (time.perf_counter() - start_time):10.1f} 次/s")
+
+    print(f"通讯统计: {poller.get_statistics()}, 建立的连接数: {client.pool.connections_opened}")
+    client.close()
+    for server in servers:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
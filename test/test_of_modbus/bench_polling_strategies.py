@@ -0,0 +1,96 @@
+"""
+轮询方式横向对比：在同一个Modbus RTU模拟器（src/modbus_simulator.py）上依次运行各种轮询方式
+模拟器按给定波特率模拟线路传输时间，并加上从机应答延迟和丢包，各方式读取同一个随时间变化的浮点数：
+    OptimizedSensorReader（faster_sample_rate02.py，minimalmodbus）固定超时 / 自适应超时
+    RtuPoller 固定超时 / 自适应超时+立即重试
+    读4个浮点数：4个RtuPoller分别读取 / BlockPoller合并为一次请求
+
+运行方式（项目根目录下）：
+python -m test.test_of_modbus.bench_polling_strategies [波特率=115200] [应答延迟ms=0.5] [丢包率=0.01] [每项测试秒数=3]
+"""
+import sys
+import time
+from typing import Callable
+
+from src.adaptive_timeout import AdaptiveTimeout
+from src.modbus_blocks import BlockPoller, RegisterValue
+from src.modbus_rtu import RtuPoller, ModbusRtuError, open_rtu_port
+from src.modbus_simulator import RtuSlaveSimulator, sine_signal
+from test.test_of_modbus.faster_sample_rate02 import OptimizedSensorReader
+
+SLAVE_ADDRESS = 1
+REGISTER_ADDRESS = 0x0206
+BLOCK_ADDRESSES = (0x0300, 0x0302, 0x0304, 0x0306)
+
+
+def run_for(duration: float, read: Callable[[], object]) -> int:
+    """
+    在duration秒内反复调用read，返回成功次数（返回None或抛出ModbusRtuError记为失败）
+    """
+    successes = 0
+    end_time = time.perf_counter() + duration
+    while time.perf_counter() < end_time:
+        try:
+            if read() is not None:
+                successes += 1
+        except ModbusRtuError:
+            pass
+    return successes
+
+
+def main():
+    baudrate = int(sys.argv[1]) if len(sys.argv) > 1 else 115200
+    turnaround = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.0005
+    drop_rate = float(sys.argv[3]) if len(sys.argv) > 3 else 0.01
+    duration = float(sys.argv[4]) if len(sys.argv) > 4 else 3.0
+
+    simulator = RtuSlaveSimulator([SLAVE_ADDRESS], turnaround=turnaround, drop_rate=drop_rate,
+                                  baudrate=baudrate, seed=0)
+    for index, address in enumerate(BLOCK_ADDRESSES):
+        simulator.add_signal(SLAVE_ADDRESS, address, sine_signal(frequency=index + 1))
+    port = simulator.start()
+    print(f"模拟器: 波特率 {baudrate}, 应答延迟 {turnaround * 1000:.2f} ms, 丢包率 {drop_rate:.2%}, "
+          f"每项 {duration:.1f} 秒\n")
+
+    results = []
+    for adaptive in (False, True):
+        # 关闭缓存，每次都读总线
+        reader = OptimizedSensorReader(port, SLAVE_ADDRESS, baudrate, adaptive_timeout=adaptive, cache_validity_period=0)
+        successes = run_for(duration, lambda: reader.read_float(REGISTER_ADDRESS))
+        results.append((f"minimalmodbus {'自适应超时' if adaptive else '固定超时'}", successes,
+                        reader.timeout_time_lost))
+        reader.instrument.serial.close()
+
+    for adaptive in (False, True):
+        ser = open_rtu_port(port, baudrate=baudrate, timeout=0.05)
+        poller = RtuPoller(ser, SLAVE_ADDRESS, REGISTER_ADDRESS,
+                           adaptive_timeout=AdaptiveTimeout() if adaptive else None, retries=2 if adaptive else 0)
+        successes = run_for(duration, poller.read_float)
+        results.append((f"RtuPoller {'自适应超时+重试' if adaptive else '固定超时'}", successes,
+                        poller.timeout_time_lost))
+        ser.close()
+
+    # 4个浮点数：每轮都读到4个数值才算一次成功
+    ser = open_rtu_port(port, baudrate=baudrate, timeout=0.05)
+    pollers = [RtuPoller(ser, SLAVE_ADDRESS, address, adaptive_timeout=AdaptiveTimeout(), retries=2)
+               for address in BLOCK_ADDRESSES]
+    successes = run_for(duration, lambda: [poller.read_float() for poller in pollers])
+    results.append(("4个浮点数 逐个读取", successes, sum(poller.timeout_time_lost for poller in pollers)))
+    block_poller = BlockPoller(ser, SLAVE_ADDRESS, [RegisterValue(f"v{index}", address)
+                                                    for index, address in enumerate(BLOCK_ADDRESSES)])
+    for poller in block_poller.pollers:
+        poller.adaptive_timeout, poller.retries = AdaptiveTimeout(), 2
+    successes = run_for(duration, block_poller.poll)
+    results.append(("4个浮点数 BlockPoller", successes, sum(poller.timeout_time_lost
+                                                          for poller in block_poller.pollers)))
+    ser.close()
+
+    print(f"{'方式':<24}{'成功次数':>10}{'采集率Hz':>12}{'超时损失s':>12}")
+    for name, successes, time_lost in results:
+        print(f"{name:<24}{successes:>10}{successes / duration:>12.1f}{time_lost:>12.3f}")
+    print(f"\n模拟器统计: {simulator.get_statistics()}")
+    simulator.stop()
+
+
+if __name__ == "__main__":
+    main()
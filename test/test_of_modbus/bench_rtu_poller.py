@@ -0,0 +1,98 @@
+"""
+采集率对比：minimalmodbus.read_registers 与 src/modbus_rtu.py 中的 RtuPoller
+两者读取同一个浮点数（2个寄存器），各自连续轮询一段时间，比较实际达到的采集率。
+
+运行方式（项目根目录下）：
+python -m test.test_of_modbus.bench_rtu_poller [串口=sim] [从机地址=1] [寄存器地址=0x0206] [波特率=115200] [每项测试秒数=5]
+串口为sim（默认）时使用src/modbus_simulator.py中的模拟器。
+"""
+import sys
+import time
+import struct
+
+import minimalmodbus
+import serial
+
+from src.modbus_rtu import RtuPoller, ModbusRtuError, open_rtu_port
+from src.modbus_simulator import RtuSlaveSimulator
+
+
+def bench_minimalmodbus(port: str, slave_address: int, register_address: int, baudrate: int,
+                        duration: float) -> float:
+    """
+    用minimalmodbus轮询，与faster_sample_rate02.py中OptimizedSensorReader的设置相同
+
+    :return: 成功读取的采集率（Hz）
+    """
+    instrument = minimalmodbus.Instrument(port, slave_address)
+    instrument.serial.baudrate = baudrate
+    instrument.serial.bytesize = 8
+    instrument.serial.parity = serial.PARITY_NONE
+    instrument.serial.stopbits = 1
+    instrument.serial.timeout = 0.05
+    instrument.mode = minimalmodbus.MODE_RTU
+    instrument.clear_buffers_before_each_transaction = False
+    instrument.close_port_after_each_call = False
+
+    count = 0
+    start_time = time.perf_counter()
+    while time.perf_counter() - start_time < duration:
+        try:
+            raw_data = instrument.read_registers(registeraddress=register_address, number_of_registers=2,
+                                                 functioncode=3)
+            struct.unpack('>f', struct.pack('>HH', *raw_data))
+            count += 1
+        except Exception:
+            pass
+    rate = count / (time.perf_counter() - start_time)
+    instrument.serial.close()
+    return rate
+
+
+def bench_rtu_poller(port: str, slave_address: int, register_address: int, baudrate: int,
+                     duration: float) -> float:
+    """
+    用RtuPoller轮询
+
+    :return: 成功读取的采集率（Hz）
+    """
+    ser = open_rtu_port(port, baudrate=baudrate, timeout=0.05)
+    poller = RtuPoller(ser, slave_address, register_address)
+    count = 0
+    start_time = time.perf_counter()
+    while time.perf_counter() - start_time < duration:
+        try:
+            poller.read_float()
+            count += 1
+        except ModbusRtuError:
+            pass
+    rate = count / (time.perf_counter() - start_time)
+    ser.close()
+    return rate
+
+
+def main():
+    port = sys.argv[1] if len(sys.argv) > 1 else 'sim'
+    slave_address = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    register_address = int(sys.argv[3], 0) if len(sys.argv) > 3 else 0x0206
+    baudrate = int(sys.argv[4]) if len(sys.argv) > 4 else 115200
+    duration = float(sys.argv[5]) if len(sys.argv) > 5 else 5.0
+
+    # 串口为sim时在本机启动Modbus RTU模拟器，按给定波特率模拟线路传输时间
+    simulator = None
+    if port == 'sim':
+        simulator = RtuSlaveSimulator([slave_address], baudrate=baudrate)
+        port = simulator.start()
+
+    # 理论上限：请求8字节+应答9字节，每字节10位
+    wire_rate = baudrate / (17 * 10)
+    print(f"串口: {port}, 波特率: {baudrate}, 不计从机响应时间的理论上限: {wire_rate:.1f} Hz")
+    print(f"minimalmodbus: {bench_minimalmodbus(port, slave_address, register_address, baudrate, duration):.1f} Hz")
+    print(f"RtuPoller:     {bench_rtu_poller(port, slave_address, register_address, baudrate, duration):.1f} Hz")
+    if simulator is not None:
+        print(f"模拟器统计: {simulator.get_statistics()}")
+        simulator.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+同一条RS-485总线上轮询多个从机：src/modbus_bus.py 中 RtuBusScheduler 的示例
+每个从机读取同一个寄存器地址上的浮点数，第一个从机优先级最高，按给定的目标采集率轮询，
+其余从机尽可能快地分享剩余的总线时间。运行结束后打印每个从机的目标与实际采集率。
+
+运行方式（项目根目录下）：
+python -m test.test_of_modbus.bus_scheduler_demo [串口=sim] [从机地址列表=1,2,3] [目标采集率=100] [寄存器地址=0x0206] [波特率=115200] [运行秒数=5]
+串口为sim（默认）时使用src/modbus_simulator.py中的模拟器。
+"""
+import sys
+
+from src.modbus_rtu import RtuPoller, open_rtu_port
+from src.modbus_bus import RtuBusScheduler
+from src.modbus_simulator import RtuSlaveSimulator
+
+
+def main():
+    port = sys.argv[1] if len(sys.argv) > 1 else 'sim'
+    slave_addresses = [int(address) for address in (sys.argv[2] if len(sys.argv) > 2 else '1,2,3').split(',')]
+    rate = float(sys.argv[3]) if len(sys.argv) > 3 else 100.0
+    register_address = int(sys.argv[4], 0) if len(sys.argv) > 4 else 0x0206
+    baudrate = int(sys.argv[5]) if len(sys.argv) > 5 else 115200
+    duration = float(sys.argv[6]) if len(sys.argv) > 6 else 5.0
+
+    # 串口为sim时在本机启动Modbus RTU模拟器，按给定波特率模拟线路传输时间
+    simulator = None
+    if port == 'sim':
+        simulator = RtuSlaveSimulator(slave_addresses, baudrate=baudrate)
+        port = simulator.start()
+
+    ser = open_rtu_port(port, baudrate=baudrate, timeout=0.05)
+    scheduler = RtuBusScheduler(ser)
+    for index, slave_address in enumerate(slave_addresses):
+        poller = RtuPoller(ser, slave_address, register_address)
+        if index == 0:
+            scheduler.add(f"slave{slave_address}", poller.read_float, rate=rate, priority=1)
+        else:
+            scheduler.add(f"slave{slave_address}", poller.read_float)
+
+    print(f"串口: {port}, 波特率: {baudrate}, 帧间静默间隔: {scheduler.silent_interval_ns / 1e6:.3f} ms")
+    try:
+        scheduler.run(duration)
+    finally:
+        ser.close()
+        if simulator is not None:
+            simulator.stop()
+
+    for name, stats in scheduler.get_statistics().items():
+        target = f"{stats['target_rate']:.1f} Hz" if stats['target_rate'] else "尽可能快"
+        print(f"{name}: 目标 {target}, 实际 {stats['achieved_rate']:.1f} Hz, "
+              f"成功 {stats['successes']}, 错误 {stats['errors']}, 跳过周期 {stats['skipped_periods']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,49 @@
 import time
 import struct
-from collections import deque
 from typing import Optional, Tuple, Deque
 import minimalmodbus
 import serial
 
+from src.adaptive_timeout import AdaptiveTimeout
+from src.streaming_stats import StreamingStats, SlidingWindowStats
+
 
 class OptimizedSensorReader:
-    def __init__(self, port: str, slave_address: int, baudrate: int = 9600):
+    def __init__(self, port: str, slave_address: int, baudrate: int = 9600, adaptive_timeout: bool = True,
+                 cache_validity_period: float = 0.01):
         """
         优化的传感器读取器
 
         优化点：
-        1. 使用循环缓冲区存储最近的数据
+        1. 使用循环缓冲区存储最近的数据，窗口统计随采样增量更新
         2. 实现数据预读取
         3. 优化串口通信参数
         4. 添加简单的数据校验和缓存机制
+        5. 超时时间根据最近的往返时间分布自适应调整，超时后立即重试，不再等待
+        6. 全部采样的流式统计（self.stats），内存占用固定，运行过程中可以随时查询
+
+        :param adaptive_timeout: 是否使用自适应超时，为False时使用固定超时
+        :param cache_validity_period: 缓存有效期（秒），在此时间内重复读取直接返回上次的值，为0时关闭缓存，每次都读总线
         """
         self.instrument = minimalmodbus.Instrument(port, slave_address)
-        self._setup_optimized_communication(baudrate)
+        self.adaptive_timeout: Optional[AdaptiveTimeout] = None
+        self._setup_optimized_communication(baudrate, adaptive_timeout)
 
         # 使用固定大小的循环缓冲区存储最近的数据
         self.buffer_size = 1000
-        self.values_buffer: Deque[float] = deque(maxlen=self.buffer_size)
+        self.recent = SlidingWindowStats(size=self.buffer_size)
+        self.values_buffer: Deque[float] = self.recent.values
+        self.stats = StreamingStats(f"slave{slave_address}")
 
         # 缓存机制
         self._last_read_time: float = 0
         self._last_read_value: Optional[float] = None
-        self._cache_validity_period: float = 0.01  # 10ms缓存有效期
+        self._cache_validity_period: float = cache_validity_period  # 默认10ms缓存有效期
 
         # 错误处理
         self.error_count = 0
+        self.timeout_count = 0
+        self.timeout_time_lost = 0.0  # 等待超时所花的总时间（秒）
         self.max_retry_count = 3
         self.consecutive_errors = 0
         self.max_consecutive_errors = 5
@@ -40,7 +53,7 @@ class OptimizedSensorReader:
         self.successful_reads = 0
         self.start_time = time.perf_counter()
 
-    def _setup_optimized_communication(self, baudrate: int) -> None:
+    def _setup_optimized_communication(self, baudrate: int, adaptive_timeout: bool = True) -> None:
         """优化串口通信参数设置"""
         self.instrument.serial.baudrate = baudrate
         self.instrument.serial.bytesize = 8
@@ -52,6 +65,12 @@ class OptimizedSensorReader:
         bit_time = 1.0 / baudrate
         message_time = bytes_per_message * 10 * bit_time  # 10 bits per byte (包括起始位和停止位)
         self.instrument.serial.timeout = max(0.05, message_time * 2)  # 至少50ms，或者消息时间的两倍
+        if adaptive_timeout:
+            # 固定超时只作为上限和初始值；下限为请求（8字节）和应答（9字节）传输时间的1.5倍，且不小于2ms
+            wire_time = (8 + 9) * 10 * bit_time
+            self.adaptive_timeout = AdaptiveTimeout(initial=self.instrument.serial.timeout,
+                                                    floor=max(0.002, wire_time * 1.5),
+                                                    ceiling=self.instrument.serial.timeout)
 
         # 优化Modbus设置
         self.instrument.mode = minimalmodbus.MODE_RTU
@@ -80,6 +99,9 @@ class OptimizedSensorReader:
 
         # 尝试读取数据，包含重试机制
         for retry in range(self.max_retry_count):
+            if self.adaptive_timeout is not None and self.instrument.serial.timeout != self.adaptive_timeout.timeout:
+                self.instrument.serial.timeout = self.adaptive_timeout.timeout
+            request_time = time.perf_counter()
             try:
                 # 读取并解析数据
                 raw_data = self.instrument.read_registers(
@@ -87,6 +109,8 @@ class OptimizedSensorReader:
                     number_of_registers=2,
                     functioncode=3
                 )
+                if self.adaptive_timeout is not None:
+                    self.adaptive_timeout.record(time.perf_counter() - request_time)
 
                 # 转换数据
                 combined = (raw_data[0] << 16) | raw_data[1]
@@ -102,12 +126,20 @@ class OptimizedSensorReader:
                 self.consecutive_errors = 0
 
                 # 存入循环缓冲区
-                self.values_buffer.append(rounded_value)
+                timestamp_ns = time.perf_counter_ns()
+                self.recent.add(rounded_value, timestamp_ns)
+                self.stats.add(rounded_value, timestamp_ns)
 
                 return rounded_value
 
             except Exception as e:
                 self.error_count += 1
+                if isinstance(e, minimalmodbus.NoResponseError):
+                    waited = time.perf_counter() - request_time
+                    self.timeout_count += 1
+                    self.timeout_time_lost += waited
+                    if self.adaptive_timeout is not None:
+                        self.adaptive_timeout.record_timeout(waited)
                 self.consecutive_errors += 1
 
                 # 如果连续错误太多，可能需要重置通信
@@ -119,8 +151,7 @@ class OptimizedSensorReader:
                 if retry == self.max_retry_count - 1:
                     print(f"读取错误 (尝试 {retry + 1}/{self.max_retry_count}): {e}")
 
-                # 在重试之前短暂等待
-                time.sleep(0.01)  # 10ms
+                # 立即重试：丢失的应答不会再到达，等待只会扩大采样间隔
 
         return None
 
@@ -142,6 +173,9 @@ class OptimizedSensorReader:
             "总读取次数": self.total_reads,
             "成功读取次数": self.successful_reads,
             "错误次数": self.error_count,
+            "超时次数": self.timeout_count,
+            "超时损失时间": f"{self.timeout_time_lost:.3f} 秒",
+            "当前超时": f"{self.instrument.serial.timeout * 1000:.2f} ms",
             "成功率": f"{(self.successful_reads / self.total_reads * 100):.2f}%" if self.total_reads > 0 else "N/A",
             "平均采样率": f"{self.successful_reads / duration:.2f} Hz" if duration > 0 else "N/A",
             "运行时间": f"{duration:.2f} 秒",
@@ -149,17 +183,17 @@ class OptimizedSensorReader:
         }
 
     def get_recent_statistics(self) -> dict:
-        """获取最近数据的统计信息"""
-        if not self.values_buffer:
+        """获取最近数据的统计信息，由SlidingWindowStats增量维护，不需要遍历缓冲区"""
+        recent = self.recent
+        if not recent.count:
             return {"状态": "没有可用数据"}
 
-        values_list = list(self.values_buffer)
         return {
-            "最新值": values_list[-1],
-            "平均值": sum(values_list) / len(values_list),
-            "最大值": max(values_list),
-            "最小值": min(values_list),
-            "数据点数": len(values_list)
+            "最新值": recent.latest,
+            "平均值": recent.mean,
+            "最大值": recent.max,
+            "最小值": recent.min,
+            "数据点数": recent.count
         }
 
 
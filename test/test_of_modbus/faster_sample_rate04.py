@@ -0,0 +1,72 @@
+"""
+定速采样：用src/rate_control.py中的FixedRatePoller代替faster_sample_rate.py中"读完后sleep剩余间隔"的做法
+采样截止点按perf_counter_ns绝对时间推进，不会累积漂移；落后一个周期以上时跳过错过的周期。
+结束后打印实际采集率、跳过的周期数和调度抖动直方图。
+给出录制文件路径时，采样连同perf_counter_ns时间戳写入src/recording.py的记录文件，不在内存中保存。
+"""
+import time
+
+import numpy as np
+
+from src.modbus_rtu import RtuPoller, open_rtu_port
+from src.rate_control import FixedRatePoller, WAIT_MODES
+from src.recording import RecordingWriter, RecordingReader
+
+
+def main():
+    PORT = input("请输入串口号 (例如 'COM3'): ")
+    SLAVE_ADDRESS = int(input("请输入从机地址 (1-247): "))
+    BAUDRATE = int(input("请输入波特率 (默认115200): ") or "115200")
+    REGISTER_ADDRESS = int(input("请输入十六进制寄存器地址 (默认0206): ") or "0206", 16)
+    RATE = float(input("请输入采集率（Hz，默认500）: ") or "500")
+    MODE = input(f"请选择等待方式 {WAIT_MODES} (默认hybrid): ") or "hybrid"
+    RECORDING_PATH = input("请输入录制文件路径 (留空则保存在内存中): ")
+
+    ser = open_rtu_port(PORT, baudrate=BAUDRATE, timeout=0.05)
+    poller = RtuPoller(ser, SLAVE_ADDRESS, REGISTER_ADDRESS)
+    sampler = FixedRatePoller(lambda: poller.read_float(precision_bit=2), RATE, mode=MODE)
+    all_values = []
+    recorder = None
+    on_value = all_values.append
+    if RECORDING_PATH:
+        recorder = RecordingWriter(RECORDING_PATH, [{'name': f'slave{SLAVE_ADDRESS}', 'register': REGISTER_ADDRESS}],
+                                   metadata={'port': PORT, 'rate': RATE}).open()
+        on_value = lambda value: recorder.append(0, time.perf_counter_ns(), value)
+
+    print("\n开始读取数据，按 Ctrl+C 停止...")
+    start_time = time.perf_counter()
+    try:
+        sampler.run(on_value=on_value)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ser.close()
+        if recorder is not None:
+            recorder.close()
+
+    duration = time.perf_counter() - start_time
+    stats = sampler.get_statistics()
+    jitter = stats["jitter"]
+    print(f"\n程序结束")
+    print(f"总运行时间: {duration:.2f} 秒")
+    print(f"目标采样率: {RATE:.2f} Hz, 实际平均采样率: {stats['achieved_rate']:.2f} Hz")
+    if recorder is not None:
+        all_values = RecordingReader(RECORDING_PATH).read(0)['value']
+        print(f"采样已保存到 {RECORDING_PATH}")
+    print(f"成功采样: {len(all_values)}, 失败: {stats['failed_samples']}, 跳过周期: {stats['skipped_periods']}")
+    print(f"通讯统计: {poller.get_statistics()}")
+    if jitter["count"]:
+        print(f"调度抖动: 平均 {jitter['mean_ms']:.3f} ms, P50 {jitter['p50_ms']:.3f} ms, "
+              f"P99 {jitter['p99_ms']:.3f} ms, 最大 {jitter['max_ms']:.3f} ms")
+        for line in sampler.jitter.format_buckets():
+            print(line)
+
+    if len(all_values):
+        print("\n数据统计:")
+        print(f"最小值: {np.min(all_values)}")
+        print(f"最大值: {np.max(all_values)}")
+        print(f"平均值: {np.mean(all_values):.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,18 +5,22 @@ import statistics
 import struct
 
 import minimalmodbus
+import numpy as np
 import serial
 
+from src.recording import RecordingWriter, RecordingReader, FLAG_INVALID
+
 
 class SensorReader:
-    def __init__(self, port, slave_address, baudrate=9600):
+    def __init__(self, port, slave_address, baudrate=9600, recorder=None):
         """
         初始化传感器读取器的相关参数
 
         :param port: 串口选择
         :param slave_address: 从机地址
         :param baudrate: 波特率
-        :param sample_rate: 采样率（默认是1hz）
+        :param recorder: 记录文件写入器（src/recording.py的RecordingWriter，已打开），读取的值连同时间戳写入通道0，
+                         读取失败记为NaN并带FLAG_INVALID标志。数据不在内存中保存，长时间运行内存占用不变
 
         还包括：数据位、停止位、校验位（默认是8N1），modbus通讯模式等等
         """
@@ -31,8 +35,7 @@ class SensorReader:
         self.instrument.mode = minimalmodbus.MODE_RTU
         self.instrument.clear_buffers_before_each_transaction = True
 
-        # 添加一个列表来存储所有读取的值
-        self.all_values = []
+        self.recorder = recorder
 
     def read_float(self, register_address, precision_bit=2):
         """
@@ -52,11 +55,14 @@ class SensorReader:
             )
 
             rounded_value = round(float_value, precision_bit)
-            # 将读取的值添加到列表中
-            self.all_values.append(rounded_value)
+            # 将读取的值写入记录文件
+            if self.recorder is not None:
+                self.recorder.append(0, time.perf_counter_ns(), rounded_value)
             return rounded_value
         except Exception as e:
             print(f"读取错误: {e}")
+            if self.recorder is not None:
+                self.recorder.append(0, time.perf_counter_ns(), float('nan'), FLAG_INVALID)
             return None
 
 
@@ -109,7 +115,13 @@ def main():
     print(f"Modbus协议地址: {modbus_address} (十六进制: 0x{modbus_address:04X})")  # 04x是用于转换modbus_address为十六进制显示
     print(f"实际通信地址: 0x{modbus_address:04X}\n")
 
-    sensor = SensorReader(PORT, SLAVE_ADDRESS, BAUDRATE)
+    # 读取的值写入记录文件，不在内存中保存
+    recording_path = input("请输入录制文件路径 (默认按当前时间命名): ") or \
+        f"sensor_{datetime.datetime.now():%Y%m%d_%H%M%S}.sfrec"
+    recorder = RecordingWriter(recording_path, [{'name': f'slave{SLAVE_ADDRESS}', 'register': modbus_address}],
+                               metadata={'port': PORT}).open()
+
+    sensor = SensorReader(PORT, SLAVE_ADDRESS, BAUDRATE, recorder=recorder)
     print("\n开始读取数据，按 Ctrl+C 停止...")
     sample_count = 0
     start_time = time.perf_counter()
@@ -127,19 +139,21 @@ def main():
         print(f"总运行时间: {duration:.2f} 秒")
         print(f"总采样次数: {sample_count}")
         print(f"实际平均采样率: {actual_rate:.2f} Hz")
-
-        # 输出所有读取到的传感器值
-        print("\n所有读取到的传感器值:")
-        for i, value in enumerate(sensor.all_values, 1):
-            print(f"读取 {i}: {value}")
-
-        # 如果数据量很大，可以只打印统计信息
-        if len(sensor.all_values) > 100:
-            print("\n数据统计:")
-            print(f"总数据点: {len(sensor.all_values)}")
-            print(f"最小值: {min(sensor.all_values)}")
-            print(f"最大值: {max(sensor.all_values)}")
-            print(f"平均值: {sum(sensor.all_values) / len(sensor.all_values):.2f}")
+    finally:
+        sensor.instrument.serial.close()
+        recorder.close()
+
+    # 统计信息从记录文件中读取；逐条查看数值可以导出为CSV：
+    # python -m src.export <记录文件> <输出文件.csv>
+    records = RecordingReader(recording_path).read(0)
+    values = records['value'][(records['flags'] & FLAG_INVALID) == 0]
+    print(f"\n采样已保存到 {recording_path}")
+    if len(values):
+        print("\n数据统计:")
+        print(f"总数据点: {len(values)}，读取失败: {len(records) - len(values)}")
+        print(f"最小值: {np.min(values)}")
+        print(f"最大值: {np.max(values)}")
+        print(f"平均值: {np.mean(values):.2f}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,51 @@
+"""
+事务分阶段计时：分别对test_single_time.py中的SensorReader（minimalmodbus）和RtuPoller做N次读取，
+用src/transaction_profiler.py统计每个阶段（Python开销、线路时间、从机应答延迟、OS/USB延迟）的耗时分布。
+
+运行方式（项目根目录下）：
+python -m test.test_of_modbus.profile_transaction [串口=sim] [从机地址=1] [寄存器地址=0x0206] [波特率=115200] [次数=500]
+串口为sim（默认）时使用src/modbus_simulator.py中的模拟器（模拟波特率，应答延迟0.5ms）。
+"""
+import sys
+
+from src.modbus_rtu import RtuPoller, open_rtu_port
+from src.modbus_simulator import RtuSlaveSimulator
+from src.transaction_profiler import TimedSerial, TransactionProfiler, profile_instrument
+from test.test_of_modbus.test_single_time import SensorReader
+
+
+def main():
+    port = sys.argv[1] if len(sys.argv) > 1 else 'sim'
+    slave_address = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    register_address = int(sys.argv[3], 0) if len(sys.argv) > 3 else 0x0206
+    baudrate = int(sys.argv[4]) if len(sys.argv) > 4 else 115200
+    count = int(sys.argv[5]) if len(sys.argv) > 5 else 500
+
+    simulator = None
+    if port == 'sim':
+        simulator = RtuSlaveSimulator([slave_address], turnaround=0.0005, baudrate=baudrate)
+        port = simulator.start()
+
+    print(f"===== minimalmodbus SensorReader（{port}, {baudrate}） =====")
+    sensor = SensorReader(port, slave_address, baudrate)
+    profiler = profile_instrument(sensor.instrument)
+    for _ in range(count):
+        profiler.measure(sensor.read_float, register_address)
+    profiler.print_results()
+    sensor.instrument.serial.close()
+
+    print(f"\n===== RtuPoller（{port}, {baudrate}） =====")
+    ser = TimedSerial(open_rtu_port(port, baudrate=baudrate))
+    poller = RtuPoller(ser, slave_address, register_address)
+    profiler = TransactionProfiler(ser)
+    for _ in range(count):
+        profiler.measure(poller.read_float)
+    profiler.print_results()
+    ser.close()
+
+    if simulator is not None:
+        simulator.stop()
+
+
+if __name__ == "__main__":
+    main()
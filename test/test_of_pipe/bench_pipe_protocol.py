@@ -0,0 +1,184 @@
+"""
+管道协议吞吐量测试：对比旧协议（长度+数据）、每条消息单独成帧的带顺序号和CRC32的协议，
+以及PipeTransmitter的默认设置（每帧最多16条消息，每条消息最多等待2ms）
+发送端使用test/sensor_with_robot_arm.py中的PipeTransmitter，接收端使用src/pipe_receiver.py中的PipeReceiver。
+每条消息是50个报文，与run_data_transmission的默认批量一致。
+
+分三种情况测试：
+1. 编解码CPU开销：在同一个进程里打包、拆包，不经过管道，每条消息的耗时，结果稳定，反映协议本身的开销
+2. 只测协议：发送固定字符串，接收端只拆消息，两个进程共用CPU时受调度影响，波动较大
+3. 带收发两端的处理：发送端每次拼接报文，接收端用decode_batch解码为NumPy数组，接近实际使用时的吞吐量
+另外测量默认设置下按不同间隔发送时，消息从send_data到被接收的延迟，检查攒消息的等待时间不超过max_delay太多
+"""
+import os
+import time
+import struct
+import logging
+import tempfile
+import multiprocessing
+from typing import Optional, List
+
+from src.pipe_receiver import PipeReceiver, decode_batch, pack_frame, pack_multi_frame
+from test.sensor_with_robot_arm import PipeTransmitter
+
+logging.disable(logging.INFO)   # 只看测试结果，屏蔽管道开关的日志
+
+
+def run_once(sequenced: bool, message_count: int, report_count: int = 50, with_processing: bool = False,
+             frame_messages: int = 1, max_delay: Optional[float] = None) -> float:
+    """
+    通过命名管道发送message_count条消息并全部接收
+
+    :param sequenced: 是否使用带顺序号的协议
+    :param frame_messages: 带顺序号的协议中每帧最多的消息数
+    :param max_delay: 消息最多等待的时间（秒），见PipeTransmitter
+    :param message_count: 消息条数
+    :param report_count: 每条消息中的报文数量
+    :param with_processing: 是否包含发送端拼接报文和接收端解码的处理
+    :return: 每秒传输的消息条数
+    """
+    pipe_path = os.path.join(tempfile.mkdtemp(), 'bench_pipe')
+    receiver = PipeReceiver(pipe_path, sequenced=sequenced)
+    receiver.open()
+    reports = [f"+{i % 1000:03d}.34" for i in range(report_count)]
+    data = ' '.join(reports)
+
+    def send():
+        transmitter = PipeTransmitter(pipe_path, sequenced=sequenced, frame_messages=frame_messages,
+                                      max_delay=max_delay)
+        transmitter.open()
+        for _ in range(message_count):
+            transmitter.send_data(' '.join(reports) if with_processing else data)
+        transmitter.close()
+
+    start_time = time.perf_counter()
+    sender = multiprocessing.get_context('fork').Process(target=send)     # 发送端和接收端与实际使用时一样，分属不同的进程
+    sender.start()
+    received = 0
+    while received < message_count:
+        messages = receiver.receive(timeout=1.0)
+        if with_processing:
+            for payload in messages:
+                decode_batch(payload)
+        received += len(messages)
+    duration = time.perf_counter() - start_time
+    sender.join()
+    receiver.close()
+    os.remove(pipe_path)
+    assert receiver.lost_messages == 0 and receiver.crc_errors == 0
+    return message_count / duration
+
+
+def latency_once(interval: float, message_count: int) -> List[float]:
+    """
+    按默认设置的PipeTransmitter每隔interval秒发送一条消息，测量每条消息从send_data到被接收的延迟
+
+    :param interval: 发送间隔（秒），0为连续发送
+    :param message_count: 消息条数
+    :return: 排好序的延迟（ms）
+    """
+    pipe_path = os.path.join(tempfile.mkdtemp(), 'bench_pipe')
+    receiver = PipeReceiver(pipe_path)
+    receiver.open()
+
+    def send():
+        transmitter = PipeTransmitter(pipe_path)
+        transmitter.open()
+        for _ in range(message_count):
+            transmitter.send_data(str(time.perf_counter_ns()))
+            if interval:
+                time.sleep(interval)
+        transmitter.close()
+
+    sender = multiprocessing.get_context('fork').Process(target=send)
+    sender.start()
+    latencies = []
+    while len(latencies) < message_count:
+        messages = receiver.receive(timeout=1.0)
+        now = time.perf_counter_ns()        # Linux上perf_counter_ns是系统范围的单调时钟，两个进程可以直接相减
+        latencies.extend((now - int(payload)) / 1e6 for payload in messages)
+    sender.join()
+    receiver.close()
+    os.remove(pipe_path)
+    return sorted(latencies)
+
+
+def codec_cost(sequenced: bool, frame_messages: int, message_count: int = 50000, report_count: int = 50,
+               batch: int = 64) -> float:
+    """
+    在同一个进程里打包并拆包message_count条消息
+
+    :param sequenced: 是否使用带顺序号的协议
+    :param frame_messages: 带顺序号的协议中每帧的消息数，必须整除batch
+    :param message_count: 消息条数
+    :param report_count: 每条消息中的报文数量
+    :param batch: 每次放入接收缓冲区的消息数
+    :return: 每条消息的耗时（us）
+    """
+    payload = ' '.join(f"+{i % 1000:03d}.34" for i in range(report_count)).encode('utf-8')
+    receiver = PipeReceiver(sequenced=sequenced)
+    split = receiver._split_frames if sequenced else receiver._split_messages
+    start_time = time.perf_counter()
+    seq = received = 0
+    for _ in range(message_count // batch):
+        if not sequenced:
+            frames = [struct.pack('<I', len(payload)) + payload for _ in range(batch)]
+        elif frame_messages == 1:
+            frames = [pack_frame(seq + i, payload) for i in range(batch)]
+        else:
+            frames = [pack_multi_frame(seq + i, [payload] * frame_messages) for i in range(0, batch, frame_messages)]
+        seq += batch
+        data = b''.join(frames)
+        receiver._buffer[:len(data)] = data
+        receiver._start, receiver._end = 0, len(data)
+        received += len(split())
+    return (time.perf_counter() - start_time) / received * 1e6
+
+
+def main():
+    message_count = 100000
+    repeats = 5
+    # 编解码开销中默认设置按每帧16条计算，即高速发送时的情况；低速时消息单独成帧，但此时开销无关紧要
+    cases = [("旧协议", False, 1, None), ("带顺序号+CRC32，逐条成帧", True, 1, None),
+             ("带顺序号+CRC32，默认设置（每帧最多16条，最多等待2ms）", True, 16, 0.002)]
+    # 各种协议轮流测量，取各自的最好成绩，避免机器负载的变化只影响其中一种
+    costs = [float('inf')] * len(cases)
+    for _ in range(15):
+        for index, (_, sequenced, frame_messages, _) in enumerate(cases):
+            costs[index] = min(costs[index], codec_cost(sequenced, frame_messages))
+    rates = {}
+    for with_processing in (False, True):
+        results = [0.0] * len(cases)
+        for _ in range(repeats):
+            for index, (_, sequenced, frame_messages, max_delay) in enumerate(cases):
+                results[index] = max(results[index], run_once(sequenced, message_count, with_processing=with_processing,
+                                                              frame_messages=frame_messages, max_delay=max_delay))
+        rates[with_processing] = results
+
+    print("编解码CPU开销（占实际处理耗时的比例按“带收发两端的处理”中旧协议的每条耗时计算）:")
+    processing_us = 1e6 / rates[True][0]
+    for index, (name, _, _, _) in enumerate(cases):
+        line = f"  {name}: {costs[index]:.3f} us/条"
+        if index:
+            extra = costs[index] - costs[0]
+            line += f", 多出 {extra:.3f} us/条, 占实际处理耗时 {extra / processing_us * 100:.2f}%"
+        print(line)
+    for with_processing in (False, True):
+        print("带收发两端的处理:" if with_processing else "只测协议:")
+        results = rates[with_processing]
+        for index, (name, _, _, _) in enumerate(cases):
+            line = f"  {name}: {results[index]:.0f} 条/秒, {results[index] * 50:.0f} 个报文/秒"
+            if index:
+                line += f", 吞吐量开销 {(results[0] - results[index]) / results[0] * 100:.2f}%"
+            print(line)
+
+    print("默认设置的延迟（send_data到被接收）:")
+    for interval, message_count in ((0.01, 300), (0.0003, 5000), (0, 100000)):
+        latencies = latency_once(interval, message_count)
+        name = f"每{interval * 1000:g}ms一条" if interval else "连续发送"
+        print(f"  {name}: P50 {latencies[len(latencies) // 2]:.3f} ms, "
+              f"P99 {latencies[int(len(latencies) * 0.99)]:.3f} ms, 最大 {latencies[-1]:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+回放吞吐量测试：把录制文件尽可能快地回放，经过read_sensor_data解码、PipeTransmitter发送，
+再由PipeReceiver接收解码，统计整条流水线每秒能处理的报文数。
+不指定录制文件时，生成一段合成的录制文件（1kHz报文，串口每次读到64字节）。
+
+运行方式（项目根目录下）：
+python -m test.test_of_pipe.bench_replay_pipeline [录制文件路径] [回放倍速，默认尽可能快]
+"""
+import os
+import sys
+import time
+import logging
+import tempfile
+import multiprocessing
+
+from src.pipe_receiver import PipeReceiver, decode_batch
+from src.raw_capture import RawCaptureWriter
+from test.sensor_with_robot_arm import run_data_transmission
+
+logging.disable(logging.INFO)   # 只看测试结果，屏蔽管道开关的日志
+
+
+def write_synthetic_capture(capture_path: str, duration: float = 60.0, rate: float = 1000.0,
+                            chunk_size: int = 64) -> int:
+    """
+    生成合成的录制文件
+
+    :param capture_path: 录制文件路径
+    :param duration: 录制时长（秒）
+    :param rate: 报文速率（个/秒）
+    :param chunk_size: 每个数据块的字节数
+    :return: 报文个数
+    """
+    report_count = int(duration * rate)
+    stream = b''.join(b'%+06.2f\r' % ((i % 2000) / 100) for i in range(report_count))
+    byte_interval_ns = 1e9 / rate / 7                 # 每个报文7字节
+    writer = RawCaptureWriter(capture_path, baudrate=115200)
+    writer.open()
+    for offset in range(0, len(stream), chunk_size):
+        chunk = stream[offset:offset + chunk_size]
+        writer.write(chunk, t_ns=int((offset + len(chunk)) * byte_interval_ns))
+    writer.close()
+    return report_count
+
+
+def main():
+    temp_dir = tempfile.mkdtemp()
+    if len(sys.argv) > 1:
+        capture_path = sys.argv[1]
+    else:
+        capture_path = os.path.join(temp_dir, 'synthetic.raw')
+        write_synthetic_capture(capture_path)
+    speed = float(sys.argv[2]) if len(sys.argv) > 2 else None
+    pipe_path = os.path.join(temp_dir, 'bench_pipe')
+
+    receiver = PipeReceiver(pipe_path)
+    receiver.open()
+    # 发送端在单独的进程中运行，与实际使用时一样
+    sender = multiprocessing.get_context('fork').Process(
+        target=run_data_transmission,
+        kwargs=dict(port_name=None, baudrate=115200, pipe_path=pipe_path,
+                    replay_path=capture_path, replay_speed=speed))
+    start_time = time.perf_counter()
+    sender.start()
+    total_reports = 0
+    while True:
+        messages = receiver.receive(timeout=0.5)
+        for payload in messages:
+            total_reports += len(decode_batch(payload))
+        if receiver.writer_disconnects or (not messages and not sender.is_alive()):
+            break
+    duration = time.perf_counter() - start_time
+    sender.join()
+    receiver.close()
+
+    print(f"回放文件: {capture_path}, 倍速: {speed or '尽可能快'}")
+    print(f"报文数: {total_reports}, 耗时: {duration:.2f} 秒, 吞吐量: {total_reports / duration:.0f} 个/秒")
+    print(f"丢失消息: {receiver.lost_messages}, CRC错误: {receiver.crc_errors}")
+
+
+if __name__ == "__main__":
+    main()
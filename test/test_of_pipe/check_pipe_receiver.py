@@ -0,0 +1,173 @@
+"""
+管道接收的检查：按 src/pipe_receiver.py 的协议把消息写入真实的命名管道，每次写入任意长度的一段后调用 drain()，
+检查 PipeReceiver 拆出的消息和统计：
+    - 单消息帧（SFP2）和多消息帧（SFP3）混合，数据被切成任意长度写入：消息完整、按顺序、没有误报
+    - 丢帧、数据内容损坏（CRC错误）、长度字段损坏、帧之间插入垃圾字节（包括假的'SFP'前缀）：
+      其余消息全部按顺序收到，lost_messages正好等于丢失和损坏的帧中的消息数，并且重新同步
+    - 顺序号在uint32处回绕时不算丢失
+    - 写端在一帧的中间断开后重新连接：半截的帧被丢弃，不和新写端的数据拼在一起
+    - 旧协议（长度 + 数据内容）
+检查失败时抛出AssertionError，全部通过时打印“全部通过”。
+
+运行方式（项目根目录下）：
+python -m test.test_of_pipe.check_pipe_receiver
+"""
+import os
+import random
+import shutil
+import struct
+import tempfile
+
+from src.pipe_receiver import PipeReceiver, pack_frame, pack_multi_frame
+
+
+def make_messages(count: int, rng: random.Random):
+    return [f"msg{i}:".encode() + bytes(rng.randrange(256) for _ in range(rng.randint(0, 300)))
+            for i in range(count)]
+
+
+def make_frames(messages, first_seq: int, rng: random.Random):
+    """把消息随机分成每帧1~8条，返回[(第一条消息的下标, 消息数, 帧)]"""
+    frames = []
+    index = 0
+    while index < len(messages):
+        count = min(rng.choice([1, 1, 2, 8]), len(messages) - index)
+        frames.append((index, count, pack_multi_frame(first_seq + index, messages[index:index + count])))
+        index += count
+    return frames
+
+
+class PipePair:
+    """临时目录中的命名管道，一端是PipeReceiver，另一端是写端的文件描述符"""
+    def __init__(self, directory: str, sequenced: bool = True):
+        self.receiver = PipeReceiver(os.path.join(directory, 'pipe'), sequenced=sequenced)
+        self.receiver.open()
+        self.writer = os.open(self.receiver.pipe_path, os.O_WRONLY)
+
+    def send(self, stream: bytes, rng: random.Random):
+        """把数据切成任意长度写入，每段写完就drain一次"""
+        messages = []
+        position = 0
+        while position < len(stream):
+            size = rng.randint(1, 2000)
+            os.write(self.writer, stream[position:position + size])
+            position += size
+            messages.extend(self.receiver.drain())
+        return messages
+
+    def reconnect(self):
+        os.close(self.writer)
+        leftovers = self.receiver.drain()
+        self.writer = os.open(self.receiver.pipe_path, os.O_WRONLY)
+        return leftovers
+
+    def close(self):
+        os.close(self.writer)
+        self.receiver.close()
+
+
+def check_clean(directory: str, rng: random.Random) -> None:
+    messages = make_messages(3000, rng)
+    pair = PipePair(directory)
+    try:
+        stream = b''.join(frame for _, _, frame in make_frames(messages, 0, rng))
+        received = pair.send(stream, rng)
+        statistics = pair.receiver.get_statistics()
+    finally:
+        pair.close()
+    assert received == messages, "消息不完整或顺序不对"
+    for key in ('header_errors', 'crc_errors', 'resyncs', 'gaps', 'lost_messages', 'discarded_bytes'):
+        assert statistics[key] == 0, f"没有错误的数据流中{key}应为0: {statistics}"
+
+
+def check_corruption(directory: str, rng: random.Random) -> None:
+    messages = make_messages(3000, rng)
+    frames = make_frames(messages, 0, rng)
+    damaged = rng.sample(range(1, len(frames) - 1), 60)
+    dropped, payload_errors, header_errors = set(damaged[:20]), set(damaged[20:40]), set(damaged[40:])
+    garbage_after = set(rng.sample(range(len(frames) - 1), 20))
+
+    stream = bytearray()
+    for number, (_, _, frame) in enumerate(frames):
+        if number in dropped:
+            continue
+        frame = bytearray(frame)
+        if number in payload_errors:
+            frame[rng.randrange(20, len(frame)) if len(frame) > 20 else 19] ^= 0xFF
+        if number in header_errors:
+            frame[8 + rng.randrange(8)] ^= 1 << rng.randrange(8)        # 长度或长度取反
+        stream += frame
+        if number in garbage_after:
+            stream += bytes(rng.randrange(256) for _ in range(rng.randint(1, 50))) + b'SFPx' + b'SFP3' + b'\0' * 3
+
+    pair = PipePair(directory)
+    try:
+        received = pair.send(bytes(stream), rng)
+        statistics = pair.receiver.get_statistics()
+    finally:
+        pair.close()
+    lost = dropped | payload_errors | header_errors
+    expected = [message for number, (index, count, _) in enumerate(frames) if number not in lost
+                for message in messages[index:index + count]]
+    assert received == expected, "损坏的数据流中，完好的消息没有全部按顺序收到"
+    assert statistics['lost_messages'] == sum(frames[number][1] for number in lost), \
+        f"丢失的消息数不对: {statistics['lost_messages']}"
+    assert statistics['crc_errors'] >= len(payload_errors), f"CRC错误没有全部检出: {statistics}"
+    assert statistics['resyncs'] > 0 and statistics['discarded_bytes'] > 0, f"没有重新同步: {statistics}"
+    assert statistics['sequence_resets'] == 0, f"不应出现顺序号回退: {statistics}"
+
+
+def check_wraparound(directory: str, rng: random.Random) -> None:
+    messages = make_messages(200, rng)
+    stream = b''.join(pack_multi_frame((0xFFFFFFFF - 50 + index) & 0xFFFFFFFF, messages[index:index + count])
+                      for index, count, _ in make_frames(messages, 0, rng))
+    pair = PipePair(directory)
+    try:
+        received = pair.send(stream, rng)
+        statistics = pair.receiver.get_statistics()
+    finally:
+        pair.close()
+    assert received == messages, "顺序号回绕时消息不完整"
+    assert statistics['gaps'] == statistics['sequence_resets'] == 0, f"顺序号回绕被当作丢失或回退: {statistics}"
+
+
+def check_reconnect(directory: str, rng: random.Random) -> None:
+    first, second = make_messages(50, rng), make_messages(50, rng)
+    pair = PipePair(directory)
+    try:
+        stream = b''.join(pack_frame(seq, message) for seq, message in enumerate(first))
+        cut = len(stream) - len(pack_frame(49, first[-1])) // 2        # 最后一帧只写了一半
+        received = pair.send(stream[:cut], rng)
+        received += pair.reconnect()
+        received += pair.send(b''.join(pack_frame(seq, message) for seq, message in enumerate(second)), rng)
+        statistics = pair.receiver.get_statistics()
+    finally:
+        pair.close()
+    assert received == first[:-1] + second, "写端重新连接后消息不对"
+    assert statistics['writer_disconnects'] == 1 and statistics['crc_errors'] == 0, f"重新连接的统计不对: {statistics}"
+
+
+def check_legacy(directory: str, rng: random.Random) -> None:
+    messages = make_messages(1000, rng)
+    pair = PipePair(directory, sequenced=False)
+    try:
+        received = pair.send(b''.join(struct.pack('<I', len(message)) + message for message in messages), rng)
+    finally:
+        pair.close()
+    assert received == messages, "旧协议的消息不完整"
+
+
+def main():
+    rng = random.Random(0)
+    directory = tempfile.mkdtemp(prefix='check_pipe_')
+    try:
+        for check in (check_clean, check_corruption, check_wraparound, check_reconnect, check_legacy):
+            check(directory, rng)
+            print(f"{check.__name__}: 通过")
+    finally:
+        shutil.rmtree(directory)
+    print("全部通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+归档压缩的压缩比与编解码速度：src/archive.py
+生成一个模拟力传感器的记录文件（默认1kHz采集约1小时，数值为两位小数，时间戳带有抖动和偶尔的无效采样），
+用不同的编解码器和块大小归档，打印压缩比、编码和解码的吞吐量，以及从归档中随机读取1秒数据的耗时。
+
+运行方式（项目根目录下）：
+python -m test.test_of_recording.bench_archive [采样数=3600000] [输出目录=临时目录]
+"""
+import os
+import sys
+import time
+import tempfile
+
+import numpy as np
+
+from src.recording import RecordingWriter, RecordingReader, FLAG_INVALID
+from src.archive import ArchiveReader, archive_recording
+
+
+def make_recording(path: str, samples: int) -> None:
+    """缓慢变化的力信号加噪声，报文只有两位小数"""
+    period_ns = 1_000_000
+    rng = np.random.default_rng(0)
+    with RecordingWriter(path, [{'name': 'force', 'unit': 'kg', 'decimals': 2}]) as writer:
+        for offset in range(0, samples, 1_000_000):
+            index = np.arange(offset, min(offset + 1_000_000, samples))
+            timestamps = index * period_ns + rng.integers(-50_000, 50_000, len(index))
+            values = np.round(20 * np.sin(index / 200_000) + rng.normal(0, 0.03, len(index)), 2)
+            flags = np.where(rng.random(len(index)) < 1e-4, FLAG_INVALID, 0)
+            values[flags != 0] = np.nan
+            writer.append_many(0, timestamps, values, flags)
+
+
+def main():
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 3_600_000
+    directory = sys.argv[2] if len(sys.argv) > 2 else tempfile.gettempdir()
+    source = os.path.join(directory, 'bench_archive.sfrec')
+    destination = os.path.join(directory, 'bench_archive.sfarc')
+    make_recording(source, samples)
+    with RecordingReader(source) as reader:
+        original = reader.read(0).copy()
+        t_middle = int(original['timestamp'][len(original) // 2])
+    print(f"记录文件: {samples} 个采样, 原始记录 {original.nbytes / 1e6:.1f} MB, "
+          f"文件（含金字塔和预分配）{os.path.getsize(source) / 1e6:.1f} MB")
+
+    print(f"{'编解码器':>10}{'块记录数':>10}{'压缩比':>10}{'字节/采样':>10}{'编码 MB/s':>12}{'解码 MB/s':>12}"
+          f"{'读1秒 ms':>10}")
+    for codec, level in (('none', None), ('zlib', 1), ('zlib', 6), ('zlib', 9), ('lzma', 6)):
+        for block_records in (8192, 65536):
+            start = time.perf_counter()
+            result = archive_recording(source, destination, codec=codec, level=level, block_records=block_records)
+            encode_s = time.perf_counter() - start
+            with ArchiveReader(destination) as archive:
+                start = time.perf_counter()
+                decoded = archive.read(0)
+                decode_s = time.perf_counter() - start
+                assert np.array_equal(decoded['value'], original['value'], equal_nan=True)
+                assert np.array_equal(decoded['timestamp'], original['timestamp'])
+                start = time.perf_counter()
+                archive.read_range(t_middle, t_middle + 1_000_000_000)
+                range_ms = (time.perf_counter() - start) * 1000
+            name = codec if level is None else f"{codec}-{level}"
+            print(f"{name:>10}{block_records:>10}{result['ratio']:>10.1f}"
+                  f"{result['archive_bytes'] / samples:>10.2f}{original.nbytes / 1e6 / encode_s:>12.1f}"
+                  f"{original.nbytes / 1e6 / decode_s:>12.1f}{range_ms:>10.2f}")
+    if len(sys.argv) <= 2:
+        os.remove(source)
+        os.remove(destination)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+写盘对采集循环的影响：在循环里直接写文件并定时fsync，与通过src/background_writer.py的后台线程写入对比
+模拟采集循环以固定节奏产生数据块（默认每1ms一个64字节的块），统计每次循环中写入操作的耗时分布，
+后台写入时另外打印丢弃数和写入延迟。
+
+运行方式（项目根目录下）：
+python -m test.test_of_recording.bench_background_writer [运行秒数=5] [fsync间隔秒=0.1] [数据块字节=64] [数据块间隔ms=1] [输出目录=临时目录]
+"""
+import os
+import sys
+import time
+import tempfile
+
+from src.background_writer import BackgroundFileWriter
+from src.latency_trace import LatencyHistogram
+from src.rate_control import wait_until
+
+
+def run_loop(write, duration: float, chunk: bytes, interval_ns: int) -> LatencyHistogram:
+    """按固定节奏调用write，返回write耗时的直方图"""
+    histogram = LatencyHistogram()
+    deadline = time.perf_counter_ns()
+    end = deadline + int(duration * 1e9)
+    while deadline < end:
+        start = time.perf_counter_ns()
+        write(chunk)
+        histogram.add(time.perf_counter_ns() - start)
+        deadline += interval_ns
+        wait_until(deadline)
+    return histogram
+
+
+def print_histogram(title: str, histogram: LatencyHistogram) -> None:
+    results = histogram.get_results()
+    print(f"{title}: {results['count']} 次, 平均 {results['mean_ms']:.4f} ms, P99 {results['p99_ms']:.4f} ms, "
+          f"最大 {results['max_ms']:.3f} ms")
+
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    fsync_interval = float(sys.argv[2]) if len(sys.argv) > 2 else 0.1
+    chunk = b'x' * (int(sys.argv[3]) if len(sys.argv) > 3 else 64)
+    interval_ns = int(float(sys.argv[4]) * 1e6) if len(sys.argv) > 4 else 1_000_000
+    directory = sys.argv[5] if len(sys.argv) > 5 else tempfile.gettempdir()
+
+    # 在循环里直接写文件，每隔fsync_interval秒fsync一次
+    inline_path = os.path.join(directory, 'bench_inline.bin')
+    with open(inline_path, 'wb') as f:
+        last_sync = [time.monotonic()]
+
+        def inline_write(data: bytes) -> None:
+            f.write(data)
+            if time.monotonic() - last_sync[0] >= fsync_interval:
+                f.flush()
+                os.fsync(f.fileno())
+                last_sync[0] = time.monotonic()
+
+        print_histogram("循环内写入+fsync", run_loop(inline_write, duration, chunk, interval_ns))
+    os.remove(inline_path)
+
+    # 后台线程写入，同样每隔fsync_interval秒fsync一次
+    background_path = os.path.join(directory, 'bench_background.bin')
+    writer = BackgroundFileWriter(background_path, fsync_interval=fsync_interval, name='bench')
+    with writer:
+        print_histogram("后台线程写入    ", run_loop(writer.submit, duration, chunk, interval_ns))
+    stats = writer.get_statistics()
+    print(f"后台写入: {stats['batches']} 次写入, {stats['syncs']} 次fsync, 丢弃 {stats['dropped']}, "
+          f"最大写入延迟 {stats['max_lag_ms']:.2f} ms, 最长单次写入 {stats['max_write_ms']:.2f} ms")
+    os.remove(background_path)
+
+
+if __name__ == "__main__":
+    main()
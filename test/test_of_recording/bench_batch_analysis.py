@@ -0,0 +1,66 @@
+"""
+离线批量分析的并行加速：src/batch_analysis.py 中 run_batch 在不同进程数下的耗时
+生成若干个模拟试验的记录文件（3个通道，带噪声、偶尔的冲击事件、无效采样和采样间断），
+依次用1、2、4...（不超过CPU核数）个进程分析，打印总耗时、相对workers=1总耗时的加速比，
+以及run_batch报告的并行度（CPU时间之和/总耗时，只说明同时在算的进程数，不等于加速比），最后打印一次完整的合并报告。
+
+运行方式（项目根目录下）：
+python -m test.test_of_recording.bench_batch_analysis [文件数=16] [每通道采样数=1000000] [输出目录=临时目录]
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+import numpy as np
+
+from src.recording import RecordingWriter, FLAG_INVALID
+from src.batch_analysis import run_batch, print_report
+
+
+def make_session(path: str, samples: int, seed: int) -> None:
+    """1kHz采集的X/Y/Z三个通道"""
+    rng = np.random.default_rng(seed)
+    period_ns = 1_000_000
+    timestamps = np.arange(samples, dtype=np.int64) * period_ns + rng.integers(-30_000, 30_000, samples)
+    timestamps[samples // 2:] += 50 * period_ns      # 一次50ms的采样间断
+    with RecordingWriter(path, [{'name': name, 'unit': 'kg'} for name in ('X', 'Y', 'Z')]) as writer:
+        for channel in range(3):
+            values = 5 * np.sin(np.arange(samples) / 30_000 + channel) + rng.normal(0, 0.05, samples)
+            for start in rng.integers(0, samples - 200, 5):
+                values[start:start + 200] += 8        # 冲击事件
+            flags = np.where(rng.random(samples) < 1e-4, FLAG_INVALID, 0)
+            values[flags != 0] = np.nan
+            writer.append_many(channel, timestamps, np.round(values, 2), flags)
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    samples = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000
+    directory = sys.argv[3] if len(sys.argv) > 3 else tempfile.mkdtemp(prefix='bench_batch_')
+    os.makedirs(directory, exist_ok=True)
+
+    start = time.perf_counter()
+    for index in range(files):
+        make_session(os.path.join(directory, f"session{index:03d}.sfrec"), samples, index)
+    print(f"生成 {files} 个文件（3 x {samples} 个采样）: {time.perf_counter() - start:.2f} 秒")
+
+    cores = os.cpu_count() or 1
+    counts = sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1)))
+    baseline = None     # workers=1（当前进程中依次分析）的总耗时，加速比以它为基准
+    print(f"{'进程数':>8}{'总耗时 s':>12}{'加速比':>10}{'CPU时间之和 s':>18}{'并行度':>10}")
+    for workers in counts:
+        report = run_batch([directory], workers=workers)
+        if workers == 1:
+            baseline = report["wall_s"]
+        print(f"{workers:>8}{report['wall_s']:>12.2f}{baseline / report['wall_s']:>10.2f}"
+              f"{report['cpu_s']:>18.2f}{report['parallelism']:>10.2f}")
+    print_report(report)
+
+    if len(sys.argv) <= 3:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+包络查询的耗时：src/recording.py 中 RecordingReader.envelope 与直接扫描原始采样的对比
+生成一段较长的记录（默认1kHz采集约3小时），在不同的缩放范围下按绘图宽度取包络，
+打印选用的金字塔层、输出点数和耗时；直接扫描的耗时随时间范围内的采样数增长，envelope只与输出点数有关。
+
+运行方式（项目根目录下）：
+python -m test.test_of_recording.bench_envelope [采样数=10000000] [像素数=1600] [记录文件路径=临时文件]
+"""
+import os
+import sys
+import time
+import tempfile
+
+import numpy as np
+
+from src.recording import RecordingWriter, RecordingReader
+
+
+def scan_envelope(reader: RecordingReader, t0: int, t1: int, pixels: int):
+    """直接扫描原始采样计算包络，作为对比"""
+    records = reader.read(0)
+    selected = records[(records['timestamp'] >= t0) & (records['timestamp'] <= t1)]
+    groups = np.array_split(selected['value'], min(pixels, len(selected)))
+    return [(group.min(), group.max(), group.mean()) for group in groups]
+
+
+def main():
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    pixels = int(sys.argv[2]) if len(sys.argv) > 2 else 1600
+    path = sys.argv[3] if len(sys.argv) > 3 else os.path.join(tempfile.gettempdir(), 'bench_envelope.sfrec')
+
+    # 1kHz采集的正弦信号加噪声
+    start = time.perf_counter()
+    period_ns = 1_000_000
+    with RecordingWriter(path, [{'name': 'force', 'unit': 'kg'}]) as writer:
+        for offset in range(0, samples, 1_000_000):
+            index = np.arange(offset, min(offset + 1_000_000, samples))
+            values = 10 * np.sin(index / 60_000) + np.random.normal(0, 0.1, len(index))
+            writer.append_many(0, index * period_ns, values)
+    print(f"写入 {samples} 个采样（含金字塔）: {time.perf_counter() - start:.2f} 秒, "
+          f"文件 {os.path.getsize(path) / 1e6:.1f} MB")
+
+    reader = RecordingReader(path)
+    total_ns = samples * period_ns
+    print(f"{'可见范围':>12}{'原始采样数':>14}{'输出点数':>10}{'envelope ms':>14}{'直接扫描 ms':>14}")
+    for fraction in (1.0, 0.1, 0.01, 0.001, 0.0001):
+        t0 = int(total_ns * (0.5 - fraction / 2))
+        t1 = int(total_ns * (0.5 + fraction / 2))
+        start = time.perf_counter()
+        envelope = reader.envelope(0, t0, t1, pixels)
+        envelope_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        scan_envelope(reader, t0, t1, pixels)
+        scan_ms = (time.perf_counter() - start) * 1000
+        print(f"{(t1 - t0) / 1e9:>10.1f} s{int((t1 - t0) / period_ns):>14}{len(envelope):>10}"
+              f"{envelope_ms:>14.2f}{scan_ms:>14.2f}")
+    reader.close()
+    if len(sys.argv) <= 3:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
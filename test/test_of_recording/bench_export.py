@@ -0,0 +1,89 @@
+"""
+导出的速度和内存：src/export.py 中 export_recording 与先读成Python列表再用csv模块逐行写出的对比
+生成一个X/Y/Z三通道的记录文件（默认每个通道1kHz采集约1小时），分别用逐行写出（只导出前naive_rows行，否则太慢）、
+分块导出长格式CSV、分块导出X/Y/Z合并的CSV，打印每秒行数和导出过程中NumPy/Python分配的内存峰值（tracemalloc）。
+安装了pyarrow时再导出一次Parquet。
+
+运行方式（项目根目录下）：
+python -m test.test_of_recording.bench_export [每通道采样数=3600000] [逐行写出的行数=300000] [输出目录=临时目录]
+"""
+import os
+import sys
+import csv
+import time
+import tempfile
+import tracemalloc
+
+import numpy as np
+
+from src.recording import RecordingWriter, RecordingReader
+from src.export import export_recording, pyarrow
+
+
+def make_recording(path: str, samples: int) -> None:
+    rng = np.random.default_rng(0)
+    period_ns = 1_000_000
+    with RecordingWriter(path, [{'name': name, 'unit': 'kg', 'decimals': 2} for name in ('X', 'Y', 'Z')]) as writer:
+        for offset in range(0, samples, 1_000_000):
+            index = np.arange(offset, min(offset + 1_000_000, samples))
+            timestamps = index * period_ns + rng.integers(0, 50_000, len(index))
+            for channel in range(3):
+                values = np.round(10 * np.sin(index / 50_000 + channel) + rng.normal(0, 0.05, len(index)), 2)
+                writer.append_many(channel, timestamps, values)
+
+
+def naive_export(source: str, destination: str, rows: int) -> int:
+    """原来的做法：读成Python列表，逐行写出"""
+    reader = RecordingReader(source)
+    records = reader.read(0)[:rows]
+    data = list(zip(records['timestamp'].tolist(), records['value'].tolist(), records['flags'].tolist()))
+    del records
+    reader.close()
+    with open(destination, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['channel', 'timestamp_ns', 'value', 'flags'])
+        for timestamp, value, flags in data:
+            writer.writerow([0, timestamp, value, flags])
+    return len(data)
+
+
+def measure(title: str, function, *args, **kwargs) -> None:
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rows = result if isinstance(result, int) else result['rows']
+    print(f"{title:<24}{rows:>12}{elapsed:>10.2f}{rows / elapsed:>14.0f}{peak / 1e6:>14.1f}")
+
+
+def main():
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 3_600_000
+    naive_rows = int(sys.argv[2]) if len(sys.argv) > 2 else 300_000
+    directory = sys.argv[3] if len(sys.argv) > 3 else tempfile.gettempdir()
+    source = os.path.join(directory, 'bench_export.sfrec')
+    make_recording(source, samples)
+    print(f"记录文件: 3 x {samples} 个采样, {os.path.getsize(source) / 1e6:.1f} MB")
+
+    outputs = []
+    print(f"{'方式':<24}{'行数':>12}{'耗时 s':>10}{'行/秒':>14}{'内存峰值 MB':>14}")
+    outputs.append(os.path.join(directory, 'bench_export_naive.csv'))
+    measure("逐行写出（csv模块）", naive_export, source, outputs[-1], naive_rows)
+    outputs.append(os.path.join(directory, 'bench_export_long.csv'))
+    measure("分块导出 长格式", export_recording, source, outputs[-1])
+    outputs.append(os.path.join(directory, 'bench_export_fused.csv'))
+    measure("分块导出 X/Y/Z合并", export_recording, source, outputs[-1], fuse=True)
+    if pyarrow is not None:
+        outputs.append(os.path.join(directory, 'bench_export_fused.parquet'))
+        measure("分块导出 Parquet", export_recording, source, outputs[-1], fuse=True)
+    else:
+        print("未安装pyarrow，跳过Parquet")
+
+    if len(sys.argv) <= 3:
+        for path in [source] + outputs:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+按时间范围读取的耗时：src/recording.py 中 RecordingReader.read_range 与读出整个通道再按时间戳过滤的对比
+生成一个多通道的长记录（默认3个通道、每个通道1kHz采集约3小时），打印打开文件（读取段索引）的耗时，
+以及不同长度的时间窗口下两种方式的耗时；read_range只在段索引和段内做二分查找，耗时与文件大小几乎无关。
+
+运行方式（项目根目录下）：
+python -m test.test_of_recording.bench_read_range [每通道采样数=10000000] [记录文件路径=临时文件]
+"""
+import os
+import sys
+import time
+import tempfile
+
+import numpy as np
+
+from src.recording import RecordingWriter, RecordingReader
+
+
+def scan_range(reader: RecordingReader, t0: int, t1: int):
+    """读出全部记录后按时间戳过滤，作为对比"""
+    results = {}
+    for channel, name in enumerate(reader.channel_names):
+        records = reader.read(channel)
+        results[name] = records[(records['timestamp'] >= t0) & (records['timestamp'] <= t1)]
+    return results
+
+
+def main():
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(tempfile.gettempdir(), 'bench_read_range.sfrec')
+
+    start = time.perf_counter()
+    period_ns = 1_000_000
+    channels = [{'name': name, 'unit': 'kg'} for name in ('X', 'Y', 'Z')]
+    with RecordingWriter(path, channels) as writer:
+        for offset in range(0, samples, 1_000_000):
+            index = np.arange(offset, min(offset + 1_000_000, samples))
+            for channel in range(len(channels)):
+                writer.append_many(channel, index * period_ns, np.sin(index / 60_000 + channel))
+    print(f"写入 {len(channels)} x {samples} 个采样: {time.perf_counter() - start:.2f} 秒, "
+          f"文件 {os.path.getsize(path) / 1e6:.1f} MB")
+
+    start = time.perf_counter()
+    reader = RecordingReader(path)
+    print(f"打开文件（读取段索引，{len(reader.segments)} 个段）: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    total_ns = samples * period_ns
+    print(f"{'时间窗口':>12}{'返回记录数':>14}{'read_range ms':>16}{'全部读出 ms':>14}")
+    for fraction in (0.1, 0.01, 0.001, 0.0001):
+        t0 = int(total_ns * 0.7)
+        t1 = t0 + int(total_ns * fraction)
+        start = time.perf_counter()
+        ranges = reader.read_range(t0, t1)
+        range_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        scanned = scan_range(reader, t0, t1)
+        scan_ms = (time.perf_counter() - start) * 1000
+        assert all(np.array_equal(ranges[name], scanned[name]) for name in ranges)
+        print(f"{(t1 - t0) / 1e9:>10.1f} s{sum(len(r) for r in ranges.values()):>14}"
+              f"{range_ms:>16.3f}{scan_ms:>14.2f}")
+    del ranges, scanned
+    reader.close()
+    if len(sys.argv) <= 2:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+记录文件的写入、读取速度：src/recording.py 中的 RecordingWriter / RecordingReader
+对比把采样保存在Python列表中（all_values.append）与逐条、批量写入记录文件的速度，
+以及读取时零拷贝视图与拼接的耗时，并打印每个采样占用的内存或磁盘空间。
+
+运行方式（项目根目录下）：
+python -m test.test_of_recording.bench_recording [采样数=1000000] [通道数=3] [记录文件路径=临时文件]
+"""
+import os
+import sys
+import time
+import tempfile
+import tracemalloc
+
+import numpy as np
+
+from src.recording import RecordingWriter, RecordingReader, RECORD_DTYPE
+
+
+def main():
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    channels = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    path = sys.argv[3] if len(sys.argv) > 3 else os.path.join(tempfile.gettempdir(), 'bench_recording.sfrec')
+    names = ['X', 'Y', 'Z', 'W'][:channels] if channels <= 4 else [f'ch{i}' for i in range(channels)]
+    per_channel = samples // channels
+
+    # 保存在Python列表中，内存占用另外用tracemalloc测量（会拖慢速度）
+    start = time.perf_counter()
+    all_values = [[] for _ in names]
+    for i in range(per_channel):
+        for values in all_values:
+            values.append((time.perf_counter_ns(), float(i)))
+    list_time = time.perf_counter() - start
+    del all_values
+    tracemalloc.start()
+    all_values = [[(time.perf_counter_ns(), float(i)) for i in range(per_channel)] for _ in names]
+    list_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del all_values
+    print(f"Python列表:   {samples / list_time:>12,.0f} 个/秒, 内存 {list_memory / samples:.1f} 字节/采样")
+
+    # 逐条写入记录文件
+    start = time.perf_counter()
+    with RecordingWriter(path, names) as writer:
+        for i in range(per_channel):
+            for channel in range(channels):
+                writer.append(channel, time.perf_counter_ns(), float(i))
+    append_time = time.perf_counter() - start
+    size = os.path.getsize(path)
+    print(f"逐条写入:     {samples / append_time:>12,.0f} 个/秒, 磁盘 {size / samples:.1f} 字节/采样 "
+          f"(记录 {RECORD_DTYPE.itemsize} 字节)")
+
+    # 批量写入记录文件
+    timestamps = np.arange(per_channel, dtype=np.int64) + time.perf_counter_ns()
+    values = np.arange(per_channel, dtype=np.float64)
+    start = time.perf_counter()
+    with RecordingWriter(path, names) as writer:
+        for channel in range(channels):
+            writer.append_many(channel, timestamps, values)
+    print(f"批量写入:     {samples / (time.perf_counter() - start):>12,.0f} 个/秒")
+
+    # 读取
+    reader = RecordingReader(path)
+    start = time.perf_counter()
+    total = sum(float(view['value'].sum()) for channel in names for view in reader.iter_views(channel))
+    view_time = time.perf_counter() - start
+    start = time.perf_counter()
+    concatenated = [reader.read(channel) for channel in names]
+    read_time = time.perf_counter() - start
+    print(f"零拷贝视图求和: {view_time * 1000:.2f} ms ({len(reader.segments)} 个段), "
+          f"拼接读取: {read_time * 1000:.2f} ms, 校验 {total == sum(float(c['value'].sum()) for c in concatenated)}")
+    del concatenated
+    reader.close()
+    if len(sys.argv) <= 3:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
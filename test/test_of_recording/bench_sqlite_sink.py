@@ -0,0 +1,109 @@
+"""
+SQLite写入对采集循环的影响：src/sqlite_sink.py 中 SQLiteSink 与在采集循环里直接插入并提交的对比
+模拟按固定节奏到达的多通道采样（默认3个通道、每个通道2kHz，每1ms处理一次积累的采样），
+分别在循环里直接INSERT+COMMIT和通过SQLiteSink的后台线程写入，打印循环中每次写入调用耗时的分布、
+实际写入的行数和每秒行数，以及后台写入的丢弃数和写入延迟。
+
+运行方式（项目根目录下）：
+python -m test.test_of_recording.bench_sqlite_sink [运行秒数=10] [每通道采样率Hz=2000] [通道数=3] [输出目录=临时目录]
+"""
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+
+import numpy as np
+
+from src.latency_trace import LatencyHistogram
+from src.sqlite_sink import SQLiteSink
+
+
+def remove_database(path: str) -> None:
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def acquisition_loop(duration: float, rate: float, channels: int, write) -> LatencyHistogram:
+    """每1ms把这段时间内到达的采样交给write(channel, timestamps, values)，返回每次调用的耗时分布"""
+    histogram = LatencyHistogram()
+    period_ns = int(1e9 / rate)
+    start = time.perf_counter_ns()
+    next_ns = start
+    emitted = 0
+    while True:
+        now = time.perf_counter_ns()
+        if now - start >= duration * 1e9:
+            break
+        due = int((now - start) // period_ns)
+        if due > emitted:
+            timestamps = start + np.arange(emitted, due, dtype=np.int64) * period_ns
+            values = np.round(10 * np.sin(timestamps / 1e9), 2)
+            for channel in range(channels):
+                begin = time.perf_counter_ns()
+                write(channel, timestamps, values + channel)
+                histogram.add(time.perf_counter_ns() - begin)
+            emitted = due
+        next_ns += 1_000_000
+        while time.perf_counter_ns() < next_ns:
+            pass
+    return histogram
+
+
+def report(title: str, histogram: LatencyHistogram, rows: int, duration: float) -> None:
+    results = histogram.get_results()
+    print(f"\n{title}: {rows} 行, {rows / duration:.0f} 行/秒")
+    print(f"  写入调用 {results['count']} 次: 平均 {results['mean_ms']:.3f} ms, P99 {results['p99_ms']:.3f} ms, "
+          f"最大 {results['max_ms']:.3f} ms")
+
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+    rate = float(sys.argv[2]) if len(sys.argv) > 2 else 2000.0
+    channels = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+    directory = sys.argv[4] if len(sys.argv) > 4 else tempfile.gettempdir()
+    names = [f"ch{channel}" for channel in range(channels)]
+    print(f"{channels} 个通道 x {rate:.0f} Hz，运行 {duration:.0f} 秒")
+
+    # 在循环里直接写入：每次调用一个事务
+    path = os.path.join(directory, 'bench_sqlite_inline.db')
+    remove_database(path)
+    connection = sqlite3.connect(path, isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("CREATE TABLE samples (channel INTEGER, timestamp INTEGER, value REAL, flags INTEGER)")
+    connection.execute("CREATE INDEX samples_channel_timestamp ON samples (channel, timestamp)")
+
+    def inline_write(channel, timestamps, values):
+        connection.execute("BEGIN")
+        connection.executemany("INSERT INTO samples VALUES (?, ?, ?, 0)",
+                               zip([channel] * len(timestamps), timestamps.tolist(), values.tolist()))
+        connection.execute("COMMIT")
+
+    histogram = acquisition_loop(duration, rate, channels, inline_write)
+    rows = connection.execute("SELECT count(*) FROM samples").fetchone()[0]
+    connection.close()
+    report("循环内直接写入", histogram, rows, duration)
+
+    # 后台线程写入
+    path = os.path.join(directory, 'bench_sqlite_sink.db')
+    remove_database(path)
+    sink = SQLiteSink(path, names).start()
+    histogram = acquisition_loop(duration, rate, channels, sink.append_many)
+    sink.stop()
+    statistics = sink.get_statistics()
+    with sqlite3.connect(path) as connection:
+        rollups = connection.execute("SELECT count(*), sum(count) FROM rollup_1s").fetchone()
+    report("SQLiteSink", histogram, statistics['rows'], duration)
+    print(f"  事务 {statistics['batches']} 次, 丢弃 {statistics['dropped']} 批, "
+          f"写入延迟 最近 {statistics['last_lag_ms']:.1f} ms / 最大 {statistics['max_lag_ms']:.1f} ms, "
+          f"最长事务 {statistics['max_write_ms']:.1f} ms")
+    print(f"  按秒汇总 {rollups[0]} 行, 覆盖 {rollups[1]} 个采样")
+
+    if len(sys.argv) <= 4:
+        remove_database(os.path.join(directory, 'bench_sqlite_inline.db'))
+        remove_database(path)
+
+
+if __name__ == "__main__":
+    main()
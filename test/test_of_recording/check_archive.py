@@ -0,0 +1,122 @@
+"""
+归档的编解码检查：src/archive.py 的 encode_block/decode_block 和 archive_recording/ArchiveReader
+    - 单块：时间戳（不等间隔、负的二阶差分、跨度很大）和标志位完全一致；
+      decimals位小数的数值解码后与float(文本)完全相同；NaN、inf、-inf原样恢复；1/2/4/8字节宽度都用到
+    - 每种编解码器（none、zlib、lzma）和多种块大小下，归档后读出的数据与记录文件完全一致，
+      read_range、iter_range的任意时间范围与记录文件的结果相同，iter_range每块不超过chunk_records
+    - 分辨率高于decimals的数值被量化，量化误差不超过半个分辨率，并由archive_recording报告
+检查失败时抛出AssertionError，全部通过时打印“全部通过”。
+
+运行方式（项目根目录下）：
+python -m test.test_of_recording.check_archive
+"""
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from src.recording import RecordingWriter, RecordingReader, RECORD_DTYPE, FLAG_INVALID
+from src.archive import encode_block, decode_block, archive_recording, ArchiveReader, CODECS
+
+
+def assert_same(actual: np.ndarray, expected: np.ndarray, message: str) -> None:
+    assert len(actual) == len(expected), f"{message}: 记录数 {len(actual)} != {len(expected)}"
+    assert np.array_equal(actual['timestamp'], expected['timestamp']), f"{message}: 时间戳不一致"
+    assert np.array_equal(actual['value'], expected['value'], equal_nan=True), f"{message}: 数值不一致"
+    assert np.array_equal(actual['flags'], expected['flags']), f"{message}: 标志位不一致"
+
+
+def check_blocks(rng) -> None:
+    for count in (1, 2, 3, 1000):
+        for scale in (1, 300, 70_000, 10 ** 10):        # 不同的差分宽度
+            records = np.zeros(count, dtype=RECORD_DTYPE)
+            records['timestamp'] = 10 ** 15 + np.cumsum(rng.integers(1, 5_000_000, count))
+            # 数值先格式化为两位小数的文本再解析，与ASCII报文解析出的数值相同
+            text = [f"{value:.2f}" for value in rng.normal(0, scale, count)]
+            records['value'] = [float(value) for value in text]
+            records['flags'] = rng.integers(0, 2 ** 32 if scale > 10 ** 5 else 3, count)
+            if count > 3:
+                records['value'][[3, 5, 7]] = [np.nan, np.inf, -np.inf]
+            for codec in CODECS:
+                block = encode_block(records, channel=3, decimals=2, codec=codec)
+                assert_same(decode_block(block), records, f"单块 count={count} scale={scale} {codec}")
+                # 块可以从更大的缓冲区中的任意位置解码
+                padded = b'\0' * 13 + block + b'\0' * 7
+                assert_same(decode_block(memoryview(padded), 13), records, "带偏移解码")
+
+    records = np.zeros(100, dtype=RECORD_DTYPE)
+    records['timestamp'] = np.arange(100) * 1000
+    records['value'] = rng.normal(0, 1, 100)
+    decoded = decode_block(encode_block(records, decimals=3))
+    assert np.abs(decoded['value'] - records['value']).max() <= 0.5e-3 + 1e-12, "量化误差超过半个分辨率"
+
+
+def make_recording(path: str, rng) -> None:
+    with RecordingWriter(path, [{'name': 'X', 'decimals': 2}, {'name': 'Y', 'decimals': 3}, 'Z'],
+                         segment_size=64 * 1024) as writer:
+        samples = 40_000
+        timestamps = 10 ** 12 + np.cumsum(rng.integers(900_000, 1_100_000, samples))
+        for channel, decimals in enumerate((2, 3, 2)):
+            values = np.round(rng.normal(5, 3, samples), decimals)
+            flags = np.where(rng.random(samples) < 0.001, FLAG_INVALID, 0)
+            values[flags != 0] = np.nan
+            chosen = np.sort(rng.choice(samples, samples - channel * 10_000, replace=False))
+            writer.append_many(channel, timestamps[chosen], values[chosen], flags[chosen])
+
+
+def check_archives(directory: str, rng) -> None:
+    source = os.path.join(directory, 'source.sfrec')
+    make_recording(source, rng)
+    with RecordingReader(source) as reader:
+        originals = [np.array(reader.read(channel)) for channel in range(len(reader.channel_names))]
+
+    for codec in CODECS:
+        for block_records in (100, 4096, 65536):
+            destination = os.path.join(directory, f'{codec}_{block_records}.sfarc')
+            result = archive_recording(source, destination, codec=codec, block_records=block_records)
+            assert result['records'] == sum(map(len, originals)), "归档的记录数不一致"
+            assert result['max_quantization_error'] == 0, "按通道的decimals归档不应有量化误差"
+            with ArchiveReader(destination) as archive:
+                assert archive.channel_names == ['X', 'Y', 'Z'], "通道名称不一致"
+                for channel, original in enumerate(originals):
+                    message = f"{codec} block_records={block_records} 通道{channel}"
+                    assert archive.count(channel) == len(original), f"{message}: 记录数不一致"
+                    assert_same(archive.read(channel), original, message)
+                    timestamps = original['timestamp']
+                    for _ in range(5):
+                        a, b = (int(t) for t in np.sort(rng.choice(timestamps, 2)))
+                        for t0, t1 in ((a, b), (a + 1, b - 1), (None, a), (b, None)):
+                            mask = np.ones(len(original), dtype=bool)
+                            if t0 is not None:
+                                mask &= timestamps >= t0
+                            if t1 is not None:
+                                mask &= timestamps <= t1
+                            name = archive.channel_names[channel]
+                            assert_same(archive.read_range(t0, t1, [name])[name], original[mask],
+                                        f"{message} read_range({t0}, {t1})")
+                            chunks = list(archive.iter_range(channel, t0, t1, 777))
+                            assert all(len(chunk) <= 777 for chunk in chunks), "iter_range的块超过chunk_records"
+                            joined = np.concatenate(chunks) if chunks else original[:0]
+                            assert_same(joined, original[mask], f"{message} iter_range({t0}, {t1})")
+
+    destination = os.path.join(directory, 'coarse.sfarc')
+    result = archive_recording(source, destination, decimals=1)
+    assert 0 < result['max_quantization_error'] <= 0.05 + 1e-9, "量化误差没有被报告或超过半个分辨率"
+
+
+def main():
+    rng = np.random.default_rng(0)
+    check_blocks(rng)
+    print("单块编解码: 通过")
+    directory = tempfile.mkdtemp(prefix='check_archive_')
+    try:
+        check_archives(directory, rng)
+    finally:
+        shutil.rmtree(directory)
+    print("归档文件: 通过")
+    print("全部通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+导出的格式检查：src/export.py 向量化格式化的CSV与Python逐个格式化的结果逐字相同，导出的文件与记录内容一致
+    - 整数和定点小数（0~6位小数，正负数、0、int64的边界值）与Python的格式化结果逐字相同
+    - 按通道decimals格式化的数值与原报文文本相同（例如'-0.05'、'12.30'，-0.0输出为'0.00'），NaN输出为空，
+      没有decimals时输出的文本解析后与原数值完全相等
+    - 长格式：表头、行数、通道号、时间戳、wall_ns、数值、标志位与记录一致；不同chunk_rows的输出逐字节相同
+    - 合并格式：其它通道的值与按时间戳直接查找的"不晚于该时刻、相差不超过tolerance_ns的最近有效采样"一致
+    - 时间范围t0/t1（含边界）；记录文件与按相同小数位数归档后的文件导出结果逐字节相同
+检查失败时抛出AssertionError，全部通过时打印“全部通过”。
+
+运行方式（项目根目录下）：
+python -m test.test_of_recording.check_export
+"""
+import os
+import csv
+import shutil
+import tempfile
+
+import numpy as np
+
+from src.recording import RecordingWriter, RecordingReader, FLAG_INVALID
+from src.archive import archive_recording
+from src.export import export_recording, format_csv, _int_field, _float_field
+
+
+def python_fixed(value: int, decimals: int) -> str:
+    """定点数value / 10**decimals 的文本，逐个用Python格式化"""
+    sign = '-' if value < 0 else ''
+    if not decimals:
+        return f"{sign}{abs(value)}"
+    integer, fraction = divmod(abs(value), 10 ** decimals)
+    return f"{sign}{integer}.{fraction:0{decimals}d}"
+
+
+def python_decimal(value: float, decimals: int) -> str:
+    """浮点数按decimals位小数的文本，NaN为空；舍入为0的负数输出为0（不输出'-0.00'）"""
+    if value != value:
+        return ''
+    text = f"{value:.{decimals}f}"
+    return text.lstrip('-') if float(text) == 0 else text
+
+
+def check_fields(rng) -> None:
+    edges = np.array([0, 1, -1, 9, 10, -10, 9999, 10000, -10001, 2 ** 63 - 1, -2 ** 63 + 1], dtype=np.int64)
+    integers = np.concatenate([edges, rng.integers(-10 ** 12, 10 ** 12, 2000), rng.integers(-100, 100, 200)])
+    for decimals in range(7):
+        lines = format_csv([_int_field(integers, decimals)]).decode().splitlines()
+        assert lines == [python_fixed(int(value), decimals) for value in integers], f"{decimals}位定点数格式不一致"
+
+    texts = ['0.00', '-0.05', '12.30', '-12.34', '100.00', '0.01', '-999999.99'] + \
+            [f"{value:.2f}" for value in rng.normal(0, 1000, 2000)]
+    texts = [python_decimal(float(text), 2) for text in texts]
+    values = np.array([float(text) for text in texts] + [np.nan, np.inf])
+    lines = format_csv([_float_field(values, 2)]).decode().split('\n')[:-1]
+    assert lines == texts + ['', ''], "按decimals格式化的数值与原文本不一致"
+
+    values = np.concatenate([rng.normal(0, 1, 1000), rng.normal(0, 1e9, 100), [1e-5, 123456789.125, -0.0, np.nan]])
+    lines = format_csv([_float_field(values, None)]).decode().split('\n')[:-1]
+    assert lines[-1] == '', "NaN应输出为空"
+    assert [float(line) for line in lines[:-1]] == values[:-1].tolist(), "最短表示解析后与原数值不相等"
+
+    columns = [_int_field(np.array([1, -2], dtype=np.int64)), _float_field(np.array([np.nan, 0.5]), 3),
+               _float_field(np.array([1.5, np.nan]), None)]
+    assert format_csv(columns) == b"1,,1.5\n-2,0.500,\n", "多列拼接的格式不正确"
+
+
+def make_recording(path: str, rng) -> None:
+    samples = 20_000
+    with RecordingWriter(path, [{'name': 'X', 'decimals': 2}, {'name': 'Y', 'decimals': 2},
+                                {'name': 'Z', 'decimals': 3}], segment_size=64 * 1024) as writer:
+        master = 10 ** 12 + np.cumsum(rng.integers(900_000, 1_100_000, samples))
+        for channel, decimals in enumerate((2, 2, 3)):
+            if channel == 0:
+                timestamps = master
+            else:
+                # 其它通道的采样时刻与主通道错开，并且有较长的中断
+                timestamps = np.sort(rng.choice(master[:-1], samples // (channel + 1), replace=False))
+                timestamps = timestamps + rng.integers(0, 900_000, len(timestamps))
+                timestamps = timestamps[(timestamps < master[5000]) | (timestamps > master[5100])]
+            values = np.round(rng.normal(0, 20, len(timestamps)), decimals)
+            flags = np.where(rng.random(len(timestamps)) < 0.01, FLAG_INVALID, 0)
+            values[rng.random(len(timestamps)) < 0.005] = np.nan
+            writer.append_many(channel, timestamps, values, flags)
+
+
+def read_csv(path: str):
+    with open(path, newline='') as f:
+        rows = list(csv.reader(f))
+    return rows[0], rows[1:]
+
+
+def check_long(source: str, directory: str, reader: RecordingReader, t0, t1) -> bytes:
+    outputs = []
+    for chunk_rows in (997, 1 << 16):
+        destination = os.path.join(directory, f'long_{chunk_rows}.csv')
+        result = export_recording(source, destination, t0=t0, t1=t1, wall_time=True, chunk_rows=chunk_rows)
+        with open(destination, 'rb') as f:
+            outputs.append(f.read())
+    assert outputs[0] == outputs[1], "不同chunk_rows的输出不一致"
+
+    header, rows = read_csv(destination)
+    assert header == ['channel', 'timestamp_ns', 'wall_ns', 'value', 'flags'], f"长格式表头不正确: {header}"
+    expected = []
+    for channel in range(len(reader.channel_names)):
+        records = reader.read_range(t0, t1, [channel])[reader.channel_names[channel]]
+        decimals = reader.channels[channel]['decimals']
+        for timestamp, value, flags in zip(records['timestamp'].tolist(), records['value'].tolist(),
+                                           records['flags'].tolist()):
+            expected.append([str(channel), str(timestamp), str(reader.to_wall_ns(timestamp)),
+                             python_decimal(value, decimals), str(flags)])
+    assert result['rows'] == len(rows) == len(expected), "长格式行数不一致"
+    assert rows == expected, "长格式的内容与记录不一致"
+    return outputs[0]
+
+
+def asof(records: np.ndarray, timestamps: np.ndarray, tolerance_ns: int) -> np.ndarray:
+    """逐个时间戳直接查找：不晚于该时刻、相差不超过tolerance_ns的最近有效采样"""
+    records = records[np.isfinite(records['value']) & ((records['flags'] & FLAG_INVALID) == 0)]
+    index = np.searchsorted(records['timestamp'], timestamps, side='right') - 1
+    found = (index >= 0) & (timestamps - records['timestamp'][np.maximum(index, 0)] <= tolerance_ns)
+    return np.where(found, records['value'][np.maximum(index, 0)], np.nan)
+
+
+def check_fused(source: str, directory: str, reader: RecordingReader, t0, t1) -> bytes:
+    tolerance_ns = 3_000_000
+    outputs = []
+    for chunk_rows in (333, 1 << 16):
+        destination = os.path.join(directory, f'fused_{chunk_rows}.csv')
+        export_recording(source, destination, t0=t0, t1=t1, fuse=True, tolerance_ns=tolerance_ns,
+                         chunk_rows=chunk_rows)
+        with open(destination, 'rb') as f:
+            outputs.append(f.read())
+    assert outputs[0] == outputs[1], "合并格式不同chunk_rows的输出不一致"
+
+    header, rows = read_csv(destination)
+    assert header == ['timestamp_ns', 'X', 'Y', 'Z'], f"合并格式表头不正确: {header}"
+    master = reader.read_range(t0, t1, ['X'])['X']
+    timestamps = master['timestamp']
+    assert [int(row[0]) for row in rows] == timestamps.tolist(), "合并格式的时间戳与主通道不一致"
+    invalid = ~np.isfinite(master['value']) | ((master['flags'] & FLAG_INVALID) != 0)
+    columns = [np.where(invalid, np.nan, master['value'])] + \
+              [asof(reader.read(channel), timestamps, tolerance_ns) for channel in (1, 2)]
+    for position, (values, decimals) in enumerate(zip(columns, (2, 2, 3)), 1):
+        expected = [python_decimal(value, decimals) for value in values.tolist()]
+        assert [row[position] for row in rows] == expected, f"合并格式第{position}列与直接查找的结果不一致"
+    assert any(row[2] == '' for row in rows) and any(row[2] != '' for row in rows), "检查数据应包含缺失值"
+    return outputs[0]
+
+
+def main():
+    rng = np.random.default_rng(0)
+    check_fields(rng)
+    print("字段格式化: 通过")
+
+    directory = tempfile.mkdtemp(prefix='check_export_')
+    try:
+        source = os.path.join(directory, 'source.sfrec')
+        make_recording(source, rng)
+        archive = os.path.join(directory, 'source.sfarc')
+        archive_recording(source, archive, block_records=4096)
+        with RecordingReader(source) as reader:
+            timestamps = reader.read(0)['timestamp']
+            for t0, t1 in ((None, None), (int(timestamps[3000]), int(timestamps[9000])),
+                           (int(timestamps[3000]) + 1, int(timestamps[9000]) - 1)):
+                recorded = (check_long(source, directory, reader, t0, t1),
+                            check_fused(source, directory, reader, t0, t1))
+                archived = (check_long(archive, directory, reader, t0, t1),
+                            check_fused(archive, directory, reader, t0, t1))
+                assert recorded == archived, "记录文件与归档文件的导出结果不一致"
+        print("长格式、合并格式、时间范围、归档文件: 通过")
+    finally:
+        shutil.rmtree(directory)
+    print("全部通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+记录文件的读写检查：src/recording.py 中 RecordingWriter 写入的数据用 RecordingReader 读回，逐项与原数据比较
+    - read / read_range / iter_range：任意时间范围（含边界、范围外、跨多个段）的结果与直接按时间戳过滤一致
+    - envelope：每个点的最小值、最大值、均值和有效采样数与对应原始采样直接计算的结果一致，NaN不计入
+    - 程序崩溃：写入进程不调用close直接退出后，已写入的记录全部可以读出，包络用原始数据补齐落后的金字塔
+    - 写入过程中（未close）打开读取，结果与已写入的部分一致
+检查失败时抛出AssertionError，全部通过时打印“全部通过”。
+
+运行方式（项目根目录下）：
+python -m test.test_of_recording.check_recording
+"""
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+
+import numpy as np
+
+from src.recording import RecordingWriter, RecordingReader, FLAG_INVALID
+
+SEGMENT_SIZE = 64 * 1024        # 小的段，让数据跨越多个段
+
+
+def make_data(samples: int, seed: int):
+    """递增但间隔不均匀的时间戳，带少量NaN（FLAG_INVALID）的数值"""
+    rng = np.random.default_rng(seed)
+    timestamps = 10 ** 12 + np.cumsum(rng.integers(1, 2_000_000, samples)).astype(np.int64)
+    values = np.round(rng.normal(0, 10, samples), 2)
+    flags = np.where(rng.random(samples) < 0.01, FLAG_INVALID, 0).astype(np.uint32)
+    values[flags != 0] = np.nan
+    return timestamps, values, flags
+
+
+def write_recording(path: str, data, batch: int = 777) -> None:
+    """一部分逐条写入，其余分批写入"""
+    with RecordingWriter(path, ['A', 'B'], segment_size=SEGMENT_SIZE) as writer:
+        for channel, (timestamps, values, flags) in enumerate(data):
+            for i in range(100):
+                writer.append(channel, int(timestamps[i]), float(values[i]), int(flags[i]))
+            for start in range(100, len(timestamps), batch):
+                stop = start + batch
+                writer.append_many(channel, timestamps[start:stop], values[start:stop], flags[start:stop])
+
+
+def assert_records(records: np.ndarray, timestamps, values, flags, message: str) -> None:
+    assert np.array_equal(records['timestamp'], timestamps), f"{message}: 时间戳不一致"
+    assert np.array_equal(records['value'], values, equal_nan=True), f"{message}: 数值不一致"
+    assert np.array_equal(records['flags'], flags), f"{message}: 标志位不一致"
+
+
+def check_envelope(reader: RecordingReader, channel: int, timestamps, values, t0, t1, pixels: int) -> None:
+    """每个点覆盖从它的时间戳到下一个点之前的原始采样；范围两端的点可能多包含一些采样，只检查覆盖关系"""
+    points = reader.envelope(channel, t0, t1, pixels)
+    assert 0 < len(points) <= pixels, f"包络点数 {len(points)} 超出 {pixels}"
+    starts = np.searchsorted(timestamps, points['timestamp'])
+    stops = np.append(starts[1:], len(timestamps))
+    assert np.array_equal(timestamps[starts], points['timestamp']), "包络点的时间戳不是采样的时间戳"
+    last_exact = len(points) if t1 is None else len(points) - 1
+    for point, start, stop in list(zip(points, starts, stops))[:last_exact]:
+        part = values[start:stop]
+        part = part[~np.isnan(part)]
+        assert point['count'] == len(part), f"包络点的采样数 {point['count']} != {len(part)}"
+        if len(part):
+            assert point['min'] == part.min() and point['max'] == part.max(), "包络点的最值不一致"
+            assert np.isclose(point['mean'], part.mean(), rtol=1e-12, atol=1e-9), "包络点的均值不一致"
+        else:
+            assert np.isnan(point['min']) and np.isnan(point['max']), "没有有效采样的包络点应为NaN"
+    first = np.searchsorted(timestamps, t0) if t0 is not None else 0
+    last = np.searchsorted(timestamps, t1, side='right') if t1 is not None else len(timestamps)
+    assert starts[0] <= first and stops[-1] >= last, "包络没有覆盖整个时间范围"
+
+
+def check_ranges(reader: RecordingReader, data, rng) -> None:
+    for channel, (timestamps, values, flags) in enumerate(data):
+        name = reader.channel_names[channel]
+        assert reader.count(channel) == len(timestamps), "记录数不一致"
+        assert_records(reader.read(channel), timestamps, values, flags, f"{name} read")
+
+        bounds = [(None, None), (None, timestamps[10]), (timestamps[-10], None),
+                  (timestamps[0] - 1, timestamps[0] - 1), (timestamps[-1] + 1, None),
+                  (timestamps[5], timestamps[5]), (timestamps[5] + 1, timestamps[6] - 1)]
+        for _ in range(30):
+            a, b = np.sort(rng.choice(timestamps, 2))
+            bounds.append((int(a), int(b)))
+            bounds.append((int(a) + 1, int(b) - 1))
+        for t0, t1 in bounds:
+            mask = np.ones(len(timestamps), dtype=bool)
+            if t0 is not None:
+                mask &= timestamps >= t0
+            if t1 is not None:
+                mask &= timestamps <= t1
+            expected = (timestamps[mask], values[mask], flags[mask])
+            assert_records(reader.read_range(t0, t1, [name])[name], *expected, f"{name} read_range({t0}, {t1})")
+            chunks = list(reader.iter_range(channel, t0, t1, chunk_records=1000))
+            assert all(len(chunk) <= 1000 for chunk in chunks), "iter_range的块超过chunk_records"
+            joined = np.concatenate(chunks) if chunks else reader.read_range(t0, t1, [name])[name]
+            assert_records(joined, *expected, f"{name} iter_range({t0}, {t1})")
+
+        for pixels in (50, 333, 5000, 10 ** 6):
+            check_envelope(reader, channel, timestamps, values, None, None, pixels)
+        for _ in range(10):
+            a, b = np.sort(rng.choice(timestamps, 2))
+            if a < b:
+                check_envelope(reader, channel, timestamps, values, int(a), int(b), 200)
+
+
+_CRASH_SCRIPT = """
+import os, sys
+import numpy as np
+from src.recording import RecordingWriter
+path, samples = sys.argv[1], int(sys.argv[2])
+data = np.load(path + '.npz')
+writer = RecordingWriter(path, ['A', 'B'], segment_size={segment_size}).open()
+for start in range(0, samples, 333):
+    for channel in range(2):
+        writer.append_many(channel, data['t%d' % channel][start:start + 333], data['v%d' % channel][start:start + 333],
+                           data['f%d' % channel][start:start + 333])
+writer.append(0, int(data['t0'][-1]) + 1, 1.5)
+os._exit(0)         # 模拟程序崩溃：不关闭写入器，不刷新金字塔
+"""
+
+
+def check_crash(directory: str, data) -> None:
+    path = os.path.join(directory, 'crash.sfrec')
+    samples = len(data[0][0])
+    np.savez(path + '.npz', **{f'{key}{channel}': array for channel, arrays in enumerate(data)
+                               for key, array in zip('tvf', arrays)})
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    subprocess.run([sys.executable, '-c', _CRASH_SCRIPT.format(segment_size=SEGMENT_SIZE), path, str(samples)],
+                   check=True, cwd=project_root, env=dict(os.environ, PYTHONPATH=project_root))
+
+    timestamps, values, flags = data[0]
+    data = [(np.append(timestamps, timestamps[-1] + 1), np.append(values, 1.5), np.append(flags, 0)), data[1]]
+    with RecordingReader(path) as reader:
+        for channel, (timestamps, values, flags) in enumerate(data):
+            assert_records(reader.read(channel), timestamps, values, flags, "崩溃后读取")
+            points = reader.envelope(channel, pixels=100)
+            assert points['count'].sum() == np.count_nonzero(~np.isnan(values)), "崩溃后包络的采样数不一致"
+            check_envelope(reader, channel, timestamps, values, None, None, 100)
+
+
+def check_live(directory: str, data) -> None:
+    path = os.path.join(directory, 'live.sfrec')
+    timestamps, values, flags = data[0]
+    half = len(timestamps) // 2
+    writer = RecordingWriter(path, ['A'], segment_size=SEGMENT_SIZE).open()
+    try:
+        writer.append_many(0, timestamps[:half], values[:half], flags[:half])
+        with RecordingReader(path) as reader:
+            assert_records(reader.read(0), timestamps[:half], values[:half], flags[:half], "写入过程中读取")
+        writer.append_many(0, timestamps[half:], values[half:], flags[half:])
+        with RecordingReader(path) as reader:
+            assert_records(reader.read(0), timestamps, values, flags, "写入过程中读取")
+    finally:
+        writer.close()
+
+
+def main():
+    rng = np.random.default_rng(0)
+    directory = tempfile.mkdtemp(prefix='check_recording_')
+    try:
+        data = [make_data(50_000, 1), make_data(7_000, 2)]
+        path = os.path.join(directory, 'roundtrip.sfrec')
+        write_recording(path, data)
+        with RecordingReader(path) as reader:
+            assert len(reader.channel_segments(0)) > 10, "数据应该跨越多个段"
+            check_ranges(reader, data, rng)
+        print("写入、read_range、iter_range、envelope: 通过")
+
+        check_crash(directory, data)
+        print("崩溃后读取: 通过")
+
+        check_live(directory, data)
+        print("写入过程中读取: 通过")
+    finally:
+        shutil.rmtree(directory)
+    print("全部通过")
+
+
+if __name__ == "__main__":
+    main()
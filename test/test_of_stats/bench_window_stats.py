@@ -0,0 +1,64 @@
+"""
+最近数据统计的开销：src/streaming_stats.py 中的 SlidingWindowStats 与 faster_sample_rate02.py 原来的做法
+（每次查询把deque复制为列表，再计算sum、max、min）对比。
+模拟GUI以较高频率轮询多个通道：每个通道每添加若干个采样查询一次。
+
+运行方式（项目根目录下）：
+python -m test.test_of_stats.bench_window_stats [窗口大小=1000] [通道数=3] [每个通道的采样数=100000] [每几个采样查询一次=10]
+"""
+import sys
+import time
+import random
+from collections import deque
+
+from src.streaming_stats import SlidingWindowStats
+
+
+def list_statistics(buffer: deque) -> dict:
+    """原来的get_recent_statistics"""
+    values_list = list(buffer)
+    return {
+        "最新值": values_list[-1],
+        "平均值": sum(values_list) / len(values_list),
+        "最大值": max(values_list),
+        "最小值": min(values_list),
+        "数据点数": len(values_list)
+    }
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    channels = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    samples = int(sys.argv[3]) if len(sys.argv) > 3 else 100_000
+    query_every = int(sys.argv[4]) if len(sys.argv) > 4 else 10
+    data = [[random.gauss(0, 1) for _ in range(samples)] for _ in range(channels)]
+
+    buffers = [deque(maxlen=size) for _ in range(channels)]
+    start = time.perf_counter()
+    for i in range(samples):
+        for buffer, values in zip(buffers, data):
+            buffer.append(values[i])
+            if i % query_every == 0:
+                list_statistics(buffer)
+    list_time = time.perf_counter() - start
+
+    windows = [SlidingWindowStats(size=size) for _ in range(channels)]
+    start = time.perf_counter()
+    for i in range(samples):
+        for window, values in zip(windows, data):
+            window.add(values[i], i)
+            if i % query_every == 0:
+                window.get_results()
+    window_time = time.perf_counter() - start
+
+    expected = list_statistics(buffers[0])
+    results = windows[0].get_results()
+    print(f"窗口 {size}，{channels} 个通道，每个通道 {samples} 个采样，每 {query_every} 个采样查询一次")
+    print(f"复制列表后计算:      {list_time:.3f} 秒")
+    print(f"SlidingWindowStats: {window_time:.3f} 秒（{list_time / window_time:.1f} 倍）")
+    print(f"校验: 均值差 {abs(expected['平均值'] - results['mean']):.2e}，"
+          f"最值一致 {expected['最大值'] == results['max'] and expected['最小值'] == results['min']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+流式统计的检查：src/streaming_stats.py 中 SlidingWindowStats 和 StreamingStats 的结果与NumPy直接计算的结果比较
+    - 按采样数的窗口：每加入一个采样后，窗口内的采样数、最新值、均值、样本标准差（ddof=1）、最小值、最大值
+      与对最近size个有效采样直接计算的结果一致；包括单调递增/递减（单调队列的最坏情况）和大量重复值
+    - 按时间的窗口，以及两个条件同时生效的窗口
+    - None、NaN、inf、-inf不进入窗口，只计入invalid
+    - 长时间运行（移出超过一百万个采样、触发重新计算）后均值和方差的误差仍然很小
+    - StreamingStats：采样数、无效数、均值、样本标准差、最值与全部有效采样直接计算的结果一致
+检查失败时抛出AssertionError，全部通过时打印“全部通过”。
+
+运行方式（项目根目录下）：
+python -m test.test_of_stats.check_window_stats
+"""
+import math
+
+import numpy as np
+
+from src.streaming_stats import SlidingWindowStats, StreamingStats
+
+
+def assert_window(stats: SlidingWindowStats, window: np.ndarray, message: str) -> None:
+    assert stats.count == len(window), f"{message}: 采样数 {stats.count} != {len(window)}"
+    if not len(window):
+        assert stats.mean is None and stats.min is None and stats.max is None, f"{message}: 空窗口应为None"
+        return
+    assert stats.latest == window[-1], f"{message}: 最新值不一致"
+    assert stats.min == window.min() and stats.max == window.max(), f"{message}: 最值不一致"
+    scale = max(1.0, float(np.abs(window).max()))
+    assert abs(stats.mean - window.mean()) <= 1e-9 * scale, f"{message}: 均值 {stats.mean} != {window.mean()}"
+    if len(window) > 1:
+        # 比较方差：窗口内全是相同值时方差只剩舍入误差，开方后会被放大
+        assert math.isclose(stats.variance, window.var(ddof=1), rel_tol=1e-6, abs_tol=1e-9 * scale * scale), \
+            f"{message}: 方差 {stats.variance} != {window.var(ddof=1)}"
+        assert math.isclose(stats.std, math.sqrt(stats.variance)), f"{message}: 标准差与方差不符"
+    else:
+        assert stats.std is None, f"{message}: 只有一个采样时标准差应为None"
+
+
+def with_invalid(values: np.ndarray, rng) -> list:
+    """在数值中随机插入None、NaN和无穷大"""
+    samples = values.tolist()
+    for position in sorted(rng.choice(len(samples), len(samples) // 20, replace=False), reverse=True):
+        samples.insert(int(position), [None, math.nan, math.inf, -math.inf][position % 4])
+    return samples
+
+
+def check_count_window(rng) -> None:
+    sequences = {
+        "随机": rng.normal(100, 3, 5000),
+        "递增": np.arange(3000, dtype=float),
+        "递减": -np.arange(3000, dtype=float),
+        "重复值": rng.integers(0, 3, 3000).astype(float),
+    }
+    for name, values in sequences.items():
+        for size in (1, 2, 7, 1000):
+            stats = SlidingWindowStats(size=size)
+            samples = with_invalid(values, rng)
+            valid = []
+            for sample in samples:
+                stats.add(sample, 0)
+                if sample is not None and math.isfinite(sample):
+                    valid.append(sample)
+                assert_window(stats, np.array(valid[-size:]), f"{name} size={size}")
+            assert stats.invalid == len(samples) - len(valid), f"{name}: 无效采样数不对"
+            assert stats.get_results()["invalid"] == stats.invalid, f"{name}: get_results中的无效采样数不对"
+
+
+def check_time_window(rng) -> None:
+    values = rng.normal(0, 1, 5000)
+    timestamps = np.cumsum(rng.integers(1, 3_000_000, len(values)))     # 不等间隔
+    for size, duration in ((None, 0.2), (50, 0.2), (None, 1e-3)):
+        stats = SlidingWindowStats(size=size, duration=duration)
+        for index, (value, timestamp) in enumerate(zip(values.tolist(), timestamps.tolist())):
+            stats.add(value, timestamp)
+            inside = timestamps[:index + 1] >= timestamp - int(duration * 1e9)
+            window = values[:index + 1][inside]
+            if size is not None:
+                window = window[-size:]
+            assert_window(stats, window, f"size={size} duration={duration}")
+        assert stats.get_results()["span"] <= duration, "窗口的时间跨度超过duration"
+
+
+def check_long_run(rng) -> None:
+    """移出超过一百万个采样；数值带很大的偏移，考验移出旧采样时的舍入误差"""
+    size = 100
+    stats = SlidingWindowStats(size=size)
+    values = 1e6 + rng.normal(0, 1e-3, 1_200_000)
+    for value in values.tolist():
+        stats.add(value, 0)
+    assert_window(stats, values[-size:], "长时间运行")
+
+
+def check_streaming(rng) -> None:
+    values = rng.normal(-5, 2, 20000)
+    samples = with_invalid(values, rng)
+    stats = StreamingStats('check')
+    for index, sample in enumerate(samples[:10000]):
+        stats.add(sample, index)
+    stats.add_many(samples[10000:], 10001)
+    results = stats.get_results()
+    assert results["count"] == len(values) and results["invalid"] == len(samples) - len(values), \
+        f"采样数不对: {results['count']}, {results['invalid']}"
+    assert results["min"] == values.min() and results["max"] == values.max(), "最值不一致"
+    assert math.isclose(results["mean"], values.mean(), rel_tol=1e-12), "均值不一致"
+    assert math.isclose(results["std"], values.std(ddof=1), rel_tol=1e-9), "标准差应为样本标准差（ddof=1）"
+    # P²估算的分位数只能近似
+    assert abs(results["p50"] - np.percentile(values, 50)) < 0.05, "P50偏差过大"
+
+
+def main():
+    rng = np.random.default_rng(0)
+    for check in (check_count_window, check_time_window, check_long_run, check_streaming):
+        check(rng)
+        print(f"{check.__name__}: 通过")
+    print("全部通过")
+
+
+if __name__ == "__main__":
+    main()